@@ -18,10 +18,24 @@ print(f"[api.py] DISABLE_DB_CHECK из окружения: {os.getenv('DISABLE_D
 print(f"[api.py] DISABLE_DB_CHECK после обработки: {DISABLE_DB_CHECK}")
 
 # Импортируем репозитории для работы с базой данных
-from repository import init_db, close_db
-
-# Импортируем API-эндпоинты для обучения моделей
-from handlers.training_api import setup_training_api
+from repository import init_db, close_db, init_async_db, close_async_db, AsyncJobRepository, get_user_cache, engine_stats, transaction_stats, statement_stats
+
+# Пулы для блокирующих задач (конвертация изображений, архивы, внешние API)
+from utils.executors import get_executors_stats, shutdown_executors
+from utils.training_utils import shutdown_conversion_pool
+from utils.photo_cache import get_cache_stats
+from utils.storage import close_storage_backend
+from utils.training_poller import get_training_poller
+from utils.generation_dispatcher import get_generation_dispatcher
+from utils.pg_listener import get_status_listener
+from utils.event_bus import get_event_bus
+from utils.replicate_client import close_replicate_client, get_replicate_client
+
+# Импортируем API-эндпоинты для обучения моделей и вебхуков Replicate
+from handlers.users.training_api import setup_training_api
+from handlers.users.replicate_webhook import setup_replicate_webhook
+from handlers.users.generation_api import setup_generation_api
+from handlers.users.events_api import setup_events_api
 
 # Импортируем настройки CORS и сервера
 from config import CORS_ORIGINS, API_HOST, API_PORT, NGROK_URL
@@ -68,8 +82,27 @@ async def log_requests(request: Request, call_next):
     return response
 
 
-# Регистрируем API-эндпоинты для обучения моделей
+# Регистрируем API-эндпоинты для обучения моделей, генерации, потоков событий и вебхуков Replicate
 setup_training_api(app)
+setup_replicate_webhook(app)
+setup_generation_api(app)
+setup_events_api(app)
+
+
+async def start_api_event_bus():
+    """
+    Подписывает API на шину событий. Пропущенные события не дочитываются:
+    снимки статусов - это кэш, при промахе статус читается из базы данных.
+    """
+    bus = get_event_bus("api", replay=False)
+
+    @bus.subscribe("model_ready")
+    async def on_model_ready(event):
+        training_status = "succeeded" if event.status == "ready" else "failed"
+        if event.training_id:
+            get_training_poller().record_completion(event.training_id, training_status, event.model_dump())
+
+    await bus.start()
 
 
 # События при запуске и остановке приложения
@@ -82,8 +115,16 @@ async def startup_event():
     if DISABLE_DB_CHECK:
         logger.warning("Проверка подключения к базе данных отключена")
     else:
-        if init_db():
+        if init_db() and await init_async_db():
             logger.info("База данных успешно инициализирована")
+            # Запускаем фоновый опрос статусов обучения моделей
+            await get_training_poller().start()
+            # Запускаем диспетчер генераций изображений
+            await get_generation_dispatcher().start()
+            # Подписываемся на изменения статусов моделей и генераций для потоков событий
+            await get_status_listener().start()
+            # Снимки статусов обучения обновляются по событиям из других процессов
+            await start_api_event_bus()
         else:
             logger.error("Ошибка при инициализации базы данных")
             raise HTTPException(status_code=500, detail="Database initialization failed")
@@ -94,9 +135,24 @@ async def shutdown_event():
     """
     Действия при остановке приложения
     """
+    # Сначала останавливаем фоновый опрос и диспетчер генераций, которые пользуются клиентом Replicate и базой данных
+    await get_training_poller().stop()
+    await get_generation_dispatcher().stop()
+    await get_status_listener().stop()
+    await get_event_bus("api", replay=False).stop()
+
+    shutdown_executors(wait=False)
+    shutdown_conversion_pool()
+    close_storage_backend()
+    await close_replicate_client()
+
+    # Закрываем HTTP-сессию бота, через которую отправлялись уведомления из вебхуков
+    from loader import bot
+    await bot.session.close()
+
     if not DISABLE_DB_CHECK:
         logger.info("Закрытие соединений с базой данных...")
-        if close_db():
+        if close_db() and await close_async_db():
             logger.info("Соединения с базой данных закрыты")
         else:
             logger.error("Ошибка при закрытии соединений с базой данных")
@@ -118,14 +174,29 @@ async def health_check():
     Эндпоинт для проверки подключения к базе данных
     """
     try:
+        metrics = {
+            "executors": get_executors_stats(),
+            "photo_cache": get_cache_stats(),
+            "training_poller": get_training_poller().stats(),
+            "generation_dispatcher": get_generation_dispatcher().stats(),
+            "status_events": get_status_listener().stats(),
+            "event_bus": get_event_bus("api", replay=False).stats(),
+            "replicate": get_replicate_client().stats(),
+            "user_cache": get_user_cache().stats(),
+            "db_pool": engine_stats(),
+            "transactions": transaction_stats(),
+            "statements": statement_stats()
+        }
         if DISABLE_DB_CHECK:
-            return {"status": "success", "database": "check_disabled"}
+            return {"status": "success", "database": "check_disabled", **metrics}
         else:
             # Проверяем подключение к базе данных
             if init_db():
-                return {"status": "success", "database": "connected"}
+                # Глубина очереди задач обучения по статусам
+                metrics["training_jobs"] = await AsyncJobRepository().count_by_status()
+                return {"status": "success", "database": "connected", **metrics}
             else:
-                return {"status": "error", "database": "disconnected"}
+                return {"status": "error", "database": "disconnected", **metrics}
     except Exception as e:
         logger.error(f"Ошибка при проверке здоровья приложения: {e}")
         raise HTTPException(status_code=500, detail=str(e))
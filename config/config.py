@@ -23,14 +23,20 @@ class Settings(BaseSettings):
 
     @property
     def DB_CONFIG(self) -> dict:
+        # Параметры подключения psycopg2 (размеры пула - в DB_POOL_CONFIG)
         return {
             'host': self.DB_HOST,
             'port': self.DB_PORT,
-            'database': self.DB_NAME,
+            'dbname': self.DB_NAME,
             'user': self.DB_USER,
             'password': self.DB_PASSWORD,
-            'min_size': self.DB_MIN_CONN,
-            'max_size': self.DB_MAX_CONN,
+        }
+
+    @property
+    def DB_POOL_CONFIG(self) -> dict:
+        return {
+            'min_connections': self.DB_MIN_CONN,
+            'max_connections': self.DB_MAX_CONN,
         }
 
     @property
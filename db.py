@@ -1,46 +1,37 @@
-import psycopg2
 from contextlib import contextmanager
-from config import config
+from repository.engine import close_sync_engine, get_sync_engine, open_sync_engine
 from utils.logger import logger
 
-# Глобальное подключение
-connection = None
-
 
 def init_connection():
     """
-    Инициализация подключения к PostgreSQL
+    Инициализация подключения к PostgreSQL (общий пул соединений процесса)
     """
-    global connection
-    if connection is None:
-        try:
-            connection = psycopg2.connect(**config.DB_CONFIG)
-            logger.info("Подключение к базе данных успешно установлено.")
-        except (Exception, psycopg2.Error) as error:
-            logger.error(f"Ошибка подключения к базе данных: {error}")
+    try:
+        open_sync_engine()
+        logger.info("Подключение к базе данных успешно установлено.")
+    except Exception as error:
+        logger.error(f"Ошибка подключения к базе данных: {error}")
 
 
 def close_connection():
     """
     Закрытие подключения к PostgreSQL
     """
-    global connection
-    if connection is not None:
-        connection.close()
+    if get_sync_engine() is not None:
+        close_sync_engine()
         logger.info("Подключение к базе данных закрыто.")
-        connection = None
 
 
 @contextmanager
 def get_cursor():
     """
     Контекстный менеджер для курсора.
-    Гарантирует commit/rollback и автоматическое закрытие курсора.
+    Берет соединение из общего пула, гарантирует commit/rollback,
+    закрытие курсора и возврат соединения в пул.
     """
-    global connection
-    if connection is None:
-        init_connection()
-
+    engine = get_sync_engine() or open_sync_engine()
+    connection = engine.getconn()
     cursor = connection.cursor()
     try:
         yield cursor
@@ -51,3 +42,4 @@ def get_cursor():
         raise
     finally:
         cursor.close()
+        engine.putconn(connection)
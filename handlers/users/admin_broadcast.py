@@ -0,0 +1,107 @@
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+import logging
+from typing import Dict, Optional
+
+from .admin_notifications import ADMIN_IDS
+from utils.broadcast import get_broadcaster
+
+# Создаем логгер
+logger = logging.getLogger(__name__)
+
+# Роутер команд рассылки, доступных только администраторам
+broadcast_router = Router()
+broadcast_router.message.filter(lambda message: message.from_user and message.from_user.id in ADMIN_IDS)
+
+
+def _format_broadcast(broadcast: Dict, live: Optional[Dict] = None) -> str:
+    """Текст с состоянием рассылки; для выполняемой в этом процессе - со скоростью и оценкой времени"""
+    data = live or broadcast
+    processed = data.get("processed", broadcast["sent"] + broadcast["failed"] + broadcast["blocked"])
+    text = (
+        f"📣 Рассылка #{broadcast['broadcast_id']}: {data['status']}\n"
+        f"Обработано: {processed} из {data.get('total') or '?'}\n"
+        f"Отправлено: {data['sent']}, заблокировали бота: {data['blocked']}, ошибок: {data['failed']}"
+    )
+    if live:
+        text += f"\nСкорость: {live['rate_per_second']} сообщ./с"
+        if live["eta_seconds"] is not None:
+            text += f", осталось ~{live['eta_seconds'] // 60} мин"
+    return text
+
+
+def _parse_id(command: CommandObject) -> Optional[int]:
+    if command.args and command.args.strip().isdigit():
+        return int(command.args.strip())
+    return None
+
+
+@broadcast_router.message(Command("broadcast"))
+async def cmd_broadcast(message: Message, command: CommandObject):
+    """
+    Запуск рассылки всем пользователям: /broadcast <текст сообщения в HTML>
+    """
+    if not command.args:
+        await message.answer("❌ Используйте формат: /broadcast текст сообщения")
+        return
+
+    broadcaster = get_broadcaster(message.bot)
+    try:
+        broadcast = await broadcaster.create(message.from_user.id, command.args.strip())
+    except Exception as e:
+        logger.error(f"Ошибка при создании рассылки: {e}")
+        await message.answer(f"❌ Не удалось запустить рассылку: {e}")
+        return
+
+    logger.info(f"Администратор {message.from_user.id} запустил рассылку {broadcast['broadcast_id']}")
+    await message.answer(
+        f"✅ Рассылка #{broadcast['broadcast_id']} запущена.\n"
+        f"Состояние: /broadcast_status {broadcast['broadcast_id']}\n"
+        f"Пауза: /broadcast_pause {broadcast['broadcast_id']}, отмена: /broadcast_cancel {broadcast['broadcast_id']}"
+    )
+
+
+@broadcast_router.message(Command("broadcast_status"))
+async def cmd_broadcast_status(message: Message, command: CommandObject):
+    """
+    Состояние рассылки: /broadcast_status [id]; без ID - последние рассылки
+    """
+    broadcaster = get_broadcaster(message.bot)
+    broadcast_id = _parse_id(command)
+    if broadcast_id is None:
+        broadcasts = await broadcaster.repository.get_recent(5)
+    else:
+        broadcast = await broadcaster.repository.get_by_id(broadcast_id)
+        broadcasts = [broadcast] if broadcast else []
+
+    if not broadcasts:
+        await message.answer("Рассылки не найдены.")
+        return
+    await message.answer("\n\n".join(
+        _format_broadcast(broadcast, broadcaster.progress(broadcast["broadcast_id"])) for broadcast in broadcasts
+    ))
+
+
+@broadcast_router.message(Command("broadcast_pause", "broadcast_cancel", "broadcast_resume"))
+async def cmd_broadcast_control(message: Message, command: CommandObject):
+    """
+    Управление рассылкой: /broadcast_pause id, /broadcast_cancel id, /broadcast_resume id
+    """
+    broadcast_id = _parse_id(command)
+    if broadcast_id is None:
+        await message.answer(f"❌ Используйте формат: /{command.command} id")
+        return
+
+    broadcaster = get_broadcaster(message.bot)
+    actions = {
+        "broadcast_pause": (broadcaster.pause, "приостановлена"),
+        "broadcast_cancel": (broadcaster.cancel, "отменена"),
+        "broadcast_resume": (broadcaster.resume, "возобновлена"),
+    }
+    action, done_text = actions[command.command]
+    if await action(broadcast_id):
+        await message.answer(f"✅ Рассылка #{broadcast_id} {done_text}.")
+    else:
+        await message.answer(f"❌ Рассылка #{broadcast_id} не найдена или уже завершена.")
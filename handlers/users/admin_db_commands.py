@@ -266,7 +266,7 @@ async def cmd_add_tokens(message: Message, command: CommandObject):
             await message.answer("❌ Пользователь не найден.")
             return
 
-        updated_user = user_repo.update_tokens(user_id, amount)
+        updated_user = user_repo.update_tokens(user_id, amount, reason="admin")
         if updated_user:
             username = user.get('username', str(user_id))
             await message.answer(
@@ -326,7 +326,7 @@ async def cmd_add_tokens(message: Message, command: CommandObject):
                 logger.error(f"Ошибка при отправке уведомления пользователю {user_id}: {e}")
                 await message.answer(f"⚠️ Токены добавлены, но не удалось отправить уведомление пользователю: {e}")
         else:
-            await message.answer("❌ Не удалось обновить токены пользователя.")
+            await message.answer("❌ Не удалось обновить токены пользователя: при списании баланс не может стать отрицательным.")
     except Exception as e:
         logger.error(f"Ошибка в команде add_tokens: {e}")
         await message.answer(f"❌ Произошла ошибка: {str(e)}")
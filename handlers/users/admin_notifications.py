@@ -1,8 +1,11 @@
 import os
+import asyncio
 import logging
 from aiogram import Bot
 from typing import List
 
+from utils.broadcast import SEND_SENT, get_message_sender
+
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
@@ -42,18 +45,18 @@ async def notify_admins_about_payment(bot: Bot, user_id: int, username: str):
     message_text += f"Для пополнения баланса используйте команду:\n"
     message_text += f"`/add_tokens {user_id} <количество_токенов>`"
     
-    # Отправляем сообщение всем администраторам
-    sent_count = 0
-    for admin_id in ADMIN_IDS:
-        try:
-            logger.info(f"Отправка уведомления администратору {admin_id}")
-            await bot.send_message(admin_id, message_text, parse_mode="Markdown")
-            logger.info(f"Уведомление успешно отправлено администратору {admin_id}")
-            sent_count += 1
-        except Exception as e:
-            logger.error(f"Ошибка при отправке уведомления администратору {admin_id}: {e}")
+    # Отправляем сообщение всем администраторам одновременно, в пределах лимитов Telegram
+    sender = get_message_sender(bot)
+    logger.info(f"Отправка уведомления администраторам {ADMIN_IDS}")
+    results = await asyncio.gather(
+        *(sender.send(admin_id, message_text, parse_mode="Markdown") for admin_id in ADMIN_IDS)
+    )
+    for admin_id, result in zip(ADMIN_IDS, results):
+        if result != SEND_SENT:
+            logger.error(f"Ошибка при отправке уведомления администратору {admin_id}: {result}")
+    sent_count = results.count(SEND_SENT)
     
     if sent_count > 0:
         logger.info(f"Уведомления о запросе пополнения баланса от пользователя {user_id} отправлены {sent_count} администраторам")
     else:
-        logger.error(f"Не удалось отправить уведомление ни одному администратору для пользователя {user_id}") 
\ No newline at end of file
+        logger.error(f"Не удалось отправить уведомление ни одному администратору для пользователя {user_id}")
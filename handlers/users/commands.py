@@ -5,7 +5,7 @@ from aiogram.utils.markdown import hbold
 import logging
 from datetime import datetime
 import os
-from repository import get_user_repository
+from repository import get_async_user_repository
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.types import KeyboardButton, ReplyKeyboardMarkup, WebAppInfo
 
@@ -27,14 +27,14 @@ async def command_start(message: types.Message, state: FSMContext):
     last_name = message.from_user.last_name
 
     # Получаем репозиторий пользователей
-    user_repo = get_user_repository()
+    user_repo = get_async_user_repository()
     if user_repo is None:
         logger.error("Не удалось получить репозиторий пользователей")
         await message.answer("Произошла ошибка при регистрации. Попробуйте позже.")
         return
 
     # Проверяем, существует ли пользователь в базе данных
-    user = user_repo.get_by_id(user_id)
+    user = await user_repo.get_by_id(user_id)
 
     if user is None:
         # Создаем нового пользователя
@@ -58,7 +58,7 @@ async def command_start(message: types.Message, state: FSMContext):
         }
 
         # Создаем пользователя
-        created_user = user_repo.create(user_data)
+        created_user = await user_repo.create(user_data)
 
         if created_user is None:
             logger.error(f"Ошибка при создании пользователя: {user_id}")
@@ -0,0 +1,42 @@
+import logging
+from aiogram import Bot
+
+from utils.event_bus import EventBus, GenerationDoneEvent, ModelReadyEvent, PaymentCompletedEvent
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+
+def setup_event_notifications(bus: EventBus, bot: Bot) -> None:
+    """
+    Подписывает бота на события шины и отправляет по ним уведомления пользователям.
+    События, пришедшие, пока бот был остановлен, будут дочитаны из журнала при запуске.
+
+    Args:
+        bus: Шина событий с подписчиком бота
+        bot: Экземпляр бота для отправки сообщений
+    """
+
+    @bus.subscribe("model_ready")
+    async def on_model_ready(event: ModelReadyEvent):
+        if event.status == "ready":
+            text = f"✅ Модель <b>{event.name}</b> обучена и готова к генерации!"
+        else:
+            text = f"❌ Не удалось обучить модель <b>{event.name}</b>. Попробуйте еще раз."
+        await bot.send_message(event.user_id, text)
+
+    @bus.subscribe("generation_done")
+    async def on_generation_done(event: GenerationDoneEvent):
+        if event.status == "completed" and event.image_url:
+            await bot.send_photo(event.user_id, event.image_url, caption="🎨 Ваше изображение готово!")
+        elif event.status == "failed":
+            await bot.send_message(event.user_id, "❌ Не удалось сгенерировать изображение. Попробуйте еще раз.")
+
+    @bus.subscribe("payment_completed")
+    async def on_payment_completed(event: PaymentCompletedEvent):
+        text = "💰 Оплата прошла успешно!"
+        if event.tokens:
+            text += f" На баланс зачислено {event.tokens} токенов."
+        await bot.send_message(event.user_id, text)
+
+    logger.info("Бот подписан на события шины: model_ready, generation_done, payment_completed")
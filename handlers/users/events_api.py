@@ -0,0 +1,123 @@
+import os
+import json
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict
+from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from dotenv import load_dotenv
+
+# Загружаем переменные окружения
+load_dotenv()
+
+from utils.pg_listener import StatusSubscription, get_status_listener
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+# Интервал служебных сообщений, которые не дают прокси закрыть простаивающее соединение
+EVENTS_KEEPALIVE_INTERVAL = float(os.getenv("EVENTS_KEEPALIVE_INTERVAL", "15"))
+
+# Создаем роутер API
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+
+def _sse(event: Dict[str, Any]) -> bytes:
+    return f"event: {event.get('kind', 'message')}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n".encode()
+
+
+async def _sse_stream(request: Request, subscription: StatusSubscription) -> AsyncIterator[bytes]:
+    """
+    Отдает события подписки в формате Server-Sent Events до отключения клиента
+    """
+    try:
+        yield _sse({"kind": "ready", "user_id": subscription.user_id})
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=EVENTS_KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield _sse(event)
+    finally:
+        get_status_listener().unsubscribe(subscription)
+
+
+@router.get("/{user_id}/stream")
+async def stream_events(user_id: int, request: Request):
+    """
+    Поток изменений статусов моделей и генераций пользователя (Server-Sent Events).
+
+    События: ready - подписка установлена; model, generation - изменился статус
+    (поля id, status, model_url/image_url); resync - часть событий могла быть
+    потеряна, состояние нужно перечитать.
+
+    Args:
+        user_id: ID пользователя
+        request: Запрос
+
+    Returns:
+        Поток text/event-stream
+    """
+    subscription = get_status_listener().subscribe(user_id)
+    return StreamingResponse(
+        _sse_stream(request, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/{user_id}/ws")
+async def websocket_events(websocket: WebSocket, user_id: int):
+    """
+    Поток изменений статусов моделей и генераций пользователя через WebSocket.
+    Формат событий тот же, что и в /stream, каждое событие - отдельное JSON-сообщение.
+
+    Args:
+        websocket: Соединение WebSocket
+        user_id: ID пользователя
+    """
+    await websocket.accept()
+    listener = get_status_listener()
+    subscription = listener.subscribe(user_id)
+
+    async def drain_incoming():
+        # Клиент ничего не отправляет, читаем только чтобы узнать о закрытии соединения
+        while True:
+            await websocket.receive_text()
+
+    receiver = asyncio.create_task(drain_incoming())
+    try:
+        await websocket.send_json({"kind": "ready", "user_id": user_id})
+        while not receiver.done():
+            getter = asyncio.create_task(subscription.get())
+            done, _ = await asyncio.wait(
+                {getter, receiver}, timeout=EVENTS_KEEPALIVE_INTERVAL, return_when=asyncio.FIRST_COMPLETED
+            )
+            if getter not in done:
+                getter.cancel()
+                try:
+                    await getter
+                except asyncio.CancelledError:
+                    pass
+            if getter.done() and not getter.cancelled():
+                await websocket.send_text(json.dumps(getter.result(), ensure_ascii=False, default=str))
+            elif not done:
+                await websocket.send_json({"kind": "keepalive"})
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.warning(f"Поток событий WebSocket пользователя {user_id} прерван: {e}")
+    finally:
+        receiver.cancel()
+        listener.unsubscribe(subscription)
+
+
+def setup_events_api(app):
+    """
+    Регистрирует эндпоинты потоков событий в приложении FastAPI.
+
+    Args:
+        app: Экземпляр приложения FastAPI
+    """
+    app.include_router(router)
@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from dotenv import load_dotenv
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Проверяем, нужно ли отключить проверку подключения к базе данных
+DISABLE_DB_CHECK = os.getenv("DISABLE_DB_CHECK", "false").lower() == "true"
+
+# Импортируем репозитории для работы с базой данных
+if not DISABLE_DB_CHECK:
+    from repository.async_model_repository import AsyncModelRepository
+    from repository.async_user_repository import AsyncUserRepository
+    from repository.async_generation_repository import AsyncGenerationRepository
+
+from utils.generation_dispatcher import get_generation_dispatcher
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+# Стоимость одной генерации в токенах
+GENERATION_COST = int(os.getenv("GENERATION_COST", "10"))
+# Максимальное количество вариаций в одной пачке
+GENERATION_BATCH_MAX = 16
+# Как часто проверять готовность генераций пачки и сколько ждать всю пачку
+GENERATION_BATCH_POLL_INTERVAL = float(os.getenv("GENERATION_BATCH_POLL_INTERVAL", "1"))
+GENERATION_BATCH_STREAM_TIMEOUT = float(os.getenv("GENERATION_BATCH_STREAM_TIMEOUT", "600"))
+
+# Статусы, после которых генерация больше не меняется
+FINAL_STATUSES = {"completed", "failed", "canceled"}
+
+# Создаем роутер API
+router = APIRouter(prefix="/api/generation", tags=["generation"])
+
+
+# Модель данных для пачки генераций
+class BatchGenerationRequest(BaseModel):
+    user_id: int
+    prompt: str
+    model_id: Optional[int] = None
+    count: int = Field(4, ge=1, le=GENERATION_BATCH_MAX)
+    lora_scale: Optional[float] = None
+    guidance_scale: Optional[float] = None
+    steps: Optional[int] = None
+
+
+# Создаем экземпляры репозиториев
+if not DISABLE_DB_CHECK:
+    model_repository = AsyncModelRepository()
+    user_repository = AsyncUserRepository()
+    generation_repository = AsyncGenerationRepository()
+
+
+def _ndjson(event: Dict[str, Any]) -> bytes:
+    return (json.dumps(event, ensure_ascii=False, default=str) + "\n").encode()
+
+
+def _result_event(generation: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "event": "result",
+        "generation_id": generation["generation_id"],
+        "status": generation.get("status"),
+        "image_url": generation.get("image_url")
+    }
+
+
+async def stream_batch_results(generations: List[Dict[str, Any]], tokens_spent: int) -> AsyncIterator[bytes]:
+    """
+    Отдает результаты пачки генераций по мере их готовности в формате NDJSON.
+    Готовность всей пачки проверяется одним запросом за проход.
+
+    Args:
+        generations: Созданные генерации
+        tokens_spent: Сколько токенов списано за пачку
+
+    Yields:
+        Строки NDJSON: accepted, result для каждой генерации, done
+    """
+    pending = [generation["generation_id"] for generation in generations]
+    yield _ndjson({"event": "accepted", "generation_ids": pending, "tokens_spent": tokens_spent})
+
+    deadline = time.monotonic() + GENERATION_BATCH_STREAM_TIMEOUT
+    while pending and time.monotonic() < deadline:
+        await asyncio.sleep(GENERATION_BATCH_POLL_INTERVAL)
+        finished = set()
+        for generation in await generation_repository.get_by_ids(pending):
+            if generation.get("status") in FINAL_STATUSES:
+                finished.add(generation["generation_id"])
+                yield _ndjson(_result_event(generation))
+        pending = [generation_id for generation_id in pending if generation_id not in finished]
+
+    yield _ndjson({"event": "done", "pending": pending})
+
+
+@router.post("/batch", status_code=status.HTTP_202_ACCEPTED)
+async def create_batch_generation(request: BatchGenerationRequest, stream: bool = True):
+    """
+    Создает пачку вариаций одного промпта.
+
+    Токены за всю пачку списываются одним запросом в той же транзакции, что и
+    многострочная вставка генераций. Генерации отправляет провайдеру диспетчер,
+    при stream=true результаты возвращаются в формате NDJSON по мере готовности.
+
+    Args:
+        request: Параметры пачки генераций
+        stream: Возвращать результаты потоком
+
+    Returns:
+        Поток NDJSON или список созданных генераций
+    """
+    total_cost = GENERATION_COST * request.count
+
+    try:
+        if DISABLE_DB_CHECK:
+            return {
+                "status": "success",
+                "generation_ids": list(range(1, request.count + 1)),
+                "tokens_spent": total_cost
+            }
+
+        # Без работающего диспетчера генерации не будут отправлены, а токены останутся списанными
+        if not get_generation_dispatcher().running:
+            raise HTTPException(status_code=503, detail="Генерация изображений временно недоступна")
+
+        user = await user_repository.get(request.user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail=f"Пользователь с ID {request.user_id} не найден")
+
+        model = None
+        if request.model_id is not None:
+            model = await model_repository.get_by_id(request.model_id)
+            if not model or (model["user_id"] != request.user_id and not model.get("is_public")):
+                raise HTTPException(status_code=404, detail=f"Модель с ID {request.model_id} не найдена")
+            if model["status"] != "ready":
+                raise HTTPException(status_code=409, detail="Модель еще не готова к генерации")
+
+        prompt = request.prompt
+        if model and model.get("trigger_word") and model["trigger_word"] not in prompt:
+            prompt = f"{model['trigger_word']} {prompt}"
+
+        rows = [
+            {
+                "user_id": request.user_id,
+                "model_id": request.model_id,
+                "prompt_text": prompt,
+                "lora_scale": request.lora_scale,
+                "guidance_scale": request.guidance_scale,
+                "steps": request.steps,
+                "status": "pending",
+                "tokens_spent": GENERATION_COST,
+                "content_amount": 1
+            }
+            for _ in range(request.count)
+        ]
+
+        generations = await generation_repository.create_many(rows, reserve_tokens=total_cost)
+        if not generations:
+            raise HTTPException(
+                status_code=403,
+                detail=f"Недостаточно токенов для генерации. Требуется {total_cost} токенов."
+            )
+
+        # Диспетчер заберет новые генерации сразу, не дожидаясь очередного опроса
+        get_generation_dispatcher().wake()
+        logger.info(f"Пользователь {request.user_id} поставил пачку из {len(generations)} генераций")
+
+        if stream:
+            return StreamingResponse(
+                stream_batch_results(generations, total_cost),
+                media_type="application/x-ndjson",
+                status_code=status.HTTP_202_ACCEPTED
+            )
+
+        return {
+            "status": "success",
+            "generation_ids": [generation["generation_id"] for generation in generations],
+            "tokens_spent": total_cost
+        }
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Ошибка при создании пачки генераций: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def setup_generation_api(app):
+    """
+    Регистрирует API-эндпоинты генерации изображений в приложении FastAPI.
+
+    Args:
+        app: Экземпляр приложения FastAPI
+    """
+    app.include_router(router)
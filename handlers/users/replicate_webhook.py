@@ -0,0 +1,308 @@
+import os
+import hmac
+import time
+import base64
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+from fastapi import APIRouter, HTTPException, Request, status
+from dotenv import load_dotenv
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Проверяем, нужно ли отключить проверку подключения к базе данных
+DISABLE_DB_CHECK = os.getenv("DISABLE_DB_CHECK", "false").lower() == "true"
+
+# Импортируем репозитории для работы с базой данных
+if not DISABLE_DB_CHECK:
+    from repository.async_model_repository import AsyncModelRepository
+    from repository.async_generation_repository import AsyncGenerationRepository
+
+from utils.training_poller import get_training_poller
+from utils.generation_dispatcher import get_generation_dispatcher
+from utils.event_bus import GenerationDoneEvent, ModelReadyEvent, publish_event
+from utils.training_jobs import TRAINING_COST
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+# Секрет подписи вебхуков Replicate (формат whsec_..., выдается API GET /v1/webhooks/default/secret)
+REPLICATE_WEBHOOK_SECRET = os.getenv("REPLICATE_WEBHOOK_SECRET")
+# Допустимое расхождение времени отправки вебхука и текущего времени, в секундах
+REPLICATE_WEBHOOK_TOLERANCE = int(os.getenv("REPLICATE_WEBHOOK_TOLERANCE", "300"))
+# Сколько идентификаторов обработанных вебхуков помнить для отсева повторных доставок
+WEBHOOK_DEDUP_SIZE = 10000
+
+# Статусы Replicate, с которыми приходит вебхук о завершении
+TERMINAL_STATUSES = {"succeeded", "failed", "canceled"}
+
+# Уведомления пользователям отправляет бот по событиям шины (utils/event_bus.py).
+# Если бот не подписан на шину, уведомления можно отправлять прямо из API
+WEBHOOK_DIRECT_NOTIFICATIONS = os.getenv("WEBHOOK_DIRECT_NOTIFICATIONS", "false").lower() == "true"
+
+# Создаем роутер API
+router = APIRouter(prefix="/api/replicate", tags=["replicate"])
+
+# Создаем экземпляры репозиториев
+if not DISABLE_DB_CHECK:
+    model_repository = AsyncModelRepository()
+    generation_repository = AsyncGenerationRepository()
+
+# Идентификаторы уже обработанных вебхуков
+_processed_webhooks: "OrderedDict[str, float]" = OrderedDict()
+
+# Фоновые задачи уведомлений (ссылки держим, чтобы задачи не удалил сборщик мусора)
+_notification_tasks: Set[asyncio.Task] = set()
+
+
+def verify_webhook_signature(body: bytes, webhook_id: str, timestamp: str, signature_header: str,
+                             secret: str) -> bool:
+    """
+    Проверяет подпись вебхука Replicate (стандарт Standard Webhooks).
+
+    Подписывается строка "{webhook-id}.{webhook-timestamp}.{тело}" ключом HMAC-SHA256,
+    в заголовке webhook-signature передается одна или несколько подписей вида "v1,<base64>".
+
+    Args:
+        body: Тело запроса
+        webhook_id: Заголовок webhook-id
+        timestamp: Заголовок webhook-timestamp
+        signature_header: Заголовок webhook-signature
+        secret: Секрет подписи
+
+    Returns:
+        True, если подпись верна и вебхук не устарел
+    """
+    try:
+        if abs(time.time() - int(timestamp)) > REPLICATE_WEBHOOK_TOLERANCE:
+            return False
+        key = base64.b64decode(secret.split("_", 1)[1] if secret.startswith("whsec_") else secret)
+    except (ValueError, TypeError):
+        return False
+
+    signed_content = f"{webhook_id}.{timestamp}.".encode() + body
+    expected = base64.b64encode(hmac.new(key, signed_content, hashlib.sha256).digest()).decode()
+
+    for signature in signature_header.split():
+        version, _, value = signature.partition(",")
+        if version == "v1" and hmac.compare_digest(value, expected):
+            return True
+    return False
+
+
+def _remember_webhook(webhook_id: str) -> bool:
+    """
+    Запоминает идентификатор вебхука
+
+    Returns:
+        False, если вебхук с таким идентификатором уже обрабатывался
+    """
+    if webhook_id in _processed_webhooks:
+        return False
+    _processed_webhooks[webhook_id] = time.time()
+    while len(_processed_webhooks) > WEBHOOK_DEDUP_SIZE:
+        _processed_webhooks.popitem(last=False)
+    return True
+
+
+def _first_output_url(output: Any) -> Optional[str]:
+    """Извлекает URL результата из поля output предсказания (строка, список или словарь)"""
+    if isinstance(output, str):
+        return output
+    if isinstance(output, list) and output:
+        return _first_output_url(output[0])
+    if isinstance(output, dict):
+        return output.get("model_url") or output.get("url") or output.get("weights")
+    return None
+
+
+def _notify_user(user_id: int, text: str, photo_url: Optional[str] = None) -> None:
+    """
+    Отправляет пользователю уведомление через бота в фоне, не задерживая ответ Replicate
+
+    Args:
+        user_id: ID пользователя в Telegram
+        text: Текст сообщения
+        photo_url: URL изображения (для результатов генерации)
+    """
+    async def send():
+        try:
+            from loader import bot
+            if photo_url:
+                await bot.send_photo(user_id, photo_url, caption=text)
+            else:
+                await bot.send_message(user_id, text)
+        except Exception as e:
+            logger.error(f"Не удалось отправить уведомление пользователю {user_id}: {e}")
+
+    task = asyncio.create_task(send())
+    _notification_tasks.add(task)
+    task.add_done_callback(_notification_tasks.discard)
+
+
+async def _apply_training(model: Dict[str, Any], payload: Dict[str, Any]) -> bool:
+    """
+    Применяет результат обучения к модели
+
+    Returns:
+        True, если статус модели изменился
+    """
+    training_id = payload["id"]
+    succeeded = payload["status"] == "succeeded"
+    model_status = "ready" if succeeded else "failed"
+    model_url = _first_output_url(payload.get("output")) if succeeded else None
+
+    # complete_training обновляет только модель в статусе training, повторный вебхук ничего не изменит
+    updated = await model_repository.complete_training(model["model_id"], model_status, model_url)
+    if updated is None:
+        get_training_poller().record_completion(training_id, payload["status"], model)
+        return False
+
+    predict_time = (payload.get("metrics") or {}).get("predict_time")
+    if predict_time is not None:
+        updated = await model_repository.update_training_info(
+            model["model_id"], int(predict_time), TRAINING_COST
+        ) or updated
+
+    get_training_poller().record_completion(training_id, payload["status"], updated)
+    await publish_event(ModelReadyEvent(
+        model_id=updated["model_id"],
+        user_id=updated["user_id"],
+        training_id=training_id,
+        name=updated.get("name"),
+        trigger_word=updated.get("trigger_word"),
+        status=updated["status"],
+        model_url=updated.get("model_url")
+    ))
+
+    if not WEBHOOK_DIRECT_NOTIFICATIONS:
+        return True
+    if succeeded:
+        _notify_user(model["user_id"], f"✅ Модель <b>{model['name']}</b> обучена и готова к генерации!")
+    else:
+        _notify_user(model["user_id"], f"❌ Не удалось обучить модель <b>{model['name']}</b>. Попробуйте еще раз.")
+    return True
+
+
+async def _apply_generation(generation: Dict[str, Any], payload: Dict[str, Any]) -> bool:
+    """
+    Применяет результат генерации
+
+    Returns:
+        True, если статус генерации изменился
+    """
+    # Генерация завершилась у провайдера - освобождаем слот диспетчера
+    get_generation_dispatcher().release(generation["generation_id"])
+
+    # Повторный вебхук для уже завершенной генерации пропускаем
+    if generation.get("status") in ("completed", "failed", "canceled"):
+        return False
+
+    generation_id = generation["generation_id"]
+    image_url = None
+    if payload["status"] == "succeeded":
+        image_url = _first_output_url(payload.get("output"))
+        new_status = "completed"
+        await generation_repository.update_result(generation_id, image_url)
+    else:
+        # Статус и возврат токенов за несостоявшуюся генерацию - одна транзакция
+        new_status = "failed" if payload["status"] == "failed" else "canceled"
+        if await generation_repository.fail_and_refund(generation_id, new_status) is None:
+            return False
+
+    await publish_event(GenerationDoneEvent(
+        generation_id=generation_id, user_id=generation["user_id"], status=new_status, image_url=image_url
+    ))
+
+    if WEBHOOK_DIRECT_NOTIFICATIONS:
+        if image_url:
+            _notify_user(generation["user_id"], "🎨 Ваше изображение готово!", photo_url=image_url)
+        else:
+            _notify_user(generation["user_id"], "❌ Не удалось сгенерировать изображение. Попробуйте еще раз.")
+    return True
+
+
+@router.post("/webhook", status_code=status.HTTP_200_OK)
+async def replicate_webhook(request: Request):
+    """
+    Принимает вебхуки Replicate о завершении обучения и генераций.
+
+    Args:
+        request: Запрос от Replicate
+
+    Returns:
+        Результат обработки вебхука
+    """
+    body = await request.body()
+    webhook_id = request.headers.get("webhook-id", "")
+
+    # Без секрета подпись проверить нельзя, а неподписанный вебхук может пометить
+    # любую модель готовой с произвольным model_url - такие запросы не принимаем
+    if not REPLICATE_WEBHOOK_SECRET:
+        logger.error(f"Отклонен вебхук Replicate {webhook_id}: REPLICATE_WEBHOOK_SECRET не задан")
+        raise HTTPException(status_code=503, detail="Прием вебхуков не настроен")
+
+    if not verify_webhook_signature(
+            body,
+            webhook_id,
+            request.headers.get("webhook-timestamp", ""),
+            request.headers.get("webhook-signature", ""),
+            REPLICATE_WEBHOOK_SECRET
+    ):
+        logger.warning(f"Отклонен вебхук Replicate с неверной подписью: {webhook_id}")
+        raise HTTPException(status_code=401, detail="Неверная подпись вебхука")
+
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректное тело вебхука")
+
+    prediction_id = payload.get("id")
+    prediction_status = payload.get("status")
+    if not prediction_id or prediction_status not in TERMINAL_STATUSES:
+        # Промежуточные события (start, output, logs) не обрабатываем
+        return {"status": "ignored"}
+
+    if DISABLE_DB_CHECK:
+        logger.info(f"[ТЕСТОВЫЙ РЕЖИМ] Вебхук Replicate {prediction_id}: {prediction_status}")
+        return {"status": "ignored"}
+
+    if webhook_id and not _remember_webhook(webhook_id):
+        return {"status": "duplicate"}
+
+    try:
+        model = await model_repository.get_by_training_id(prediction_id)
+        if model:
+            applied = await _apply_training(model, payload)
+            logger.info(f"Вебхук обучения {prediction_id}: {prediction_status}, применен: {applied}")
+            return {"status": "applied" if applied else "duplicate"}
+
+        generation = await generation_repository.get_by_external_id(prediction_id)
+        if generation:
+            applied = await _apply_generation(generation, payload)
+            logger.info(f"Вебхук генерации {prediction_id}: {prediction_status}, применен: {applied}")
+            return {"status": "applied" if applied else "duplicate"}
+
+        logger.warning(f"Вебхук Replicate для неизвестного предсказания: {prediction_id}")
+        return {"status": "unknown"}
+    except Exception as e:
+        # Разрешаем Replicate повторить доставку
+        _processed_webhooks.pop(webhook_id, None)
+        logger.error(f"Ошибка при обработке вебхука Replicate {prediction_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def setup_replicate_webhook(app):
+    """
+    Регистрирует эндпоинт вебхуков Replicate в приложении FastAPI.
+
+    Args:
+        app: Экземпляр приложения FastAPI
+    """
+    if not REPLICATE_WEBHOOK_SECRET:
+        logger.error("REPLICATE_WEBHOOK_SECRET не задан: вебхуки Replicate будут отклоняться с кодом 503")
+    app.include_router(router)
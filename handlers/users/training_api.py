@@ -1,10 +1,8 @@
 import os
 import json
 import logging
-import shutil
-import tempfile
 from typing import List, Dict, Any, Optional
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, UploadFile, status
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
@@ -19,21 +17,24 @@ print(f"[training_api.py] DISABLE_DB_CHECK после обработки: {DISAB
 
 # Импортируем репозитории для работы с базой данных
 if not DISABLE_DB_CHECK:
-    from repository.model_repository import ModelRepository
-    from repository.user_repository import UserRepository
+    from repository.async_model_repository import AsyncModelRepository
+    from repository.async_user_repository import AsyncUserRepository
+    from repository.async_job_repository import AsyncJobRepository
 
 # Импортируем утилиты для обработки изображений и запуска обучения
 from utils.training_utils import (
     ensure_upload_dir_exists,
     get_user_upload_path,
     clear_user_upload_dir,
-    process_and_convert_images,
-    create_zip_archive,
-    upload_zip_to_cloud,
-    start_replicate_training,
-    check_training_status,
-    process_training_completion
+    detect_image_type,
+    ALLOWED_IMAGE_TYPES,
+    MAX_IMAGE_SIZE
 )
+from utils.executors import ExecutorSaturatedError, run_blocking
+from utils.photo_cache import convert_images_cached, evict as evict_photo_cache
+from utils.training_poller import get_training_poller
+from utils.training_jobs import TRAINING_COST, TRAINING_JOB_MAX_ATTEMPTS, reserve_training_tokens
+from repository.unit_of_work import run_in_async_transaction
 
 # Настраиваем логгер
 logger = logging.getLogger(__name__)
@@ -58,8 +59,69 @@ class StatusCheckRequest(BaseModel):
 
 # Создаем экземпляры репозиториев
 if not DISABLE_DB_CHECK:
-    model_repository = ModelRepository()
-    user_repository = UserRepository()
+    model_repository = AsyncModelRepository()
+    user_repository = AsyncUserRepository()
+    job_repository = AsyncJobRepository()
+
+
+# Размер блока при чтении загруженного файла
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+async def read_upload_file(photo: UploadFile) -> bytes:
+    """
+    Читает загруженную фотографию из буфера Starlette блоками, проверяя размер и формат.
+    
+    К моменту вызова запрос уже полностью принят и записан в SpooledTemporaryFile,
+    поэтому проверки не ограничивают прием данных от клиента: они лишь избавляют
+    от копирования во временный файл и повторного чтения, а слишком большой файл
+    или файл неподдерживаемого формата не дочитывается из буфера в память.
+    Общий размер тела запроса нужно ограничивать на прокси (client_max_body_size).
+    
+    Args:
+        photo: Загруженный файл
+    
+    Returns:
+        Содержимое файла
+    
+    Raises:
+        HTTPException: 413, если файл больше MAX_IMAGE_SIZE; 415, если формат не из ALLOWED_IMAGE_TYPES
+    """
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"Файл {photo.filename} превышает допустимый размер {MAX_IMAGE_SIZE // (1024 * 1024)} МБ"
+    )
+
+    # Размер уже известен, если загрузка целиком попала в буфер
+    if photo.size is not None and photo.size > MAX_IMAGE_SIZE:
+        raise too_large
+
+    chunks = []
+    received = 0
+    while True:
+        chunk = await photo.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+
+        received += len(chunk)
+        if received > MAX_IMAGE_SIZE:
+            raise too_large
+
+        # Формат определяем по сигнатуре первого блока
+        if not chunks:
+            image_type = detect_image_type(chunk)
+            if image_type not in ALLOWED_IMAGE_TYPES:
+                raise HTTPException(
+                    status_code=415,
+                    detail=f"Файл {photo.filename} имеет неподдерживаемый формат: {image_type or photo.content_type}"
+                )
+
+        chunks.append(chunk)
+
+    if not chunks:
+        raise HTTPException(status_code=400, detail=f"Файл {photo.filename} пуст")
+
+    return chunks[0] if len(chunks) == 1 else b"".join(chunks)
 
 
 @router.post("/upload-photos", status_code=status.HTTP_200_OK)
@@ -81,7 +143,7 @@ async def upload_photos(
     """
     # Проверяем наличие пользователя в базе данных
     if not DISABLE_DB_CHECK:
-        user = user_repository.get(user_id)
+        user = await user_repository.get(user_id)
         if not user:
             raise HTTPException(status_code=404, detail=f"Пользователь с ID {user_id} не найден")
 
@@ -89,65 +151,87 @@ async def upload_photos(
     if not ensure_upload_dir_exists():
         raise HTTPException(status_code=500, detail="Не удалось создать директорию для загрузок")
 
-    # Очищаем директорию пользователя от старых файлов
-    if not clear_user_upload_dir(username, user_id):
-        logger.warning(f"Не удалось очистить директорию пользователя {username}")
-
-    # Создаем временные файлы для загруженных фотографий
-    temp_files = []
     try:
+        # Читаем фотографии из буфера загрузки с проверкой размера и формата,
+        # не сохраняя исходники во временные файлы
+        uploads = []
         for photo in photos:
-            # Проверяем тип файла (только изображения)
-            content_type = photo.content_type
-            if not content_type or not content_type.startswith("image/"):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Файл {photo.filename} не является изображением. Тип: {content_type}"
-                )
+            uploads.append(await read_upload_file(photo))
 
-            # Создаем временный файл
-            with tempfile.NamedTemporaryFile(delete=False) as temp:
-                # Сохраняем содержимое загруженного файла
-                shutil.copyfileobj(photo.file, temp)
-                temp_files.append(temp.name)
+        # Очищаем директорию пользователя от старых файлов только после успешной проверки новых
+        if not await run_blocking("io", clear_user_upload_dir, username, user_id):
+            logger.warning(f"Не удалось очистить директорию пользователя {username}")
 
-        # Обрабатываем и конвертируем загруженные изображения
+        # Декодируем изображения из памяти и записываем на диск только итоговые JPEG;
+        # уже обработанные ранее фотографии берутся из кэша без повторной конвертации
         user_path = get_user_upload_path(username, user_id)
-        converted_paths = process_and_convert_images(username, user_id, temp_files)
+        conversion = await run_blocking("image", convert_images_cached, uploads, user_path)
+        converted_paths = conversion["converted"]
+
+        # Следим за размером кэша, удаляя давно не использованные фотографии;
+        # перегрузка исполнителя не должна срывать уже выполненную загрузку
+        try:
+            await run_blocking("io", evict_photo_cache)
+        except ExecutorSaturatedError as e:
+            logger.warning(f"Очистка кэша фотографий отложена: {e}")
 
         if not converted_paths:
             raise HTTPException(status_code=500, detail="Не удалось обработать загруженные изображения")
 
+        # Сообщаем клиенту, какие из файлов не удалось обработать
+        failed_images = [
+            {
+                "index": failed["index"],
+                "filename": photos[failed["index"] - 1].filename,
+                "error": failed["error"]
+            }
+            for failed in conversion["failed"]
+        ]
+
+        # Почти одинаковые фотографии не добавляют модели информации, предупреждаем о них клиента
+        near_duplicates = [
+            {
+                "index": duplicate["index"],
+                "filename": photos[duplicate["index"] - 1].filename,
+                "duplicate_of": duplicate["duplicate_of"],
+                "duplicate_of_filename": photos[duplicate["duplicate_of"] - 1].filename,
+                "distance": duplicate["distance"]
+            }
+            for duplicate in conversion["near_duplicates"]
+        ]
+
         return {
             "status": "success",
             "message": f"Загружено и обработано {len(converted_paths)} изображений",
             "user_id": user_id,
             "username": username,
             "image_count": len(converted_paths),
+            "failed_images": failed_images,
+            "near_duplicates": near_duplicates,
+            "cache_hits": conversion["cache_hits"],
             "user_upload_dir": user_path
         }
 
+    except (HTTPException, ExecutorSaturatedError):
+        raise
+
     except Exception as e:
         logger.error(f"Ошибка при загрузке фотографий: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-    finally:
-        # Удаляем временные файлы
-        for temp_file in temp_files:
-            if os.path.exists(temp_file):
-                os.unlink(temp_file)
-
 
-@router.post("/start-training", status_code=status.HTTP_200_OK)
+@router.post("/start-training", status_code=status.HTTP_202_ACCEPTED)
 async def start_training(request: TrainingRequest):
     """
-    Запускает обучение модели с загруженными фотографиями.
+    Ставит обучение модели с загруженными фотографиями в очередь и в той же
+    транзакции резервирует токены по журналу токенов. Архив и запуск на Replicate
+    выполняют процессы worker.py; если задача перейдет в dead, токены вернутся.
     
     Args:
         request: Запрос на обучение модели
     
     Returns:
-        Информация о запущенном обучении
+        ID задачи в очереди
     """
     # Извлекаем параметры из запроса
     user_id = request.user_id
@@ -158,98 +242,120 @@ async def start_training(request: TrainingRequest):
     try:
         # Проверяем наличие пользователя в базе данных
         if not DISABLE_DB_CHECK:
-            user = user_repository.get(user_id)
+            user = await user_repository.get(user_id)
             if not user:
                 raise HTTPException(status_code=404, detail=f"Пользователь с ID {user_id} не найден")
 
-            # Проверяем достаточное количество токенов у пользователя
-            if user.get("token_balance", 0) < 300:  # Стоимость обучения - 300 токенов
-                raise HTTPException(
-                    status_code=403,
-                    detail="Недостаточно токенов для обучения модели. Требуется минимум 300 токенов."
-                )
 
         # Проверяем наличие загруженных изображений
         user_path = get_user_upload_path(username, user_id)
-        image_files = [f for f in os.listdir(user_path) if f.endswith('.jpg')]
-
-        if not image_files:
+        if not any(f.endswith('.jpg') for f in os.listdir(user_path)):
             raise HTTPException(
                 status_code=400,
                 detail="Не найдено загруженных изображений. Сначала загрузите фотографии."
             )
 
-        # Создаем полные пути к изображениям
-        image_paths = [os.path.join(user_path, f) for f in image_files]
-
-        # Создаем ZIP-архив с изображениями
-        zip_path = create_zip_archive(username, user_id, image_paths)
-        if not zip_path:
-            raise HTTPException(status_code=500, detail="Не удалось создать ZIP-архив с изображениями")
-
         # В режиме отключенной базы данных имитируем ответы
         if DISABLE_DB_CHECK:
-            # Генерируем фиктивный ID тренировки
-            import uuid
-            training_id = str(uuid.uuid4())
-            model_id = 1
-
             return {
-                "status": "success",
-                "message": "Обучение модели успешно запущено",
-                "model_id": model_id,
-                "training_id": training_id,
+                "status": "queued",
+                "message": "Обучение модели поставлено в очередь",
+                "job_id": 1,
                 "model_name": model_name,
                 "trigger_word": trigger_word,
                 "user_id": user_id,
-                "username": username,
-                "tokens_spent": 300
+                "username": username
             }
 
-        # Загружаем ZIP-архив в облачное хранилище
-        zip_url = upload_zip_to_cloud(zip_path)
-        if not zip_url:
-            raise HTTPException(status_code=500, detail="Не удалось загрузить ZIP-архив в облачное хранилище")
+        async def enqueue_and_reserve() -> Optional[Dict[str, Any]]:
+            queued_job = await job_repository.enqueue(
+                user_id,
+                {"username": username, "model_name": model_name, "trigger_word": trigger_word},
+                max_attempts=TRAINING_JOB_MAX_ATTEMPTS,
+                # Резерв фиксируется той же транзакцией, поэтому обработчик не списывает токены повторно
+                progress={"tokens_reserved": True}
+            )
+            if queued_job is None:
+                return None
+            # Условное списание: при нехватке токенов транзакция откатывается вместе с задачей
+            if not await reserve_training_tokens(user_id, queued_job["job_id"], user_repository):
+                raise HTTPException(
+                    status_code=403,
+                    detail=f"Недостаточно токенов для обучения модели. Требуется минимум {TRAINING_COST} токенов."
+                )
+            return queued_job
 
-        # Запускаем обучение модели на Replicate
-        training_info = start_replicate_training(username, user_id, zip_url, model_name, trigger_word)
-        if not training_info or training_info.get("status") == "failed":
-            error_msg = training_info.get("error", "Неизвестная ошибка") if training_info else "Неизвестная ошибка"
-            raise HTTPException(status_code=500, detail=f"Не удалось запустить обучение модели: {error_msg}")
+        job = await run_in_async_transaction(enqueue_and_reserve)
+        if job is None:
+            active_job = await job_repository.get_active_by_user(user_id)
+            raise HTTPException(
+                status_code=409,
+                detail=f"Обучение модели уже в очереди (задача {active_job['job_id'] if active_job else '?'})"
+            )
 
-        # Сохраняем информацию о модели в базе данных
-        model_data = {
-            "user_id": user_id,
-            "name": model_name,
+        logger.info(f"Задача обучения {job['job_id']} поставлена в очередь для пользователя {user_id}")
+
+        return {
+            "status": "queued",
+            "message": "Обучение модели поставлено в очередь",
+            "job_id": job["job_id"],
+            "model_name": model_name,
             "trigger_word": trigger_word,
-            "training_id": training_info["training_id"],
-            "status": "training",
-            "is_public": False,
-            "model_type": "user"
+            "user_id": user_id,
+            "username": username
         }
 
-        model_id = model_repository.create(model_data)
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Ошибка при постановке обучения модели в очередь: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Вычитаем токены у пользователя
-        user_repository.update_token_balance(user_id, -300)
+
+@router.get("/jobs/{job_id}", status_code=status.HTTP_200_OK)
+async def get_training_job(job_id: int, user_id: int):
+    """
+    Возвращает состояние задачи обучения.
+    
+    Args:
+        job_id: ID задачи
+        user_id: ID пользователя, поставившего задачу
+    
+    Returns:
+        Статус задачи, количество попыток, последняя ошибка и результат
+    """
+    try:
+        if DISABLE_DB_CHECK:
+            return {"status": "success", "job_id": job_id, "job_status": "queued", "attempts": 0}
+
+        job = await job_repository.get_by_id(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail=f"Задача {job_id} не найдена")
+
+        if job["user_id"] != user_id:
+            raise HTTPException(status_code=403, detail="У вас нет доступа к этой задаче")
 
         return {
             "status": "success",
-            "message": "Обучение модели успешно запущено",
-            "model_id": model_id,
-            "training_id": training_info["training_id"],
-            "model_name": model_name,
-            "trigger_word": trigger_word,
-            "user_id": user_id,
-            "username": username,
-            "tokens_spent": 300
+            "job_id": job["job_id"],
+            "job_status": job["status"],
+            "attempts": job["attempts"],
+            "max_attempts": job["max_attempts"],
+            "last_error": job["last_error"],
+            "model_id": job["progress"].get("model_id"),
+            "training_id": job["progress"].get("training_id"),
+            "result": job["result"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+            "finished_at": job["finished_at"]
         }
 
     except HTTPException:
         raise
 
     except Exception as e:
-        logger.error(f"Ошибка при запуске обучения модели: {e}")
+        logger.error(f"Ошибка при получении задачи обучения {job_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -278,70 +384,46 @@ async def check_training_status_endpoint(request: StatusCheckRequest):
                 "model_url": None
             }
 
-        # Получаем информацию о модели из базы данных
-        model = model_repository.get_by_training_id(request.training_id)
-        if not model:
-            raise HTTPException(status_code=404, detail=f"Модель с training_id {request.training_id} не найдена")
-
-        # Проверяем соответствие модели пользователю
-        if model["user_id"] != request.user_id:
-            raise HTTPException(status_code=403, detail="У вас нет доступа к этой модели")
-
-        # Если модель уже в завершенном состоянии, просто возвращаем информацию
-        if model["status"] in ["ready", "failed"]:
-            return {
-                "status": "success",
-                "model_status": model["status"],
-                "model_id": model["id"],
-                "training_id": model["training_id"],
-                "model_name": model["name"],
-                "trigger_word": model["trigger_word"],
-                "model_url": model.get("model_url", None)
-            }
+        # Статус берется из снимка фонового опроса, без обращения к Replicate
+        poller = get_training_poller()
+        snapshot = poller.get_snapshot(request.training_id)
 
-        # Проверяем статус обучения на Replicate
-        training_status = check_training_status(request.training_id)
-
-        # Если статус изменился, обновляем информацию в базе данных
-        if training_status["status"] in ["succeeded", "failed", "canceled"]:
-            new_status = "ready" if training_status["status"] == "succeeded" else "failed"
-
-            # Если обучение успешно завершено, обрабатываем результаты
-            if new_status == "ready":
-                # Получаем информацию о модели из результатов обучения
-                completion_info = process_training_completion(
-                    request.training_id,
-                    request.user_id,
-                    model["username"] if "username" in model else "user",
-                    model["name"],
-                    model["trigger_word"]
-                )
+        if snapshot is None:
+            # Тренировка еще не попала в опрос (например, запущена другим процессом) - читаем базу данных
+            model = await model_repository.get_by_training_id(request.training_id)
+            if not model:
+                raise HTTPException(status_code=404, detail=f"Модель с training_id {request.training_id} не найдена")
 
-                # Обновляем информацию о модели в базе данных
-                model_repository.update_training_info(
-                    model["id"],
-                    new_status,
-                    completion_info.get("model_url", None)
-                )
+            if model["status"] == "training":
+                poller.track(model)
+                snapshot = poller.get_snapshot(request.training_id)
             else:
-                # Если обучение завершилось с ошибкой, просто обновляем статус
-                model_repository.update_status(model["id"], new_status)
+                snapshot = {
+                    "model_id": model["model_id"],
+                    "user_id": model["user_id"],
+                    "model_name": model["name"],
+                    "trigger_word": model["trigger_word"],
+                    "model_status": model["status"],
+                    "training_status": None,
+                    "model_url": model.get("model_url", None)
+                }
 
-            # Получаем обновленную информацию о модели
-            model = model_repository.get_by_training_id(request.training_id)
+        # Проверяем соответствие модели пользователю
+        if snapshot["user_id"] != request.user_id:
+            raise HTTPException(status_code=403, detail="У вас нет доступа к этой модели")
 
         return {
             "status": "success",
-            "model_status": model["status"],
-            "training_status": training_status["status"],
-            "model_id": model["id"],
-            "training_id": model["training_id"],
-            "model_name": model["name"],
-            "trigger_word": model["trigger_word"],
-            "model_url": model.get("model_url", None)
+            "model_status": snapshot["model_status"],
+            "training_status": snapshot["training_status"],
+            "model_id": snapshot["model_id"],
+            "training_id": request.training_id,
+            "model_name": snapshot["model_name"],
+            "trigger_word": snapshot["trigger_word"],
+            "model_url": snapshot["model_url"]
         }
 
-    except HTTPException:
+    except (HTTPException, ExecutorSaturatedError):
         raise
 
     except Exception as e:
@@ -380,16 +462,16 @@ async def get_user_models(user_id: int):
             }
 
         # Проверяем наличие пользователя в базе данных
-        user = user_repository.get(user_id)
+        user = await user_repository.get(user_id)
         if not user:
             raise HTTPException(status_code=404, detail=f"Пользователь с ID {user_id} не найден")
 
         # Получаем список моделей пользователя
-        models = model_repository.get_by_user_id(user_id)
+        models = await model_repository.get_by_user_id(user_id)
 
         return {
             "status": "success",
-            "models": models
+            "models": [model.to_dict() for model in models]
         }
 
     except HTTPException:
@@ -428,7 +510,7 @@ async def get_user(user_id: int):
             }
 
         # Получаем информацию о пользователе из базы данных
-        user = user_repository.get(user_id)
+        user = await user_repository.get(user_id)
         if not user:
             raise HTTPException(status_code=404, detail=f"Пользователь с ID {user_id} не найден")
 
@@ -459,6 +541,18 @@ async def get_user(user_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturatedError):
+    """
+    Отвечает 503 с заголовком Retry-After, когда пул фоновых задач перегружен.
+    """
+    logger.warning(f"Отклонен запрос {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "error", "detail": str(exc), "task_type": exc.task_type},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
 def setup_training_api(app):
     """
     Регистрирует API-эндпоинты для обучения моделей в приложении FastAPI.
@@ -467,3 +561,4 @@ def setup_training_api(app):
         app: Экземпляр приложения FastAPI
     """
     app.include_router(router)
+    app.add_exception_handler(ExecutorSaturatedError, executor_saturated_handler)
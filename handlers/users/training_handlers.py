@@ -7,7 +7,7 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from repository import get_user_repository, get_model_repository
+from repository import get_async_user_repository, get_async_model_repository
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -35,14 +35,14 @@ async def process_start_training(callback: CallbackQuery, state: FSMContext):
     user_id = callback.from_user.id
 
     # Получаем репозиторий пользователей
-    user_repo = get_user_repository()
+    user_repo = get_async_user_repository()
     if user_repo is None:
         logger.error(f"Не удалось получить репозиторий пользователей")
         await callback.answer("❌ Произошла ошибка. Попробуйте позже.", show_alert=True)
         return
 
     # Проверяем, достаточно ли у пользователя токенов для обучения модели
-    user = user_repo.get_by_id(user_id)
+    user = await user_repo.get_by_id(user_id)
     if not user:
         logger.error(f"Пользователь {user_id} не найден")
         await callback.answer("❌ Пользователь не найден.", show_alert=True)
@@ -121,14 +121,14 @@ async def cmd_train(message: Message):
     user_id = message.from_user.id
 
     # Получаем репозиторий пользователей для проверки баланса
-    user_repo = get_user_repository()
+    user_repo = get_async_user_repository()
     if user_repo is None:
         logger.error(f"Не удалось получить репозиторий пользователей")
         await message.answer("❌ Произошла ошибка. Попробуйте позже.")
         return
 
     # Получаем данные пользователя
-    user = user_repo.get_by_id(user_id)
+    user = await user_repo.get_by_id(user_id)
     if not user:
         logger.error(f"Пользователь {user_id} не найден")
         await message.answer("❌ Пользователь не найден.")
@@ -138,13 +138,13 @@ async def cmd_train(message: Message):
     training_cost = 300
 
     # Проверяем наличие обученных моделей
-    model_repo = get_model_repository()
+    model_repo = get_async_model_repository()
     if model_repo is None:
         logger.error(f"Не удалось получить репозиторий моделей")
         await message.answer("❌ Произошла ошибка. Попробуйте позже.")
         return
 
-    user_models = model_repo.get_models_by_user(user_id, status="ready")
+    user_models = await model_repo.get_models_by_user(user_id, status="ready")
 
     # Формируем текст сообщения
     message_text = "🧠 *Обучение персональной модели*\n\n"
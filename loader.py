@@ -1,10 +1,11 @@
 # loader.py
 
 from aiogram import Bot, Dispatcher, enums
-from aiogram.fsm.storage.memory import MemoryStorage
 from config import config
+from utils.fsm_storage import create_fsm_storage
 
 # Используем данные из конфигурации
 bot = Bot(token=config.BOT_TOKEN, parse_mode=enums.ParseMode.HTML)
-storage = MemoryStorage()
-dp = Dispatcher(bot=bot, storage=storage)
+# Хранилище состояний FSM выбирается настройкой FSM_STORAGE (memory или redis)
+storage, events_isolation = create_fsm_storage()
+dp = Dispatcher(bot=bot, storage=storage, events_isolation=events_isolation)
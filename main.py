@@ -1,34 +1,91 @@
+import os
+import signal
 import asyncio
 
+from config import config
 from utils.logger import logger
 from loader import bot, dp
-from db import init_connection, close_connection
+from repository import init_db, close_db, init_async_db, close_async_db, get_user_cache
 from handlers import register_all_handlers
+from handlers.users.event_notifications import setup_event_notifications
+from utils.event_bus import get_event_bus
+from utils.bot_webhook import run_webhook
+from utils.broadcast import get_broadcaster
+
+# Режим получения апдейтов: polling (один процесс) или webhook (можно запускать несколько реплик
+# за балансировщиком). По умолчанию webhook, если задан TELEGRAM_WEBHOOK_URL
+BOT_MODE = os.getenv("BOT_MODE", "webhook" if config.TELEGRAM_WEBHOOK_URL else "polling").lower()
 
 
 async def on_startup() -> None:
     logger.info("Инициализация подключения к базе данных...")
-    #init_connection()
+    # Синхронный пул нужен административным командам, работающим через синхронные репозитории
+    if not init_db():
+        logger.error("Не удалось инициализировать пул соединений с базой данных")
+    if not await init_async_db():
+        logger.error("Не удалось инициализировать асинхронный пул соединений с базой данных")
 
     logger.info("Регистрация всех обработчиков...")
     register_all_handlers(dp)
 
+    # Подписываемся на события API (завершение обучения, генераций, платежей)
+    bus = get_event_bus("bot")
+    setup_event_notifications(bus, bot)
+    try:
+        await bus.start()
+    except Exception as e:
+        logger.error(f"Не удалось подписаться на шину событий: {e}")
+
+    # Продолжаем рассылки, прерванные предыдущей остановкой бота
+    try:
+        await get_broadcaster(bot).resume_unfinished()
+    except Exception as e:
+        logger.error(f"Не удалось продолжить незавершенные рассылки: {e}")
+
     logger.info("Бот готов к запуску.")
 
 
 async def on_shutdown() -> None:
     logger.info("Остановка бота...")
-    close_connection()
+    await get_event_bus("bot").stop()
+    await get_broadcaster(bot).stop()
+    close_db()
+    await close_async_db()
+    await get_user_cache().close()
     logger.info("Подключение к базе данных закрыто.")
 
 
+def check_bot_mode() -> None:
+    """
+    Проверяет настройки режима получения апдейтов до подключения к базе данных
+
+    Raises:
+        SystemExit: Если режим неизвестен или для вебхука не задан TELEGRAM_WEBHOOK_URL
+    """
+    if BOT_MODE not in ("webhook", "polling"):
+        raise SystemExit(f"Неизвестный BOT_MODE={BOT_MODE}: допустимы webhook и polling")
+    if BOT_MODE == "webhook" and not config.TELEGRAM_WEBHOOK_URL:
+        raise SystemExit("BOT_MODE=webhook требует TELEGRAM_WEBHOOK_URL (публичный https-адрес вебхука)")
+
+
 async def main() -> None:
     logger.info("Запуск бота...")
 
+    check_bot_mode()
     await on_startup()
 
     try:
-        await dp.start_polling(bot)
+        if BOT_MODE == "webhook":
+            stop = asyncio.Event()
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, stop.set)
+            logger.info("Бот получает апдейты через вебхук")
+            await run_webhook(bot, dp, config.TELEGRAM_WEBHOOK_URL, stop)
+        else:
+            # Пока вебхук зарегистрирован, getUpdates не работает; накопленные апдейты сохраняем
+            await bot.delete_webhook(drop_pending_updates=False)
+            await dp.start_polling(bot)
     except Exception as e:
         logger.exception(f"Ошибка при запуске бота: {e}")
     finally:
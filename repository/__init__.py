@@ -9,6 +9,39 @@ from .generation_repository import GenerationRepository
 from .payment_repository import PaymentRepository
 from .referral_repository import ReferralRepository
 from .admin_repository import AdminRepository
+from .async_base_repository import AsyncBaseRepository
+from .async_user_repository import AsyncUserRepository
+from .async_model_repository import AsyncModelRepository
+from .async_generation_repository import AsyncGenerationRepository
+from .async_payment_repository import AsyncPaymentRepository
+from .async_referral_repository import AsyncReferralRepository
+from .async_admin_repository import AsyncAdminRepository
+from .async_job_repository import AsyncJobRepository
+from .async_event_outbox_repository import AsyncEventOutboxRepository
+from .async_broadcast_repository import AsyncBroadcastRepository
+from .token_ledger_repository import TokenLedgerRepository
+from .async_token_ledger_repository import AsyncTokenLedgerRepository
+from .user_cache import UserCache, get_user_cache
+from .engine import (
+    PoolTimeoutError,
+    close_async_engine,
+    close_sync_engine,
+    connect_dedicated,
+    engine_stats,
+    get_connection_params,
+    open_async_engine,
+    open_sync_engine,
+)
+from .rows import ModelSummaryRow, ReferrerRow, Row, RowCursor, UserRow, UserSummaryRow
+from .statements import StatementRegistry, get_statement_registry, statement_stats
+from .unit_of_work import (
+    AsyncUnitOfWork,
+    UnitOfWork,
+    UnitOfWorkRollbackError,
+    run_in_async_transaction,
+    run_in_transaction,
+    transaction_stats,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -29,42 +62,16 @@ DB_PASSWORD = os.getenv("DB_PASSWORD", "")
 DB_MIN_CONN = int(os.getenv("DB_MIN_CONN", "1"))
 DB_MAX_CONN = int(os.getenv("DB_MAX_CONN", "10"))
 
-# Глобальный пул соединений
-connection_pool = None
-
 def init_db() -> bool:
     """
     Инициализация подключения к базе данных
     Возвращает True, если инициализация прошла успешно
     """
-    global connection_pool
-    
-    try:
-        # Параметры подключения к базе данных
-        db_params = {
-            'dbname': os.getenv('DB_NAME', 'dream_photo'),
-            'user': os.getenv('DB_USER', 'postgres'),
-            'password': os.getenv('DB_PASSWORD', 'postgres'),
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'port': os.getenv('DB_PORT', '5432')
-        }
-        
-        # Параметры пула соединений
-        min_connections = int(os.getenv('DB_MIN_CONN', '1'))
-        max_connections = int(os.getenv('DB_MAX_CONN', '10'))
-        
-        # Инициализация пула соединений
-        connection_pool = BaseRepository.initialize_pool(
-            dbname=db_params['dbname'],
-            user=db_params['user'],
-            password=db_params['password'],
-            host=db_params['host'],
-            port=db_params['port'],
-            min_connections=min_connections,
-            max_connections=max_connections
-        )
-        
-        logger.info(f"База данных инициализирована: {db_params['dbname']} на {db_params['host']}:{db_params['port']}")
+    try:
+        # Параметры подключения и размеры пула берутся из переменных окружения (repository/engine.py)
+        open_sync_engine()
+        params = get_connection_params()
+        logger.info(f"База данных инициализирована: {params['dbname']} на {params['host']}:{params['port']}")
         return True
     except Exception as e:
         logger.error(f"Ошибка при инициализации БД: {e}")
@@ -75,18 +82,38 @@ def close_db() -> bool:
     Закрытие соединения с базой данных
     Возвращает True, если закрытие прошло успешно
     """
-    global connection_pool
-    
     try:
-        if connection_pool:
-            connection_pool.closeall()
-            connection_pool = None
-            logger.info("Соединение с базой данных закрыто")
+        close_sync_engine()
+        BaseRepository._connection_pool = None
         return True
     except Exception as e:
         logger.error(f"Ошибка при закрытии соединения с БД: {e}")
         return False
 
+async def init_async_db() -> bool:
+    """
+    Инициализация асинхронного пула соединений (asyncpg) для обработчиков, работающих в event loop
+    Возвращает True, если инициализация прошла успешно
+    """
+    try:
+        await open_async_engine()
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при инициализации асинхронного пула БД: {e}")
+        return False
+
+async def close_async_db() -> bool:
+    """
+    Закрытие асинхронного пула соединений
+    Возвращает True, если закрытие прошло успешно
+    """
+    try:
+        await AsyncBaseRepository.close_pool()
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при закрытии асинхронного пула БД: {e}")
+        return False
+
 # Функции-фабрики для создания экземпляров репозиториев
 
 def get_user_repository() -> Optional[UserRepository]:
@@ -137,6 +164,64 @@ def get_admin_repository() -> Optional[AdminRepository]:
         logger.error(f"Ошибка при создании репозитория администратора: {e}")
         return None
 
+# Функции-фабрики для асинхронных репозиториев
+
+def get_async_user_repository() -> Optional[AsyncUserRepository]:
+    """Возвращает асинхронный репозиторий пользователей"""
+    try:
+        return AsyncUserRepository()
+    except Exception as e:
+        logger.error(f"Ошибка при создании асинхронного репозитория пользователей: {e}")
+        return None
+
+def get_async_model_repository() -> Optional[AsyncModelRepository]:
+    """Возвращает асинхронный репозиторий моделей"""
+    try:
+        return AsyncModelRepository()
+    except Exception as e:
+        logger.error(f"Ошибка при создании асинхронного репозитория моделей: {e}")
+        return None
+
+def get_async_generation_repository() -> Optional[AsyncGenerationRepository]:
+    """Возвращает асинхронный репозиторий генераций"""
+    try:
+        return AsyncGenerationRepository()
+    except Exception as e:
+        logger.error(f"Ошибка при создании асинхронного репозитория генераций: {e}")
+        return None
+
+def get_async_payment_repository() -> Optional[AsyncPaymentRepository]:
+    """Возвращает асинхронный репозиторий платежей"""
+    try:
+        return AsyncPaymentRepository()
+    except Exception as e:
+        logger.error(f"Ошибка при создании асинхронного репозитория платежей: {e}")
+        return None
+
+def get_async_referral_repository() -> Optional[AsyncReferralRepository]:
+    """Возвращает асинхронный репозиторий рефералов"""
+    try:
+        return AsyncReferralRepository()
+    except Exception as e:
+        logger.error(f"Ошибка при создании асинхронного репозитория рефералов: {e}")
+        return None
+
+def get_async_admin_repository() -> Optional[AsyncAdminRepository]:
+    """Возвращает асинхронный репозиторий администратора"""
+    try:
+        return AsyncAdminRepository()
+    except Exception as e:
+        logger.error(f"Ошибка при создании асинхронного репозитория администратора: {e}")
+        return None
+
+def get_async_job_repository() -> Optional[AsyncJobRepository]:
+    """Возвращает асинхронный репозиторий очереди задач обучения"""
+    try:
+        return AsyncJobRepository()
+    except Exception as e:
+        logger.error(f"Ошибка при создании асинхронного репозитория задач обучения: {e}")
+        return None
+
 __all__ = [
     'BaseRepository',
     'UserRepository',
@@ -145,12 +230,58 @@ __all__ = [
     'PaymentRepository',
     'ReferralRepository',
     'AdminRepository',
+    'AsyncBaseRepository',
+    'AsyncUserRepository',
+    'AsyncModelRepository',
+    'AsyncGenerationRepository',
+    'AsyncPaymentRepository',
+    'AsyncReferralRepository',
+    'AsyncAdminRepository',
+    'AsyncJobRepository',
+    'AsyncEventOutboxRepository',
+    'AsyncBroadcastRepository',
+    'TokenLedgerRepository',
+    'AsyncTokenLedgerRepository',
+    'UserCache',
+    'PoolTimeoutError',
+    'UnitOfWork',
+    'AsyncUnitOfWork',
+    'UnitOfWorkRollbackError',
+    'run_in_transaction',
+    'run_in_async_transaction',
+    'transaction_stats',
     'init_db',
     'close_db',
+    'init_async_db',
+    'close_async_db',
+    'open_sync_engine',
+    'close_sync_engine',
+    'open_async_engine',
+    'close_async_engine',
+    'connect_dedicated',
+    'get_connection_params',
+    'engine_stats',
+    'Row',
+    'RowCursor',
+    'UserRow',
+    'UserSummaryRow',
+    'ReferrerRow',
+    'ModelSummaryRow',
+    'StatementRegistry',
+    'get_statement_registry',
+    'statement_stats',
     'get_user_repository',
     'get_model_repository',
     'get_generation_repository',
     'get_payment_repository',
     'get_referral_repository',
-    'get_admin_repository'
+    'get_admin_repository',
+    'get_async_user_repository',
+    'get_async_model_repository',
+    'get_async_generation_repository',
+    'get_async_payment_repository',
+    'get_async_referral_repository',
+    'get_async_admin_repository',
+    'get_async_job_repository',
+    'get_user_cache'
 ] 
\ No newline at end of file
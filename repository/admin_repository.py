@@ -1,6 +1,9 @@
 from typing import Dict, List, Optional, Any, Tuple
 import logging
 from .base_repository import BaseRepository
+from .unit_of_work import reraise_in_unit_of_work
+from .statements import insert_clause, set_clause
+from .user_cache import get_user_cache
 import json
 import psycopg2
 import psycopg2.extras
@@ -45,24 +48,18 @@ class AdminRepository(BaseRepository):
         Returns:
             Обновленные данные администратора или None в случае ошибки
         """
-        # Формируем строку SET для UPDATE
-        set_clauses = []
-        params = {"id": id_value}
-        
-        for key, value in data.items():
-            set_clauses.append(f"{key} = %({key})s")
-            params[key] = value
-        
         # Если нет данных для обновления
-        if not set_clauses:
+        if not data:
             logger.warning("Нет данных для обновления администратора")
             return self.get_by_id(id_value)
         
-        set_clause = ", ".join(set_clauses)
+        params = {"id": id_value, **data}
         
-        query = f'UPDATE "User" SET {set_clause} WHERE user_id = %(id)s AND is_admin = TRUE RETURNING *'
+        query = f'UPDATE "User" SET {set_clause(data)} WHERE user_id = %(id)s AND is_admin = TRUE RETURNING *'
         
-        return self.execute_with_returning(query, params)
+        admin = self.execute_with_returning(query, params)
+        get_user_cache().invalidate(id_value)
+        return admin
     
     def delete(self, id_value: Any) -> bool:
         """
@@ -103,6 +100,7 @@ class AdminRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при логировании административного действия: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def get_admin_actions(self, limit: int = 100, offset: int = 0) -> List[Dict]:
@@ -220,6 +218,7 @@ class AdminRepository(BaseRepository):
             logger.error(f"Ошибка при создании промо-кода: {e}")
             if conn:
                 conn.rollback()
+            reraise_in_unit_of_work(e)
             return None
         finally:
             if conn:
@@ -256,6 +255,7 @@ class AdminRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при обновлении промо-кода: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def delete_promo_code(self, promo_id: int) -> bool:
@@ -275,6 +275,7 @@ class AdminRepository(BaseRepository):
             return True
         except Exception as e:
             logger.error(f"Ошибка при удалении промо-кода: {e}")
+            reraise_in_unit_of_work(e)
             return False
     
     def get_promo_code(self, code: str) -> Optional[Dict]:
@@ -338,6 +339,7 @@ class AdminRepository(BaseRepository):
                 return list(results)
         except Exception as e:
             logger.error(f"Ошибка при получении списка промо-кодов: {e}")
+            reraise_in_unit_of_work(e)
             return []
         finally:
             if conn:
@@ -386,6 +388,7 @@ class AdminRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при записи использования промо-кода: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def check_promo_usage(self, promo_id: int, user_id: int) -> bool:
@@ -432,6 +435,7 @@ class AdminRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при обновлении системной конфигурации: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def get_system_config(self, key: str) -> Optional[Dict]:
@@ -494,6 +498,7 @@ class AdminRepository(BaseRepository):
                     return dict(result)
         except Exception as e:
             logger.error(f"Ошибка при получении системной статистики: {e}")
+            reraise_in_unit_of_work(e)
             return {}
         finally:
             if conn:
@@ -514,51 +519,19 @@ class AdminRepository(BaseRepository):
         
         logger.info(f"Обновление статистики системы с данными: {data}")
         
-        conn = None
+        if stats:
+            # Обновляем существующую запись
+            query = f'UPDATE "GlobalStats" SET {set_clause(data)} RETURNING *'
+        else:
+            # Создаем новую запись
+            fields, values = insert_clause(data)
+            query = f'INSERT INTO "GlobalStats" ({fields}) VALUES ({values}) RETURNING *'
+        
         try:
-            conn = self.get_connection()
-            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-                if stats:
-                    # Обновляем существующую запись
-                    set_values = []
-                    values = []
-                    
-                    for key, value in data.items():
-                        set_values.append(f'{key} = %s')
-                        values.append(value)
-                    
-                    set_str = ', '.join(set_values)
-                    
-                    query = f'UPDATE "GlobalStats" SET {set_str} RETURNING *'
-                    
-                    cursor.execute(query, tuple(values))
-                else:
-                    # Создаем новую запись
-                    fields = []
-                    placeholders = []
-                    values = []
-                    
-                    for key, value in data.items():
-                        fields.append(key)
-                        placeholders.append(f'%s')
-                        values.append(value)
-                    
-                    fields_str = ', '.join(fields)
-                    placeholders_str = ', '.join(placeholders)
-                    
-                    query = f'INSERT INTO "GlobalStats" ({fields_str}) VALUES ({placeholders_str}) RETURNING *'
-                    
-                    cursor.execute(query, tuple(values))
-                
-                conn.commit()
-                result = cursor.fetchone()
-                logger.info(f"Статистика успешно обновлена: {result}")
-                return dict(result) if result else None
+            result = self.execute_with_returning(query, data)
+            logger.info(f"Статистика успешно обновлена: {result}")
+            return result
         except Exception as e:
             logger.error(f"Ошибка при обновлении системной статистики: {e}")
-            if conn:
-                conn.rollback()
+            reraise_in_unit_of_work(e)
             return None
-        finally:
-            if conn:
-                self.release_connection(conn) 
\ No newline at end of file
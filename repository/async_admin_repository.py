@@ -0,0 +1,550 @@
+from typing import Dict, List, Optional, Any, Tuple
+import logging
+from .async_base_repository import AsyncBaseRepository
+from .statements import insert_clause, set_clause
+from .async_user_repository import AsyncUserRepository
+from .user_cache import get_user_cache
+from .unit_of_work import run_in_async_transaction, reraise_in_async_unit_of_work
+import json
+
+logger = logging.getLogger(__name__)
+
+class AsyncAdminRepository(AsyncBaseRepository):
+    """
+    Асинхронный репозиторий для административной части проекта
+    """
+    
+    async def get_by_id(self, id_value: Any) -> Optional[Dict[str, Any]]:
+        """
+        Получение администратора по ID
+        
+        Args:
+            id_value: ID администратора
+            
+        Returns:
+            Данные администратора или None, если не найден
+        """
+        query = 'SELECT * FROM "User" WHERE user_id = %(id)s AND is_admin = TRUE'
+        return await self.execute_query_single(query, {"id": id_value})
+    
+    async def create(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Метод не используется для AdminRepository, но должен быть реализован
+        из-за наследования от BaseRepository
+        """
+        # Админы создаются через обновление обычных пользователей
+        logger.warning("Метод create не поддерживается для AdminRepository")
+        return None
+    
+    async def update(self, id_value: Any, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Обновление данных администратора
+        
+        Args:
+            id_value: ID администратора
+            data: Данные для обновления
+            
+        Returns:
+            Обновленные данные администратора или None в случае ошибки
+        """
+        # Если нет данных для обновления
+        if not data:
+            logger.warning("Нет данных для обновления администратора")
+            return await self.get_by_id(id_value)
+        
+        params = {"id": id_value, **data}
+        
+        query = f'UPDATE "User" SET {set_clause(data)} WHERE user_id = %(id)s AND is_admin = TRUE RETURNING *'
+        
+        admin = await self.execute_with_returning(query, params)
+        await get_user_cache().invalidate_async(id_value)
+        return admin
+    
+    async def delete(self, id_value: Any) -> bool:
+        """
+        Метод не используется для AdminRepository, но должен быть реализован
+        из-за наследования от BaseRepository
+        """
+        # Администраторы не удаляются, а деактивируются
+        logger.warning("Метод delete не поддерживается для AdminRepository, используйте deactivate_admin")
+        return False
+    
+    async def log_admin_action(self, admin_id: int, action_type: str, entity_type: str, 
+                         entity_id: Optional[int] = None, description: Optional[str] = None) -> Optional[Dict]:
+        """
+        Логирование административного действия
+        
+        Args:
+            admin_id: ID администратора
+            action_type: Тип действия (create, update, delete, etc.)
+            entity_type: Тип сущности (user, model, payment, etc.)
+            entity_id: ID сущности (опционально)
+            description: Описание действия (опционально)
+            
+        Returns:
+            Данные созданной записи или None в случае ошибки
+        """
+        query = """
+            INSERT INTO "AdminAction" 
+                (admin_id, action_type, target_table, target_id, details)
+            VALUES
+                (%s, %s, %s, %s, %s)
+            RETURNING *
+        """
+        
+        details = {"description": description} if description else {}
+        
+        try:
+            result = await self.execute_query(query, (admin_id, action_type, entity_type, entity_id, json.dumps(details)), fetch_one=True)
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при логировании административного действия: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def get_admin_actions(self, limit: int = 100, offset: int = 0) -> List[Dict]:
+        """
+        Получение истории административных действий
+        
+        Args:
+            limit: Максимальное количество результатов
+            offset: Смещение для пагинации
+            
+        Returns:
+            Список административных действий
+        """
+        query = """
+            SELECT a.*, u.username, u.first_name, u.last_name
+            FROM "AdminAction" a
+            JOIN "User" u ON a.admin_id = u.user_id
+            ORDER BY a.created_at DESC
+            LIMIT %s OFFSET %s
+        """
+        return await self.execute_query(query, (limit, offset))
+    
+    async def get_admin_actions_by_admin(self, admin_id: int, limit: int = 100, offset: int = 0) -> List[Dict]:
+        """
+        Получение истории действий конкретного администратора
+        
+        Args:
+            admin_id: ID администратора
+            limit: Максимальное количество результатов
+            offset: Смещение для пагинации
+            
+        Returns:
+            Список административных действий
+        """
+        query = """
+            SELECT a.*, u.username, u.first_name, u.last_name
+            FROM "AdminAction" a
+            JOIN "User" u ON a.admin_id = u.user_id
+            WHERE a.admin_id = %s
+            ORDER BY a.created_at DESC
+            LIMIT %s OFFSET %s
+        """
+        return await self.execute_query(query, (admin_id, limit, offset))
+    
+    async def get_admin_actions_by_entity(self, entity_type: str, entity_id: int, limit: int = 100) -> List[Dict]:
+        """
+        Получение истории действий над конкретной сущностью
+        
+        Args:
+            entity_type: Тип сущности
+            entity_id: ID сущности
+            limit: Максимальное количество результатов
+            
+        Returns:
+            Список административных действий
+        """
+        query = """
+            SELECT a.*, u.username, u.first_name, u.last_name
+            FROM "AdminAction" a
+            JOIN "User" u ON a.admin_id = u.user_id
+            WHERE a.entity_type = %s AND a.entity_id = %s
+            ORDER BY a.created_at DESC
+            LIMIT %s
+        """
+        return await self.execute_query(query, (entity_type, entity_id, limit))
+    
+    async def create_promo_code(self, data: Dict) -> Optional[Dict]:
+        """
+        Создание нового промо-кода
+        
+        Args:
+            data: Данные промо-кода
+            
+        Returns:
+            Данные созданного промо-кода или None в случае ошибки
+        """
+        # Формируем список полей и значений для вставки
+        fields = []
+        placeholders = []
+        values = []
+        
+        # Специальная обработка для valid_to, если оно содержит SQL выражение с INTERVAL
+        valid_to_sql = None
+        if 'valid_to' in data and isinstance(data['valid_to'], str) and "INTERVAL" in data['valid_to']:
+            valid_to_sql = data.pop('valid_to')
+        
+        for key, value in data.items():
+            fields.append(key)
+            placeholders.append(f'%s')
+            values.append(value)
+        
+        # Добавляем valid_to с SQL выражением, если оно было
+        if valid_to_sql:
+            fields.append('valid_to')
+            placeholders.append(valid_to_sql)
+        
+        fields_str = ', '.join(fields)
+        placeholders_str = ', '.join(placeholders)
+        
+        query = f'INSERT INTO "PromoCode" ({fields_str}) VALUES ({placeholders_str}) RETURNING *'
+        
+        logger.info(f"SQL запрос для создания промо-кода: {query}")
+        logger.info(f"Значения: {values}")
+        
+        try:
+            result = await self.execute_with_returning(query, tuple(values))
+            logger.info(f"Промо-код успешно создан: {result}")
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при создании промо-кода: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def update_promo_code(self, promo_id: int, data: Dict) -> Optional[Dict]:
+        """
+        Обновление данных промо-кода
+        
+        Args:
+            promo_id: ID промо-кода
+            data: Данные для обновления
+            
+        Returns:
+            Обновленные данные промо-кода или None в случае ошибки
+        """
+        # Формируем строку SET для UPDATE
+        set_values = []
+        values = []
+        
+        for key, value in data.items():
+            set_values.append(f'{key} = %s')
+            values.append(value)
+        
+        # Больше не добавляем обновление updated_at
+        
+        set_str = ', '.join(set_values)
+        values.append(promo_id)  # Добавляем ID промо-кода для WHERE
+        
+        query = f'UPDATE "PromoCode" SET {set_str} WHERE promo_id = %s RETURNING *'
+        
+        try:
+            result = await self.execute_query(query, tuple(values), fetch_one=True)
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении промо-кода: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def delete_promo_code(self, promo_id: int) -> bool:
+        """
+        Удаление промо-кода
+        
+        Args:
+            promo_id: ID промо-кода
+            
+        Returns:
+            True, если промо-код успешно удален
+        """
+        query = 'DELETE FROM "PromoCode" WHERE promo_id = %s'
+        
+        try:
+            await self.execute_query(query, (promo_id,))
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при удалении промо-кода: {e}")
+            reraise_in_async_unit_of_work(e)
+            return False
+    
+    async def get_promo_code(self, code: str) -> Optional[Dict]:
+        """
+        Получение промо-кода по значению кода
+        
+        Args:
+            code: Значение промо-кода
+            
+        Returns:
+            Данные промо-кода или None, если промо-код не найден
+        """
+        query = 'SELECT * FROM "PromoCode" WHERE code = %s'
+        return await self.execute_query(query, (code,), fetch_one=True)
+    
+    async def get_promo_code_by_id(self, promo_id: int) -> Optional[Dict]:
+        """
+        Получение промо-кода по ID
+        
+        Args:
+            promo_id: ID промо-кода
+            
+        Returns:
+            Данные промо-кода или None, если промо-код не найден
+        """
+        query = 'SELECT * FROM "PromoCode" WHERE promo_id = %s'
+        return await self.execute_query(query, (promo_id,), fetch_one=True)
+    
+    async def get_all_promo_codes(self, limit: int = 100, offset: int = 0) -> List[Dict]:
+        """
+        Получение всех промо-кодов
+        
+        Args:
+            limit: Максимальное количество результатов
+            offset: Смещение для пагинации
+            
+        Returns:
+            Список промо-кодов
+        """
+        query = """
+            SELECT p.*, 
+                (SELECT COUNT(*) FROM "PromoUsage" pu WHERE pu.promo_id = p.promo_id) as usage_count
+            FROM "PromoCode" p
+            ORDER BY p.promo_id DESC
+            LIMIT %s OFFSET %s
+        """
+        
+        logger.info(f"Выполняется запрос на получение промо-кодов с limit={limit}, offset={offset}")
+        
+        try:
+            results = await self.execute_query(query, (limit, offset))
+            logger.info(f"Найдено промо-кодов: {len(results)}")
+            if not results:
+                logger.info("Список промо-кодов пуст")
+            else:
+                logger.info(f"Первый промо-код: {results[0]}")
+            return results
+        except Exception as e:
+            logger.error(f"Ошибка при получении списка промо-кодов: {e}")
+            reraise_in_async_unit_of_work(e)
+            return []
+    
+    async def get_active_promo_codes(self) -> List[Dict]:
+        """
+        Получение активных промо-кодов
+        
+        Returns:
+            Список активных промо-кодов
+        """
+        query = """
+            SELECT p.*, 
+                (SELECT COUNT(*) FROM "PromoUsage" pu WHERE pu.promo_id = p.promo_id) as usage_count
+            FROM "PromoCode" p
+            WHERE p.is_active = TRUE
+                AND (p.valid_to IS NULL OR p.valid_to > NOW())
+                AND (p.max_usages IS NULL OR (SELECT COUNT(*) FROM "PromoUsage" pu WHERE pu.promo_id = p.promo_id) < p.max_usages)
+            ORDER BY p.promo_id DESC
+        """
+        return await self.execute_query(query)
+    
+    async def record_promo_usage(self, promo_id: int, user_id: int, tokens_awarded: int) -> Optional[Dict]:
+        """
+        Запись использования промо-кода пользователем
+        
+        Args:
+            promo_id: ID промо-кода
+            user_id: ID пользователя
+            tokens_awarded: Количество начисленных токенов
+            
+        Returns:
+            Данные записи использования промо-кода или None в случае ошибки
+        """
+        query = """
+            INSERT INTO "PromoUsage" 
+                (promo_id, user_id, tokens_awarded, usage_date)
+            VALUES
+                (%s, %s, %s, NOW())
+            RETURNING *
+        """
+        
+        try:
+            result = await self.execute_query(query, (promo_id, user_id, tokens_awarded), fetch_one=True)
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при записи использования промо-кода: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def check_promo_usage(self, promo_id: int, user_id: int) -> bool:
+        """
+        Проверка использования промо-кода пользователем
+        
+        Args:
+            promo_id: ID промо-кода
+            user_id: ID пользователя
+            
+        Returns:
+            True, если пользователь уже использовал промо-код
+        """
+        query = """
+            SELECT EXISTS(
+                SELECT 1 FROM "PromoUsage"
+                WHERE promo_id = %s AND user_id = %s
+            ) as used
+        """
+        result = await self.execute_query(query, (promo_id, user_id), fetch_one=True)
+        return result.get('used', False) if result else False
+    
+    async def redeem_promo_code(self, code: str, user_id: int) -> Optional[Dict]:
+        """
+        Активация промо-кода пользователем: проверка, запись использования и начисление
+        токенов выполняются одной транзакцией. Строка промо-кода блокируется, поэтому
+        одновременные активации не превысят лимит использований.
+        
+        Args:
+            code: Промо-код
+            user_id: ID пользователя
+            
+        Returns:
+            Данные записи использования промо-кода или None, если промо-код недействителен,
+            исчерпан или уже использован пользователем
+        """
+        async def redeem() -> Optional[Dict]:
+            query = """
+                SELECT p.*, (SELECT COUNT(*) FROM "PromoUsage" pu WHERE pu.promo_id = p.promo_id) as usage_count
+                FROM "PromoCode" p
+                WHERE p.code = %s AND p.is_active = TRUE AND (p.valid_to IS NULL OR p.valid_to > NOW())
+                FOR UPDATE OF p
+            """
+            promo = await self.execute_query(query, (code,), fetch_one=True)
+            if not promo:
+                return None
+            if promo.get('max_uses') and promo['usage_count'] >= promo['max_uses']:
+                return None
+            if await self.check_promo_usage(promo['promo_id'], user_id):
+                return None
+            
+            tokens = promo.get('tokens_bonus') or 0
+            usage = await self.record_promo_usage(promo['promo_id'], user_id, tokens)
+            if not usage:
+                raise RuntimeError(f"Не удалось записать использование промо-кода {code}")
+            await AsyncUserRepository().update_tokens(
+                user_id, tokens, reason='promo', reference=f"promo:{promo['promo_id']}:{user_id}"
+            )
+            return usage
+        
+        return await run_in_async_transaction(redeem)
+    
+    async def update_system_config(self, key: str, value: Any) -> Optional[Dict]:
+        """
+        Обновление системной конфигурации
+        
+        Args:
+            key: Ключ конфигурации
+            value: Значение конфигурации
+            
+        Returns:
+            Обновленные данные конфигурации или None в случае ошибки
+        """
+        query = """
+            INSERT INTO "SystemConfig" (config_key, config_value)
+            VALUES (%s, %s)
+            ON CONFLICT (config_key) DO UPDATE
+            SET config_value = %s
+            RETURNING *
+        """
+        
+        try:
+            result = await self.execute_query(query, (key, value, value), fetch_one=True)
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении системной конфигурации: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def get_system_config(self, key: str) -> Optional[Dict]:
+        """
+        Получение системной конфигурации
+        
+        Args:
+            key: Ключ конфигурации
+            
+        Returns:
+            Данные конфигурации или None, если конфигурация не найдена
+        """
+        query = 'SELECT * FROM "SystemConfig" WHERE config_key = %s'
+        return await self.execute_query(query, (key,), fetch_one=True)
+    
+    async def get_all_system_configs(self) -> List[Dict]:
+        """
+        Получение всех системных конфигураций
+        
+        Returns:
+            Список системных конфигураций
+        """
+        query = 'SELECT * FROM "SystemConfig" ORDER BY config_key'
+        return await self.execute_query(query)
+    
+    async def get_system_stats(self) -> Dict:
+        """
+        Получение системной статистики
+        
+        Returns:
+            Системная статистика
+        """
+        query = 'SELECT * FROM "GlobalStats" LIMIT 1'
+        
+        logger.info("Выполняется запрос на получение системной статистики")
+        
+        try:
+            result = await self.execute_query(query, fetch_one=True)
+            if result:
+                logger.info(f"Получена статистика системы: {result}")
+                return result
+            
+            logger.info("Таблица GlobalStats пуста, создаем начальную запись")
+            # Создаем базовую статистику, если нет записей
+            init_query = """
+                INSERT INTO "GlobalStats" 
+                (total_users, active_users, new_users, total_generations, 
+                total_tokens_spent, total_revenue, total_gifts_sent, total_models_trained)
+                VALUES (0, 0, 0, 0, 0, 0, 0, 0)
+                RETURNING *
+            """
+            result = await self.execute_with_returning(init_query)
+            logger.info(f"Создана начальная запись статистики: {result}")
+            return result or {}
+        except Exception as e:
+            logger.error(f"Ошибка при получении системной статистики: {e}")
+            reraise_in_async_unit_of_work(e)
+            return {}
+    
+    async def update_system_stats(self, data: Dict) -> Optional[Dict]:
+        """
+        Обновление системной статистики
+        
+        Args:
+            data: Данные для обновления
+            
+        Returns:
+            Обновленные данные статистики или None в случае ошибки
+        """
+        # Проверяем, существует ли запись
+        stats = await self.get_system_stats()
+        
+        logger.info(f"Обновление статистики системы с данными: {data}")
+        
+        if stats:
+            # Обновляем существующую запись
+            query = f'UPDATE "GlobalStats" SET {set_clause(data)} RETURNING *'
+        else:
+            # Создаем новую запись
+            fields, values = insert_clause(data)
+            query = f'INSERT INTO "GlobalStats" ({fields}) VALUES ({values}) RETURNING *'
+        
+        try:
+            result = await self.execute_with_returning(query, data)
+            logger.info(f"Статистика успешно обновлена: {result}")
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении системной статистики: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
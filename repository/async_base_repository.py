@@ -0,0 +1,422 @@
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type, Union
+
+import asyncpg
+
+from .engine import AsyncEngine, close_async_engine, get_async_engine, open_async_engine
+from .rows import Row, wrap_records
+from .statements import bind_params, compile_query, normalize_query
+from .unit_of_work import current_async_unit_of_work
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+
+QueryParams = Optional[Union[Dict[str, Any], Sequence[Any]]]
+
+
+def _compile_query(query: str) -> Tuple[str, Tuple[Optional[str], ...]]:
+    """
+    Переводит запрос с плейсхолдерами psycopg2 в формат asyncpg ($1, $2, ...).
+    Текст нормализуется, поэтому запросы, отличающиеся только форматированием,
+    попадают в один подготовленный оператор кэша asyncpg.
+
+    Args:
+        query: SQL-запрос в формате psycopg2
+
+    Returns:
+        Кортеж (запрос для asyncpg, порядок параметров).
+        Для позиционных параметров в порядке стоит None, для именованных - имя.
+    """
+    return compile_query(normalize_query(query))
+
+
+def convert_query(query: str, params: QueryParams = None) -> Tuple[str, List[Any]]:
+    """
+    Подготавливает запрос и параметры в формате psycopg2 для выполнения через asyncpg
+
+    Args:
+        query: SQL-запрос с плейсхолдерами %s или %(name)s
+        params: Параметры запроса (словарь или последовательность)
+
+    Returns:
+        Кортеж (запрос для asyncpg, список аргументов)
+    """
+    sql, order = _compile_query(query)
+    return sql, bind_params(order, params)
+
+
+def _affected_rows(status: str) -> int:
+    """
+    Извлекает количество затронутых строк из статуса команды asyncpg ("UPDATE 3", "INSERT 0 1")
+    """
+    try:
+        return int(status.rsplit(" ", 1)[-1])
+    except (ValueError, AttributeError, IndexError):
+        return 0
+
+
+class AsyncBaseRepository(ABC):
+    """Абстрактный асинхронный базовый класс для работы с PostgreSQL через asyncpg"""
+
+    # Глобальный асинхронный пул соединений (AsyncEngine), инициализируется при запуске приложения
+    _connection_pool: Optional[AsyncEngine] = None
+
+    @classmethod
+    async def initialize_pool(cls, dbname: str, user: str, password: str, host: str, port: str,
+                              min_connections: int = 1, max_connections: int = 10) -> AsyncEngine:
+        """
+        Инициализирует асинхронный пул соединений с базой данных (общий AsyncEngine процесса)
+
+        Args:
+            dbname: Имя базы данных
+            user: Имя пользователя
+            password: Пароль
+            host: Хост базы данных
+            port: Порт
+            min_connections: Минимальное количество соединений в пуле
+            max_connections: Максимальное количество соединений в пуле
+
+        Returns:
+            Пул соединений AsyncEngine
+        """
+        try:
+            cls._connection_pool = await open_async_engine(
+                min_connections,
+                max_connections,
+                params={"dbname": dbname, "user": user, "password": password, "host": host, "port": int(port)}
+            )
+            return cls._connection_pool
+        except Exception as e:
+            logger.error(f"Ошибка при инициализации асинхронного пула соединений: {e}")
+            raise
+
+    @classmethod
+    async def close_pool(cls) -> None:
+        """
+        Закрывает асинхронный пул соединений
+        """
+        await close_async_engine()
+        cls._connection_pool = None
+
+    @classmethod
+    def _engine(cls) -> Optional[AsyncEngine]:
+        # Пул общий для процесса: его мог открыть и скрипт через open_async_engine, минуя initialize_pool
+        return get_async_engine()
+
+    @classmethod
+    async def get_connection(cls) -> asyncpg.Connection:
+        """
+        Получает соединение из асинхронного пула. Если свободных соединений нет,
+        ждет освобождения до DB_POOL_TIMEOUT секунд. Внутри единицы работы
+        (AsyncUnitOfWork) возвращает ее соединение, чтобы запросы выполнялись в одной транзакции.
+
+        Returns:
+            Соединение с базой данных
+
+        Raises:
+            Exception: Если пул не инициализирован или не удалось получить соединение
+        """
+        unit_of_work = current_async_unit_of_work()
+        if unit_of_work is not None:
+            return unit_of_work.connection
+
+        engine = cls._engine()
+        if engine is None:
+            logger.error("Асинхронный пул соединений не инициализирован")
+            raise Exception("Асинхронный пул соединений не инициализирован")
+
+        try:
+            return await engine.acquire()
+        except Exception as e:
+            logger.error(f"Ошибка при получении соединения из асинхронного пула: {e}")
+            raise
+
+    @classmethod
+    async def release_connection(cls, conn: asyncpg.Connection) -> None:
+        """
+        Возвращает соединение в асинхронный пул
+
+        Args:
+            conn: Соединение для возврата в пул
+        """
+        unit_of_work = current_async_unit_of_work()
+        if unit_of_work is not None and conn is unit_of_work.connection:
+            # Соединение вернет в пул сама единица работы
+            return
+
+        engine = cls._engine()
+        if engine is not None:
+            try:
+                await engine.release(conn)
+            except Exception as e:
+                logger.error(f"Ошибка при возврате соединения в асинхронный пул: {e}")
+
+    # Абстрактные методы, которые должны быть реализованы в дочерних классах
+    @abstractmethod
+    async def get_by_id(self, id_value: Any) -> Optional[Dict[str, Any]]:
+        """
+        Получение записи по ID
+
+        Args:
+            id_value: Значение ID
+
+        Returns:
+            Запись в виде словаря или None, если запись не найдена
+        """
+        pass
+
+    @abstractmethod
+    async def create(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Создание новой записи
+
+        Args:
+            data: Данные для создания записи
+
+        Returns:
+            Созданная запись в виде словаря или None в случае ошибки
+        """
+        pass
+
+    @abstractmethod
+    async def update(self, id_value: Any, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Обновление записи
+
+        Args:
+            id_value: Значение ID записи для обновления
+            data: Данные для обновления
+
+        Returns:
+            Обновленная запись в виде словаря или None в случае ошибки
+        """
+        pass
+
+    @abstractmethod
+    async def delete(self, id_value: Any) -> bool:
+        """
+        Удаление записи
+
+        Args:
+            id_value: Значение ID записи для удаления
+
+        Returns:
+            True, если запись успешно удалена, иначе False
+        """
+        pass
+
+    async def execute_query(self, query: str, params: QueryParams = None,
+                            fetch_one: bool = False) -> Union[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Выполняет SQL-запрос и возвращает результат в виде списка словарей
+
+        Args:
+            query: SQL-запрос в формате psycopg2
+            params: Параметры запроса
+            fetch_one: Если True, возвращает только первую запись
+
+        Returns:
+            Список словарей с результатами запроса или одна запись, если fetch_one=True
+        """
+        sql, args = convert_query(query, params)
+        conn = None
+        try:
+            conn = await self.get_connection()
+            if fetch_one:
+                result = await conn.fetchrow(sql, *args)
+                return dict(result) if result else None
+            else:
+                result = await conn.fetch(sql, *args)
+                return [dict(row) for row in result]
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении асинхронного запроса: {e}")
+            raise
+        finally:
+            if conn:
+                await self.release_connection(conn)
+
+    async def fetch_rows(self, query: str, params: QueryParams = None,
+                         row_type: Optional[Type[Row]] = None) -> List[Row]:
+        """
+        Выполняет SQL-запрос и возвращает строки Row, которые оборачивают Record
+        asyncpg без копирования в словари. Для запросов с проекцией колонок
+        (SELECT {row_type.select_list()}) вместо SELECT *
+
+        Args:
+            query: SQL-запрос в формате psycopg2
+            params: Параметры запроса
+            row_type: Тип строки (repository/rows.py); без него класс строится по колонкам результата
+
+        Returns:
+            Список строк
+        """
+        sql, args = convert_query(query, params)
+        conn = None
+        try:
+            conn = await self.get_connection()
+            return wrap_records(await conn.fetch(sql, *args), row_type)
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении асинхронного запроса (rows): {e}")
+            raise
+        finally:
+            if conn:
+                await self.release_connection(conn)
+
+    async def fetch_row(self, query: str, params: QueryParams = None,
+                        row_type: Optional[Type[Row]] = None) -> Optional[Row]:
+        """
+        Выполняет SQL-запрос и возвращает первую строку Row
+
+        Args:
+            query: SQL-запрос в формате psycopg2
+            params: Параметры запроса
+            row_type: Тип строки (repository/rows.py)
+
+        Returns:
+            Строка или None, если запись не найдена
+        """
+        sql, args = convert_query(query, params)
+        conn = None
+        try:
+            conn = await self.get_connection()
+            record = await conn.fetchrow(sql, *args)
+            return wrap_records([record], row_type)[0] if record is not None else None
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении асинхронного запроса (row): {e}")
+            raise
+        finally:
+            if conn:
+                await self.release_connection(conn)
+
+    async def execute_query_single(self, query: str, params: QueryParams = None) -> Optional[Dict[str, Any]]:
+        """
+        Выполняет SQL-запрос и возвращает одну запись
+
+        Args:
+            query: SQL-запрос в формате psycopg2
+            params: Параметры запроса
+
+        Returns:
+            Запись в виде словаря или None, если запись не найдена
+        """
+        return await self.execute_query(query, params, fetch_one=True)
+
+    async def execute_query_scalar(self, query: str, params: QueryParams = None) -> Any:
+        """
+        Выполняет SQL-запрос и возвращает скалярное значение
+
+        Args:
+            query: SQL-запрос в формате psycopg2
+            params: Параметры запроса
+
+        Returns:
+            Скалярное значение результата запроса
+        """
+        sql, args = convert_query(query, params)
+        conn = None
+        try:
+            conn = await self.get_connection()
+            return await conn.fetchval(sql, *args)
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении асинхронного запроса (scalar): {e}")
+            raise
+        finally:
+            if conn:
+                await self.release_connection(conn)
+
+    async def execute_non_query(self, query: str, params: QueryParams = None) -> int:
+        """
+        Выполняет SQL-запрос без возврата результата (INSERT, UPDATE, DELETE)
+
+        Args:
+            query: SQL-запрос в формате psycopg2
+            params: Параметры запроса
+
+        Returns:
+            Количество затронутых строк
+        """
+        sql, args = convert_query(query, params)
+        conn = None
+        try:
+            conn = await self.get_connection()
+            status = await conn.execute(sql, *args)
+            return _affected_rows(status)
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении асинхронного запроса (non-query): {e}")
+            raise
+        finally:
+            if conn:
+                await self.release_connection(conn)
+
+    async def execute_batch(self, query: str, params_list: List[QueryParams]) -> int:
+        """
+        Выполняет пакетный SQL-запрос в одной транзакции
+
+        Args:
+            query: SQL-запрос в формате psycopg2
+            params_list: Список параметров запроса
+
+        Returns:
+            Количество обработанных параметров
+        """
+        if not params_list:
+            return 0
+
+        sql, _ = _compile_query(query)
+        args_list = [convert_query(query, params)[1] for params in params_list]
+
+        conn = None
+        try:
+            conn = await self.get_connection()
+            async with conn.transaction():
+                await conn.executemany(sql, args_list)
+            return len(params_list)
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении асинхронного пакетного запроса: {e}")
+            raise
+        finally:
+            if conn:
+                await self.release_connection(conn)
+
+    async def execute_with_returning(self, query: str, params: QueryParams = None) -> Optional[Dict[str, Any]]:
+        """
+        Выполняет SQL-запрос с RETURNING и возвращает одну запись
+
+        Args:
+            query: SQL-запрос с RETURNING в формате psycopg2
+            params: Параметры запроса
+
+        Returns:
+            Запись в виде словаря или None в случае ошибки
+        """
+        return await self.execute_query(query, params, fetch_one=True)
+
+    async def execute_transaction(self, queries_with_params: List[Tuple[str, QueryParams]]) -> bool:
+        """
+        Выполняет несколько SQL-запросов в одной транзакции
+
+        Args:
+            queries_with_params: Список кортежей (запрос, параметры)
+
+        Returns:
+            True, если транзакция выполнена успешно, иначе False
+        """
+        conn = None
+        try:
+            conn = await self.get_connection()
+            async with conn.transaction():
+                for query, params in queries_with_params:
+                    sql, args = convert_query(query, params)
+                    await conn.execute(sql, *args)
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении асинхронной транзакции: {e}")
+            if current_async_unit_of_work() is not None:
+                # Запросы выполнялись в точке сохранения: транзакция единицы работы
+                # не прервана, но ошибка (в том числе конфликт сериализации) должна дойти до вызывающего
+                raise
+            return False
+        finally:
+            if conn:
+                await self.release_connection(conn)
@@ -0,0 +1,211 @@
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from .async_base_repository import AsyncBaseRepository
+
+logger = logging.getLogger(__name__)
+
+# Пространство ключей рекомендательных блокировок рассылок (pg_try_advisory_lock(key, broadcast_id))
+BROADCAST_LOCK_KEY = 7301
+
+
+class AsyncBroadcastRepository(AsyncBaseRepository):
+    """
+    Асинхронный репозиторий рассылок (таблица Broadcast)
+    """
+
+    async def get_by_id(self, broadcast_id: int) -> Optional[Dict]:
+        """
+        Получение рассылки по ID
+
+        Args:
+            broadcast_id: ID рассылки
+
+        Returns:
+            Данные рассылки или None, если рассылка не найдена
+        """
+        query = 'SELECT * FROM "Broadcast" WHERE broadcast_id = %s'
+        return await self.execute_query(query, (broadcast_id,), fetch_one=True)
+
+    async def get_recent(self, limit: int = 10) -> List[Dict]:
+        """
+        Последние рассылки
+
+        Args:
+            limit: Количество рассылок
+
+        Returns:
+            Список рассылок, новые первыми
+        """
+        query = 'SELECT * FROM "Broadcast" ORDER BY broadcast_id DESC LIMIT %s'
+        return await self.execute_query(query, (limit,))
+
+    async def get_running(self) -> List[Dict]:
+        """
+        Незавершенные рассылки, которые нужно продолжить после перезапуска
+
+        Returns:
+            Список рассылок со статусом running
+        """
+        query = """SELECT * FROM "Broadcast" WHERE status = 'running' ORDER BY broadcast_id"""
+        return await self.execute_query(query)
+
+    async def create(self, data: Dict) -> Optional[Dict]:
+        """
+        Создание рассылки
+
+        Args:
+            data: Данные рассылки (created_by, text, parse_mode)
+
+        Returns:
+            Созданная рассылка
+        """
+        query = """
+            INSERT INTO "Broadcast" (created_by, text, parse_mode)
+            VALUES (%(created_by)s, %(text)s, %(parse_mode)s)
+            RETURNING *
+        """
+        return await self.execute_with_returning(query, {
+            "created_by": data["created_by"],
+            "text": data["text"],
+            "parse_mode": data.get("parse_mode", "HTML"),
+        })
+
+    async def update(self, broadcast_id: int, data: Dict) -> Optional[Dict]:
+        """
+        Обновление рассылки
+
+        Args:
+            broadcast_id: ID рассылки
+            data: Данные для обновления
+
+        Returns:
+            Обновленная рассылка
+        """
+        if not data:
+            return await self.get_by_id(broadcast_id)
+        set_clause = ", ".join(f"{key} = %({key})s" for key in data)
+        query = f'UPDATE "Broadcast" SET {set_clause}, updated_at = NOW() WHERE broadcast_id = %(broadcast_id)s RETURNING *'
+        return await self.execute_with_returning(query, {**data, "broadcast_id": broadcast_id})
+
+    async def set_status(self, broadcast_id: int, status: str) -> Optional[Dict]:
+        """
+        Смена статуса рассылки. Завершенную или отмененную рассылку изменить нельзя.
+
+        Args:
+            broadcast_id: ID рассылки
+            status: Новый статус (running, paused, completed, canceled)
+
+        Returns:
+            Обновленная рассылка или None, если рассылка уже завершена
+        """
+        query = """
+            UPDATE "Broadcast"
+            SET status = %(status)s, updated_at = NOW(),
+                finished_at = CASE WHEN %(status)s IN ('completed', 'canceled') THEN NOW() ELSE finished_at END
+            WHERE broadcast_id = %(broadcast_id)s AND status NOT IN ('completed', 'canceled')
+            RETURNING *
+        """
+        return await self.execute_with_returning(query, {"broadcast_id": broadcast_id, "status": status})
+
+    async def save_progress(self, broadcast_id: int, last_user_id: int,
+                            sent: int, failed: int, blocked: int, total: Optional[int] = None) -> Optional[str]:
+        """
+        Сохранение прогресса рассылки
+
+        Args:
+            broadcast_id: ID рассылки
+            last_user_id: Все получатели с user_id не больше этого уже обработаны
+            sent: Отправлено сообщений
+            failed: Ошибок отправки
+            blocked: Пользователей, заблокировавших бота
+            total: Количество получателей (если известно)
+
+        Returns:
+            Текущий статус рассылки (по нему обработчик узнает об отмене или паузе)
+        """
+        query = """
+            UPDATE "Broadcast"
+            SET last_user_id = GREATEST(last_user_id, %(last_user_id)s),
+                sent = %(sent)s, failed = %(failed)s, blocked = %(blocked)s,
+                total = COALESCE(%(total)s, total), updated_at = NOW()
+            WHERE broadcast_id = %(broadcast_id)s
+            RETURNING status
+        """
+        return await self.execute_query_scalar(query, {
+            "broadcast_id": broadcast_id, "last_user_id": last_user_id,
+            "sent": sent, "failed": failed, "blocked": blocked, "total": total,
+        })
+
+    async def count_recipients(self, after_user_id: int = 0) -> int:
+        """
+        Количество получателей рассылки после заданного user_id
+
+        Args:
+            after_user_id: Позиция рассылки
+
+        Returns:
+            Количество получателей
+        """
+        query = 'SELECT COUNT(*) FROM "User" WHERE user_id > %s AND NOT COALESCE(blocked, FALSE)'
+        return await self.execute_query_scalar(query, (after_user_id,)) or 0
+
+    @asynccontextmanager
+    async def stream_recipients(self, broadcast_id: int, after_user_id: int = 0,
+                                prefetch: int = 1000) -> AsyncIterator[Optional[AsyncIterator[int]]]:
+        """
+        Открывает серверный курсор по получателям рассылки в порядке user_id.
+
+        На время рассылки на ее ID берется рекомендательная блокировка сессии:
+        если рассылку уже выполняет другая реплика бота, вместо итератора
+        возвращается None.
+
+        Args:
+            broadcast_id: ID рассылки
+            after_user_id: Позиция, с которой продолжить рассылку
+            prefetch: Сколько строк курсор получает за один запрос
+
+        Returns:
+            Асинхронный итератор по user_id получателей или None
+        """
+        conn = await self.get_connection()
+        locked = False
+        try:
+            locked = await conn.fetchval("SELECT pg_try_advisory_lock($1, $2)", BROADCAST_LOCK_KEY, broadcast_id)
+            if not locked:
+                yield None
+                return
+
+            query = 'SELECT user_id FROM "User" WHERE user_id > $1 AND NOT COALESCE(blocked, FALSE) ORDER BY user_id'
+
+            async def recipients() -> AsyncIterator[int]:
+                async with conn.transaction(readonly=True):
+                    async for record in conn.cursor(query, after_user_id, prefetch=prefetch):
+                        yield record["user_id"]
+
+            iterator = recipients()
+            try:
+                yield iterator
+            finally:
+                # Закрываем курсор и его транзакцию, даже если рассылка прервана на середине
+                await iterator.aclose()
+        finally:
+            if locked:
+                try:
+                    await conn.execute("SELECT pg_advisory_unlock($1, $2)", BROADCAST_LOCK_KEY, broadcast_id)
+                except Exception as e:
+                    logger.warning(f"Не удалось снять блокировку рассылки {broadcast_id}: {e}")
+            await self.release_connection(conn)
+
+    async def delete(self, broadcast_id: int) -> bool:
+        """
+        Удаление рассылки
+
+        Args:
+            broadcast_id: ID рассылки
+
+        Returns:
+            True, если рассылка удалена
+        """
+        return await self.execute_non_query('DELETE FROM "Broadcast" WHERE broadcast_id = %s', (broadcast_id,)) > 0
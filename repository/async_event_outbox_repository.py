@@ -0,0 +1,183 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from .async_base_repository import AsyncBaseRepository
+
+logger = logging.getLogger(__name__)
+
+# Канал PostgreSQL LISTEN/NOTIFY шины событий
+EVENT_BUS_CHANNEL = "event_bus"
+
+
+def _decode_event(event: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if event is not None and isinstance(event.get("payload"), str):
+        event["payload"] = json.loads(event["payload"])
+    return event
+
+
+class AsyncEventOutboxRepository(AsyncBaseRepository):
+    """
+    Асинхронный репозиторий журнала событий шины (таблицы EventOutbox и EventConsumer)
+    """
+
+    async def get_by_id(self, event_id: int) -> Optional[Dict]:
+        """
+        Получение события по ID
+
+        Args:
+            event_id: ID события
+
+        Returns:
+            Данные события или None, если событие не найдено
+        """
+        query = 'SELECT * FROM "EventOutbox" WHERE event_id = %s'
+        return _decode_event(await self.execute_query(query, (event_id,), fetch_one=True))
+
+    async def create(self, data: Dict) -> Optional[Dict]:
+        """
+        Запись события в журнал
+
+        Args:
+            data: Данные события (event_type, payload)
+
+        Returns:
+            Записанное событие
+        """
+        return await self.publish(data["event_type"], data["payload"])
+
+    async def publish(self, event_type: str, payload: Dict[str, Any]) -> Optional[Dict]:
+        """
+        Записывает событие в журнал и уведомляет подписчиков одним запросом.
+        Уведомление уходит при фиксации транзакции вместе с записью в журнале.
+
+        Args:
+            event_type: Тип события
+            payload: Данные события
+
+        Returns:
+            Записанное событие (event_id, event_type, payload, created_at)
+        """
+        query = f"""
+            WITH inserted AS (
+                INSERT INTO "EventOutbox" (event_type, payload)
+                VALUES (%s, %s::jsonb)
+                RETURNING *
+            )
+            SELECT inserted.* FROM inserted
+            CROSS JOIN LATERAL (
+                SELECT pg_notify('{EVENT_BUS_CHANNEL}', json_build_object(
+                    'event_id', inserted.event_id, 'event_type', inserted.event_type,
+                    'payload', inserted.payload, 'created_at', inserted.created_at
+                )::text)
+            ) AS notified
+        """
+        return _decode_event(await self.execute_with_returning(query, (event_type, json.dumps(payload, default=str))))
+
+    async def get_after(self, event_id: int, limit: int = 500) -> List[Dict]:
+        """
+        Получение событий после заданного ID (для догоняющего чтения)
+
+        Args:
+            event_id: ID последнего обработанного события
+            limit: Максимальное количество событий
+
+        Returns:
+            Список событий в порядке записи
+        """
+        query = 'SELECT * FROM "EventOutbox" WHERE event_id > %s ORDER BY event_id LIMIT %s'
+        return [_decode_event(event) for event in await self.execute_query(query, (event_id, limit))]
+
+    async def get_replay_start(self, event_id: int, lookback_seconds: float) -> int:
+        """
+        Позиция, с которой дочитывать журнал. ID выдаются при вставке, а видны после фиксации,
+        поэтому событие с меньшим ID может появиться в журнале позже курсора. Позиция сдвигается
+        назад на события, записанные за последние lookback_seconds секунд.
+
+        Args:
+            event_id: ID последнего обработанного события
+            lookback_seconds: Окно перечитывания в секундах
+
+        Returns:
+            ID, после которого дочитывать события
+        """
+        query = """
+            SELECT LEAST(%s, COALESCE(MIN(event_id) - 1, %s)) FROM "EventOutbox"
+            WHERE created_at >= NOW() - make_interval(secs => %s)
+        """
+        start = await self.execute_query_scalar(query, (event_id, event_id, lookback_seconds))
+        return event_id if start is None else start
+
+    async def get_last_event_id(self) -> int:
+        """
+        ID последнего записанного события
+
+        Returns:
+            ID события или 0, если журнал пуст
+        """
+        return await self.execute_query_scalar('SELECT COALESCE(MAX(event_id), 0) FROM "EventOutbox"') or 0
+
+    async def get_cursor(self, consumer_name: str) -> Optional[int]:
+        """
+        Позиция чтения журнала подписчиком
+
+        Args:
+            consumer_name: Имя подписчика
+
+        Returns:
+            ID последнего обработанного события или None для нового подписчика
+        """
+        query = 'SELECT last_event_id FROM "EventConsumer" WHERE consumer_name = %s'
+        return await self.execute_query_scalar(query, (consumer_name,))
+
+    async def save_cursor(self, consumer_name: str, event_id: int) -> None:
+        """
+        Сохраняет позицию чтения журнала подписчиком (позиция только растет)
+
+        Args:
+            consumer_name: Имя подписчика
+            event_id: ID последнего обработанного события
+        """
+        query = """
+            INSERT INTO "EventConsumer" (consumer_name, last_event_id)
+            VALUES (%s, %s)
+            ON CONFLICT (consumer_name) DO UPDATE
+            SET last_event_id = GREATEST("EventConsumer".last_event_id, EXCLUDED.last_event_id),
+                updated_at = NOW()
+        """
+        await self.execute_non_query(query, (consumer_name, event_id))
+
+    async def delete_older_than(self, days: int) -> int:
+        """
+        Удаляет из журнала старые события
+
+        Args:
+            days: Сколько дней хранить события
+
+        Returns:
+            Количество удаленных событий
+        """
+        query = """DELETE FROM "EventOutbox" WHERE created_at < NOW() - make_interval(days => %s)"""
+        return await self.execute_non_query(query, (days,))
+
+    async def update(self, event_id: int, data: Dict) -> Optional[Dict]:
+        """
+        События в журнале не изменяются: вызов только пишет предупреждение
+
+        Returns:
+            Всегда None
+        """
+        logger.warning(f"Попытка изменить событие {event_id} журнала: события в журнале не изменяются")
+        return None
+
+    async def delete(self, event_id: int) -> bool:
+        """
+        Удаление события из журнала
+
+        Args:
+            event_id: ID события
+
+        Returns:
+            True, если событие удалено
+        """
+        return await self.execute_non_query('DELETE FROM "EventOutbox" WHERE event_id = %s', (event_id,)) > 0
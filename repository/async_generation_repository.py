@@ -0,0 +1,476 @@
+from typing import Dict, List, Optional, Any, Tuple
+import logging
+from .async_base_repository import AsyncBaseRepository
+from .async_token_ledger_repository import AsyncTokenLedgerRepository
+from .status_events import with_status_notify
+from .unit_of_work import AsyncUnitOfWork, reraise_in_async_unit_of_work
+
+logger = logging.getLogger(__name__)
+
+
+def generation_refund_reference(generation_id: int) -> str:
+    """
+    Ключ возврата токенов за генерацию в журнале токенов (reason="generation_refund")
+
+    Args:
+        generation_id: ID генерации
+
+    Returns:
+        Ключ операции вида generation:<id>:refund
+    """
+    return f"generation:{generation_id}:refund"
+
+
+class AsyncGenerationRepository(AsyncBaseRepository):
+    """
+    Асинхронный репозиторий для работы с таблицей генераций изображений
+    """
+    
+    async def get_by_id(self, generation_id: int) -> Optional[Dict]:
+        """
+        Получение генерации по ID
+        
+        Args:
+            generation_id: ID генерации
+            
+        Returns:
+            Данные генерации или None, если генерация не найдена
+        """
+        query = 'SELECT * FROM "Generation" WHERE generation_id = %s'
+        return await self.execute_query(query, (generation_id,), fetch_one=True)
+    
+    async def get_by_external_id(self, external_id: str) -> Optional[Dict]:
+        """
+        Получение генерации по внешнему ID (ID генерации в API)
+        
+        Args:
+            external_id: Внешний ID генерации
+            
+        Returns:
+            Данные генерации или None, если генерация не найдена
+        """
+        query = 'SELECT * FROM "Generation" WHERE external_id = %s'
+        return await self.execute_query(query, (external_id,), fetch_one=True)
+    
+    async def get_by_user_id(self, user_id: int, limit: int = 10, offset: int = 0) -> List[Dict]:
+        """
+        Получение генераций пользователя
+        
+        Args:
+            user_id: ID пользователя
+            limit: Максимальное количество результатов
+            offset: Смещение для пагинации
+            
+        Returns:
+            Список генераций пользователя
+        """
+        query = """
+            SELECT g.*, m.name as model_name, m.trigger_word
+            FROM "Generation" g
+            LEFT JOIN "Model" m ON g.model_id = m.model_id
+            WHERE g.user_id = %s
+            ORDER BY g.created_at DESC
+            LIMIT %s OFFSET %s
+        """
+        return await self.execute_query(query, (user_id, limit, offset))
+    
+    async def create(self, data: Dict) -> Optional[Dict]:
+        """
+        Создание новой записи о генерации
+        
+        Args:
+            data: Данные генерации
+            
+        Returns:
+            Данные созданной генерации или None в случае ошибки
+        """
+        # Формируем список полей и значений для вставки
+        fields = []
+        placeholders = []
+        values = []
+        
+        for key, value in data.items():
+            fields.append(key)
+            placeholders.append(f'%s')
+            values.append(value)
+        
+        fields_str = ', '.join(fields)
+        placeholders_str = ', '.join(placeholders)
+        
+        query = f'INSERT INTO "Generation" ({fields_str}) VALUES ({placeholders_str}) RETURNING *'
+        
+        try:
+            result = await self.execute_query(query, tuple(values), fetch_one=True)
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при создании записи о генерации: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def get_by_ids(self, generation_ids: List[int]) -> List[Dict]:
+        """
+        Получение генераций по списку ID одним запросом
+        
+        Args:
+            generation_ids: Список ID генераций
+            
+        Returns:
+            Список найденных генераций
+        """
+        query = 'SELECT * FROM "Generation" WHERE generation_id = ANY(%s::integer[]) ORDER BY generation_id'
+        return await self.execute_query(query, (list(generation_ids),))
+    
+    async def create_many(self, rows: List[Dict], reserve_tokens: int = 0) -> List[Dict]:
+        """
+        Создание нескольких генераций одним многострочным INSERT.
+        Если задано reserve_tokens, в той же транзакции у пользователя списываются токены;
+        при нехватке токенов ничего не создается.
+        
+        Args:
+            rows: Данные генераций (одинаковый набор полей, у всех один user_id)
+            reserve_tokens: Сколько токенов списать за всю пачку
+            
+        Returns:
+            Список созданных генераций или пустой список, если токенов не хватило
+        """
+        if not rows:
+            return []
+        
+        fields = list(rows[0].keys())
+        values = []
+        row_placeholders = []
+        for row in rows:
+            row_placeholders.append('(' + ', '.join(['%s'] * len(fields)) + ')')
+            values.extend(row[field] for field in fields)
+        
+        insert_query = (
+            f'INSERT INTO "Generation" ({", ".join(fields)}) '
+            f'VALUES {", ".join(row_placeholders)} RETURNING *'
+        )
+        
+        try:
+            # Списание по журналу токенов и вставка генераций - одна транзакция
+            async with AsyncUnitOfWork():
+                if reserve_tokens:
+                    entry = await AsyncTokenLedgerRepository().debit(rows[0]["user_id"], reserve_tokens, "generation")
+                    if entry is None:
+                        return []
+                return await self.execute_query(insert_query, values)
+        except Exception as e:
+            logger.error(f"Ошибка при создании пачки генераций: {e}")
+            raise
+    
+    async def update(self, generation_id: int, data: Dict) -> Optional[Dict]:
+        """
+        Обновление данных генерации
+        
+        Args:
+            generation_id: ID генерации
+            data: Данные для обновления
+            
+        Returns:
+            Обновленные данные генерации или None в случае ошибки
+        """
+        # Формируем строку SET для UPDATE
+        set_values = []
+        values = []
+        
+        for key, value in data.items():
+            set_values.append(f'{key} = %s')
+            values.append(value)
+        
+        # Добавляем обновление updated_at
+        set_values.append('updated_at = NOW()')
+        
+        set_str = ', '.join(set_values)
+        values.append(generation_id)  # Добавляем ID генерации для WHERE
+        
+        query = f'UPDATE "Generation" SET {set_str} WHERE generation_id = %s RETURNING *'
+        
+        try:
+            result = await self.execute_query(query, tuple(values), fetch_one=True)
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении генерации: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def delete(self, generation_id: int) -> bool:
+        """
+        Удаление генерации
+        
+        Args:
+            generation_id: ID генерации
+            
+        Returns:
+            True, если генерация успешно удалена
+        """
+        query = 'DELETE FROM "Generation" WHERE generation_id = %s'
+        
+        try:
+            await self.execute_query(query, (generation_id,))
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при удалении генерации: {e}")
+            reraise_in_async_unit_of_work(e)
+            return False
+    
+    async def update_status(self, generation_id: int, status: str) -> Optional[Dict]:
+        """
+        Обновление статуса генерации
+        
+        Args:
+            generation_id: ID генерации
+            status: Новый статус
+            
+        Returns:
+            Обновленные данные генерации или None в случае ошибки
+        """
+        query = """
+            UPDATE "Generation" 
+            SET status = %s, 
+                updated_at = NOW() 
+            WHERE generation_id = %s 
+            RETURNING *
+        """
+        query = with_status_notify(query, "generation", "generation_id", ("image_url",))
+        
+        try:
+            result = await self.execute_query(query, (status, generation_id), fetch_one=True)
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении статуса генерации: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def fail_and_refund(self, generation_id: int, status: str = 'failed') -> Optional[Dict]:
+        """
+        Переводит незавершенную генерацию в статус failed или canceled и в той же транзакции
+        возвращает пользователю списанные за нее токены. Возврат записывается в журнал токенов
+        с ключом generation:<id>:refund, поэтому повторный вызов токены не начисляет.
+        
+        Args:
+            generation_id: ID генерации
+            status: Новый статус (failed или canceled)
+            
+        Returns:
+            Обновленные данные генерации или None, если генерация уже завершена
+        """
+        query = """
+            UPDATE "Generation" 
+            SET status = %s, 
+                updated_at = NOW() 
+            WHERE generation_id = %s AND status NOT IN ('completed', 'failed', 'canceled')
+            RETURNING *
+        """
+        query = with_status_notify(query, "generation", "generation_id", ("image_url",))
+        
+        try:
+            async with AsyncUnitOfWork():
+                generation = await self.execute_query(query, (status, generation_id), fetch_one=True)
+                if generation and generation.get("tokens_spent"):
+                    await AsyncTokenLedgerRepository().credit(
+                        generation["user_id"], generation["tokens_spent"], "generation_refund",
+                        reference=generation_refund_reference(generation_id)
+                    )
+                return generation
+        except Exception as e:
+            logger.error(f"Ошибка при возврате токенов за генерацию {generation_id}: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def update_result(self, generation_id: int, image_url: str, status: str = 'completed') -> Optional[Dict]:
+        """
+        Обновление результата генерации
+        
+        Args:
+            generation_id: ID генерации
+            image_url: URL сгенерированного изображения
+            status: Новый статус (по умолчанию 'completed')
+            
+        Returns:
+            Обновленные данные генерации или None в случае ошибки
+        """
+        query = """
+            UPDATE "Generation" 
+            SET image_url = %s,
+                status = %s,
+                completed_at = NOW(),
+                updated_at = NOW() 
+            WHERE generation_id = %s 
+            RETURNING *
+        """
+        query = with_status_notify(query, "generation", "generation_id", ("image_url",))
+        
+        try:
+            result = await self.execute_query(query, (image_url, status, generation_id), fetch_one=True)
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении результата генерации: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def update_mark(self, generation_id: int, mark: int) -> Optional[Dict]:
+        """
+        Обновление оценки генерации
+        
+        Args:
+            generation_id: ID генерации
+            mark: Оценка (1-5)
+            
+        Returns:
+            Обновленные данные генерации или None в случае ошибки
+        """
+        query = """
+            UPDATE "Generation" 
+            SET mark = %s,
+                updated_at = NOW() 
+            WHERE generation_id = %s 
+            RETURNING *
+        """
+        
+        try:
+            result = await self.execute_query(query, (mark, generation_id), fetch_one=True)
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении оценки генерации: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def get_generations_in_progress(self) -> List[Dict]:
+        """
+        Получение генераций, находящихся в процессе
+        
+        Returns:
+            Список генераций в процессе
+        """
+        query = """
+            SELECT g.*, u.username, u.first_name, u.last_name,
+                  m.name as model_name, m.trigger_word
+            FROM "Generation" g
+            JOIN "User" u ON g.user_id = u.user_id
+            LEFT JOIN "Model" m ON g.model_id = m.model_id
+            WHERE g.status = 'processing'
+            ORDER BY g.created_at ASC
+        """
+        
+        return await self.execute_query(query)
+    
+    async def get_pending_generations(self, limit: int = 100, exclude_ids: Optional[List[int]] = None) -> List[Dict]:
+        """
+        Получение генераций, ожидающих отправки в API, вместе с признаками приоритета пользователя
+        
+        Args:
+            limit: Максимальное количество результатов
+            exclude_ids: ID генераций, которые уже находятся в очереди диспетчера
+            
+        Returns:
+            Список генераций в порядке создания (с полями is_admin и is_paying)
+        """
+        query = """
+            SELECT g.*, m.name as model_name, m.trigger_word, m.model_url,
+                   COALESCE(u.is_admin, FALSE) as is_admin,
+                   EXISTS (
+                       SELECT 1 FROM "Payment" p
+                       WHERE p.user_id = g.user_id AND p.status = 'completed'
+                   ) as is_paying
+            FROM "Generation" g
+            JOIN "User" u ON g.user_id = u.user_id
+            LEFT JOIN "Model" m ON g.model_id = m.model_id
+            WHERE g.status = 'pending' AND NOT (g.generation_id = ANY(%s::integer[]))
+            ORDER BY g.created_at ASC
+            LIMIT %s
+        """
+        
+        return await self.execute_query(query, (list(exclude_ids or []), limit))
+    
+    async def claim_pending(self, generation_id: int) -> Optional[Dict]:
+        """
+        Переводит ожидающую генерацию в статус processing.
+        Если генерацию уже забрал другой процесс, ничего не меняет.
+        
+        Args:
+            generation_id: ID генерации
+            
+        Returns:
+            Обновленные данные генерации или None, если генерация уже не в статусе pending
+        """
+        query = """
+            UPDATE "Generation" 
+            SET status = 'processing',
+                updated_at = NOW() 
+            WHERE generation_id = %s AND status = 'pending'
+            RETURNING *
+        """
+        query = with_status_notify(query, "generation", "generation_id", ("image_url",))
+        
+        return await self.execute_with_returning(query, (generation_id,))
+    
+    async def get_user_generations_stats(self, user_id: int) -> Dict:
+        """
+        Получение статистики генераций пользователя
+        
+        Args:
+            user_id: ID пользователя
+            
+        Returns:
+            Статистика генераций пользователя
+        """
+        query = """
+            SELECT 
+                COUNT(*) as total_generations,
+                COUNT(CASE WHEN status = 'completed' THEN 1 END) as completed_generations,
+                COUNT(CASE WHEN status = 'failed' THEN 1 END) as failed_generations,
+                AVG(CASE WHEN mark IS NOT NULL THEN mark END) as avg_mark,
+                SUM(token_cost) as total_tokens_spent
+            FROM "Generation"
+            WHERE user_id = %s
+        """
+        
+        return await self.execute_query(query, (user_id,), fetch_one=True)
+    
+    async def get_last_generations(self, limit: int = 10) -> List[Dict]:
+        """
+        Получение последних генераций
+        
+        Args:
+            limit: Максимальное количество результатов
+            
+        Returns:
+            Список последних генераций
+        """
+        query = """
+            SELECT g.*, u.username, u.first_name, u.last_name,
+                  m.name as model_name, m.trigger_word
+            FROM "Generation" g
+            JOIN "User" u ON g.user_id = u.user_id
+            LEFT JOIN "Model" m ON g.model_id = m.model_id
+            WHERE g.status = 'completed' AND g.image_url IS NOT NULL
+            ORDER BY g.created_at DESC
+            LIMIT %s
+        """
+        
+        return await self.execute_query(query, (limit,))
+    
+    async def get_top_rated_generations(self, limit: int = 10) -> List[Dict]:
+        """
+        Получение топ генераций по оценкам
+        
+        Args:
+            limit: Максимальное количество результатов
+            
+        Returns:
+            Список топ генераций
+        """
+        query = """
+            SELECT g.*, u.username, u.first_name, u.last_name,
+                  m.name as model_name, m.trigger_word
+            FROM "Generation" g
+            JOIN "User" u ON g.user_id = u.user_id
+            LEFT JOIN "Model" m ON g.model_id = m.model_id
+            WHERE g.status = 'completed' AND g.image_url IS NOT NULL AND g.mark IS NOT NULL
+            ORDER BY g.mark DESC, g.created_at DESC
+            LIMIT %s
+        """
+        
+        return await self.execute_query(query, (limit,)) 
\ No newline at end of file
@@ -0,0 +1,282 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from .async_base_repository import AsyncBaseRepository
+
+logger = logging.getLogger(__name__)
+
+
+def _decode_job(job: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Разбирает JSONB-поля задачи (asyncpg без настроенного кодека возвращает их строками)
+    """
+    if job is None:
+        return None
+    for field in ("payload", "progress", "result"):
+        if isinstance(job.get(field), str):
+            job[field] = json.loads(job[field])
+    return job
+
+
+class AsyncJobRepository(AsyncBaseRepository):
+    """
+    Асинхронный репозиторий для работы с очередью задач обучения (таблица TrainingJob).
+
+    Задача проходит статусы queued -> running -> succeeded. При ошибке она
+    возвращается в queued с задержкой, а после max_attempts попыток переходит
+    в dead. Обработчики берут задачи через FOR UPDATE SKIP LOCKED и держат
+    аренду (locked_at), продлевая ее, пока задача выполняется.
+    """
+
+    async def get_by_id(self, job_id: int) -> Optional[Dict]:
+        """
+        Получение задачи по ID
+
+        Args:
+            job_id: ID задачи
+
+        Returns:
+            Данные задачи или None, если задача не найдена
+        """
+        query = 'SELECT * FROM "TrainingJob" WHERE job_id = %s'
+        return _decode_job(await self.execute_query(query, (job_id,), fetch_one=True))
+
+    async def get_by_user_id(self, user_id: int, limit: int = 10) -> List[Dict]:
+        """
+        Получение последних задач пользователя
+
+        Args:
+            user_id: ID пользователя
+            limit: Максимальное количество результатов
+
+        Returns:
+            Список задач, начиная с последней
+        """
+        query = 'SELECT * FROM "TrainingJob" WHERE user_id = %s ORDER BY created_at DESC LIMIT %s'
+        return [_decode_job(job) for job in await self.execute_query(query, (user_id, limit))]
+
+    async def get_active_by_user(self, user_id: int) -> Optional[Dict]:
+        """
+        Получение ожидающей или выполняющейся задачи пользователя
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            Данные задачи или None, если активной задачи нет
+        """
+        query = """
+            SELECT * FROM "TrainingJob"
+            WHERE user_id = %s AND status IN ('queued', 'running')
+            ORDER BY created_at DESC
+            LIMIT 1
+        """
+        return _decode_job(await self.execute_query(query, (user_id,), fetch_one=True))
+
+    async def create(self, data: Dict) -> Optional[Dict]:
+        """
+        Создание задачи
+
+        Args:
+            data: Данные задачи (user_id, payload, max_attempts)
+
+        Returns:
+            Созданная задача или None, если у пользователя уже есть активная задача
+        """
+        return await self.enqueue(data["user_id"], data["payload"], data.get("max_attempts", 5))
+
+    async def enqueue(self, user_id: int, payload: Dict[str, Any], max_attempts: int = 5,
+                      progress: Optional[Dict[str, Any]] = None) -> Optional[Dict]:
+        """
+        Ставит задачу обучения в очередь
+
+        Args:
+            user_id: ID пользователя
+            payload: Параметры задачи
+            max_attempts: Максимальное количество попыток выполнения
+            progress: Шаги, выполненные до постановки в очередь (например, резерв токенов)
+
+        Returns:
+            Созданная задача или None, если у пользователя уже есть активная задача
+        """
+        query = """
+            INSERT INTO "TrainingJob" (user_id, payload, max_attempts, progress)
+            VALUES (%s, %s::jsonb, %s, %s::jsonb)
+            ON CONFLICT (user_id) WHERE status IN ('queued', 'running') DO NOTHING
+            RETURNING *
+        """
+        params = (user_id, json.dumps(payload), max_attempts, json.dumps(progress or {}))
+        return _decode_job(await self.execute_with_returning(query, params))
+
+    async def claim_next(self, worker_id: str) -> Optional[Dict]:
+        """
+        Забирает следующую готовую задачу. Задачи, уже взятые другими
+        обработчиками, пропускаются без ожидания блокировки.
+
+        Args:
+            worker_id: Идентификатор обработчика
+
+        Returns:
+            Задача в статусе running или None, если очередь пуста
+        """
+        query = """
+            UPDATE "TrainingJob"
+            SET status = 'running', attempts = attempts + 1, locked_by = %s,
+                locked_at = NOW(), updated_at = NOW()
+            WHERE job_id = (
+                SELECT job_id FROM "TrainingJob"
+                WHERE status = 'queued' AND run_after <= NOW()
+                ORDER BY run_after, job_id
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING *
+        """
+        return _decode_job(await self.execute_with_returning(query, (worker_id,)))
+
+    async def extend_lease(self, job_id: int, worker_id: str) -> bool:
+        """
+        Продлевает аренду задачи
+
+        Args:
+            job_id: ID задачи
+            worker_id: Идентификатор обработчика
+
+        Returns:
+            False, если задача уже не принадлежит обработчику
+        """
+        query = """
+            UPDATE "TrainingJob" SET locked_at = NOW()
+            WHERE job_id = %s AND locked_by = %s AND status = 'running'
+        """
+        return await self.execute_non_query(query, (job_id, worker_id)) > 0
+
+    async def save_progress(self, job_id: int, worker_id: str, progress: Dict[str, Any]) -> bool:
+        """
+        Сохраняет выполненные шаги задачи, чтобы повторная попытка их пропустила
+
+        Args:
+            job_id: ID задачи
+            worker_id: Идентификатор обработчика
+            progress: Новые значения шагов, объединяются с уже сохраненными
+
+        Returns:
+            False, если задача уже не принадлежит обработчику
+        """
+        query = """
+            UPDATE "TrainingJob"
+            SET progress = progress || %s::jsonb, locked_at = NOW(), updated_at = NOW()
+            WHERE job_id = %s AND locked_by = %s AND status = 'running'
+        """
+        return await self.execute_non_query(query, (json.dumps(progress), job_id, worker_id)) > 0
+
+    async def mark_succeeded(self, job_id: int, worker_id: str, result: Dict[str, Any]) -> Optional[Dict]:
+        """
+        Отмечает задачу выполненной
+
+        Args:
+            job_id: ID задачи
+            worker_id: Идентификатор обработчика
+            result: Результат задачи
+
+        Returns:
+            Обновленная задача или None, если задача уже не принадлежит обработчику
+        """
+        query = """
+            UPDATE "TrainingJob"
+            SET status = 'succeeded', result = %s::jsonb, last_error = NULL, locked_by = NULL,
+                locked_at = NULL, updated_at = NOW(), finished_at = NOW()
+            WHERE job_id = %s AND locked_by = %s AND status = 'running'
+            RETURNING *
+        """
+        return _decode_job(await self.execute_with_returning(query, (json.dumps(result), job_id, worker_id)))
+
+    async def mark_failed(self, job_id: int, worker_id: str, error: str, retry_delay: float,
+                          permanent: bool = False) -> Optional[Dict]:
+        """
+        Отмечает неудачную попытку. Задача возвращается в очередь с задержкой
+        или переходит в dead, если попытки исчерпаны или ошибка неустранима.
+
+        Args:
+            job_id: ID задачи
+            worker_id: Идентификатор обработчика
+            error: Текст ошибки
+            retry_delay: Задержка перед следующей попыткой, в секундах
+            permanent: Ошибка неустранима, повторять задачу бессмысленно
+
+        Returns:
+            Обновленная задача или None, если задача уже не принадлежит обработчику
+        """
+        query = """
+            UPDATE "TrainingJob"
+            SET status = CASE WHEN %(permanent)s OR attempts >= max_attempts THEN 'dead' ELSE 'queued' END,
+                finished_at = CASE WHEN %(permanent)s OR attempts >= max_attempts THEN NOW() END,
+                run_after = NOW() + make_interval(secs => %(retry_delay)s),
+                last_error = %(error)s, locked_by = NULL, locked_at = NULL, updated_at = NOW()
+            WHERE job_id = %(job_id)s AND locked_by = %(worker_id)s AND status = 'running'
+            RETURNING *
+        """
+        params = {
+            "permanent": permanent,
+            "retry_delay": float(retry_delay),
+            "error": error,
+            "job_id": job_id,
+            "worker_id": worker_id,
+        }
+        return _decode_job(await self.execute_with_returning(query, params))
+
+    async def requeue_stale(self, lease_seconds: float) -> List[Dict]:
+        """
+        Возвращает в очередь задачи, аренда которых истекла (обработчик упал или завис)
+
+        Args:
+            lease_seconds: Время аренды в секундах
+
+        Returns:
+            Список возвращенных задач (job_id, user_id, status)
+        """
+        query = """
+            UPDATE "TrainingJob"
+            SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'queued' END,
+                finished_at = CASE WHEN attempts >= max_attempts THEN NOW() END,
+                last_error = 'Истекла аренда обработчика ' || COALESCE(locked_by, ''),
+                run_after = NOW(), locked_by = NULL, locked_at = NULL, updated_at = NOW()
+            WHERE status = 'running' AND locked_at < NOW() - make_interval(secs => %s)
+            RETURNING job_id, user_id, status
+        """
+        return await self.execute_query(query, (float(lease_seconds),))
+
+    async def count_by_status(self) -> Dict[str, int]:
+        """
+        Количество задач по статусам
+
+        Returns:
+            Словарь статус -> количество
+        """
+        query = 'SELECT status, COUNT(*) AS count FROM "TrainingJob" GROUP BY status'
+        return {row["status"]: row["count"] for row in await self.execute_query(query)}
+
+    async def update(self, job_id: int, data: Dict) -> Optional[Dict]:
+        """
+        Задачи меняются только через методы очереди (claim_next, mark_succeeded, mark_failed):
+        вызов только пишет предупреждение
+
+        Returns:
+            Всегда None
+        """
+        logger.warning(f"Попытка изменить задачу {job_id} в обход методов очереди")
+        return None
+
+    async def delete(self, job_id: int) -> bool:
+        """
+        Удаление завершенной задачи
+
+        Args:
+            job_id: ID задачи
+
+        Returns:
+            True, если задача удалена
+        """
+        query = """DELETE FROM "TrainingJob" WHERE job_id = %s AND status IN ('succeeded', 'dead')"""
+        return await self.execute_non_query(query, (job_id,)) > 0
@@ -0,0 +1,384 @@
+from typing import Dict, List, Optional, Any, Tuple
+import logging
+from .async_base_repository import AsyncBaseRepository
+from .unit_of_work import reraise_in_async_unit_of_work
+from .rows import ModelSummaryRow
+from .status_events import with_status_notify
+
+logger = logging.getLogger(__name__)
+
+class AsyncModelRepository(AsyncBaseRepository):
+    """
+    Асинхронный репозиторий для работы с таблицей моделей
+    """
+    
+    async def get_by_id(self, model_id: int) -> Optional[Dict]:
+        """
+        Получение модели по ID
+        
+        Args:
+            model_id: ID модели
+            
+        Returns:
+            Данные модели или None, если модель не найдена
+        """
+        query = 'SELECT * FROM "Model" WHERE model_id = %s'
+        return await self.execute_query(query, (model_id,), fetch_one=True)
+    
+    async def get_by_training_id(self, training_id: str) -> Optional[Dict]:
+        """
+        Получение модели по ID тренировки в Replicate API
+        
+        Args:
+            training_id: ID тренировки в Replicate API
+            
+        Returns:
+            Данные модели или None, если модель не найдена
+        """
+        query = 'SELECT * FROM "Model" WHERE training_id = %s'
+        return await self.execute_query(query, (training_id,), fetch_one=True)
+    
+    async def get_by_user_id(self, user_id: int) -> List[ModelSummaryRow]:
+        """
+        Получение моделей пользователя
+        
+        Args:
+            user_id: ID пользователя
+            
+        Returns:
+            Список моделей пользователя
+        """
+        query = f'SELECT {ModelSummaryRow.select_list()} FROM "Model" WHERE user_id = %s ORDER BY created_at DESC'
+        return await self.fetch_rows(query, (user_id,), ModelSummaryRow)
+    
+    async def get_ready_models_by_user_id(self, user_id: int) -> List[ModelSummaryRow]:
+        """
+        Получение готовых моделей пользователя
+        
+        Args:
+            user_id: ID пользователя
+            
+        Returns:
+            Список готовых моделей пользователя
+        """
+        query = f'SELECT {ModelSummaryRow.select_list()} FROM "Model" WHERE user_id = %s AND status = %s ORDER BY created_at DESC'
+        return await self.fetch_rows(query, (user_id, 'ready'), ModelSummaryRow)
+    
+    async def create(self, data: Dict) -> Optional[Dict]:
+        """
+        Создание новой модели
+        
+        Args:
+            data: Данные модели
+            
+        Returns:
+            Данные созданной модели или None в случае ошибки
+        """
+        # Формируем список полей и значений для вставки
+        fields = []
+        placeholders = []
+        values = []
+        
+        for key, value in data.items():
+            fields.append(key)
+            placeholders.append(f'%s')
+            values.append(value)
+        
+        fields_str = ', '.join(fields)
+        placeholders_str = ', '.join(placeholders)
+        
+        query = f'INSERT INTO "Model" ({fields_str}) VALUES ({placeholders_str}) RETURNING *'
+        
+        try:
+            result = await self.execute_query(query, tuple(values), fetch_one=True)
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при создании модели: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def update(self, model_id: int, data: Dict) -> Optional[Dict]:
+        """
+        Обновление данных модели
+        
+        Args:
+            model_id: ID модели
+            data: Данные для обновления
+            
+        Returns:
+            Обновленные данные модели или None в случае ошибки
+        """
+        # Формируем строку SET для UPDATE
+        set_values = []
+        values = []
+        
+        for key, value in data.items():
+            set_values.append(f'{key} = %s')
+            values.append(value)
+        
+        # Добавляем обновление updated_at
+        set_values.append('updated_at = NOW()')
+        
+        set_str = ', '.join(set_values)
+        values.append(model_id)  # Добавляем ID модели для WHERE
+        
+        query = f'UPDATE "Model" SET {set_str} WHERE model_id = %s RETURNING *'
+        
+        try:
+            result = await self.execute_query(query, tuple(values), fetch_one=True)
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении модели: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def delete(self, model_id: int) -> bool:
+        """
+        Удаление модели
+        
+        Args:
+            model_id: ID модели
+            
+        Returns:
+            True, если модель успешно удалена
+        """
+        query = 'DELETE FROM "Model" WHERE model_id = %s'
+        
+        try:
+            await self.execute_query(query, (model_id,))
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка при удалении модели: {e}")
+            reraise_in_async_unit_of_work(e)
+            return False
+    
+    async def update_status(self, model_id: int, status: str) -> Optional[Dict]:
+        """
+        Обновление статуса модели
+        
+        Args:
+            model_id: ID модели
+            status: Новый статус
+            
+        Returns:
+            Обновленные данные модели или None в случае ошибки
+        """
+        query = """
+            UPDATE "Model" 
+            SET status = %s, 
+                updated_at = NOW() 
+            WHERE model_id = %s 
+            RETURNING *
+        """
+        query = with_status_notify(query, "model", "model_id", ("model_url",))
+        
+        try:
+            result = await self.execute_query(query, (status, model_id), fetch_one=True)
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении статуса модели: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def increment_usage_count(self, model_id: int) -> Optional[Dict]:
+        """
+        Увеличение счетчика использования модели
+        
+        Args:
+            model_id: ID модели
+            
+        Returns:
+            Обновленные данные модели или None в случае ошибки
+        """
+        query = """
+            UPDATE "Model" 
+            SET usage_count = usage_count + 1, 
+                updated_at = NOW() 
+            WHERE model_id = %s 
+            RETURNING *
+        """
+        
+        try:
+            result = await self.execute_query(query, (model_id,), fetch_one=True)
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении счетчика использования модели: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def get_public_models(self, limit: int = 10, offset: int = 0) -> List[Dict]:
+        """
+        Получение публичных моделей
+        
+        Args:
+            limit: Максимальное количество результатов
+            offset: Смещение для пагинации
+            
+        Returns:
+            Список публичных моделей
+        """
+        query = """
+            SELECT m.*, u.username, u.first_name, u.last_name
+            FROM "Model" m
+            JOIN "User" u ON m.user_id = u.user_id
+            WHERE m.is_public = TRUE AND m.status = 'ready'
+            ORDER BY m.usage_count DESC, m.created_at DESC
+            LIMIT %s OFFSET %s
+        """
+        
+        return await self.execute_query(query, (limit, offset))
+    
+    async def get_top_models(self, limit: int = 10) -> List[Dict]:
+        """
+        Получение топ моделей по частоте использования
+        
+        Args:
+            limit: Максимальное количество результатов
+            
+        Returns:
+            Список топ моделей
+        """
+        query = """
+            SELECT m.*, u.username, u.first_name, u.last_name,
+                   COUNT(g.generation_id) as generation_count,
+                   AVG(CASE WHEN g.mark IS NOT NULL THEN g.mark ELSE NULL END) as avg_rating
+            FROM "Model" m
+            JOIN "User" u ON m.user_id = u.user_id
+            LEFT JOIN "Generation" g ON m.model_id = g.model_id
+            WHERE m.status = 'ready'
+            GROUP BY m.model_id, u.username, u.first_name, u.last_name
+            ORDER BY m.usage_count DESC, avg_rating DESC NULLS LAST
+            LIMIT %s
+        """
+        
+        return await self.execute_query(query, (limit,))
+    
+    async def search_models(self, search_term: str, limit: int = 10) -> List[Dict]:
+        """
+        Поиск моделей по имени или описанию
+        
+        Args:
+            search_term: Поисковый запрос
+            limit: Максимальное количество результатов
+            
+        Returns:
+            Список найденных моделей
+        """
+        search_pattern = f"%{search_term}%"
+        query = """
+            SELECT m.*, u.username, u.first_name, u.last_name
+            FROM "Model" m
+            JOIN "User" u ON m.user_id = u.user_id
+            WHERE (m.name ILIKE %s OR m.trigger_word ILIKE %s) AND m.status = 'ready'
+            ORDER BY m.usage_count DESC, m.created_at DESC
+            LIMIT %s
+        """
+        
+        return await self.execute_query(query, (search_pattern, search_pattern, limit))
+    
+    async def get_models_in_training(self) -> List[Dict]:
+        """
+        Получение моделей, находящихся в процессе обучения
+        
+        Returns:
+            Список моделей в процессе обучения
+        """
+        query = """
+            SELECT m.*, u.username, u.first_name, u.last_name
+            FROM "Model" m
+            JOIN "User" u ON m.user_id = u.user_id
+            WHERE m.status = 'training'
+            ORDER BY m.created_at ASC
+        """
+        
+        return await self.execute_query(query)
+    
+    async def update_training_info(self, model_id: int, training_duration: int, training_cost: int) -> Optional[Dict]:
+        """
+        Обновление информации об обучении модели
+        
+        Args:
+            model_id: ID модели
+            training_duration: Длительность обучения в секундах
+            training_cost: Стоимость обучения в токенах
+            
+        Returns:
+            Обновленные данные модели или None в случае ошибки
+        """
+        query = """
+            UPDATE "Model" 
+            SET training_duration = %s, 
+                training_cost = %s,
+                updated_at = NOW() 
+            WHERE model_id = %s 
+            RETURNING *
+        """
+        
+        try:
+            result = await self.execute_query(query, (training_duration, training_cost, model_id), fetch_one=True)
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении информации об обучении модели: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def complete_training(self, model_id: int, status: str, model_url: Optional[str] = None) -> Optional[Dict]:
+        """
+        Фиксирует завершение обучения модели. Обновление выполняется только для модели
+        в статусе training, поэтому повторная запись того же перехода ничего не меняет
+        
+        Args:
+            model_id: ID модели
+            status: Итоговый статус (ready или failed)
+            model_url: URL обученной модели
+            
+        Returns:
+            Обновленные данные модели или None, если модель уже не в статусе training
+        """
+        query = """
+            UPDATE "Model" 
+            SET status = %s, 
+                model_url = COALESCE(%s, model_url),
+                updated_at = NOW() 
+            WHERE model_id = %s AND status = 'training'
+            RETURNING *
+        """
+        query = with_status_notify(query, "model", "model_id", ("model_url",))
+        
+        try:
+            result = await self.execute_with_returning(query, (status, model_url, model_id))
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при фиксации завершения обучения модели: {e}")
+            reraise_in_async_unit_of_work(e)
+            return None
+    
+    async def get_models_by_user(self, user_id: int, status: str = None) -> List[ModelSummaryRow]:
+        """
+        Получает список моделей пользователя, опционально фильтруя по статусу
+        
+        Args:
+            user_id: ID пользователя
+            status: Статус модели (например, 'ready', 'training', 'failed')
+            
+        Returns:
+            List[ModelSummaryRow]: Список моделей пользователя
+        """
+        query = f'SELECT {ModelSummaryRow.select_list()} FROM "Model" WHERE user_id = %s'
+        params = [user_id]
+        
+        if status:
+            query += ' AND status = %s'
+            params.append(status)
+            
+        query += ' ORDER BY created_at DESC'
+        
+        try:
+            models = await self.fetch_rows(query, params, ModelSummaryRow)
+            logger.info(f"Найдено {len(models)} моделей пользователя {user_id}" + 
+                        (f" со статусом '{status}'" if status else ""))
+            return models
+        except Exception as e:
+            logger.error(f"Ошибка при получении моделей пользователя {user_id}: {e}")
+            reraise_in_async_unit_of_work(e)
+            return []
@@ -0,0 +1,215 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from .async_base_repository import AsyncBaseRepository
+from .token_ledger_repository import APPLY_QUERY, LEDGER_BALANCE_QUERY, SNAPSHOT_QUERY, UNIQUE_VIOLATION
+from .unit_of_work import AsyncUnitOfWork, current_async_unit_of_work
+from .user_cache import get_user_cache
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTokenLedgerRepository(AsyncBaseRepository):
+    """
+    Асинхронный репозиторий журнала токенов (таблицы TokenLedger и TokenBalanceSnapshot).
+    Все изменения "User".tokens_left проходят через apply, записи журнала не изменяются.
+    """
+
+    async def get_by_id(self, entry_id: int) -> Optional[Dict]:
+        """
+        Получение записи журнала по ID
+
+        Args:
+            entry_id: ID записи
+
+        Returns:
+            Запись журнала или None, если запись не найдена
+        """
+        query = 'SELECT * FROM "TokenLedger" WHERE entry_id = %s'
+        return await self.execute_query(query, (entry_id,), fetch_one=True)
+
+    async def get_by_reference(self, reason: str, reference: str) -> Optional[Dict]:
+        """
+        Получение записи журнала по ключу операции
+
+        Args:
+            reason: Причина операции
+            reference: Ключ операции
+
+        Returns:
+            Запись журнала или None, если операции не было
+        """
+        query = 'SELECT * FROM "TokenLedger" WHERE reason = %s AND reference = %s'
+        return await self.execute_query(query, (reason, reference), fetch_one=True)
+
+    async def create(self, data: Dict) -> Optional[Dict]:
+        """
+        Запись операции в журнал с изменением баланса
+
+        Args:
+            data: Данные операции (user_id, amount, reason, reference)
+
+        Returns:
+            Запись журнала
+        """
+        return await self.apply(data["user_id"], data["amount"], data["reason"], data.get("reference"))
+
+    async def apply(self, user_id: int, amount: int, reason: str, reference: Optional[str] = None) -> Optional[Dict]:
+        """
+        Изменяет баланс пользователя и добавляет запись в журнал
+
+        Args:
+            user_id: ID пользователя
+            amount: Изменение баланса (> 0 начисление, < 0 списание)
+            reason: Причина операции (payment, promo, training, generation, admin)
+            reference: Ключ операции; повтор с тем же ключом возвращает первую запись
+
+        Returns:
+            Запись журнала или None, если токенов не хватает или пользователь не найден
+        """
+        params = {"user_id": user_id, "amount": amount, "reason": reason, "reference": reference}
+        try:
+            # Внутри единицы работы ошибка запроса не должна прерывать всю транзакцию
+            if current_async_unit_of_work() is not None:
+                async with AsyncUnitOfWork():
+                    entry = await self.execute_with_returning(APPLY_QUERY, params)
+            else:
+                entry = await self.execute_with_returning(APPLY_QUERY, params)
+        except Exception as e:
+            if getattr(e, "sqlstate", None) != UNIQUE_VIOLATION:
+                raise
+            return await self.get_by_reference(reason, reference)
+
+        if entry is not None:
+            await self._invalidate(user_id)
+        return entry
+
+    async def debit(self, user_id: int, cost: int, reason: str, reference: Optional[str] = None) -> Optional[Dict]:
+        """
+        Списание токенов, если их хватает
+
+        Args:
+            user_id: ID пользователя
+            cost: Сколько токенов списать
+            reason: Причина списания
+            reference: Ключ операции
+
+        Returns:
+            Запись журнала или None, если токенов не хватает
+        """
+        return await self.apply(user_id, -cost, reason, reference)
+
+    async def credit(self, user_id: int, amount: int, reason: str, reference: Optional[str] = None) -> Optional[Dict]:
+        """
+        Начисление токенов
+
+        Args:
+            user_id: ID пользователя
+            amount: Сколько токенов начислить
+            reason: Причина начисления
+            reference: Ключ операции
+
+        Returns:
+            Запись журнала или None, если пользователь не найден
+        """
+        return await self.apply(user_id, amount, reason, reference)
+
+    async def _invalidate(self, user_id: int) -> None:
+        cache = get_user_cache()
+        await cache.invalidate_async(user_id)
+        unit_of_work = current_async_unit_of_work()
+        if unit_of_work is not None:
+            unit_of_work.on_commit(lambda: cache.invalidate_async(user_id))
+
+    async def get_history(self, user_id: int, limit: int = 50, before_entry_id: Optional[int] = None) -> List[Dict]:
+        """
+        История операций пользователя от новых к старым (постранично по entry_id)
+
+        Args:
+            user_id: ID пользователя
+            limit: Количество записей
+            before_entry_id: Вернуть записи старше этой (ID последней записи предыдущей страницы)
+
+        Returns:
+            Список записей журнала
+        """
+        query = """
+            SELECT * FROM "TokenLedger"
+            WHERE user_id = %s AND (%s::bigint IS NULL OR entry_id < %s)
+            ORDER BY entry_id DESC
+            LIMIT %s
+        """
+        return await self.execute_query(query, (user_id, before_entry_id, before_entry_id, limit))
+
+    async def get_ledger_balance(self, user_id: int) -> int:
+        """
+        Баланс пользователя, посчитанный по журналу от последнего снимка
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            Баланс по журналу
+        """
+        return await self.execute_query_scalar(LEDGER_BALANCE_QUERY, {"user_id": user_id}) or 0
+
+    async def reconcile(self, user_id: int) -> Dict[str, Any]:
+        """
+        Сверка баланса пользователя с журналом
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            Баланс по журналу, tokens_left и признак совпадения
+        """
+        ledger_balance = await self.get_ledger_balance(user_id)
+        tokens_left = await self.execute_query_scalar('SELECT tokens_left FROM "User" WHERE user_id = %s', (user_id,))
+        return {
+            "user_id": user_id,
+            "ledger_balance": ledger_balance,
+            "tokens_left": tokens_left,
+            "consistent": tokens_left is not None and ledger_balance == tokens_left,
+        }
+
+    async def snapshot_balances(self, since_entry_id: int = 0, min_entries: int = 100) -> int:
+        """
+        Сохраняет снимки балансов пользователей с накопившимися записями журнала
+
+        Args:
+            since_entry_id: Рассматривать пользователей с записями новее этой
+            min_entries: Сколько записей после последнего снимка нужно для нового снимка
+
+        Returns:
+            Количество сохраненных снимков
+        """
+        return await self.execute_non_query(SNAPSHOT_QUERY, {"since": since_entry_id, "min_entries": min_entries})
+
+    async def get_last_entry_id(self) -> int:
+        """
+        ID последней записи журнала (граница для следующего вызова snapshot_balances)
+
+        Returns:
+            ID записи или 0, если журнал пуст
+        """
+        return await self.execute_query_scalar('SELECT COALESCE(MAX(entry_id), 0) FROM "TokenLedger"') or 0
+
+    async def update(self, entry_id: int, data: Dict) -> Optional[Dict]:
+        """
+        Записи журнала не изменяются: вызов только пишет предупреждение
+
+        Returns:
+            Всегда None
+        """
+        logger.warning(f"Попытка изменить запись {entry_id} журнала токенов: записи журнала не изменяются")
+        return None
+
+    async def delete(self, entry_id: int) -> bool:
+        """
+        Записи журнала не удаляются: вызов только пишет предупреждение
+
+        Returns:
+            Всегда False
+        """
+        logger.warning(f"Попытка удалить запись {entry_id} журнала токенов: записи журнала не удаляются")
+        return False
@@ -1,9 +1,13 @@
 import logging
 import psycopg2
 import psycopg2.extras
-from psycopg2 import pool
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+
+from .engine import SyncEngine, get_sync_engine, open_sync_engine
+from .rows import Row, RowCursor, dict_row, dict_rows
+from .statements import get_statement_registry
+from .unit_of_work import current_unit_of_work, reraise_in_unit_of_work
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -11,14 +15,14 @@ logger = logging.getLogger(__name__)
 class BaseRepository(ABC):
     """Абстрактный базовый класс для работы с PostgreSQL"""
     
-    # Глобальный пул соединений, инициализируется при запуске приложения
-    _connection_pool = None
+    # Глобальный пул соединений (SyncEngine), инициализируется при запуске приложения
+    _connection_pool: Optional[SyncEngine] = None
     
     @classmethod
     def initialize_pool(cls, dbname: str, user: str, password: str, host: str, port: str,
-                    min_connections: int = 1, max_connections: int = 10) -> pool.ThreadedConnectionPool:
+                    min_connections: int = 1, max_connections: int = 10) -> SyncEngine:
         """
-        Инициализирует пул соединений с базой данных
+        Инициализирует пул соединений с базой данных (общий SyncEngine процесса)
         
         Args:
             dbname: Имя базы данных
@@ -30,24 +34,30 @@ class BaseRepository(ABC):
             max_connections: Максимальное количество соединений в пуле
             
         Returns:
-            Пул соединений ThreadedConnectionPool
+            Пул соединений SyncEngine
         """
         try:
-            cls._connection_pool = pool.ThreadedConnectionPool(
-                minconn=min_connections,
-                maxconn=max_connections,
-                dsn=f"dbname={dbname} user={user} password={password} host={host} port={port}"
+            cls._connection_pool = open_sync_engine(
+                min_connections,
+                max_connections,
+                params={"dbname": dbname, "user": user, "password": password, "host": host, "port": int(port)}
             )
-            logger.info(f"Пул соединений инициализирован (min={min_connections}, max={max_connections})")
             return cls._connection_pool
         except Exception as e:
             logger.error(f"Ошибка при инициализации пула соединений: {e}")
             raise
     
+    @classmethod
+    def _engine(cls) -> Optional[SyncEngine]:
+        # Пул общий для процесса: его мог открыть и скрипт через open_sync_engine, минуя initialize_pool
+        return get_sync_engine()
+    
     @classmethod
     def get_connection(cls):
         """
-        Получает соединение из пула
+        Получает соединение из пула. Если свободных соединений нет, ждет
+        освобождения до DB_POOL_TIMEOUT секунд. Внутри единицы работы (UnitOfWork)
+        возвращает ее соединение, чтобы запросы выполнялись в одной транзакции.
         
         Returns:
             Соединение с базой данных
@@ -55,12 +65,17 @@ class BaseRepository(ABC):
         Raises:
             Exception: Если пул не инициализирован или не удалось получить соединение
         """
-        if cls._connection_pool is None:
+        unit_of_work = current_unit_of_work()
+        if unit_of_work is not None:
+            return unit_of_work.connection
+        
+        engine = cls._engine()
+        if engine is None:
             logger.error("Пул соединений не инициализирован")
             raise Exception("Пул соединений не инициализирован")
         
         try:
-            return cls._connection_pool.getconn()
+            return engine.getconn()
         except Exception as e:
             logger.error(f"Ошибка при получении соединения из пула: {e}")
             raise
@@ -73,12 +88,31 @@ class BaseRepository(ABC):
         Args:
             conn: Соединение для возврата в пул
         """
-        if cls._connection_pool is not None:
+        unit_of_work = current_unit_of_work()
+        if unit_of_work is not None and conn is unit_of_work.connection:
+            # Соединение вернет в пул сама единица работы
+            return
+        
+        engine = cls._engine()
+        if engine is not None:
             try:
-                cls._connection_pool.putconn(conn)
+                engine.putconn(conn)
             except Exception as e:
                 logger.error(f"Ошибка при возврате соединения в пул: {e}")
     
+    @staticmethod
+    def _execute(cursor, query: str, params: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Выполняет запрос на курсоре; повторяющиеся запросы выполняются через
+        подготовленные на соединении операторы (repository/statements.py)
+        
+        Args:
+            cursor: Курсор psycopg2
+            query: SQL-запрос
+            params: Параметры запроса
+        """
+        get_statement_registry().execute(cursor, query, params)
+    
     # Абстрактные методы, которые должны быть реализованы в дочерних классах
     @abstractmethod
     def get_by_id(self, id_value: Any) -> Optional[Dict[str, Any]]:
@@ -148,14 +182,12 @@ class BaseRepository(ABC):
         conn = None
         try:
             conn = self.get_connection()
-            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-                cursor.execute(query, params or {})
+            with conn.cursor() as cursor:
+                self._execute(cursor, query, params)
                 if fetch_one:
-                    result = cursor.fetchone()
-                    return dict(result) if result else None
+                    return dict_row(cursor)
                 else:
-                    result = cursor.fetchall()
-                    return list(result)
+                    return dict_rows(cursor)
         except Exception as e:
             logger.error(f"Ошибка при выполнении запроса: {e}")
             if conn:
@@ -165,6 +197,65 @@ class BaseRepository(ABC):
             if conn:
                 self.release_connection(conn)
     
+    def fetch_rows(self, query: str, params: Optional[Dict[str, Any]] = None,
+                   row_type: Optional[Type[Row]] = None) -> List[Row]:
+        """
+        Выполняет SQL-запрос и возвращает строки Row без копирования в словари.
+        Для запросов с проекцией колонок (SELECT {row_type.select_list()}) вместо SELECT *
+        
+        Args:
+            query: SQL-запрос
+            params: Параметры запроса
+            row_type: Тип строки (repository/rows.py); без него класс строится по колонкам результата
+            
+        Returns:
+            Список строк
+        """
+        conn = None
+        try:
+            conn = self.get_connection()
+            with conn.cursor(cursor_factory=RowCursor) as cursor:
+                cursor.row_type = row_type
+                self._execute(cursor, query, params)
+                return cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении запроса (rows): {e}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if conn:
+                self.release_connection(conn)
+    
+    def fetch_row(self, query: str, params: Optional[Dict[str, Any]] = None,
+                  row_type: Optional[Type[Row]] = None) -> Optional[Row]:
+        """
+        Выполняет SQL-запрос и возвращает первую строку Row
+        
+        Args:
+            query: SQL-запрос
+            params: Параметры запроса
+            row_type: Тип строки (repository/rows.py)
+            
+        Returns:
+            Строка или None, если запись не найдена
+        """
+        conn = None
+        try:
+            conn = self.get_connection()
+            with conn.cursor(cursor_factory=RowCursor) as cursor:
+                cursor.row_type = row_type
+                self._execute(cursor, query, params)
+                return cursor.fetchone()
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении запроса (row): {e}")
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if conn:
+                self.release_connection(conn)
+    
     def execute_query_single(self, query: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
         """
         Выполняет SQL-запрос и возвращает одну запись
@@ -179,10 +270,9 @@ class BaseRepository(ABC):
         conn = None
         try:
             conn = self.get_connection()
-            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-                cursor.execute(query, params or {})
-                result = cursor.fetchone()
-                return dict(result) if result else None
+            with conn.cursor() as cursor:
+                self._execute(cursor, query, params)
+                return dict_row(cursor)
         except Exception as e:
             logger.error(f"Ошибка при выполнении запроса (single): {e}")
             if conn:
@@ -207,7 +297,7 @@ class BaseRepository(ABC):
         try:
             conn = self.get_connection()
             with conn.cursor() as cursor:
-                cursor.execute(query, params or {})
+                self._execute(cursor, query, params)
                 result = cursor.fetchone()
                 return result[0] if result else None
         except Exception as e:
@@ -234,7 +324,7 @@ class BaseRepository(ABC):
         try:
             conn = self.get_connection()
             with conn.cursor() as cursor:
-                cursor.execute(query, params or {})
+                self._execute(cursor, query, params)
                 conn.commit()
                 return cursor.rowcount
         except Exception as e:
@@ -290,11 +380,10 @@ class BaseRepository(ABC):
         conn = None
         try:
             conn = self.get_connection()
-            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-                cursor.execute(query, params or {})
+            with conn.cursor() as cursor:
+                self._execute(cursor, query, params)
                 conn.commit()
-                result = cursor.fetchone()
-                return dict(result) if result else None
+                return dict_row(cursor)
         except Exception as e:
             logger.error(f"Ошибка при выполнении запроса с RETURNING: {e}")
             if conn:
@@ -319,13 +408,14 @@ class BaseRepository(ABC):
             conn = self.get_connection()
             with conn.cursor() as cursor:
                 for query, params in queries_with_params:
-                    cursor.execute(query, params or {})
+                    self._execute(cursor, query, params)
                 conn.commit()
                 return True
         except Exception as e:
             logger.error(f"Ошибка при выполнении транзакции: {e}")
             if conn:
                 conn.rollback()
+            reraise_in_unit_of_work(e)
             return False
         finally:
             if conn:
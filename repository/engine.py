@@ -0,0 +1,471 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import asyncpg
+from psycopg2 import pool
+from dotenv import load_dotenv
+
+from .statements import DB_STATEMENT_CACHE, DB_STATEMENT_CACHE_SIZE, get_statement_registry
+
+# Загружаем переменные окружения
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Минимальный и максимальный размер каждого пула (синхронного и асинхронного)
+DB_MIN_CONN = int(os.getenv("DB_MIN_CONN", "1"))
+DB_MAX_CONN = int(os.getenv("DB_MAX_CONN", "10"))
+# Таймаут установки соединения с сервером в секундах
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+# Сколько ждать свободного соединения, прежде чем вернуть ошибку, в секундах
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Максимальный возраст соединения: более старые закрываются и открываются заново
+DB_MAX_LIFETIME = float(os.getenv("DB_MAX_LIFETIME", "1800"))
+# Соединения, простаивавшие дольше, проверяются запросом SELECT 1 перед выдачей
+DB_HEALTHCHECK_IDLE = float(os.getenv("DB_HEALTHCHECK_IDLE", "30"))
+# Простаивающие соединения асинхронного пула сверх минимума закрываются через это время
+DB_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_MAX_INACTIVE_LIFETIME", "300"))
+
+
+class PoolTimeoutError(Exception):
+    """Свободное соединение не появилось за DB_POOL_TIMEOUT секунд"""
+
+
+def get_connection_params() -> Dict[str, Any]:
+    """
+    Параметры подключения к PostgreSQL из переменных окружения (DB_*).
+    Единственный источник настроек подключения для бота, API, обработчиков и скриптов.
+
+    Returns:
+        Словарь с ключами host, port, dbname, user, password
+    """
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": int(os.getenv("DB_PORT", "5432")),
+        "dbname": os.getenv("DB_NAME", "dream_photo"),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "postgres"),
+    }
+
+
+def _asyncpg_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    asyncpg_params = dict(params)
+    asyncpg_params["database"] = asyncpg_params.pop("dbname")
+    return asyncpg_params
+
+
+class _PoolStats:
+    """Счетчики выдачи соединений, общие для обоих пулов"""
+
+    def __init__(self):
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        self.recycled = 0
+        self.broken = 0
+
+    def record_wait(self, seconds: float) -> None:
+        self.acquired += 1
+        # Ожидание дольше 10 мс означает, что свободных соединений не было
+        if seconds > 0.01:
+            self.waited += 1
+            self.wait_seconds += seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "avg_wait_ms": round(self.wait_seconds / self.waited * 1000, 1) if self.waited else 0.0,
+            "timeouts": self.timeouts,
+            "recycled": self.recycled,
+            "broken": self.broken,
+        }
+
+
+class SyncEngine:
+    """
+    Пул соединений psycopg2 с проверкой соединений и ограничением их возраста.
+
+    В отличие от ThreadedConnectionPool, который при исчерпании пула сразу
+    бросает PoolError, выдача соединения ждет освобождения до DB_POOL_TIMEOUT.
+    Соединения старше DB_MAX_LIFETIME закрываются, а простаивавшие дольше
+    DB_HEALTHCHECK_IDLE проверяются перед выдачей, поэтому разорванные
+    сервером или балансировщиком сокеты не попадают в репозитории.
+
+    Args:
+        params: Параметры подключения (get_connection_params)
+        min_connections: Минимальное количество соединений
+        max_connections: Максимальное количество соединений
+    """
+
+    def __init__(self, params: Dict[str, Any], min_connections: int = DB_MIN_CONN,
+                 max_connections: int = DB_MAX_CONN):
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self._pool = pool.ThreadedConnectionPool(
+            min_connections, max_connections, connect_timeout=DB_CONNECT_TIMEOUT, **params
+        )
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        # id соединения -> [время открытия, время последнего возврата в пул]
+        self._meta: Dict[int, list] = {}
+        self._in_use = 0
+        self._stats = _PoolStats()
+
+    @staticmethod
+    def _ping(conn) -> bool:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn, broken: bool) -> None:
+        get_statement_registry().forget(conn)
+        with self._lock:
+            self._meta.pop(id(conn), None)
+            if broken:
+                self._stats.broken += 1
+            else:
+                self._stats.recycled += 1
+        try:
+            self._pool.putconn(conn, close=True)
+        except Exception as e:
+            logger.warning(f"Ошибка при закрытии соединения: {e}")
+
+    def getconn(self):
+        """
+        Выдает проверенное соединение из пула
+
+        Returns:
+            Соединение psycopg2
+
+        Raises:
+            PoolTimeoutError: Если свободное соединение не появилось за DB_POOL_TIMEOUT
+        """
+        started_at = time.monotonic()
+        if not self._slots.acquire(timeout=DB_POOL_TIMEOUT):
+            with self._lock:
+                self._stats.timeouts += 1
+            raise PoolTimeoutError(f"Нет свободных соединений с базой данных за {DB_POOL_TIMEOUT} с")
+
+        try:
+            while True:
+                conn = self._pool.getconn()
+                now = time.monotonic()
+                with self._lock:
+                    created_at, last_used_at = self._meta.setdefault(id(conn), [now, now])
+                if conn.closed:
+                    self._discard(conn, broken=True)
+                elif now - created_at > DB_MAX_LIFETIME:
+                    self._discard(conn, broken=False)
+                elif now - last_used_at > DB_HEALTHCHECK_IDLE and not self._ping(conn):
+                    self._discard(conn, broken=True)
+                else:
+                    break
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._stats.record_wait(time.monotonic() - started_at)
+        return conn
+
+    def putconn(self, conn) -> None:
+        """
+        Возвращает соединение в пул; разорванные и слишком старые соединения закрываются
+
+        Args:
+            conn: Соединение, полученное через getconn
+        """
+        try:
+            now = time.monotonic()
+            with self._lock:
+                self._in_use -= 1
+                meta = self._meta.get(id(conn))
+            if conn.closed:
+                self._discard(conn, broken=True)
+            elif meta is None or now - meta[0] > DB_MAX_LIFETIME:
+                self._discard(conn, broken=False)
+            else:
+                meta[1] = now
+                self._pool.putconn(conn)
+        finally:
+            self._slots.release()
+
+    def warm_up(self) -> None:
+        """Открывает и проверяет минимальное количество соединений, чтобы первые запросы не ждали подключения"""
+        connections = [self.getconn() for _ in range(self.min_connections)]
+        for conn in connections:
+            self._ping(conn)
+            self.putconn(conn)
+
+    def close(self) -> None:
+        """Закрывает все соединения пула"""
+        self._pool.closeall()
+        get_statement_registry().clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики пула
+
+        Returns:
+            Размер пула, занятые соединения, насыщенность и счетчики выдачи
+        """
+        with self._lock:
+            return {
+                "size": len(self._meta),
+                "in_use": self._in_use,
+                "max": self.max_connections,
+                "saturation": round(self._in_use / self.max_connections, 2),
+                **self._stats.as_dict(),
+            }
+
+
+class AsyncEngine:
+    """
+    Пул соединений asyncpg с проверкой соединений и ограничением их возраста.
+    Поведение то же, что у SyncEngine: ожидание свободного соединения
+    до DB_POOL_TIMEOUT, закрытие соединений старше DB_MAX_LIFETIME и проверка
+    простаивавших дольше DB_HEALTHCHECK_IDLE.
+
+    Args:
+        params: Параметры подключения (get_connection_params)
+        min_connections: Минимальное количество соединений
+        max_connections: Максимальное количество соединений
+    """
+
+    def __init__(self, params: Dict[str, Any], min_connections: int = DB_MIN_CONN,
+                 max_connections: int = DB_MAX_CONN):
+        self.params = params
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.pool: Optional[asyncpg.Pool] = None
+        # PID серверного процесса соединения -> время открытия и время последнего возврата
+        self._created_at: Dict[int, float] = {}
+        self._released_at: Dict[int, float] = {}
+        self._stats = _PoolStats()
+
+    async def _init_connection(self, conn: asyncpg.Connection) -> None:
+        pid = conn.get_server_pid()
+        self._created_at[pid] = time.monotonic()
+        self._released_at.pop(pid, None)
+
+    async def open(self) -> asyncpg.Pool:
+        """
+        Создает пул и прогревает его
+
+        Returns:
+            Пул asyncpg
+        """
+        self.pool = await asyncpg.create_pool(
+            **_asyncpg_params(self.params),
+            min_size=self.min_connections,
+            max_size=self.max_connections,
+            max_inactive_connection_lifetime=DB_MAX_INACTIVE_LIFETIME,
+            timeout=DB_CONNECT_TIMEOUT,
+            init=self._init_connection,
+            # asyncpg сам подготавливает запросы и кэширует операторы на соединении
+            statement_cache_size=DB_STATEMENT_CACHE_SIZE if DB_STATEMENT_CACHE else 0,
+        )
+        await self.warm_up()
+        return self.pool
+
+    async def _discard(self, conn, broken: bool) -> None:
+        pid = conn.get_server_pid()
+        self._created_at.pop(pid, None)
+        self._released_at.pop(pid, None)
+        if broken:
+            self._stats.broken += 1
+        else:
+            self._stats.recycled += 1
+        # Закрытое соединение пул заменит новым при следующей выдаче
+        try:
+            await conn.close(timeout=2)
+        except Exception:
+            conn.terminate()
+        await self.pool.release(conn)
+
+    async def acquire(self) -> asyncpg.Connection:
+        """
+        Выдает проверенное соединение из пула
+
+        Returns:
+            Соединение asyncpg
+
+        Raises:
+            PoolTimeoutError: Если свободное соединение не появилось за DB_POOL_TIMEOUT
+        """
+        started_at = time.monotonic()
+        while True:
+            try:
+                conn = await self.pool.acquire(timeout=DB_POOL_TIMEOUT)
+            except asyncio.TimeoutError:
+                self._stats.timeouts += 1
+                raise PoolTimeoutError(f"Нет свободных соединений с базой данных за {DB_POOL_TIMEOUT} с")
+
+            now = time.monotonic()
+            pid = conn.get_server_pid()
+            if now - self._created_at.get(pid, now) > DB_MAX_LIFETIME:
+                await self._discard(conn, broken=False)
+                continue
+            if now - self._released_at.get(pid, now) > DB_HEALTHCHECK_IDLE:
+                try:
+                    await conn.fetchval("SELECT 1", timeout=DB_CONNECT_TIMEOUT)
+                except Exception:
+                    await self._discard(conn, broken=True)
+                    continue
+            self._stats.record_wait(time.monotonic() - started_at)
+            return conn
+
+    async def release(self, conn: asyncpg.Connection) -> None:
+        """
+        Возвращает соединение в пул
+
+        Args:
+            conn: Соединение, полученное через acquire
+        """
+        if not conn.is_closed():
+            self._released_at[conn.get_server_pid()] = time.monotonic()
+        await self.pool.release(conn)
+
+    async def warm_up(self) -> None:
+        """Открывает и проверяет минимальное количество соединений, чтобы первые запросы не ждали подключения"""
+        connections = [await self.acquire() for _ in range(self.min_connections)]
+        await asyncio.gather(*(conn.fetchval("SELECT 1") for conn in connections))
+        for conn in connections:
+            await self.release(conn)
+
+    async def close(self) -> None:
+        """Закрывает пул"""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики пула
+
+        Returns:
+            Размер пула, занятые соединения, насыщенность и счетчики выдачи
+        """
+        if self.pool is None:
+            return {"size": 0, "in_use": 0, "max": self.max_connections, "saturation": 0.0, **self._stats.as_dict()}
+        size = self.pool.get_size()
+        in_use = size - self.pool.get_idle_size()
+        return {
+            "size": size,
+            "in_use": in_use,
+            "max": self.max_connections,
+            "saturation": round(in_use / self.max_connections, 2),
+            **self._stats.as_dict(),
+        }
+
+
+# Общие экземпляры пулов процесса
+_sync_engine: Optional[SyncEngine] = None
+_async_engine: Optional[AsyncEngine] = None
+
+
+def get_sync_engine() -> Optional[SyncEngine]:
+    """Возвращает синхронный пул процесса или None, если он не создан"""
+    return _sync_engine
+
+
+def get_async_engine() -> Optional[AsyncEngine]:
+    """Возвращает асинхронный пул процесса или None, если он не создан"""
+    return _async_engine
+
+
+def open_sync_engine(min_connections: int = DB_MIN_CONN, max_connections: int = DB_MAX_CONN,
+                     params: Optional[Dict[str, Any]] = None) -> SyncEngine:
+    """
+    Создает и прогревает синхронный пул процесса (повторный вызов возвращает существующий)
+
+    Args:
+        min_connections: Минимальное количество соединений
+        max_connections: Максимальное количество соединений
+        params: Параметры подключения (по умолчанию get_connection_params)
+
+    Returns:
+        SyncEngine: Пул соединений
+    """
+    global _sync_engine
+    if _sync_engine is None:
+        engine = SyncEngine(params or get_connection_params(), min_connections, max_connections)
+        engine.warm_up()
+        _sync_engine = engine
+        logger.info(f"Пул соединений инициализирован (min={min_connections}, max={max_connections})")
+    return _sync_engine
+
+
+def close_sync_engine() -> None:
+    """Закрывает синхронный пул процесса"""
+    global _sync_engine
+    if _sync_engine is not None:
+        _sync_engine.close()
+        _sync_engine = None
+        logger.info("Пул соединений закрыт")
+
+
+async def open_async_engine(min_connections: int = DB_MIN_CONN, max_connections: int = DB_MAX_CONN,
+                            params: Optional[Dict[str, Any]] = None) -> AsyncEngine:
+    """
+    Создает и прогревает асинхронный пул процесса (повторный вызов возвращает существующий)
+
+    Args:
+        min_connections: Минимальное количество соединений
+        max_connections: Максимальное количество соединений
+        params: Параметры подключения (по умолчанию get_connection_params)
+
+    Returns:
+        AsyncEngine: Пул соединений
+    """
+    global _async_engine
+    if _async_engine is None:
+        engine = AsyncEngine(params or get_connection_params(), min_connections, max_connections)
+        await engine.open()
+        _async_engine = engine
+        logger.info(f"Асинхронный пул соединений инициализирован (min={min_connections}, max={max_connections})")
+    return _async_engine
+
+
+async def close_async_engine() -> None:
+    """Закрывает асинхронный пул процесса"""
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.close()
+        _async_engine = None
+        logger.info("Асинхронный пул соединений закрыт")
+
+
+async def connect_dedicated() -> asyncpg.Connection:
+    """
+    Открывает отдельное соединение asyncpg с теми же параметрами, что и пул
+    (для LISTEN/NOTIFY, где соединение занято все время работы подписчика)
+
+    Returns:
+        Соединение asyncpg
+    """
+    return await asyncpg.connect(**_asyncpg_params(get_connection_params()), timeout=DB_CONNECT_TIMEOUT)
+
+
+def engine_stats() -> Dict[str, Any]:
+    """
+    Метрики пулов соединений процесса
+
+    Returns:
+        Метрики синхронного и асинхронного пулов (None для несозданного пула)
+    """
+    return {
+        "sync": _sync_engine.stats() if _sync_engine else None,
+        "async": _async_engine.stats() if _async_engine else None,
+    }
@@ -1,6 +1,10 @@
 from typing import Dict, List, Optional, Any, Tuple
 import logging
+import psycopg2.extras
 from .base_repository import BaseRepository
+from .status_events import with_status_notify
+from .token_ledger_repository import TokenLedgerRepository
+from .unit_of_work import UnitOfWork, reraise_in_unit_of_work
 
 logger = logging.getLogger(__name__)
 
@@ -87,8 +91,59 @@ class GenerationRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при создании записи о генерации: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
+    def get_by_ids(self, generation_ids: List[int]) -> List[Dict]:
+        """
+        Получение генераций по списку ID одним запросом
+        
+        Args:
+            generation_ids: Список ID генераций
+            
+        Returns:
+            Список найденных генераций
+        """
+        query = 'SELECT * FROM "Generation" WHERE generation_id = ANY(%s::integer[]) ORDER BY generation_id'
+        return self.execute_query(query, (list(generation_ids),))
+    
+    def create_many(self, rows: List[Dict], reserve_tokens: int = 0) -> List[Dict]:
+        """
+        Создание нескольких генераций одним многострочным INSERT (execute_values).
+        Если задано reserve_tokens, в той же транзакции у пользователя списываются токены;
+        при нехватке токенов ничего не создается.
+        
+        Args:
+            rows: Данные генераций (одинаковый набор полей, у всех один user_id)
+            reserve_tokens: Сколько токенов списать за всю пачку
+            
+        Returns:
+            Список созданных генераций или пустой список, если токенов не хватило
+        """
+        if not rows:
+            return []
+        
+        fields = list(rows[0].keys())
+        insert_query = f'INSERT INTO "Generation" ({", ".join(fields)}) VALUES %s RETURNING *'
+        
+        try:
+            # Списание по журналу токенов и вставка генераций - одна транзакция
+            with UnitOfWork():
+                if reserve_tokens:
+                    entry = TokenLedgerRepository().debit(rows[0]["user_id"], reserve_tokens, "generation")
+                    if entry is None:
+                        return []
+                conn = self.get_connection()
+                with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                    created = psycopg2.extras.execute_values(
+                        cursor, insert_query, [tuple(row[field] for field in fields) for row in rows],
+                        page_size=len(rows), fetch=True
+                    )
+                return [dict(row) for row in created]
+        except Exception as e:
+            logger.error(f"Ошибка при создании пачки генераций: {e}")
+            raise
+    
     def update(self, generation_id: int, data: Dict) -> Optional[Dict]:
         """
         Обновление данных генерации
@@ -121,6 +176,7 @@ class GenerationRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при обновлении генерации: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def delete(self, generation_id: int) -> bool:
@@ -140,6 +196,7 @@ class GenerationRepository(BaseRepository):
             return True
         except Exception as e:
             logger.error(f"Ошибка при удалении генерации: {e}")
+            reraise_in_unit_of_work(e)
             return False
     
     def update_status(self, generation_id: int, status: str) -> Optional[Dict]:
@@ -160,12 +217,14 @@ class GenerationRepository(BaseRepository):
             WHERE generation_id = %s 
             RETURNING *
         """
+        query = with_status_notify(query, "generation", "generation_id", ("image_url",))
         
         try:
-            result = self.execute_query(query, (status, generation_id), fetch_one=True)
+            result = self.execute_with_returning(query, (status, generation_id))
             return result
         except Exception as e:
             logger.error(f"Ошибка при обновлении статуса генерации: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def update_result(self, generation_id: int, image_url: str, status: str = 'completed') -> Optional[Dict]:
@@ -189,12 +248,14 @@ class GenerationRepository(BaseRepository):
             WHERE generation_id = %s 
             RETURNING *
         """
+        query = with_status_notify(query, "generation", "generation_id", ("image_url",))
         
         try:
-            result = self.execute_query(query, (image_url, status, generation_id), fetch_one=True)
+            result = self.execute_with_returning(query, (image_url, status, generation_id))
             return result
         except Exception as e:
             logger.error(f"Ошибка при обновлении результата генерации: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def update_mark(self, generation_id: int, mark: int) -> Optional[Dict]:
@@ -221,6 +282,7 @@ class GenerationRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при обновлении оценки генерации: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def get_generations_in_progress(self) -> List[Dict]:
@@ -242,6 +304,56 @@ class GenerationRepository(BaseRepository):
         
         return self.execute_query(query)
     
+    def get_pending_generations(self, limit: int = 100, exclude_ids: Optional[List[int]] = None) -> List[Dict]:
+        """
+        Получение генераций, ожидающих отправки в API, вместе с признаками приоритета пользователя
+        
+        Args:
+            limit: Максимальное количество результатов
+            exclude_ids: ID генераций, которые уже находятся в очереди диспетчера
+            
+        Returns:
+            Список генераций в порядке создания (с полями is_admin и is_paying)
+        """
+        query = """
+            SELECT g.*, m.name as model_name, m.trigger_word, m.model_url,
+                   COALESCE(u.is_admin, FALSE) as is_admin,
+                   EXISTS (
+                       SELECT 1 FROM "Payment" p
+                       WHERE p.user_id = g.user_id AND p.status = 'completed'
+                   ) as is_paying
+            FROM "Generation" g
+            JOIN "User" u ON g.user_id = u.user_id
+            LEFT JOIN "Model" m ON g.model_id = m.model_id
+            WHERE g.status = 'pending' AND NOT (g.generation_id = ANY(%s::integer[]))
+            ORDER BY g.created_at ASC
+            LIMIT %s
+        """
+        
+        return self.execute_query(query, (list(exclude_ids or []), limit))
+    
+    def claim_pending(self, generation_id: int) -> Optional[Dict]:
+        """
+        Переводит ожидающую генерацию в статус processing.
+        Если генерацию уже забрал другой процесс, ничего не меняет.
+        
+        Args:
+            generation_id: ID генерации
+            
+        Returns:
+            Обновленные данные генерации или None, если генерация уже не в статусе pending
+        """
+        query = """
+            UPDATE "Generation" 
+            SET status = 'processing',
+                updated_at = NOW() 
+            WHERE generation_id = %s AND status = 'pending'
+            RETURNING *
+        """
+        query = with_status_notify(query, "generation", "generation_id", ("image_url",))
+        
+        return self.execute_with_returning(query, (generation_id,))
+    
     def get_user_generations_stats(self, user_id: int) -> Dict:
         """
         Получение статистики генераций пользователя
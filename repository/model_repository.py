@@ -1,6 +1,9 @@
 from typing import Dict, List, Optional, Any, Tuple
 import logging
 from .base_repository import BaseRepository
+from .unit_of_work import reraise_in_unit_of_work
+from .rows import ModelSummaryRow
+from .status_events import with_status_notify
 
 logger = logging.getLogger(__name__)
 
@@ -35,7 +38,7 @@ class ModelRepository(BaseRepository):
         query = 'SELECT * FROM "Model" WHERE training_id = %s'
         return self.execute_query(query, (training_id,), fetch_one=True)
     
-    def get_by_user_id(self, user_id: int) -> List[Dict]:
+    def get_by_user_id(self, user_id: int) -> List[ModelSummaryRow]:
         """
         Получение моделей пользователя
         
@@ -45,10 +48,10 @@ class ModelRepository(BaseRepository):
         Returns:
             Список моделей пользователя
         """
-        query = 'SELECT * FROM "Model" WHERE user_id = %s ORDER BY created_at DESC'
-        return self.execute_query(query, (user_id,))
+        query = f'SELECT {ModelSummaryRow.select_list()} FROM "Model" WHERE user_id = %s ORDER BY created_at DESC'
+        return self.fetch_rows(query, (user_id,), ModelSummaryRow)
     
-    def get_ready_models_by_user_id(self, user_id: int) -> List[Dict]:
+    def get_ready_models_by_user_id(self, user_id: int) -> List[ModelSummaryRow]:
         """
         Получение готовых моделей пользователя
         
@@ -58,8 +61,8 @@ class ModelRepository(BaseRepository):
         Returns:
             Список готовых моделей пользователя
         """
-        query = 'SELECT * FROM "Model" WHERE user_id = %s AND status = %s ORDER BY created_at DESC'
-        return self.execute_query(query, (user_id, 'ready'))
+        query = f'SELECT {ModelSummaryRow.select_list()} FROM "Model" WHERE user_id = %s AND status = %s ORDER BY created_at DESC'
+        return self.fetch_rows(query, (user_id, 'ready'), ModelSummaryRow)
     
     def create(self, data: Dict) -> Optional[Dict]:
         """
@@ -91,6 +94,7 @@ class ModelRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при создании модели: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def update(self, model_id: int, data: Dict) -> Optional[Dict]:
@@ -125,6 +129,7 @@ class ModelRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при обновлении модели: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def delete(self, model_id: int) -> bool:
@@ -144,6 +149,7 @@ class ModelRepository(BaseRepository):
             return True
         except Exception as e:
             logger.error(f"Ошибка при удалении модели: {e}")
+            reraise_in_unit_of_work(e)
             return False
     
     def update_status(self, model_id: int, status: str) -> Optional[Dict]:
@@ -164,12 +170,14 @@ class ModelRepository(BaseRepository):
             WHERE model_id = %s 
             RETURNING *
         """
+        query = with_status_notify(query, "model", "model_id", ("model_url",))
         
         try:
-            result = self.execute_query(query, (status, model_id), fetch_one=True)
+            result = self.execute_with_returning(query, (status, model_id))
             return result
         except Exception as e:
             logger.error(f"Ошибка при обновлении статуса модели: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def increment_usage_count(self, model_id: int) -> Optional[Dict]:
@@ -195,6 +203,7 @@ class ModelRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при обновлении счетчика использования модели: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def get_public_models(self, limit: int = 10, offset: int = 0) -> List[Dict]:
@@ -310,9 +319,41 @@ class ModelRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при обновлении информации об обучении модели: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
-    def get_models_by_user(self, user_id: int, status: str = None) -> List[Dict]:
+    def complete_training(self, model_id: int, status: str, model_url: Optional[str] = None) -> Optional[Dict]:
+        """
+        Фиксирует завершение обучения модели. Обновление выполняется только для модели
+        в статусе training, поэтому повторная запись того же перехода ничего не меняет
+        
+        Args:
+            model_id: ID модели
+            status: Итоговый статус (ready или failed)
+            model_url: URL обученной модели
+            
+        Returns:
+            Обновленные данные модели или None, если модель уже не в статусе training
+        """
+        query = """
+            UPDATE "Model" 
+            SET status = %s, 
+                model_url = COALESCE(%s, model_url),
+                updated_at = NOW() 
+            WHERE model_id = %s AND status = 'training'
+            RETURNING *
+        """
+        query = with_status_notify(query, "model", "model_id", ("model_url",))
+        
+        try:
+            result = self.execute_with_returning(query, (status, model_url, model_id))
+            return result
+        except Exception as e:
+            logger.error(f"Ошибка при фиксации завершения обучения модели: {e}")
+            reraise_in_unit_of_work(e)
+            return None
+    
+    def get_models_by_user(self, user_id: int, status: str = None) -> List[ModelSummaryRow]:
         """
         Получает список моделей пользователя, опционально фильтруя по статусу
         
@@ -321,51 +362,23 @@ class ModelRepository(BaseRepository):
             status: Статус модели (например, 'ready', 'training', 'failed')
             
         Returns:
-            List[Dict]: Список моделей пользователя
+            List[ModelSummaryRow]: Список моделей пользователя
         """
+        query = f'SELECT {ModelSummaryRow.select_list()} FROM "Model" WHERE user_id = %s'
+        params = [user_id]
+        
+        if status:
+            query += ' AND status = %s'
+            params.append(status)
+            
+        query += ' ORDER BY created_at DESC'
+        
         try:
-            conn = self.get_connection()
-            try:
-                with conn.cursor() as cursor:
-                    query = 'SELECT * FROM "Model" WHERE user_id = %s'
-                    params = [user_id]
-                    
-                    if status:
-                        query += ' AND status = %s'
-                        params.append(status)
-                        
-                    query += ' ORDER BY created_at DESC'
-                    
-                    cursor.execute(query, params)
-                    models = cursor.fetchall()
-                    
-                    if not models:
-                        self.logger.info(f"Модели пользователя {user_id} не найдены" + 
-                                        (f" со статусом '{status}'" if status else ""))
-                        return []
-                    
-                    result = []
-                    for model in models:
-                        result.append({
-                            'model_id': model[0],
-                            'user_id': model[1],
-                            'name': model[2],
-                            'description': model[3],
-                            'status': model[4],
-                            'created_at': model[5],
-                            'updated_at': model[6],
-                            'model_type': model[7],
-                            'image_count': model[8],
-                            'training_params': model[9],
-                            'model_path': model[10] if len(model) > 10 else None,
-                            'preview_url': model[11] if len(model) > 11 else None
-                        })
-                    
-                    self.logger.info(f"Найдено {len(result)} моделей пользователя {user_id}" + 
-                                   (f" со статусом '{status}'" if status else ""))
-                    return result
-            finally:
-                self.release_connection(conn)
+            models = self.fetch_rows(query, params, ModelSummaryRow)
+            self.logger.info(f"Найдено {len(models)} моделей пользователя {user_id}" + 
+                           (f" со статусом '{status}'" if status else ""))
+            return models
         except Exception as e:
             self.logger.error(f"Ошибка при получении моделей пользователя {user_id}: {e}")
+            reraise_in_unit_of_work(e)
             return [] 
\ No newline at end of file
@@ -1,6 +1,8 @@
 from typing import Dict, List, Optional, Any, Tuple
 import logging
 from .base_repository import BaseRepository
+from .unit_of_work import reraise_in_unit_of_work
+from .rows import Row
 
 logger = logging.getLogger(__name__)
 
@@ -35,7 +37,7 @@ class PaymentRepository(BaseRepository):
         query = 'SELECT * FROM "Payment" WHERE external_id = %s'
         return self.execute_query(query, (external_id,), fetch_one=True)
     
-    def get_by_user_id(self, user_id: int, limit: int = 10, offset: int = 0) -> List[Dict]:
+    def get_by_user_id(self, user_id: int, limit: int = 10, offset: int = 0) -> List[Row]:
         """
         Получение платежей пользователя
         
@@ -53,7 +55,7 @@ class PaymentRepository(BaseRepository):
             ORDER BY created_at DESC
             LIMIT %s OFFSET %s
         """
-        return self.execute_query(query, (user_id, limit, offset))
+        return self.fetch_rows(query, (user_id, limit, offset))
     
     def create(self, data: Dict) -> Optional[Dict]:
         """
@@ -85,6 +87,7 @@ class PaymentRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при создании записи о платеже: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def update(self, payment_id: int, data: Dict) -> Optional[Dict]:
@@ -119,6 +122,7 @@ class PaymentRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при обновлении платежа: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def delete(self, payment_id: int) -> bool:
@@ -138,6 +142,7 @@ class PaymentRepository(BaseRepository):
             return True
         except Exception as e:
             logger.error(f"Ошибка при удалении платежа: {e}")
+            reraise_in_unit_of_work(e)
             return False
     
     def update_status(self, payment_id: int, status: str) -> Optional[Dict]:
@@ -164,6 +169,7 @@ class PaymentRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при обновлении статуса платежа: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def complete_payment(self, payment_id: int, external_id: Optional[str] = None) -> Optional[Dict]:
@@ -209,6 +215,7 @@ class PaymentRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при завершении платежа: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def get_user_payments_stats(self, user_id: int) -> Dict:
@@ -1,6 +1,7 @@
 from typing import Dict, List, Optional, Any, Tuple
 import logging
 from .base_repository import BaseRepository
+from .unit_of_work import reraise_in_unit_of_work
 
 logger = logging.getLogger(__name__)
 
@@ -80,6 +81,7 @@ class ReferralRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при создании пригласительного кода: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def update_invite(self, invite_id: int, data: Dict) -> Optional[Dict]:
@@ -114,6 +116,7 @@ class ReferralRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при обновлении пригласительного кода: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def delete_invite(self, invite_id: int) -> bool:
@@ -133,6 +136,7 @@ class ReferralRepository(BaseRepository):
             return True
         except Exception as e:
             logger.error(f"Ошибка при удалении пригласительного кода: {e}")
+            reraise_in_unit_of_work(e)
             return False
     
     def get_users_by_invite_code(self, invite_code: str, limit: int = 50, offset: int = 0) -> List[Dict]:
@@ -265,6 +269,7 @@ class ReferralRepository(BaseRepository):
             return result
         except Exception as e:
             logger.error(f"Ошибка при создании подарка токенов: {e}")
+            reraise_in_unit_of_work(e)
             return None
     
     def get_top_referrers(self, limit: int = 10) -> List[Dict]:
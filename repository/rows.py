@@ -0,0 +1,288 @@
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+import psycopg2.extensions
+
+
+class Row:
+    """
+    Легкая строка результата запроса.
+
+    Хранит кортеж значений, полученный от драйвера (tuple psycopg2 или Record
+    asyncpg), без копирования в словарь: имена колонок и их позиции общие для
+    всех строк класса. Поддерживает чтение как словарь (row["name"], row.get,
+    in, keys/items, dict(row)), поэтому вызывающему коду не важно, вернул
+    репозиторий словарь или строку. Ключи вне списка колонок (служебные поля,
+    которые добавляет вызывающий код) хранятся отдельно.
+
+    Подклассы задают колонки явно и используются с проекцией SELECT {select_list()}.
+    """
+
+    __slots__ = ("_values", "_extra")
+
+    _columns: Tuple[str, ...] = ()
+    _index: Dict[str, int] = {}
+    # Класс создан по описанию курсора (row_class), а не объявлен в модуле
+    _generic = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._index = {column: position for position, column in enumerate(cls._columns)}
+
+    def __init__(self, values: Sequence[Any]):
+        self._values = values
+        self._extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def select_list(cls, alias: Optional[str] = None) -> str:
+        """
+        Список колонок для SELECT
+
+        Args:
+            alias: Псевдоним таблицы в запросе
+
+        Returns:
+            Строка вида "user_id, username" или "u.user_id, u.username"
+        """
+        if alias:
+            return ", ".join(f"{alias}.{column}" for column in cls._columns)
+        return ", ".join(cls._columns)
+
+    def __getitem__(self, key: str) -> Any:
+        position = self._index.get(key)
+        if position is not None:
+            return self._values[position]
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        position = self._index.get(key)
+        if position is not None:
+            return self._values[position]
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        position = self._index.get(key)
+        if position is None:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+            return
+        values = list(self._values)
+        values[position] = value
+        self._values = tuple(values)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index or (self._extra is not None and key in self._extra)
+
+    def keys(self) -> Sequence[str]:
+        if self._extra:
+            return self._columns + tuple(self._extra)
+        return self._columns
+
+    def values(self) -> List[Any]:
+        return [self[key] for key in self.keys()]
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return [(key, self[key]) for key in self.keys()]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self._columns) + (len(self._extra) if self._extra else 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Копия строки в виде словаря (для сериализации и изменения набора ключей)
+
+        Returns:
+            Словарь колонка -> значение
+        """
+        result = dict(zip(self._columns, self._values))
+        if self._extra:
+            result.update(self._extra)
+        return result
+
+    copy = to_dict
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (Row, dict)):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def __reduce__(self):
+        # Record asyncpg не сериализуется pickle, поэтому сохраняется кортеж значений
+        if self._generic:
+            return _restore_generic, (self._columns, tuple(self._values), self._extra)
+        return _restore, (type(self), tuple(self._values), self._extra)
+
+
+# Для isinstance(row, Mapping) в коде, который проверяет словареподобные значения
+Mapping.register(Row)
+
+
+def _restore(row_type: Type[Row], values: Tuple[Any, ...], extra: Optional[Dict[str, Any]]) -> Row:
+    row = row_type(values)
+    row._extra = extra
+    return row
+
+
+def _restore_generic(columns: Tuple[str, ...], values: Tuple[Any, ...], extra: Optional[Dict[str, Any]]) -> Row:
+    return _restore(row_class(columns), values, extra)
+
+
+@lru_cache(maxsize=256)
+def row_class(columns: Tuple[str, ...]) -> Type[Row]:
+    """
+    Класс строки для произвольного набора колонок (запросы без объявленного типа строки)
+
+    Args:
+        columns: Имена колонок в порядке результата
+
+    Returns:
+        Подкласс Row
+    """
+    return type("Row", (Row,), {"__slots__": (), "_columns": columns, "_generic": True})
+
+
+class RowCursor(psycopg2.extensions.cursor):
+    """
+    Курсор psycopg2, который возвращает строки Row вместо кортежей.
+    В отличие от RealDictCursor не создает словарь на каждую строку: строка
+    оборачивает кортеж, уже полученный драйвером.
+
+    Тип строки задается атрибутом row_type; без него класс строится по описанию результата.
+    """
+
+    row_type: Optional[Type[Row]] = None
+
+    def _row_class(self) -> Type[Row]:
+        columns = tuple(column[0] for column in self.description)
+        if self.row_type is None:
+            return row_class(columns)
+        if columns != self.row_type._columns:
+            raise ValueError(f"Колонки результата {columns} не совпадают с {self.row_type.__name__}")
+        return self.row_type
+
+    def fetchone(self) -> Optional[Row]:
+        values = super().fetchone()
+        return None if values is None else self._row_class()(values)
+
+    def fetchmany(self, size: Optional[int] = None) -> List[Row]:
+        rows = super().fetchmany(size if size is not None else self.arraysize)
+        if not rows:
+            return []
+        row_type = self._row_class()
+        return [row_type(values) for values in rows]
+
+    def fetchall(self) -> List[Row]:
+        rows = super().fetchall()
+        if not rows:
+            return []
+        row_type = self._row_class()
+        return [row_type(values) for values in rows]
+
+    def __iter__(self) -> Iterator[Row]:
+        row = self.fetchone()
+        while row is not None:
+            yield row
+            row = self.fetchone()
+
+
+def wrap_records(records: Sequence[Any], row_type: Optional[Type[Row]] = None) -> List[Row]:
+    """
+    Оборачивает строки asyncpg (Record) в Row без копирования значений
+
+    Args:
+        records: Результат conn.fetch
+        row_type: Тип строки; без него класс строится по колонкам результата
+
+    Returns:
+        Список строк
+    """
+    if not records:
+        return []
+    columns = tuple(records[0].keys())
+    if row_type is None:
+        row_type = row_class(columns)
+    elif columns != row_type._columns:
+        raise ValueError(f"Колонки результата {columns} не совпадают с {row_type.__name__}")
+    return [row_type(record) for record in records]
+
+
+def dict_rows(cursor) -> List[Dict[str, Any]]:
+    """
+    Строки курсора psycopg2 в виде словарей: один словарь на строку вместо
+    RealDictRow и его копии
+
+    Args:
+        cursor: Курсор psycopg2 после execute
+
+    Returns:
+        Список словарей
+    """
+    names = [column[0] for column in cursor.description]
+    return [dict(zip(names, values)) for values in cursor.fetchall()]
+
+
+def dict_row(cursor) -> Optional[Dict[str, Any]]:
+    """
+    Первая строка курсора psycopg2 в виде словаря
+
+    Args:
+        cursor: Курсор psycopg2 после execute
+
+    Returns:
+        Словарь или None, если строк нет
+    """
+    values = cursor.fetchone()
+    if values is None:
+        return None
+    return dict(zip((column[0] for column in cursor.description), values))
+
+
+# Типы строк для запросов с явной проекцией колонок
+
+class UserRow(Row):
+    """
+    Колонки пользователя для get_by_id. Результат кэшируется словарем и читается
+    обработчиками целиком, поэтому здесь все поля, которые использует код
+    """
+
+    __slots__ = ()
+    _columns = (
+        "user_id", "username", "first_name", "last_name", "activation_date", "tokens_left", "tokens_spent",
+        "blocked", "language", "last_active", "user_state", "images_generated", "models_trained",
+        "referrer_id", "referral_code", "registration_complete",
+    )
+
+
+class UserSummaryRow(Row):
+    """Пользователь в списках: поиск, выборка по состоянию, рефералы"""
+
+    __slots__ = ()
+    _columns = ("user_id", "username", "first_name", "last_name", "tokens_left", "user_state", "last_active", "blocked")
+
+
+class ReferrerRow(Row):
+    """Пользователь с количеством приглашенных"""
+
+    __slots__ = ()
+    _columns = UserSummaryRow._columns + ("referrals_count",)
+
+
+class ModelSummaryRow(Row):
+    """Модель пользователя в списках моделей"""
+
+    __slots__ = ()
+    _columns = ("model_id", "user_id", "name", "trigger_word", "status", "model_url", "training_id", "created_at")
@@ -0,0 +1,364 @@
+import os
+import re
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import psycopg2
+import psycopg2.extensions
+from dotenv import load_dotenv
+
+# Загружаем переменные окружения
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Подготавливать запросы на сервере и переиспользовать их планы (false - для PgBouncer
+# в режиме pool_mode=transaction, где подготовленные операторы не переживают транзакцию)
+DB_STATEMENT_CACHE = os.getenv("DB_STATEMENT_CACHE", "true").lower() == "true"
+# Сколько подготовленных операторов держать на одном соединении (синхронном и asyncpg)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))
+# После скольких выполнений форма запроса подготавливается (разовые запросы не подготавливаются)
+DB_STATEMENT_PREPARE_THRESHOLD = int(os.getenv("DB_STATEMENT_PREPARE_THRESHOLD", "2"))
+
+# Плейсхолдеры psycopg2: %(name)s, %s и экранированный %%
+_PLACEHOLDER_RE = re.compile(r"%\((\w+)\)s|%s|%%")
+# Строковые литералы и идентификаторы в кавычках сохраняются, пробелы и комментарии схлопываются
+_WHITESPACE_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|\s+")
+# Подготовить можно только один оператор DML или SELECT
+_PREPARABLE_RE = re.compile(r"^(SELECT|INSERT|UPDATE|DELETE|WITH|VALUES)\b", re.IGNORECASE)
+
+# SQLSTATE: invalid_sql_statement_name (оператор удален на сервере) и
+# feature_not_supported ("cached plan must not change result type" после изменения схемы)
+_STALE_STATEMENT_SQLSTATES = {"26000", "0A000"}
+
+QueryParams = Optional[Union[Dict[str, Any], Sequence[Any]]]
+
+
+@lru_cache(maxsize=2048)
+def normalize_query(query: str) -> str:
+    """
+    Приводит текст запроса к канонической форме: запросы, которые отличаются только
+    отступами, переносами строк и комментариями, дают одну и ту же строку
+
+    Args:
+        query: SQL-запрос
+
+    Returns:
+        Запрос в одну строку
+    """
+    def replace(match: re.Match) -> str:
+        token = match.group(0)
+        return token if token[0] in "'\"" else " "
+
+    return _WHITESPACE_RE.sub(replace, query).strip()
+
+
+@lru_cache(maxsize=2048)
+def compile_query(query: str) -> Tuple[str, Tuple[Optional[str], ...]]:
+    """
+    Переводит запрос с плейсхолдерами psycopg2 в нумерованные параметры ($1, $2, ...)
+
+    Args:
+        query: SQL-запрос в формате psycopg2
+
+    Returns:
+        Кортеж (запрос с $N, порядок параметров).
+        Для позиционных параметров в порядке стоит None, для именованных - имя.
+    """
+    order: List[Optional[str]] = []
+    named_positions: Dict[str, int] = {}
+
+    def replace(match: re.Match) -> str:
+        token = match.group(0)
+        if token == "%%":
+            return "%"
+
+        name = match.group(1)
+        if name is None:
+            order.append(None)
+            return f"${len(order)}"
+
+        if name not in named_positions:
+            order.append(name)
+            named_positions[name] = len(order)
+        return f"${named_positions[name]}"
+
+    return _PLACEHOLDER_RE.sub(replace, query), tuple(order)
+
+
+def bind_params(order: Tuple[Optional[str], ...], params: QueryParams) -> List[Any]:
+    """
+    Раскладывает параметры psycopg2 по порядку нумерованных параметров
+
+    Args:
+        order: Порядок параметров из compile_query
+        params: Параметры запроса (словарь или последовательность)
+
+    Returns:
+        Список аргументов
+    """
+    if not params:
+        return []
+
+    if isinstance(params, dict):
+        return [params[name] for name in order]
+
+    args = list(params)
+    if len(args) != len(order):
+        raise ValueError(f"Ожидалось {len(order)} параметров запроса, получено {len(args)}")
+    return args
+
+
+@lru_cache(maxsize=256)
+def _set_clause(columns: Tuple[str, ...]) -> str:
+    return ", ".join(f"{column} = %({column})s" for column in columns)
+
+
+@lru_cache(maxsize=256)
+def _insert_clause(columns: Tuple[str, ...]) -> Tuple[str, str]:
+    return ", ".join(columns), ", ".join(f"%({column})s" for column in columns)
+
+
+def set_clause(columns: Iterable[str]) -> str:
+    """
+    SET-часть UPDATE с именованными параметрами. Колонки упорядочиваются, поэтому
+    один и тот же набор колонок всегда дает один текст запроса и один план
+
+    Args:
+        columns: Изменяемые колонки
+
+    Returns:
+        Строка вида "a = %(a)s, b = %(b)s"
+    """
+    return _set_clause(tuple(sorted(columns)))
+
+
+def insert_clause(columns: Iterable[str]) -> Tuple[str, str]:
+    """
+    Списки колонок и значений INSERT с именованными параметрами в постоянном порядке
+
+    Args:
+        columns: Колонки новой записи
+
+    Returns:
+        Кортеж ("a, b", "%(a)s, %(b)s")
+    """
+    return _insert_clause(tuple(sorted(columns)))
+
+
+class _Shape:
+    """Форма запроса: нормализованный текст, имя подготовленного оператора и порядок параметров"""
+
+    __slots__ = ("name", "prepare_sql", "execute_sql", "order", "uses", "preparable", "verified")
+
+    def __init__(self, text: str):
+        sql, order = compile_query(text)
+        # Имя зависит только от текста, поэтому одинаково на всех соединениях и во всех процессах
+        self.name = "stmt_" + hashlib.sha1(text.encode()).hexdigest()[:16]
+        self.prepare_sql = f"PREPARE {self.name} AS {sql}"
+        self.execute_sql = f"EXECUTE {self.name} ({', '.join(['%s'] * len(order))})" if order else f"EXECUTE {self.name}"
+        self.order = order
+        self.uses = 0
+        self.preparable = bool(_PREPARABLE_RE.match(text)) and ";" not in text.rstrip(";")
+        # Запрос уже успешно подготавливался (типы параметров определяются сервером)
+        self.verified = False
+
+
+class StatementRegistry:
+    """
+    Реестр подготовленных операторов для синхронных репозиториев (psycopg2).
+
+    psycopg2 отправляет каждый запрос текстом, и PostgreSQL разбирает и планирует
+    его заново. Реестр приводит запросы к нормализованным формам, после
+    DB_STATEMENT_PREPARE_THRESHOLD выполнений подготавливает форму на соединении
+    (PREPARE) и дальше выполняет ее через EXECUTE, переиспользуя разбор и план.
+    На каждом соединении хранится не больше DB_STATEMENT_CACHE_SIZE операторов,
+    давно не использованные удаляются (DEALLOCATE).
+
+    Асинхронным репозиториям реестр не нужен: asyncpg сам подготавливает запросы
+    и кэширует их на соединении, от реестра им достаточно нормализации текста.
+
+    Args:
+        enabled: Подготавливать ли запросы
+        cache_size: Максимум подготовленных операторов на соединении
+        prepare_threshold: После скольких выполнений форма подготавливается
+    """
+
+    def __init__(self, enabled: bool = DB_STATEMENT_CACHE, cache_size: int = DB_STATEMENT_CACHE_SIZE,
+                 prepare_threshold: int = DB_STATEMENT_PREPARE_THRESHOLD):
+        self.enabled = enabled
+        self.cache_size = cache_size
+        self.prepare_threshold = prepare_threshold
+        self._lock = threading.Lock()
+        # Нормализованный текст -> форма; ограничен, чтобы запросы со значениями в тексте не росли без предела
+        self._shapes: "OrderedDict[str, _Shape]" = OrderedDict()
+        # id соединения -> [PID серверного процесса, подготовленные операторы в порядке использования,
+        # нужно ли удалить все операторы соединения перед следующей подготовкой]
+        self._connections: Dict[int, list] = {}
+        self._stats = {"executed": 0, "prepared_executions": 0, "prepared": 0, "evicted": 0, "rejected": 0}
+
+    def _shape(self, query: str) -> _Shape:
+        text = normalize_query(query)
+        with self._lock:
+            shape = self._shapes.get(text)
+            if shape is None:
+                shape = self._shapes[text] = _Shape(text)
+                if len(self._shapes) > self.cache_size * 4:
+                    self._shapes.popitem(last=False)
+            else:
+                self._shapes.move_to_end(text)
+            shape.uses += 1
+            self._stats["executed"] += 1
+        return shape
+
+    def _prepared(self, cursor) -> "OrderedDict[str, None]":
+        conn = cursor.connection
+        pid = conn.get_backend_pid()
+        entry = self._connections.get(id(conn))
+        if entry is None or entry[0] != pid:
+            # Новое соединение (или объект с тем же id после пересоздания)
+            entry = self._connections[id(conn)] = [pid, OrderedDict(), False]
+        elif entry[2]:
+            cursor.execute("DEALLOCATE ALL")
+            entry[1].clear()
+            entry[2] = False
+        return entry[1]
+
+    def _prepare(self, cursor, shape: _Shape, prepared: "OrderedDict[str, None]") -> bool:
+        conn = cursor.connection
+        if shape.verified:
+            cursor.execute(shape.prepare_sql)
+        else:
+            # Первая подготовка формы может не пройти (сервер не вывел тип параметра):
+            # тогда форма выполняется обычным запросом, а транзакция не должна прерваться
+            in_transaction = conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+            try:
+                if in_transaction:
+                    cursor.execute("SAVEPOINT statement_prepare")
+                cursor.execute(shape.prepare_sql)
+                if in_transaction:
+                    cursor.execute("RELEASE SAVEPOINT statement_prepare")
+            except psycopg2.Error as e:
+                if in_transaction:
+                    cursor.execute("ROLLBACK TO SAVEPOINT statement_prepare")
+                else:
+                    conn.rollback()
+                shape.preparable = False
+                with self._lock:
+                    self._stats["rejected"] += 1
+                logger.debug(f"Запрос не подготовлен и будет выполняться без кэша: {e}")
+                return False
+            shape.verified = True
+
+        prepared[shape.name] = None
+        with self._lock:
+            self._stats["prepared"] += 1
+        while len(prepared) > self.cache_size:
+            evicted, _ = prepared.popitem(last=False)
+            cursor.execute(f"DEALLOCATE {evicted}")
+            with self._lock:
+                self._stats["evicted"] += 1
+        return True
+
+    def execute(self, cursor, query: str, params: QueryParams = None) -> None:
+        """
+        Выполняет запрос на курсоре psycopg2, по возможности через подготовленный оператор
+
+        Args:
+            cursor: Курсор psycopg2
+            query: SQL-запрос в формате psycopg2
+            params: Параметры запроса
+        """
+        if not self.enabled:
+            cursor.execute(query, params or {})
+            return
+
+        shape = self._shape(query)
+        if not shape.preparable or shape.uses < self.prepare_threshold:
+            cursor.execute(query, params or {})
+            return
+
+        try:
+            args = bind_params(shape.order, params)
+        except (KeyError, ValueError):
+            # Ошибку в параметрах сообщит сам psycopg2
+            cursor.execute(query, params or {})
+            return
+
+        prepared = self._prepared(cursor)
+        if shape.name in prepared:
+            prepared.move_to_end(shape.name)
+        elif not self._prepare(cursor, shape, prepared):
+            cursor.execute(query, params or {})
+            return
+
+        try:
+            cursor.execute(shape.execute_sql, args or None)
+        except psycopg2.Error as e:
+            entry = self._connections.get(id(cursor.connection))
+            if entry is not None and e.pgcode in _STALE_STATEMENT_SQLSTATES:
+                # Оператор удален на сервере или его план устарел после изменения схемы:
+                # транзакция уже прервана, поэтому операторы соединения удаляются и
+                # подготавливаются заново при следующем выполнении
+                entry[2] = True
+            raise
+        with self._lock:
+            self._stats["prepared_executions"] += 1
+
+    def forget(self, conn) -> None:
+        """
+        Забывает подготовленные операторы закрываемого соединения
+
+        Args:
+            conn: Соединение psycopg2
+        """
+        self._connections.pop(id(conn), None)
+
+    def clear(self) -> None:
+        """Забывает подготовленные операторы всех соединений (пул закрыт)"""
+        self._connections.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики реестра
+
+        Returns:
+            Количество форм, соединений, выполнений и доля выполнений через подготовленные операторы
+        """
+        with self._lock:
+            executed = self._stats["executed"]
+            return {
+                "enabled": self.enabled,
+                "shapes": len(self._shapes),
+                "connections": len(self._connections),
+                **self._stats,
+                "hit_rate": round(self._stats["prepared_executions"] / executed, 3) if executed else 0.0,
+            }
+
+
+# Общий реестр процесса
+_registry = StatementRegistry()
+
+
+def get_statement_registry() -> StatementRegistry:
+    """
+    Получение реестра подготовленных операторов процесса
+
+    Returns:
+        Экземпляр StatementRegistry
+    """
+    return _registry
+
+
+def statement_stats() -> Dict[str, Any]:
+    """
+    Метрики реестра подготовленных операторов процесса
+
+    Returns:
+        Метрики StatementRegistry
+    """
+    return _registry.stats()
@@ -0,0 +1,32 @@
+from typing import Sequence
+
+# Канал PostgreSQL LISTEN/NOTIFY, в который публикуются изменения статусов моделей и генераций
+STATUS_CHANNEL = "status_events"
+
+
+def with_status_notify(update_query: str, kind: str, id_column: str, extra_columns: Sequence[str] = ()) -> str:
+    """
+    Дополняет запрос UPDATE ... RETURNING * отправкой уведомления pg_notify
+    для каждой обновленной строки. Уведомление уходит подписчикам при фиксации
+    транзакции, то есть только если изменение действительно сохранено.
+
+    Args:
+        update_query: Запрос UPDATE, заканчивающийся RETURNING *
+        kind: Тип объекта в уведомлении (model, generation)
+        id_column: Столбец с ID объекта
+        extra_columns: Дополнительные столбцы, передаваемые в уведомлении
+
+    Returns:
+        Запрос, возвращающий те же строки, что и исходный UPDATE
+    """
+    extra = "".join(f", '{column}', updated.{column}" for column in extra_columns)
+    return f"""
+        WITH updated AS ({update_query.strip()})
+        SELECT updated.* FROM updated
+        CROSS JOIN LATERAL (
+            SELECT pg_notify('{STATUS_CHANNEL}', json_build_object(
+                'kind', '{kind}', 'id', updated.{id_column}, 'user_id', updated.user_id,
+                'status', updated.status{extra}
+            )::text)
+        ) AS notified
+    """
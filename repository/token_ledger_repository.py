@@ -0,0 +1,276 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from .base_repository import BaseRepository
+from .unit_of_work import UnitOfWork, current_unit_of_work
+from .user_cache import get_user_cache
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE unique_violation: операция с таким reason и reference уже есть в журнале
+UNIQUE_VIOLATION = "23505"
+
+# Изменение баланса и запись в журнал одним запросом. Списание проходит, только если
+# после него баланс не станет отрицательным: проверка и изменение выполняются одним
+# UPDATE под блокировкой строки, поэтому одновременные списания не уводят баланс в минус.
+# Если запись с тем же (reason, reference) уже есть, уникальный индекс отменяет весь запрос.
+APPLY_QUERY = """
+    WITH updated AS (
+        UPDATE "User"
+        SET tokens_left = tokens_left + %(amount)s,
+            tokens_spent = COALESCE(tokens_spent, 0) + GREATEST(-%(amount)s, 0)
+        WHERE user_id = %(user_id)s AND tokens_left + %(amount)s >= 0
+        RETURNING user_id, tokens_left
+    )
+    INSERT INTO "TokenLedger" (user_id, amount, balance_after, reason, reference)
+    SELECT user_id, %(amount)s, tokens_left, %(reason)s, %(reference)s FROM updated
+    RETURNING *
+"""
+
+# Баланс по журналу: последний снимок плюс записи после него
+LEDGER_BALANCE_QUERY = """
+    SELECT COALESCE(s.balance, 0) + COALESCE(SUM(l.amount), 0) AS balance
+    FROM (SELECT %(user_id)s::bigint AS user_id) u
+    LEFT JOIN LATERAL (
+        SELECT entry_id, balance FROM "TokenBalanceSnapshot"
+        WHERE user_id = u.user_id ORDER BY entry_id DESC LIMIT 1
+    ) s ON TRUE
+    LEFT JOIN "TokenLedger" l ON l.user_id = u.user_id AND l.entry_id > COALESCE(s.entry_id, 0)
+    GROUP BY s.balance
+"""
+
+# Пространство ключей рекомендательной блокировки снимков: при нескольких процессах
+# снимки сохраняет только один, остальные пропускают запуск
+LEDGER_SNAPSHOT_LOCK_KEY = 7302
+
+# Снимки для пользователей, у которых после последнего снимка накопилось не меньше
+# min_entries записей. Кандидаты выбираются только среди записей новее since,
+# поэтому запрос не просматривает весь журнал.
+SNAPSHOT_QUERY = f"""
+    WITH locked AS (
+        SELECT pg_try_advisory_xact_lock({LEDGER_SNAPSHOT_LOCK_KEY}) AS acquired
+    ), candidates AS (
+        SELECT DISTINCT user_id FROM "TokenLedger"
+        WHERE entry_id > %(since)s AND (SELECT acquired FROM locked)
+    ), pending AS (
+        SELECT c.user_id, MAX(l.entry_id) AS entry_id,
+               COALESCE(MAX(s.balance), 0) + SUM(l.amount) AS balance
+        FROM candidates c
+        LEFT JOIN LATERAL (
+            SELECT entry_id, balance FROM "TokenBalanceSnapshot"
+            WHERE user_id = c.user_id ORDER BY entry_id DESC LIMIT 1
+        ) s ON TRUE
+        JOIN "TokenLedger" l ON l.user_id = c.user_id AND l.entry_id > COALESCE(s.entry_id, 0)
+        GROUP BY c.user_id
+        HAVING COUNT(*) >= %(min_entries)s
+    )
+    INSERT INTO "TokenBalanceSnapshot" (user_id, entry_id, balance)
+    SELECT user_id, entry_id, balance FROM pending
+    ON CONFLICT DO NOTHING
+"""
+
+
+class TokenLedgerRepository(BaseRepository):
+    """
+    Репозиторий журнала токенов (таблицы TokenLedger и TokenBalanceSnapshot).
+    Все изменения "User".tokens_left проходят через apply, записи журнала не изменяются.
+    """
+
+    def get_by_id(self, entry_id: int) -> Optional[Dict]:
+        """
+        Получение записи журнала по ID
+
+        Args:
+            entry_id: ID записи
+
+        Returns:
+            Запись журнала или None, если запись не найдена
+        """
+        query = 'SELECT * FROM "TokenLedger" WHERE entry_id = %s'
+        return self.execute_query(query, (entry_id,), fetch_one=True)
+
+    def get_by_reference(self, reason: str, reference: str) -> Optional[Dict]:
+        """
+        Получение записи журнала по ключу операции
+
+        Args:
+            reason: Причина операции
+            reference: Ключ операции
+
+        Returns:
+            Запись журнала или None, если операции не было
+        """
+        query = 'SELECT * FROM "TokenLedger" WHERE reason = %s AND reference = %s'
+        return self.execute_query(query, (reason, reference), fetch_one=True)
+
+    def create(self, data: Dict) -> Optional[Dict]:
+        """
+        Запись операции в журнал с изменением баланса
+
+        Args:
+            data: Данные операции (user_id, amount, reason, reference)
+
+        Returns:
+            Запись журнала
+        """
+        return self.apply(data["user_id"], data["amount"], data["reason"], data.get("reference"))
+
+    def apply(self, user_id: int, amount: int, reason: str, reference: Optional[str] = None) -> Optional[Dict]:
+        """
+        Изменяет баланс пользователя и добавляет запись в журнал
+
+        Args:
+            user_id: ID пользователя
+            amount: Изменение баланса (> 0 начисление, < 0 списание)
+            reason: Причина операции (payment, promo, training, generation, admin)
+            reference: Ключ операции; повтор с тем же ключом возвращает первую запись
+
+        Returns:
+            Запись журнала или None, если токенов не хватает или пользователь не найден
+        """
+        params = {"user_id": user_id, "amount": amount, "reason": reason, "reference": reference}
+        try:
+            # Внутри единицы работы ошибка запроса не должна прерывать всю транзакцию
+            if current_unit_of_work() is not None:
+                with UnitOfWork():
+                    entry = self.execute_with_returning(APPLY_QUERY, params)
+            else:
+                entry = self.execute_with_returning(APPLY_QUERY, params)
+        except Exception as e:
+            if getattr(e, "pgcode", None) != UNIQUE_VIOLATION:
+                raise
+            return self.get_by_reference(reason, reference)
+
+        if entry is not None:
+            self._invalidate(user_id)
+        return entry
+
+    def debit(self, user_id: int, cost: int, reason: str, reference: Optional[str] = None) -> Optional[Dict]:
+        """
+        Списание токенов, если их хватает
+
+        Args:
+            user_id: ID пользователя
+            cost: Сколько токенов списать
+            reason: Причина списания
+            reference: Ключ операции
+
+        Returns:
+            Запись журнала или None, если токенов не хватает
+        """
+        return self.apply(user_id, -cost, reason, reference)
+
+    def credit(self, user_id: int, amount: int, reason: str, reference: Optional[str] = None) -> Optional[Dict]:
+        """
+        Начисление токенов
+
+        Args:
+            user_id: ID пользователя
+            amount: Сколько токенов начислить
+            reason: Причина начисления
+            reference: Ключ операции
+
+        Returns:
+            Запись журнала или None, если пользователь не найден
+        """
+        return self.apply(user_id, amount, reason, reference)
+
+    def _invalidate(self, user_id: int) -> None:
+        cache = get_user_cache()
+        cache.invalidate(user_id)
+        unit_of_work = current_unit_of_work()
+        if unit_of_work is not None:
+            unit_of_work.on_commit(lambda: cache.invalidate(user_id))
+
+    def get_history(self, user_id: int, limit: int = 50, before_entry_id: Optional[int] = None) -> List[Dict]:
+        """
+        История операций пользователя от новых к старым (постранично по entry_id)
+
+        Args:
+            user_id: ID пользователя
+            limit: Количество записей
+            before_entry_id: Вернуть записи старше этой (ID последней записи предыдущей страницы)
+
+        Returns:
+            Список записей журнала
+        """
+        query = """
+            SELECT * FROM "TokenLedger"
+            WHERE user_id = %s AND (%s::bigint IS NULL OR entry_id < %s)
+            ORDER BY entry_id DESC
+            LIMIT %s
+        """
+        return self.execute_query(query, (user_id, before_entry_id, before_entry_id, limit))
+
+    def get_ledger_balance(self, user_id: int) -> int:
+        """
+        Баланс пользователя, посчитанный по журналу от последнего снимка
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            Баланс по журналу
+        """
+        return self.execute_query_scalar(LEDGER_BALANCE_QUERY, {"user_id": user_id}) or 0
+
+    def reconcile(self, user_id: int) -> Dict[str, Any]:
+        """
+        Сверка баланса пользователя с журналом
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            Баланс по журналу, tokens_left и признак совпадения
+        """
+        ledger_balance = self.get_ledger_balance(user_id)
+        tokens_left = self.execute_query_scalar('SELECT tokens_left FROM "User" WHERE user_id = %s', (user_id,))
+        return {
+            "user_id": user_id,
+            "ledger_balance": ledger_balance,
+            "tokens_left": tokens_left,
+            "consistent": tokens_left is not None and ledger_balance == tokens_left,
+        }
+
+    def snapshot_balances(self, since_entry_id: int = 0, min_entries: int = 100) -> int:
+        """
+        Сохраняет снимки балансов пользователей с накопившимися записями журнала
+
+        Args:
+            since_entry_id: Рассматривать пользователей с записями новее этой
+            min_entries: Сколько записей после последнего снимка нужно для нового снимка
+
+        Returns:
+            Количество сохраненных снимков
+        """
+        return self.execute_non_query(SNAPSHOT_QUERY, {"since": since_entry_id, "min_entries": min_entries})
+
+    def get_last_entry_id(self) -> int:
+        """
+        ID последней записи журнала (граница для следующего вызова snapshot_balances)
+
+        Returns:
+            ID записи или 0, если журнал пуст
+        """
+        return self.execute_query_scalar('SELECT COALESCE(MAX(entry_id), 0) FROM "TokenLedger"') or 0
+
+    def update(self, entry_id: int, data: Dict) -> Optional[Dict]:
+        """
+        Записи журнала не изменяются: вызов только пишет предупреждение
+
+        Returns:
+            Всегда None
+        """
+        logger.warning(f"Попытка изменить запись {entry_id} журнала токенов: записи журнала не изменяются")
+        return None
+
+    def delete(self, entry_id: int) -> bool:
+        """
+        Записи журнала не удаляются: вызов только пишет предупреждение
+
+        Returns:
+            Всегда False
+        """
+        logger.warning(f"Попытка удалить запись {entry_id} журнала токенов: записи журнала не удаляются")
+        return False
@@ -0,0 +1,502 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import itertools
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from dotenv import load_dotenv
+
+from .engine import get_async_engine, get_sync_engine
+
+# Загружаем переменные окружения
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Сколько раз повторять транзакцию после конфликта сериализации или взаимной блокировки
+DB_TRANSACTION_RETRIES = int(os.getenv("DB_TRANSACTION_RETRIES", "3"))
+# Базовая задержка перед повтором транзакции в секундах (растет вдвое с каждой попыткой)
+DB_TRANSACTION_RETRY_DELAY = float(os.getenv("DB_TRANSACTION_RETRY_DELAY", "0.05"))
+
+# SQLSTATE ошибок, после которых транзакцию можно безопасно повторить целиком:
+# serialization_failure и deadlock_detected
+RETRYABLE_SQLSTATES = {"40001", "40P01"}
+
+T = TypeVar("T")
+
+# Текущая единица работы контекста (поток или задача asyncio)
+_current_sync: ContextVar[Optional["UnitOfWork"]] = ContextVar("unit_of_work", default=None)
+_current_async: ContextVar[Optional["AsyncUnitOfWork"]] = ContextVar("async_unit_of_work", default=None)
+
+_savepoint_ids = itertools.count(1)
+_stats = {"committed": 0, "rolled_back": 0, "retried": 0}
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Можно ли повторить транзакцию после ошибки (конфликт сериализации или взаимная блокировка)
+
+    Args:
+        error: Исключение psycopg2 или asyncpg
+
+    Returns:
+        True, если транзакцию нужно повторить
+    """
+    sqlstate = getattr(error, "pgcode", None) or getattr(error, "sqlstate", None)
+    return sqlstate in RETRYABLE_SQLSTATES
+
+
+class UnitOfWorkRollbackError(Exception):
+    """
+    Транзакция единицы работы отмечена к откату: один из запросов внутри нее
+    завершился ошибкой, и зафиксировать изменения нельзя.
+    """
+    pass
+
+
+def _retry_delay(attempt: int) -> float:
+    return DB_TRANSACTION_RETRY_DELAY * 2 ** attempt * random.uniform(0.5, 1.5)
+
+
+def current_unit_of_work() -> Optional["UnitOfWork"]:
+    """Активная синхронная единица работы текущего потока или None"""
+    return _current_sync.get()
+
+
+def current_async_unit_of_work() -> Optional["AsyncUnitOfWork"]:
+    """Активная асинхронная единица работы текущей задачи или None"""
+    return _current_async.get()
+
+
+def reraise_in_unit_of_work(error: BaseException) -> None:
+    """
+    Повторно выбрасывает ошибку запроса репозитория, если активна синхронная единица работы.
+
+    Репозитории вне единицы работы логируют ошибку и возвращают None или False.
+    Внутри нее так делать нельзя: транзакция PostgreSQL после ошибки прервана,
+    а конфликт сериализации должен дойти до run_in_transaction, чтобы ее повторить.
+    Поэтому единица работы отмечается к откату, а ошибка выбрасывается дальше.
+
+    Args:
+        error: Перехваченное исключение
+    """
+    unit_of_work = _current_sync.get()
+    if unit_of_work is not None:
+        unit_of_work.set_rollback_only(error)
+        raise error
+
+
+def reraise_in_async_unit_of_work(error: BaseException) -> None:
+    """
+    Асинхронный вариант reraise_in_unit_of_work для репозиториев asyncpg
+
+    Args:
+        error: Перехваченное исключение
+    """
+    unit_of_work = _current_async.get()
+    if unit_of_work is not None:
+        unit_of_work.set_rollback_only(error)
+        raise error
+
+
+class _RollbackOnlyMixin:
+    """
+    Отметка «только откат» для единиц работы: ошибка запроса внутри транзакции
+    запоминается, и вместо COMMIT выполняется откат с повторным выбросом этой ошибки.
+    """
+
+    _failure: Optional[BaseException] = None
+    _rollback_only: bool = False
+
+    def set_rollback_only(self, error: Optional[BaseException] = None) -> None:
+        """
+        Отмечает транзакцию к откату
+
+        Args:
+            error: Ошибка, из-за которой транзакцию нельзя зафиксировать
+        """
+        self._rollback_only = True
+        if error is not None and self._failure is None:
+            self._failure = error
+
+    @property
+    def rollback_only(self) -> bool:
+        """Отмечена ли транзакция к откату"""
+        return self._rollback_only
+
+    def _pending_failure(self, exc: Optional[BaseException]) -> Optional[BaseException]:
+        """
+        Ошибка, которую нужно выбросить при выходе из блока вместо исходной.
+        Без исходного исключения выбрасывается запомненная ошибка (транзакция
+        не зафиксирована), а конфликт сериализации выбрасывается всегда,
+        чтобы run_in_transaction мог повторить транзакцию.
+        """
+        if not self._rollback_only:
+            return None
+        failure = self._failure or UnitOfWorkRollbackError("Запрос в единице работы завершился ошибкой")
+        if failure is exc:
+            return None
+        if exc is None or is_retryable_error(failure):
+            return failure
+        return None
+
+
+class _UnitOfWorkConnection:
+    """
+    Соединение psycopg2, выданное репозиториям внутри единицы работы.
+    commit репозиториев игнорируется: транзакцию завершает единица работы.
+    rollback после ошибки запроса отмечает текущую единицу работы к откату.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        unit_of_work = _current_sync.get()
+        if unit_of_work is not None:
+            unit_of_work.set_rollback_only()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+
+class _Savepoint:
+    """
+    Точка сохранения в транзакции синхронной единицы работы.
+    Откат к точке сохранения снимает отметку «только откат», поставленную внутри блока.
+    """
+
+    def __init__(self, conn, unit_of_work: Optional["UnitOfWork"] = None):
+        self._conn = conn
+        self._unit_of_work = unit_of_work
+        self._saved_state = (None, False)
+        self.name = f"sp_{next(_savepoint_ids)}"
+
+    def __enter__(self):
+        if self._unit_of_work is not None:
+            self._saved_state = (self._unit_of_work._failure, self._unit_of_work._rollback_only)
+        with self._conn.cursor() as cursor:
+            cursor.execute(f"SAVEPOINT {self.name}")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._conn.cursor() as cursor:
+            if exc_type is None:
+                cursor.execute(f"RELEASE SAVEPOINT {self.name}")
+            else:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {self.name}")
+                if self._unit_of_work is not None:
+                    self._unit_of_work._failure, self._unit_of_work._rollback_only = self._saved_state
+        return False
+
+
+class _AsyncSavepoint:
+    """
+    Точка сохранения в транзакции асинхронной единицы работы (вложенная транзакция asyncpg).
+    Откат к точке сохранения снимает отметку «только откат», поставленную внутри блока.
+    """
+
+    def __init__(self, unit_of_work: "AsyncUnitOfWork"):
+        self._unit_of_work = unit_of_work
+        self._transaction = unit_of_work.connection.transaction()
+        self._saved_state = (None, False)
+
+    async def __aenter__(self):
+        self._saved_state = (self._unit_of_work._failure, self._unit_of_work._rollback_only)
+        await self._transaction.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._transaction.__aexit__(exc_type, exc, tb)
+        if exc_type is not None:
+            self._unit_of_work._failure, self._unit_of_work._rollback_only = self._saved_state
+        return False
+
+
+class UnitOfWork(_RollbackOnlyMixin):
+    """
+    Синхронная единица работы: одна транзакция на одном соединении для нескольких репозиториев.
+
+    Пока блок with активен, все синхронные репозитории этого потока выполняют
+    запросы на соединении единицы работы, а их собственные commit игнорируются.
+    При выходе из блока транзакция фиксируется одним COMMIT или откатывается при
+    исключении. Вложенная единица работы становится точкой сохранения внешней.
+    Ошибки запросов репозиториев внутри блока не проглатываются (reraise_in_unit_of_work):
+    если вызывающий код все же перехватил такую ошибку, транзакция откатывается,
+    а ошибка выбрасывается при выходе из блока.
+
+    Пример:
+        with UnitOfWork():
+            model = model_repository.create({...})
+            user_repository.update_tokens(user_id, -cost)
+
+    Args:
+        isolation: Уровень изоляции (read committed, repeatable read, serializable)
+    """
+
+    def __init__(self, isolation: Optional[str] = None):
+        self.isolation = isolation
+        self.connection: Optional[_UnitOfWorkConnection] = None
+        self._raw = None
+        self._parent: Optional["UnitOfWork"] = None
+        self._savepoint = None
+        self._token = None
+        self._on_commit: List[Callable[[], Any]] = []
+
+    def __enter__(self) -> "UnitOfWork":
+        self._parent = _current_sync.get()
+        if self._parent is not None:
+            # Вложенная единица работы: точка сохранения в транзакции внешней
+            self.connection = self._parent.connection
+            self._savepoint = self._parent.savepoint()
+            self._savepoint.__enter__()
+        else:
+            engine = get_sync_engine()
+            if engine is None:
+                raise Exception("Пул соединений не инициализирован")
+            self._raw = engine.getconn()
+            self.connection = _UnitOfWorkConnection(self._raw)
+            if self.isolation:
+                with self._raw.cursor() as cursor:
+                    cursor.execute(f"SET TRANSACTION ISOLATION LEVEL {self.isolation.replace('_', ' ').upper()}")
+        self._token = _current_sync.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        _current_sync.reset(self._token)
+        failure = self._pending_failure(exc)
+        succeeded = exc_type is None and not self._rollback_only
+
+        if self._parent is not None:
+            if succeeded:
+                self._savepoint.__exit__(None, None, None)
+                self._parent._on_commit.extend(self._on_commit)
+            else:
+                self._savepoint.__exit__(exc_type or UnitOfWorkRollbackError, exc, tb)
+            if failure is not None:
+                raise failure
+            return False
+
+        engine = get_sync_engine()
+        try:
+            if succeeded:
+                self._raw.commit()
+                _stats["committed"] += 1
+            else:
+                self._raw.rollback()
+                _stats["rolled_back"] += 1
+        finally:
+            engine.putconn(self._raw)
+        if failure is not None:
+            raise failure
+        if succeeded:
+            for callback in self._on_commit:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error(f"Ошибка в обработчике фиксации транзакции: {e}")
+        return False
+
+    def savepoint(self) -> _Savepoint:
+        """
+        Точка сохранения: при исключении внутри блока откатываются только его изменения
+
+        Returns:
+            Контекстный менеджер точки сохранения
+        """
+        return _Savepoint(self.connection, self)
+
+    def on_commit(self, callback: Callable[[], Any]) -> None:
+        """
+        Регистрирует действие, которое выполнится после успешной фиксации транзакции
+        (например, сброс кэша: до фиксации другие соединения видят старые данные)
+
+        Args:
+            callback: Функция без аргументов
+        """
+        self._on_commit.append(callback)
+
+
+class AsyncUnitOfWork(_RollbackOnlyMixin):
+    """
+    Асинхронная единица работы: одна транзакция asyncpg для нескольких репозиториев.
+
+    Пока блок async with активен, все асинхронные репозитории текущей задачи
+    выполняют запросы на соединении единицы работы. Вложенная единица работы
+    становится точкой сохранения. Внутри блока нельзя выполнять запросы
+    параллельно (asyncio.gather): соединение одно. Ошибки запросов обрабатываются
+    так же, как в UnitOfWork (reraise_in_async_unit_of_work).
+
+    Пример:
+        async with AsyncUnitOfWork():
+            model = await model_repository.create({...})
+            await user_repository.update_tokens(user_id, -cost)
+
+    Args:
+        isolation: Уровень изоляции (read_committed, repeatable_read, serializable)
+    """
+
+    def __init__(self, isolation: Optional[str] = None):
+        self.isolation = isolation
+        self.connection = None
+        self._parent: Optional["AsyncUnitOfWork"] = None
+        self._transaction = None
+        self._token = None
+        self._on_commit: List[Callable[[], Awaitable[Any]]] = []
+
+    async def __aenter__(self) -> "AsyncUnitOfWork":
+        self._parent = _current_async.get()
+        if self._parent is not None:
+            self.connection = self._parent.connection
+            # Вложенная транзакция asyncpg - это точка сохранения
+            self._transaction = self.connection.transaction()
+        else:
+            engine = get_async_engine()
+            if engine is None:
+                raise Exception("Асинхронный пул соединений не инициализирован")
+            self.connection = await engine.acquire()
+            isolation = self.isolation.replace(" ", "_").lower() if self.isolation else None
+            self._transaction = self.connection.transaction(isolation=isolation)
+        try:
+            await self._transaction.start()
+        except BaseException:
+            if self._parent is None:
+                await get_async_engine().release(self.connection)
+            raise
+        self._token = _current_async.set(self)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        _current_async.reset(self._token)
+        failure = self._pending_failure(exc)
+        succeeded = exc_type is None and not self._rollback_only
+        try:
+            if succeeded:
+                await self._transaction.commit()
+            else:
+                await self._transaction.rollback()
+        finally:
+            if self._parent is None:
+                await get_async_engine().release(self.connection)
+
+        if self._parent is not None:
+            if succeeded:
+                self._parent._on_commit.extend(self._on_commit)
+            if failure is not None:
+                raise failure
+            return False
+
+        if failure is not None:
+            _stats["rolled_back"] += 1
+            raise failure
+
+        if succeeded:
+            _stats["committed"] += 1
+            for callback in self._on_commit:
+                try:
+                    await callback()
+                except Exception as e:
+                    logger.error(f"Ошибка в обработчике фиксации транзакции: {e}")
+        else:
+            _stats["rolled_back"] += 1
+        return False
+
+    def savepoint(self):
+        """
+        Точка сохранения: при исключении внутри блока откатываются только его изменения
+
+        Returns:
+            Асинхронный контекстный менеджер точки сохранения
+        """
+        return _AsyncSavepoint(self)
+
+    def on_commit(self, callback: Callable[[], Awaitable[Any]]) -> None:
+        """
+        Регистрирует действие, которое выполнится после успешной фиксации транзакции
+
+        Args:
+            callback: Асинхронная функция без аргументов
+        """
+        self._on_commit.append(callback)
+
+
+def run_in_transaction(func: Callable[..., T], *args: Any, isolation: Optional[str] = None,
+                       retries: int = DB_TRANSACTION_RETRIES, **kwargs: Any) -> T:
+    """
+    Выполняет функцию в единице работы и повторяет ее целиком при конфликте
+    сериализации или взаимной блокировке. Внутри уже открытой единицы работы
+    функция выполняется в точке сохранения без повторов (повторить можно только
+    всю внешнюю транзакцию).
+
+    Args:
+        func: Функция, выполняющая запросы через репозитории
+        *args: Аргументы функции
+        isolation: Уровень изоляции
+        retries: Количество повторов
+        **kwargs: Именованные аргументы функции
+
+    Returns:
+        Результат функции
+    """
+    if current_unit_of_work() is not None:
+        with UnitOfWork():
+            return func(*args, **kwargs)
+
+    for attempt in range(retries + 1):
+        try:
+            with UnitOfWork(isolation):
+                return func(*args, **kwargs)
+        except Exception as e:
+            if attempt >= retries or not is_retryable_error(e):
+                raise
+            _stats["retried"] += 1
+            logger.warning(f"Транзакция будет повторена (попытка {attempt + 2}): {e}")
+            time.sleep(_retry_delay(attempt))
+
+
+async def run_in_async_transaction(func: Callable[..., Awaitable[T]], *args: Any, isolation: Optional[str] = None,
+                                   retries: int = DB_TRANSACTION_RETRIES, **kwargs: Any) -> T:
+    """
+    Выполняет корутину в асинхронной единице работы и повторяет ее целиком при
+    конфликте сериализации или взаимной блокировке
+
+    Args:
+        func: Асинхронная функция, выполняющая запросы через репозитории
+        *args: Аргументы функции
+        isolation: Уровень изоляции
+        retries: Количество повторов
+        **kwargs: Именованные аргументы функции
+
+    Returns:
+        Результат функции
+    """
+    if current_async_unit_of_work() is not None:
+        async with AsyncUnitOfWork():
+            return await func(*args, **kwargs)
+
+    for attempt in range(retries + 1):
+        try:
+            async with AsyncUnitOfWork(isolation):
+                return await func(*args, **kwargs)
+        except Exception as e:
+            if attempt >= retries or not is_retryable_error(e):
+                raise
+            _stats["retried"] += 1
+            logger.warning(f"Транзакция будет повторена (попытка {attempt + 2}): {e}")
+            await asyncio.sleep(_retry_delay(attempt))
+
+
+def transaction_stats() -> Dict[str, int]:
+    """
+    Счетчики единиц работы процесса
+
+    Returns:
+        Количество зафиксированных, откатанных и повторенных транзакций
+    """
+    return dict(_stats)
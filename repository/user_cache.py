@@ -0,0 +1,308 @@
+import os
+import time
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:  # Redis-уровень кэша необязателен
+    redis = None
+    aioredis = None
+
+# Загружаем переменные окружения
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Включен ли кэш пользователей
+USER_CACHE_ENABLED = os.getenv("USER_CACHE_ENABLED", "true").lower() == "true"
+# Размер и время жизни записей локального (в памяти процесса) уровня кэша.
+# Бот и API держат свои локальные уровни, поэтому TTL ограничивает, как долго
+# процесс может видеть данные, измененные другим процессом
+USER_CACHE_LOCAL_SIZE = int(os.getenv("USER_CACHE_LOCAL_SIZE", "10000"))
+USER_CACHE_LOCAL_TTL = float(os.getenv("USER_CACHE_LOCAL_TTL", "5"))
+# Общий для всех процессов уровень кэша в Redis (настройки REDIS_* из config.Settings)
+USER_CACHE_REDIS_ENABLED = os.getenv("USER_CACHE_REDIS_ENABLED", "false").lower() == "true"
+USER_CACHE_REDIS_TTL = int(os.getenv("USER_CACHE_REDIS_TTL", "60"))
+USER_CACHE_REDIS_PREFIX = os.getenv("USER_CACHE_REDIS_PREFIX", "user:")
+# Таймаут операций с Redis: медленный кэш не должен замедлять запросы сильнее базы данных
+USER_CACHE_REDIS_TIMEOUT = float(os.getenv("USER_CACHE_REDIS_TIMEOUT", "0.2"))
+
+
+def _redis_config() -> Dict[str, Any]:
+    return {
+        "host": os.getenv("REDIS_HOST", "localhost"),
+        "port": int(os.getenv("REDIS_PORT", "6379")),
+        "password": os.getenv("REDIS_PASSWORD") or None,
+        "db": int(os.getenv("REDIS_DB", "0")),
+        "socket_timeout": USER_CACHE_REDIS_TIMEOUT,
+        "socket_connect_timeout": USER_CACHE_REDIS_TIMEOUT,
+    }
+
+
+class UserCache:
+    """
+    Кэш данных пользователей со сквозным чтением: локальный LRU-уровень с TTL
+    и необязательный уровень в Redis, общий для бота и API.
+
+    Кэш общий для синхронного и асинхронного репозиториев пользователей, поэтому
+    сброс записи в одном из них виден другому. Методы с суффиксом _async работают
+    с асинхронным клиентом Redis, остальные - с синхронным.
+
+    Чтение, начатое до сброса записи, не кладет в кэш устаревшие данные:
+    repository сначала берет версию записи (version), а put отбрасывает
+    результат, если запись с тех пор сбрасывалась.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local: "OrderedDict[int, tuple]" = OrderedDict()
+        self._versions: "OrderedDict[int, int]" = OrderedDict()
+        self._redis = None
+        self._async_redis = None
+        self._stats = {"hits": 0, "redis_hits": 0, "misses": 0, "invalidations": 0, "redis_errors": 0}
+        self.redis_enabled = USER_CACHE_REDIS_ENABLED and redis is not None
+        if USER_CACHE_REDIS_ENABLED and redis is None:
+            logger.warning("USER_CACHE_REDIS_ENABLED=true, но пакет redis не установлен: используется только локальный кэш")
+
+    def _key(self, user_id: int) -> str:
+        return f"{USER_CACHE_REDIS_PREFIX}{user_id}"
+
+    def version(self, user_id: int) -> int:
+        """
+        Версия записи пользователя, которую нужно передать в put после чтения из базы данных
+
+        Args:
+            user_id: Telegram ID пользователя
+
+        Returns:
+            Номер версии (растет при каждом сбросе записи)
+        """
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def _get_local(self, user_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._local.get(user_id)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._local[user_id]
+                return None
+            self._local.move_to_end(user_id)
+            self._stats["hits"] += 1
+            return dict(user)
+
+    def _put_local(self, user_id: int, user: Dict[str, Any], version: Optional[int]) -> bool:
+        with self._lock:
+            if version is not None and self._versions.get(user_id, 0) != version:
+                return False
+            self._local[user_id] = (time.monotonic() + USER_CACHE_LOCAL_TTL, dict(user))
+            self._local.move_to_end(user_id)
+            while len(self._local) > USER_CACHE_LOCAL_SIZE:
+                self._local.popitem(last=False)
+            return True
+
+    def _invalidate_local(self, user_id: int) -> None:
+        with self._lock:
+            self._local.pop(user_id, None)
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._versions.move_to_end(user_id)
+            # Старые версии можно забыть: чтения, начатые до их сброса, давно завершились
+            while len(self._versions) > USER_CACHE_LOCAL_SIZE:
+                self._versions.popitem(last=False)
+            self._stats["invalidations"] += 1
+
+    def _miss(self) -> None:
+        with self._lock:
+            self._stats["misses"] += 1
+
+    def _redis_hit(self, user_id: int, raw: Optional[bytes], version: int) -> Optional[Dict[str, Any]]:
+        if raw is None:
+            return None
+        user = pickle.loads(raw)
+        self._put_local(user_id, user, version)
+        with self._lock:
+            self._stats["redis_hits"] += 1
+        return user
+
+    def _redis_error(self, action: str, e: Exception) -> None:
+        with self._lock:
+            self._stats["redis_errors"] += 1
+        logger.warning(f"Ошибка Redis при {action} кэша пользователей: {e}")
+
+    def _sync_client(self):
+        if self._redis is None:
+            self._redis = redis.Redis(**_redis_config())
+        return self._redis
+
+    def _async_client(self):
+        if self._async_redis is None:
+            self._async_redis = aioredis.Redis(**_redis_config())
+        return self._async_redis
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Получение пользователя из кэша
+
+        Args:
+            user_id: Telegram ID пользователя
+
+        Returns:
+            Копия данных пользователя или None при промахе
+        """
+        user = self._get_local(user_id)
+        if user is not None or not self.redis_enabled:
+            if user is None:
+                self._miss()
+            return user
+        version = self.version(user_id)
+        try:
+            user = self._redis_hit(user_id, self._sync_client().get(self._key(user_id)), version)
+        except Exception as e:
+            self._redis_error("чтении", e)
+        if user is None:
+            self._miss()
+        return user
+
+    async def get_async(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Получение пользователя из кэша (асинхронный клиент Redis)
+
+        Args:
+            user_id: Telegram ID пользователя
+
+        Returns:
+            Копия данных пользователя или None при промахе
+        """
+        user = self._get_local(user_id)
+        if user is not None or not self.redis_enabled:
+            if user is None:
+                self._miss()
+            return user
+        version = self.version(user_id)
+        try:
+            user = self._redis_hit(user_id, await self._async_client().get(self._key(user_id)), version)
+        except Exception as e:
+            self._redis_error("чтении", e)
+        if user is None:
+            self._miss()
+        return user
+
+    def put(self, user_id: int, user: Dict[str, Any], version: Optional[int] = None) -> None:
+        """
+        Сохранение пользователя в кэш
+
+        Args:
+            user_id: Telegram ID пользователя
+            user: Данные пользователя
+            version: Версия записи, взятая до чтения из базы данных
+        """
+        if not self._put_local(user_id, user, version) or not self.redis_enabled:
+            return
+        try:
+            self._sync_client().set(self._key(user_id), pickle.dumps(user), ex=USER_CACHE_REDIS_TTL)
+        except Exception as e:
+            self._redis_error("записи", e)
+
+    async def put_async(self, user_id: int, user: Dict[str, Any], version: Optional[int] = None) -> None:
+        """
+        Сохранение пользователя в кэш (асинхронный клиент Redis)
+
+        Args:
+            user_id: Telegram ID пользователя
+            user: Данные пользователя
+            version: Версия записи, взятая до чтения из базы данных
+        """
+        if not self._put_local(user_id, user, version) or not self.redis_enabled:
+            return
+        try:
+            await self._async_client().set(self._key(user_id), pickle.dumps(user), ex=USER_CACHE_REDIS_TTL)
+        except Exception as e:
+            self._redis_error("записи", e)
+
+    def invalidate(self, user_id: int) -> None:
+        """
+        Сброс записи пользователя после изменения его данных
+
+        Args:
+            user_id: Telegram ID пользователя
+        """
+        self._invalidate_local(user_id)
+        if not self.redis_enabled:
+            return
+        try:
+            self._sync_client().delete(self._key(user_id))
+        except Exception as e:
+            self._redis_error("сбросе", e)
+
+    async def invalidate_async(self, user_id: int) -> None:
+        """
+        Сброс записи пользователя после изменения его данных (асинхронный клиент Redis)
+
+        Args:
+            user_id: Telegram ID пользователя
+        """
+        self._invalidate_local(user_id)
+        if not self.redis_enabled:
+            return
+        try:
+            await self._async_client().delete(self._key(user_id))
+        except Exception as e:
+            self._redis_error("сбросе", e)
+
+    def clear(self) -> None:
+        """Очистка локального уровня кэша"""
+        with self._lock:
+            for user_id in self._local:
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._local.clear()
+
+    async def close(self) -> None:
+        """Закрытие соединений с Redis"""
+        if self._async_redis is not None:
+            await self._async_redis.close()
+            self._async_redis = None
+        if self._redis is not None:
+            self._redis.close()
+            self._redis = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики кэша
+
+        Returns:
+            Счетчики попаданий и промахов, размер локального уровня
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["redis_hits"] + self._stats["misses"]
+            return {
+                "enabled": USER_CACHE_ENABLED,
+                "redis": self.redis_enabled,
+                "size": len(self._local),
+                "hit_ratio": round((self._stats["hits"] + self._stats["redis_hits"]) / lookups, 3) if lookups else None,
+                **self._stats,
+            }
+
+
+# Общий экземпляр кэша
+_user_cache: Optional[UserCache] = None
+
+
+def get_user_cache() -> UserCache:
+    """
+    Возвращает общий экземпляр кэша пользователей
+
+    Returns:
+        UserCache: Кэш пользователей
+    """
+    global _user_cache
+    if _user_cache is None:
+        _user_cache = UserCache()
+    return _user_cache
@@ -1,15 +1,32 @@
 from typing import Dict, List, Optional, Any, Tuple
 import logging
+from .user_cache import USER_CACHE_ENABLED, get_user_cache
+from .token_ledger_repository import TokenLedgerRepository
+from .unit_of_work import current_unit_of_work, reraise_in_unit_of_work
 from .base_repository import BaseRepository
+from .rows import UserRow, UserSummaryRow
+from .statements import insert_clause, set_clause
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 class UserRepository(BaseRepository):
     """
-    Репозиторий для работы с таблицей пользователей
+    Репозиторий для работы с таблицей пользователей.
+    Чтение по ID идет через кэш пользователей, методы, изменяющие пользователя, сбрасывают его запись.
     """
     
+    def __init__(self):
+        super().__init__()
+        self._cache = get_user_cache()
+    
+    def _invalidate(self, user_id: int) -> None:
+        """Сброс записи пользователя в кэше; внутри единицы работы - еще и после фиксации транзакции"""
+        self._cache.invalidate(user_id)
+        unit_of_work = current_unit_of_work()
+        if unit_of_work is not None:
+            unit_of_work.on_commit(lambda: self._cache.invalidate(user_id))
+    
     def get_by_id(self, user_id: int) -> Optional[Dict[str, Any]]:
         """
         Получение пользователя по Telegram ID
@@ -20,10 +37,22 @@ class UserRepository(BaseRepository):
         Returns:
             Данные пользователя или None, если пользователь не найден
         """
-        query = '''
-        SELECT * FROM "User" WHERE user_id = %(user_id)s
+        # Внутри единицы работы кэш не используется: транзакция должна видеть свои изменения,
+        # а незафиксированные данные нельзя класть в кэш
+        use_cache = USER_CACHE_ENABLED and current_unit_of_work() is None
+        if use_cache:
+            user = self._cache.get(user_id)
+            if user is not None:
+                return user
+            version = self._cache.version(user_id)
+        
+        query = f'''
+        SELECT {UserRow.select_list()} FROM "User" WHERE user_id = %(user_id)s
         '''
-        return self.execute_query_single(query, {"user_id": user_id})
+        user = self.execute_query_single(query, {"user_id": user_id})
+        if user is not None and use_cache:
+            self._cache.put(user_id, user, version)
+        return user
     
     def get(self, user_id: int) -> Optional[Dict[str, Any]]:
         """
@@ -87,19 +116,13 @@ class UserRepository(BaseRepository):
         Returns:
             Данные созданного пользователя или None в случае ошибки
         """
-        fields = []
-        values = []
-        params = {}
-        
-        for key, value in user_data.items():
-            if value is not None:
-                fields.append(key)
-                values.append(f"%({key})s")
-                params[key] = value
+        params = {key: value for key, value in user_data.items() if value is not None}
+        # Колонки в постоянном порядке: один набор полей - одна форма запроса
+        fields, values = insert_clause(params)
         
         query = f'''
-        INSERT INTO "User" ({", ".join(fields)})
-        VALUES ({", ".join(values)})
+        INSERT INTO "User" ({fields})
+        VALUES ({values})
         RETURNING *
         '''
         
@@ -119,21 +142,18 @@ class UserRepository(BaseRepository):
         if not update_data:
             return self.get_by_id(user_id)
             
-        set_clause = []
-        params = {"user_id": user_id}
-        
-        for key, value in update_data.items():
-            set_clause.append(f"{key} = %({key})s")
-            params[key] = value
+        params = {"user_id": user_id, **update_data}
         
         query = f'''
         UPDATE "User"
-        SET {", ".join(set_clause)}
+        SET {set_clause(update_data)}
         WHERE user_id = %(user_id)s
         RETURNING *
         '''
         
-        return self.execute_with_returning(query, params)
+        user = self.execute_with_returning(query, params)
+        self._invalidate(user_id)
+        return user
     
     def delete(self, user_id: int) -> bool:
         """
@@ -151,30 +171,32 @@ class UserRepository(BaseRepository):
         
         try:
             affected_rows = self.execute_non_query(query, {"user_id": user_id})
+            self._invalidate(user_id)
             return affected_rows > 0
         except Exception as e:
             logger.error(f"Ошибка при удалении пользователя {user_id}: {e}")
+            reraise_in_unit_of_work(e)
             return False
     
-    def update_tokens(self, user_id: int, amount: int) -> Optional[Dict[str, Any]]:
+    def update_tokens(self, user_id: int, amount: int, reason: str = "adjustment",
+                      reference: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
-        Обновление количества токенов пользователя
+        Обновление количества токенов пользователя через журнал токенов.
+        Списание, после которого баланс стал бы отрицательным, не выполняется.
         
         Args:
             user_id: Telegram ID пользователя
             amount: Количество токенов для добавления (может быть отрицательным)
+            reason: Причина операции для журнала (payment, promo, training, admin, ...)
+            reference: Ключ операции: повтор с тем же ключом не меняет баланс второй раз
             
         Returns:
-            Обновленные данные пользователя или None в случае ошибки
+            Обновленные данные пользователя или None, если токенов не хватает или пользователь не найден
         """
-        query = '''
-        UPDATE "User"
-        SET tokens_left = tokens_left + %(amount)s
-        WHERE user_id = %(user_id)s
-        RETURNING *
-        '''
-        
-        return self.execute_with_returning(query, {"user_id": user_id, "amount": amount})
+        entry = TokenLedgerRepository().apply(user_id, amount, reason, reference)
+        if entry is None:
+            return None
+        return self.get_by_id(user_id)
     
     def get_user_referrals(self, user_id: int) -> List[Dict[str, Any]]:
         """
@@ -186,8 +208,8 @@ class UserRepository(BaseRepository):
         Returns:
             Список пользователей, зарегистрированных по реферальной ссылке
         """
-        query = '''
-        SELECT * FROM "User" WHERE referrer_id = %(user_id)s
+        query = f'''
+        SELECT {UserSummaryRow.select_list()} FROM "User" WHERE referrer_id = %(user_id)s
         '''
         
         return self.execute_query(query, {"user_id": user_id})
@@ -210,7 +232,9 @@ class UserRepository(BaseRepository):
         RETURNING *
         '''
         
-        return self.execute_with_returning(query, {"user_id": user_id, "count": count})
+        user = self.execute_with_returning(query, {"user_id": user_id, "count": count})
+        self._invalidate(user_id)
+        return user
     
     def increment_trained_models(self, user_id: int, count: int = 1) -> Optional[Dict[str, Any]]:
         """
@@ -230,7 +254,9 @@ class UserRepository(BaseRepository):
         RETURNING *
         '''
         
-        return self.execute_with_returning(query, {"user_id": user_id, "count": count})
+        user = self.execute_with_returning(query, {"user_id": user_id, "count": count})
+        self._invalidate(user_id)
+        return user
     
     def update_user_state(self, user_id: int, state: str) -> Optional[Dict[str, Any]]:
         """
@@ -250,7 +276,9 @@ class UserRepository(BaseRepository):
         RETURNING *
         '''
         
-        return self.execute_with_returning(query, {"user_id": user_id, "state": state})
+        user = self.execute_with_returning(query, {"user_id": user_id, "state": state})
+        self._invalidate(user_id)
+        return user
     
     def get_users_by_state(self, state: str, limit: int = 100) -> List[Dict[str, Any]]:
         """
@@ -263,8 +291,8 @@ class UserRepository(BaseRepository):
         Returns:
             Список пользователей в указанном состоянии
         """
-        query = '''
-        SELECT * FROM "User" 
+        query = f'''
+        SELECT {UserSummaryRow.select_list()} FROM "User" 
         WHERE user_state = %(state)s
         ORDER BY last_active DESC
         LIMIT %(limit)s
@@ -282,8 +310,8 @@ class UserRepository(BaseRepository):
         Returns:
             Список пользователей с наибольшим количеством приглашенных
         """
-        query = '''
-        SELECT u.*, COUNT(r.user_id) as referrals_count 
+        query = f'''
+        SELECT {UserSummaryRow.select_list("u")}, COUNT(r.user_id) as referrals_count 
         FROM "User" u
         LEFT JOIN "User" r ON r.referrer_id = u.user_id
         GROUP BY u.user_id
@@ -346,7 +374,7 @@ class UserRepository(BaseRepository):
         where_clause = " AND ".join(where_clauses) if where_clauses else "1=1"
         
         query = f'''
-        SELECT * FROM "User"
+        SELECT {UserSummaryRow.select_list()} FROM "User"
         WHERE {where_clause}
         ORDER BY last_active DESC
         LIMIT %(limit)s
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""
+Нагрузочный тест хранилищ состояний FSM.
+
+Сравнивает задержки операций FSM (set_state, get_state, set_data, get_data,
+update_data) для трех хранилищ:
+    memory     - MemoryStorage (состояние в памяти процесса)
+    redis      - стандартный RedisStorage из aiogram
+    pipelined  - PipelinedRedisStorage (utils/fsm_storage.py)
+
+Для redis и pipelined нужен запущенный Redis (настройки REDIS_* из окружения).
+Тест использует отдельный префикс ключей и удаляет их после завершения.
+
+Пример запуска:
+    python scripts/bench_fsm_storage.py --users 200 --rounds 20 --concurrency 50
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+
+from utils.fsm_storage import FSM_DATA_TTL, FSM_STATE_TTL, PipelinedRedisStorage, create_redis_client
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.WARNING,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BENCH_PREFIX = "fsm_bench"
+OPERATIONS = ("set_state", "get_state", "set_data", "get_data", "update_data")
+
+
+def build_storage(name: str):
+    """Создает хранилище по имени"""
+    if name == "memory":
+        return MemoryStorage()
+    storage_class = RedisStorage if name == "redis" else PipelinedRedisStorage
+    return storage_class(
+        create_redis_client(),
+        key_builder=DefaultKeyBuilder(prefix=f"{BENCH_PREFIX}_{name}", with_bot_id=True),
+        state_ttl=FSM_STATE_TTL,
+        data_ttl=FSM_DATA_TTL,
+    )
+
+
+async def user_session(storage, key: StorageKey, rounds: int, timings: dict, semaphore: asyncio.Semaphore):
+    """Имитирует диалог пользователя: смена состояния и накопление данных, как при загрузке фотографий"""
+    for round_number in range(rounds):
+        calls = (
+            ("set_state", storage.set_state(key, f"TrainingStates:step_{round_number % 3}")),
+            ("get_state", storage.get_state(key)),
+            ("set_data", storage.set_data(key, {"photos": list(range(round_number)), "model_name": "bench"})),
+            ("get_data", storage.get_data(key)),
+            ("update_data", storage.update_data(key, {"last_round": round_number})),
+        )
+        for operation, call in calls:
+            async with semaphore:
+                started_at = time.perf_counter()
+                await call
+                timings[operation].append(time.perf_counter() - started_at)
+
+
+async def cleanup(storage) -> None:
+    """Удаляет ключи теста из Redis"""
+    if isinstance(storage, RedisStorage):
+        prefix = storage.key_builder.prefix
+        keys = [key async for key in storage.redis.scan_iter(match=f"{prefix}:*")]
+        if keys:
+            await storage.redis.delete(*keys)
+
+
+def percentile(values: list, share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+async def run_benchmark(name: str, users: int, rounds: int, concurrency: int) -> None:
+    storage = build_storage(name)
+    timings = {operation: [] for operation in OPERATIONS}
+    semaphore = asyncio.Semaphore(concurrency)
+    try:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(
+            user_session(storage, StorageKey(bot_id=1, chat_id=user_id, user_id=user_id), rounds, timings, semaphore)
+            for user_id in range(1, users + 1)
+        ))
+        elapsed = time.perf_counter() - started_at
+    finally:
+        await cleanup(storage)
+        await storage.close()
+
+    total = sum(len(values) for values in timings.values())
+    print(f"\n{name}: {total} операций за {elapsed:.2f} с ({total / elapsed:.0f} оп/с)")
+    for operation in OPERATIONS:
+        values = timings[operation]
+        print(
+            f"  {operation:12} p50 {statistics.median(values) * 1000:7.3f} мс"
+            f"  p95 {percentile(values, 0.95) * 1000:7.3f} мс"
+            f"  p99 {percentile(values, 0.99) * 1000:7.3f} мс"
+        )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест хранилищ FSM")
+    parser.add_argument("--users", type=int, default=200, help="Количество одновременных пользователей")
+    parser.add_argument("--rounds", type=int, default=20, help="Количество циклов операций на пользователя")
+    parser.add_argument("--concurrency", type=int, default=50, help="Максимум одновременных операций")
+    parser.add_argument("--storages", default="memory,redis,pipelined", help="Хранилища через запятую")
+    args = parser.parse_args()
+
+    for name in args.storages.split(","):
+        await run_benchmark(name.strip(), args.users, args.rounds, args.concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
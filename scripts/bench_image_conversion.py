@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Бенчмарк конвертации фотографий для обучения: последовательно и через пул процессов.
+
+Генерирует набор синтетических фотографий размером с кадр телефона (12 Мп, 4032x3024),
+конвертирует их обоими способами и выводит пропускную способность.
+
+Пример запуска:
+    python scripts/bench_image_conversion.py --images 20
+    python scripts/bench_image_conversion.py --images 20 --mode full
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+from PIL import Image
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.training_utils import (
+    IMAGE_CONVERSION_WORKERS, IMAGE_PREPROCESS_MODE, convert_images_parallel, shutdown_conversion_pool
+)
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.WARNING,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PHONE_PHOTO_SIZE = (4032, 3024)
+
+
+def generate_photos(directory: str, count: int) -> list:
+    """Создает синтетические 12-Мп фотографии с шумом, чтобы JPEG-кодек работал как на реальных снимках"""
+    # Шум генерируем в уменьшенном виде и растягиваем - так быстрее, а текстура остается сложной
+    noise = Image.effect_noise((PHONE_PHOTO_SIZE[0] // 4, PHONE_PHOTO_SIZE[1] // 4), 64)
+    base = Image.merge("RGB", (noise, noise.rotate(90, expand=False), noise.transpose(Image.FLIP_LEFT_RIGHT)))
+    base = base.resize(PHONE_PHOTO_SIZE, Image.BILINEAR)
+
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"source_{i + 1}.jpg")
+        base.save(path, "JPEG", quality=92)
+        paths.append(path)
+    return paths
+
+
+def run_benchmark(image_paths: list, parallel: bool, repeats: int, mode: str = None) -> tuple:
+    """Возвращает лучшее время конвертации набора в секундах и суммарный размер результатов в байтах"""
+    best = None
+    output_size = 0
+    for _ in range(repeats):
+        output_dir = tempfile.mkdtemp(prefix="bench_out_")
+        try:
+            started_at = time.perf_counter()
+            report = convert_images_parallel(image_paths, output_dir, parallel=parallel, mode=mode)
+            elapsed = time.perf_counter() - started_at
+            output_size = sum(os.path.getsize(path) for path in report["converted"])
+            if report["failed"]:
+                logger.error(f"Ошибки конвертации: {report['failed']}")
+            best = elapsed if best is None else min(best, elapsed)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+    return best, output_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк конвертации изображений")
+    parser.add_argument("--images", type=int, default=20, help="Количество фотографий в наборе")
+    parser.add_argument("--repeats", type=int, default=3, help="Количество повторов, берется лучшее время")
+    parser.add_argument("--mode", choices=("training", "full"), default=IMAGE_PREPROCESS_MODE,
+                        help="Режим предобработки изображений")
+    args = parser.parse_args()
+
+    source_dir = tempfile.mkdtemp(prefix="bench_src_")
+    try:
+        print(f"Генерация {args.images} фотографий {PHONE_PHOTO_SIZE[0]}x{PHONE_PHOTO_SIZE[1]}...")
+        image_paths = generate_photos(source_dir, args.images)
+
+        # Прогреваем пул процессов, чтобы не учитывать время запуска воркеров
+        run_benchmark(image_paths[:2], parallel=True, repeats=1, mode=args.mode)
+
+        serial, output_size = run_benchmark(image_paths, parallel=False, repeats=args.repeats, mode=args.mode)
+        parallel, _ = run_benchmark(image_paths, parallel=True, repeats=args.repeats, mode=args.mode)
+
+        print(f"Режим: {args.mode}, воркеров: {IMAGE_CONVERSION_WORKERS}")
+        print(f"Размер результатов: {output_size / 1024 / 1024:.2f} МБ")
+        print(f"Последовательно: {serial:.2f} с, {args.images / serial:.2f} изобр./с")
+        print(f"Параллельно:     {parallel:.2f} с, {args.images / parallel:.2f} изобр./с")
+        print(f"Ускорение:       x{serial / parallel:.2f}")
+    finally:
+        shutdown_conversion_pool()
+        shutil.rmtree(source_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+Нагрузочный тест способов чтения строк из PostgreSQL (repository/rows.py).
+
+Сравнивает время выборки и память, занятую результатом, для трех вариантов:
+    realdict   - SELECT * через RealDictCursor с копией каждой строки в dict
+                 (как репозитории читали данные раньше)
+    dict       - SELECT * через BaseRepository.execute_query (один словарь на строку)
+    rows       - проекция колонок UserSummaryRow через BaseRepository.fetch_rows
+                 (строки оборачивают кортежи драйвера без копирования)
+
+По умолчанию строки генерируются запросом generate_series с колонками как у
+таблицы User, поэтому тест не зависит от количества пользователей в базе.
+С --source users читается сама таблица "User" (настройки DB_* из окружения).
+
+Пример запуска:
+    python scripts/bench_row_types.py --count 100000 --repeat 3
+"""
+import os
+import gc
+import sys
+import time
+import logging
+import argparse
+import statistics
+import tracemalloc
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2.extras
+
+from repository.engine import close_sync_engine, open_sync_engine
+from repository.rows import UserSummaryRow
+from repository.user_repository import UserRepository
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.WARNING,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Строки той же ширины, что и у таблицы User
+SYNTHETIC_USERS = """
+    SELECT g AS user_id, 'user_' || g AS username, 'Имя' AS first_name, 'Фамилия' AS last_name,
+           NOW() AS activation_date, g %% 1000 AS tokens_left, 0 AS tokens_spent,
+           'main_menu' AS user_state, NOW() AS last_active, FALSE AS blocked,
+           'ref_' || g AS referral_code, NULL::bigint AS referrer_id, 'ru' AS language,
+           1 AS source_id, 0 AS images_generated, 0 AS models_trained, FALSE AS is_admin,
+           NOW() AS created_at
+    FROM generate_series(1, %(count)s) g
+"""
+TABLE_USERS = 'SELECT * FROM "User" ORDER BY user_id LIMIT %(count)s'
+
+
+def read_realdict(repository: UserRepository, query: str, params: dict) -> list:
+    conn = repository.get_connection()
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            cursor.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.rollback()
+        repository.release_connection(conn)
+
+
+def build_cases(source: str) -> dict:
+    wide_query = SYNTHETIC_USERS if source == "synthetic" else TABLE_USERS
+    projected_query = f"SELECT {UserSummaryRow.select_list()} FROM ({wide_query}) u"
+    return {
+        "realdict": lambda repository, params: read_realdict(repository, wide_query, params),
+        "dict": lambda repository, params: repository.execute_query(wide_query, params),
+        "rows": lambda repository, params: repository.fetch_rows(projected_query, params, UserSummaryRow),
+    }
+
+
+def measure(case, repository: UserRepository, params: dict, repeat: int):
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        gc.collect()
+        started_at = time.perf_counter()
+        result = case(repository, params)
+        timings.append(time.perf_counter() - started_at)
+        rows = len(result)
+        del result
+
+    # Память результата измеряется отдельным проходом: tracemalloc замедляет выборку
+    gc.collect()
+    tracemalloc.start()
+    result = case(repository, params)
+    memory, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return rows, timings, memory, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест способов чтения строк")
+    parser.add_argument("--count", type=int, default=100000, help="Количество строк")
+    parser.add_argument("--repeat", type=int, default=3, help="Количество повторов выборки")
+    parser.add_argument("--source", choices=("synthetic", "users"), default="synthetic", help="Источник строк")
+    parser.add_argument("--cases", default="realdict,dict,rows", help="Варианты через запятую")
+    args = parser.parse_args()
+
+    open_sync_engine(1, 1)
+    try:
+        repository = UserRepository()
+        cases = build_cases(args.source)
+        params = {"count": args.count}
+        for name in args.cases.split(","):
+            name = name.strip()
+            rows, timings, memory, peak = measure(cases[name], repository, params, args.repeat)
+            print(
+                f"{name:9} {rows} строк: медиана {statistics.median(timings) * 1000:8.1f} мс"
+                f"  лучшее {min(timings) * 1000:8.1f} мс"
+                f"  память {memory / 1024 / 1024:7.1f} МБ ({memory / max(rows, 1):6.0f} Б/строку)"
+                f"  пик {peak / 1024 / 1024:7.1f} МБ"
+            )
+    finally:
+        close_sync_engine()
+
+
+if __name__ == "__main__":
+    main()
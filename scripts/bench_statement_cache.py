@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Нагрузочный тест реестра подготовленных операторов (repository/statements.py).
+
+Измеряет задержки UserRepository.get_by_id и UserRepository.update с реестром
+и без него: без реестра каждый запрос разбирается и планируется сервером
+заново, с реестром повторяющиеся формы выполняются через EXECUTE.
+update вызывается с колонками в разном порядке, как это делают обработчики,
+поэтому тест проверяет и нормализацию динамических запросов.
+
+Тест работает с существующими пользователями (настройки DB_* из окружения).
+Все запросы выполняются в одной единице работы, которая в конце откатывается,
+поэтому данные пользователей не меняются, а кэш пользователей не используется.
+
+Пример запуска:
+    python scripts/bench_statement_cache.py --users 100 --rounds 50
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import statistics
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repository.engine import close_sync_engine, open_sync_engine
+from repository.statements import get_statement_registry
+from repository.unit_of_work import UnitOfWork
+from repository.user_repository import UserRepository
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.WARNING,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ("get_by_id", "update")
+
+
+class _Rollback(Exception):
+    """Откат единицы работы теста"""
+
+
+def percentile(values: list, share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def run_benchmark(name: str, enabled: bool, user_ids: list, rounds: int) -> None:
+    registry = get_statement_registry()
+    registry.enabled = enabled
+    repository = UserRepository()
+    timings = {operation: [] for operation in OPERATIONS}
+
+    started_at = time.perf_counter()
+    try:
+        with UnitOfWork():
+            # Первый круг не измеряется: формы запросов подготавливаются после DB_STATEMENT_PREPARE_THRESHOLD выполнений
+            for round_number in range(rounds + 1):
+                for user_id in user_ids:
+                    call_started_at = time.perf_counter()
+                    user = repository.get_by_id(user_id)
+                    get_elapsed = time.perf_counter() - call_started_at
+
+                    data = {"user_state": user["user_state"], "last_active": user["last_active"]}
+                    if round_number % 2:
+                        data = dict(reversed(list(data.items())))
+                    call_started_at = time.perf_counter()
+                    repository.update(user_id, data)
+                    update_elapsed = time.perf_counter() - call_started_at
+
+                    if round_number:
+                        timings["get_by_id"].append(get_elapsed)
+                        timings["update"].append(update_elapsed)
+            raise _Rollback()
+    except _Rollback:
+        pass
+    elapsed = time.perf_counter() - started_at
+
+    total = sum(len(values) for values in timings.values())
+    print(f"\n{name}: {total} операций за {elapsed:.2f} с ({total / elapsed:.0f} оп/с)")
+    for operation in OPERATIONS:
+        values = timings[operation]
+        print(
+            f"  {operation:10} p50 {statistics.median(values) * 1000:7.3f} мс"
+            f"  p95 {percentile(values, 0.95) * 1000:7.3f} мс"
+            f"  p99 {percentile(values, 0.99) * 1000:7.3f} мс"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест реестра подготовленных операторов")
+    parser.add_argument("--users", type=int, default=100, help="Количество пользователей в тесте")
+    parser.add_argument("--rounds", type=int, default=50, help="Количество кругов запросов на пользователя")
+    args = parser.parse_args()
+
+    open_sync_engine(1, 2)
+    try:
+        user_ids = [
+            row["user_id"] for row in UserRepository().execute_query(
+                'SELECT user_id FROM "User" ORDER BY user_id LIMIT %(limit)s', {"limit": args.users}
+            )
+        ]
+        if not user_ids:
+            print("В таблице User нет пользователей для теста")
+            return
+
+        run_benchmark("без кэша операторов", False, user_ids, args.rounds)
+        run_benchmark("с кэшем операторов", True, user_ids, args.rounds)
+        print(f"\nРеестр: {get_statement_registry().stats()}")
+    finally:
+        close_sync_engine()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Бенчмарк сборки ZIP-архива с фотографиями для обучения.
+
+Сравнивает три способа:
+    deflate  - архив со сжатием ZIP_DEFLATED на диске
+    stored   - архив без сжатия (ZIP_STORED), записанный на диск
+    stream   - iter_zip_stream: архив собирается на лету без записи на диск
+
+Пример запуска:
+    python scripts/bench_zip_archive.py --images 20
+"""
+import os
+import sys
+import time
+import shutil
+import zipfile
+import logging
+import argparse
+import tempfile
+
+from PIL import Image
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.training_utils import TRAINING_MAX_EDGE, iter_zip_stream
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.WARNING,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def generate_photos(directory: str, count: int, edge: int) -> list:
+    """Создает синтетические JPEG-фотографии с шумом, по размеру как после предобработки"""
+    noise = Image.effect_noise((edge, edge), 64)
+    base = Image.merge("RGB", (noise, noise.rotate(90), noise.transpose(Image.FLIP_LEFT_RIGHT)))
+
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"image_{i + 1}.jpg")
+        base.save(path, "JPEG", quality=90)
+        paths.append(path)
+    return paths
+
+
+def build_deflate(image_paths: list, output_dir: str) -> int:
+    """Архив со сжатием на диске, возвращает размер в байтах"""
+    zip_path = os.path.join(output_dir, "deflate.zip")
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zipf:
+        for img_path in image_paths:
+            zipf.write(img_path, os.path.basename(img_path))
+    return os.path.getsize(zip_path)
+
+
+def build_stored(image_paths: list, output_dir: str) -> int:
+    """Архив без сжатия на диске, возвращает размер в байтах"""
+    zip_path = os.path.join(output_dir, "stored.zip")
+    with open(zip_path, "wb") as zip_file:
+        for data in iter_zip_stream(image_paths):
+            zip_file.write(data)
+    return os.path.getsize(zip_path)
+
+
+def build_stream(image_paths: list, output_dir: str) -> int:
+    """Потоковая сборка без записи на диск, возвращает количество отданных байтов"""
+    return sum(len(data) for data in iter_zip_stream(image_paths))
+
+
+def run_benchmark(builder, image_paths: list, repeats: int) -> tuple:
+    """Возвращает лучшее время сборки в секундах и размер архива в байтах"""
+    best = None
+    size = 0
+    for _ in range(repeats):
+        output_dir = tempfile.mkdtemp(prefix="bench_zip_")
+        try:
+            started_at = time.perf_counter()
+            size = builder(image_paths, output_dir)
+            elapsed = time.perf_counter() - started_at
+            best = elapsed if best is None else min(best, elapsed)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк сборки ZIP-архива")
+    parser.add_argument("--images", type=int, default=20, help="Количество фотографий в архиве")
+    parser.add_argument("--edge", type=int, default=TRAINING_MAX_EDGE, help="Сторона фотографий в пикселях")
+    parser.add_argument("--repeats", type=int, default=3, help="Количество повторов, берется лучшее время")
+    args = parser.parse_args()
+
+    source_dir = tempfile.mkdtemp(prefix="bench_zip_src_")
+    try:
+        print(f"Генерация {args.images} фотографий {args.edge}x{args.edge}...")
+        image_paths = generate_photos(source_dir, args.images, args.edge)
+        source_size = sum(os.path.getsize(path) for path in image_paths)
+        print(f"Исходные фотографии: {source_size / 1024 / 1024:.2f} МБ")
+
+        for name, builder in (("deflate", build_deflate), ("stored", build_stored), ("stream", build_stream)):
+            elapsed, size = run_benchmark(builder, image_paths, args.repeats)
+            print(f"{name:8} {elapsed * 1000:8.1f} мс  {size / 1024 / 1024:8.2f} МБ")
+    finally:
+        shutil.rmtree(source_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
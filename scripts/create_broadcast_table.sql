@@ -0,0 +1,22 @@
+-- Рассылки сообщений всем пользователям (utils/broadcast.py).
+-- Получатели читаются из "User" в порядке user_id, поэтому last_user_id - позиция,
+-- до которой рассылка гарантированно дошла: после перезапуска она продолжается с нее.
+CREATE TABLE IF NOT EXISTS "Broadcast" (
+    broadcast_id BIGSERIAL PRIMARY KEY,
+    created_by BIGINT NOT NULL,                      -- Администратор, создавший рассылку
+    text TEXT NOT NULL,
+    parse_mode VARCHAR(20) DEFAULT 'HTML',
+    status VARCHAR(20) NOT NULL DEFAULT 'running',   -- running, paused, completed, canceled
+    last_user_id BIGINT NOT NULL DEFAULT 0,
+    total INTEGER,                                   -- Количество получателей на момент запуска
+    sent INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    blocked INTEGER NOT NULL DEFAULT 0,              -- Пользователи, заблокировавшие бота
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMP,
+    CONSTRAINT broadcast_status_check CHECK (status IN ('running', 'paused', 'completed', 'canceled'))
+);
+
+-- Поиск незавершенных рассылок при запуске бота
+CREATE INDEX IF NOT EXISTS idx_broadcast_running ON "Broadcast" (broadcast_id) WHERE status = 'running';
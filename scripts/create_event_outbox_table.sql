@@ -0,0 +1,18 @@
+-- Журнал событий шины (utils/event_bus.py).
+-- Событие записывается в журнал и отправляется подписчикам через NOTIFY одним запросом;
+-- подписчик, пропустивший события во время простоя, дочитывает их из журнала после своего курсора.
+CREATE TABLE IF NOT EXISTS "EventOutbox" (
+    event_id BIGSERIAL PRIMARY KEY,
+    event_type VARCHAR(50) NOT NULL,             -- model_ready, generation_done, payment_completed
+    payload JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_event_outbox_created_at ON "EventOutbox" (created_at);
+
+-- Позиция чтения журнала каждым подписчиком (bot, api, ...)
+CREATE TABLE IF NOT EXISTS "EventConsumer" (
+    consumer_name VARCHAR(100) PRIMARY KEY,
+    last_event_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,5 @@
+-- Индекс для диспетчера генераций: выборка ожидающих генераций в порядке создания
+CREATE INDEX IF NOT EXISTS idx_generation_pending ON "Generation" (created_at) WHERE status = 'pending';
+
+-- Поиск генерации по ID предсказания Replicate (вебхуки)
+CREATE INDEX IF NOT EXISTS idx_generation_external_id ON "Generation" (external_id);
@@ -0,0 +1,36 @@
+-- Журнал движения токенов (repository/token_ledger_repository.py).
+-- Каждое списание и начисление меняет "User".tokens_left условным UPDATE и в том же
+-- запросе добавляет запись в журнал; записи журнала не изменяются и не удаляются.
+CREATE TABLE IF NOT EXISTS "TokenLedger" (
+    entry_id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    amount INTEGER NOT NULL,                         -- > 0 начисление, < 0 списание
+    balance_after INTEGER NOT NULL,                  -- tokens_left после операции
+    reason VARCHAR(50) NOT NULL,                     -- payment, promo, training, training_refund, generation, generation_refund, admin, opening_balance
+    reference VARCHAR(100),                          -- Внешний ключ операции (training_job:42, payment:17)
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- История пользователя от новых записей к старым
+CREATE INDEX IF NOT EXISTS idx_token_ledger_user ON "TokenLedger" (user_id, entry_id DESC);
+
+-- Повтор операции с тем же reference (повторная попытка задачи, повторный вебхук оплаты)
+-- не списывает и не начисляет токены второй раз
+CREATE UNIQUE INDEX IF NOT EXISTS idx_token_ledger_reference ON "TokenLedger" (reason, reference)
+    WHERE reference IS NOT NULL;
+
+-- Снимки баланса: сверка и подсчет баланса по журналу начинаются с последнего снимка,
+-- а не с первой записи пользователя
+CREATE TABLE IF NOT EXISTS "TokenBalanceSnapshot" (
+    user_id BIGINT NOT NULL,
+    entry_id BIGINT NOT NULL,                        -- Последняя запись журнала, учтенная в снимке
+    balance INTEGER NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, entry_id)
+);
+
+-- Начальные остатки: текущий баланс пользователей становится первой записью журнала
+INSERT INTO "TokenLedger" (user_id, amount, balance_after, reason)
+SELECT u.user_id, COALESCE(u.tokens_left, 0), COALESCE(u.tokens_left, 0), 'opening_balance'
+FROM "User" u
+WHERE NOT EXISTS (SELECT 1 FROM "TokenLedger" l WHERE l.user_id = u.user_id);
@@ -0,0 +1,33 @@
+-- Очередь задач обучения моделей.
+-- Эндпоинт /api/training/start-training только ставит задачу в очередь,
+-- выполняют ее процессы worker.py (выборка через FOR UPDATE SKIP LOCKED).
+CREATE TABLE IF NOT EXISTS "TrainingJob" (
+    job_id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    payload JSONB NOT NULL,                          -- Параметры задачи (username, model_name, trigger_word, ...)
+    progress JSONB NOT NULL DEFAULT '{}'::jsonb,     -- Выполненные шаги (zip_url, training_id, model_id, ...)
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',    -- queued, running, succeeded, dead
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_after TIMESTAMP NOT NULL DEFAULT NOW(),      -- Не запускать раньше (задержка перед повтором)
+    locked_by VARCHAR(100),                          -- Идентификатор обработчика, взявшего задачу
+    locked_at TIMESTAMP,                             -- Время взятия задачи или последнего продления аренды
+    last_error TEXT,
+    result JSONB,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMP,
+    CONSTRAINT training_job_status_check CHECK (status IN ('queued', 'running', 'succeeded', 'dead'))
+);
+
+-- Выборка следующей задачи: только ожидающие, в порядке готовности
+CREATE INDEX IF NOT EXISTS idx_training_job_queued ON "TrainingJob" (run_after, job_id) WHERE status = 'queued';
+
+-- Поиск зависших задач (обработчик упал, не продлив аренду)
+CREATE INDEX IF NOT EXISTS idx_training_job_running ON "TrainingJob" (locked_at) WHERE status = 'running';
+
+-- Не более одной активной задачи обучения на пользователя
+CREATE UNIQUE INDEX IF NOT EXISTS idx_training_job_active_user ON "TrainingJob" (user_id)
+    WHERE status IN ('queued', 'running');
+
+CREATE INDEX IF NOT EXISTS idx_training_job_user ON "TrainingJob" (user_id, created_at DESC);
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Обязательные поля config.Settings: модули утилит читают общую конфигурацию при импорте
+for name in ("BOT_TOKEN", "BOT_USERNAME", "DB_USER", "REPLICATE_API_TOKEN", "FALAI_API_KEY",
+             "NGROK_AUTH_TOKEN", "CLOUD_STORAGE_API_KEY", "CLOUD_STORAGE_URL"):
+    os.environ.setdefault(name, "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
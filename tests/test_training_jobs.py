@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from utils import training_jobs
+from utils.training_jobs import PermanentJobError, TRAINING_COST, reserve_training_tokens, run_training_job
+
+
+class FakeLedger:
+    """Журнал токенов с семантикой APPLY_QUERY: условное списание и уникальный (reason, reference)"""
+
+    def __init__(self, balance: int):
+        self.balance = balance
+        self.entries = {}
+
+    def apply(self, amount: int, reason: str, reference: str):
+        if (reason, reference) in self.entries:
+            # Уникальный индекс срабатывает, только если UPDATE нашел строку
+            if self.balance + amount < 0:
+                return None
+            return self.entries[(reason, reference)]
+        if self.balance + amount < 0:
+            return None
+        self.balance += amount
+        entry = {"amount": amount, "reason": reason, "reference": reference, "balance_after": self.balance}
+        self.entries[(reason, reference)] = entry
+        return entry
+
+
+class FakeLedgerRepository:
+    def __init__(self, ledger: FakeLedger):
+        self.ledger = ledger
+
+    async def get_by_reference(self, reason: str, reference: str):
+        return self.ledger.entries.get((reason, reference))
+
+
+class FakeUserRepository:
+    def __init__(self, ledger: FakeLedger):
+        self.ledger = ledger
+
+    async def update_tokens(self, user_id: int, amount: int, reason: str = "adjustment", reference=None):
+        entry = self.ledger.apply(amount, reason, reference)
+        return None if entry is None else {"user_id": user_id, "tokens_left": self.ledger.balance}
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    ledger = FakeLedger(balance=TRAINING_COST)
+    monkeypatch.setattr(training_jobs, "AsyncTokenLedgerRepository", lambda: FakeLedgerRepository(ledger))
+    return ledger
+
+
+@pytest.mark.parametrize("progress", [{"tokens_reserved": True}, {}])
+def test_balance_equal_to_cost_is_charged_once(ledger, monkeypatch, tmp_path, progress):
+    user_repository = FakeUserRepository(ledger)
+    assert asyncio.run(reserve_training_tokens(1, 42, user_repository))
+    assert ledger.balance == 0
+
+    # Пустая директория загрузок: задача должна дойти до шага архива, а не упасть на резерве
+    monkeypatch.setattr(training_jobs, "get_user_upload_path", lambda username, user_id: str(tmp_path))
+    saved = []
+
+    async def save_progress(step):
+        saved.append(step)
+
+    job = {
+        "job_id": 42,
+        "user_id": 1,
+        "payload": {"username": "user", "model_name": "model", "trigger_word": "TOK"},
+        "progress": progress,
+    }
+    with pytest.raises(PermanentJobError, match="Не найдено загруженных изображений"):
+        asyncio.run(run_training_job(job, save_progress, model_repository=None, user_repository=user_repository))
+
+    assert ledger.balance == 0
+    assert list(ledger.entries) == [("training", "training_job:42")]
+
+
+def test_reserve_fails_when_balance_is_short(ledger):
+    ledger.balance = TRAINING_COST - 1
+    assert not asyncio.run(reserve_training_tokens(1, 7, FakeUserRepository(ledger)))
+    assert ledger.balance == TRAINING_COST - 1
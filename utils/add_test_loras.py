@@ -19,23 +19,19 @@ backend_dir = os.path.dirname(script_dir)
 project_dir = os.path.dirname(backend_dir)
 sys.path.append(backend_dir)
 
-# Настройки подключения к базе данных (из .env)
-db_config = {
-    "host": "localhost",
-    "port": 5432,
-    "database": "dream_photo",
-    "user": "serzhbigulov",
-    "password": ""
-}
+from repository.engine import close_sync_engine, get_connection_params, get_sync_engine, open_sync_engine
 
-logger.info(f"Параметры подключения к БД: хост={db_config['host']}, база={db_config['database']}, пользователь={db_config['user']}")
+# Настройки подключения к базе данных (из .env, как у бота и API)
+db_config = get_connection_params()
+
+logger.info(f"Параметры подключения к БД: хост={db_config['host']}, база={db_config['dbname']}, пользователь={db_config['user']}")
 
 
 def connect_to_db():
-    """Подключение к базе данных"""
+    """Подключение к базе данных через общий пул соединений"""
     try:
-        conn = psycopg2.connect(**db_config)
-        logger.info(f"Успешное подключение к базе данных {db_config['database']} на {db_config['host']}:{db_config['port']}")
+        conn = open_sync_engine(min_connections=1, max_connections=1).getconn()
+        logger.info(f"Успешное подключение к базе данных {db_config['dbname']} на {db_config['host']}:{db_config['port']}")
         return conn
     except Exception as e:
         logger.error(f"Ошибка подключения к базе данных: {e}")
@@ -140,7 +136,8 @@ def main():
     except Exception as e:
         logger.error(f"Произошла ошибка: {e}")
     finally:
-        conn.close()
+        get_sync_engine().putconn(conn)
+        close_sync_engine()
         logger.info("Соединение с базой данных закрыто.")
 
 if __name__ == "__main__":
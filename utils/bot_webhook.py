@@ -0,0 +1,237 @@
+import os
+import hmac
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import Update
+from dotenv import load_dotenv
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+# Адрес и порт, на которых реплика бота принимает вебхуки Telegram
+TELEGRAM_WEBHOOK_HOST = os.getenv("TELEGRAM_WEBHOOK_HOST", "0.0.0.0")
+TELEGRAM_WEBHOOK_PORT = int(os.getenv("TELEGRAM_WEBHOOK_PORT", "8081"))
+# Секрет, который Telegram передает в заголовке X-Telegram-Bot-Api-Secret-Token.
+# Если не задан, выводится из токена бота, чтобы у всех реплик он был одинаковым
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET")
+# Количество обработчиков апдейтов в реплике и размер очереди каждого из них.
+# Апдейты одного пользователя попадают к одному обработчику и обрабатываются по порядку
+TELEGRAM_WEBHOOK_WORKERS = int(os.getenv("TELEGRAM_WEBHOOK_WORKERS", "16"))
+TELEGRAM_WEBHOOK_QUEUE_SIZE = int(os.getenv("TELEGRAM_WEBHOOK_QUEUE_SIZE", "64"))
+# Сколько одновременных соединений Telegram открывает к вебхуку (на все реплики)
+TELEGRAM_WEBHOOK_MAX_CONNECTIONS = int(os.getenv("TELEGRAM_WEBHOOK_MAX_CONNECTIONS", "40"))
+# Сколько секунд при остановке ждать обработки уже принятых апдейтов
+TELEGRAM_WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("TELEGRAM_WEBHOOK_DRAIN_TIMEOUT", "20"))
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def get_webhook_secret(bot: Bot) -> str:
+    """
+    Возвращает секрет вебхука (допустимые символы Telegram: A-Z, a-z, 0-9, _ и -)
+
+    Args:
+        bot: Экземпляр бота
+
+    Returns:
+        str: Секрет вебхука
+    """
+    return TELEGRAM_WEBHOOK_SECRET or hashlib.sha256(f"webhook:{bot.token}".encode()).hexdigest()
+
+
+def _update_owner(update: Update) -> int:
+    """ID пользователя (или чата), по которому апдейты распределяются между обработчиками"""
+    event = update.event
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        return user.id
+    chat = getattr(event, "chat", None)
+    if chat is not None:
+        return chat.id
+    return update.update_id
+
+
+class WebhookUpdateProcessor:
+    """
+    Принимает вебхуки Telegram и обрабатывает апдейты пулом обработчиков.
+
+    Запрос подтверждается сразу после постановки апдейта в очередь, обработка идет
+    в фоне. Очереди ограничены: если очередь обработчика заполнена, Telegram получает
+    503 и повторит доставку позже, поэтому реплика не накапливает апдейты без предела.
+    Апдейты одного пользователя всегда попадают в одну очередь и не обгоняют друг друга.
+
+    Args:
+        bot: Экземпляр бота
+        dp: Диспетчер с зарегистрированными обработчиками
+        workers: Количество обработчиков
+        queue_size: Размер очереди одного обработчика
+    """
+
+    def __init__(self, bot: Bot, dp: Dispatcher, workers: int = TELEGRAM_WEBHOOK_WORKERS,
+                 queue_size: int = TELEGRAM_WEBHOOK_QUEUE_SIZE):
+        self.bot = bot
+        self.dp = dp
+        self.secret = get_webhook_secret(bot)
+        self._queues: List["asyncio.Queue[Update]"] = [asyncio.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._tasks: List[asyncio.Task] = []
+        self._stats = {"accepted": 0, "rejected": 0, "unauthorized": 0, "processed": 0, "errors": 0}
+        self._latencies: List[float] = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """
+        Обработчик POST-запроса Telegram с апдейтом
+        """
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            self._stats["unauthorized"] += 1
+            return web.Response(status=401)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+            # update.event бросает исключение, если в апдейте нет ни одного известного типа события
+            queue = self._queues[_update_owner(update) % len(self._queues)]
+        except Exception as e:
+            logger.warning(f"Некорректный апдейт в вебхуке Telegram: {e}")
+            # Повторная доставка не поможет, подтверждаем
+            return web.Response()
+
+        try:
+            queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self._stats["rejected"] += 1
+            logger.warning(f"Очередь апдейтов заполнена, апдейт {update.update_id} будет доставлен повторно")
+            return web.Response(status=503)
+        self._stats["accepted"] += 1
+        return web.Response()
+
+    async def _worker(self, queue: "asyncio.Queue[Update]") -> None:
+        while True:
+            update = await queue.get()
+            started_at = time.monotonic()
+            try:
+                await self.dp.feed_update(self.bot, update)
+                self._stats["processed"] += 1
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.exception(f"Ошибка при обработке апдейта {update.update_id}: {e}")
+            finally:
+                self._latencies.append(time.monotonic() - started_at)
+                del self._latencies[:-1000]
+                queue.task_done()
+
+    def start(self) -> None:
+        """Запускает обработчики апдейтов"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+
+    async def stop(self, drain_timeout: float = TELEGRAM_WEBHOOK_DRAIN_TIMEOUT) -> None:
+        """
+        Дожидается обработки принятых апдейтов и останавливает обработчики
+
+        Args:
+            drain_timeout: Сколько секунд ждать обработки очередей
+        """
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), drain_timeout)
+        except asyncio.TimeoutError:
+            left = sum(queue.qsize() for queue in self._queues)
+            logger.warning(f"Не дождались обработки {left} апдейтов при остановке")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики обработки апдейтов
+
+        Returns:
+            Счетчики апдейтов, глубина очередей и время обработки
+        """
+        latencies = sorted(self._latencies)
+        return {
+            "workers": len(self._queues),
+            "queued": sum(queue.qsize() for queue in self._queues),
+            "max_queue": max(queue.qsize() for queue in self._queues),
+            "avg_seconds": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "p95_seconds": round(latencies[int(len(latencies) * 0.95)], 3) if latencies else None,
+            **self._stats,
+        }
+
+
+async def ensure_webhook(bot: Bot, dp: Dispatcher, url: str, secret: str) -> None:
+    """
+    Регистрирует вебхук в Telegram. Вызов идемпотентен, поэтому безопасен при
+    одновременном запуске нескольких реплик; остановка реплики вебхук не удаляет,
+    чтобы остальные реплики продолжали получать апдейты.
+
+    Args:
+        bot: Экземпляр бота
+        dp: Диспетчер (по нему определяются нужные типы апдейтов)
+        url: Публичный адрес вебхука
+        secret: Секрет вебхука
+    """
+    try:
+        await bot.set_webhook(
+            url,
+            secret_token=secret,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=TELEGRAM_WEBHOOK_MAX_CONNECTIONS,
+        )
+        logger.info(f"Вебхук Telegram установлен: {url}")
+    except TelegramRetryAfter:
+        # Вебхук одновременно регистрирует другая реплика
+        logger.info("Вебхук Telegram регистрирует другая реплика, пропускаем")
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher, url: str, stop: Optional[asyncio.Event] = None) -> None:
+    """
+    Запускает сервер вебхуков Telegram и работает до установки события stop.
+    Реплик может быть несколько: все они слушают один и тот же путь за балансировщиком.
+
+    Args:
+        bot: Экземпляр бота
+        dp: Диспетчер с зарегистрированными обработчиками
+        url: Публичный адрес вебхука (TELEGRAM_WEBHOOK_URL), путь из него используется сервером
+        stop: Событие остановки сервера
+    """
+    stop = stop or asyncio.Event()
+    processor = WebhookUpdateProcessor(bot, dp)
+    path = urlsplit(url).path or "/"
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response(processor.stats())
+
+    app = web.Application()
+    app.router.add_post(path, processor.handle)
+    app.router.add_get("/health", health)
+
+    await dp.emit_startup(**{**dp.workflow_data, "bot": bot})
+    processor.start()
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, TELEGRAM_WEBHOOK_HOST, TELEGRAM_WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"Сервер вебхуков Telegram слушает {TELEGRAM_WEBHOOK_HOST}:{TELEGRAM_WEBHOOK_PORT}{path}")
+
+    try:
+        await ensure_webhook(bot, dp, url, processor.secret)
+        await stop.wait()
+    finally:
+        logger.info("Остановка сервера вебхуков Telegram...")
+        # Сначала перестаем принимать запросы, затем дообрабатываем принятые апдейты
+        await site.stop()
+        await processor.stop()
+        await runner.cleanup()
+        await dp.emit_shutdown(**{**dp.workflow_data, "bot": bot})
+        await bot.session.close()
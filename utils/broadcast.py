@@ -0,0 +1,418 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from dotenv import load_dotenv
+
+from repository.async_broadcast_repository import AsyncBroadcastRepository
+from utils.rate_limit import TokenBucket
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+# Общий лимит отправки сообщений ботом в секунду (Telegram допускает около 30 сообщений в секунду)
+BROADCAST_GLOBAL_RATE = float(os.getenv("BROADCAST_GLOBAL_RATE", "25"))
+# Минимальный интервал между сообщениями в один чат в секундах
+BROADCAST_CHAT_INTERVAL = float(os.getenv("BROADCAST_CHAT_INTERVAL", "1"))
+# Сколько сообщений рассылки отправляется одновременно
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "30"))
+# Как часто сохранять прогресс рассылки в секундах
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", "5"))
+# Сколько раз повторять отправку после RetryAfter или сетевой ошибки
+BROADCAST_MAX_RETRIES = 3
+# Сколько чатов помнить для соблюдения интервала между сообщениями
+CHAT_INTERVAL_CACHE_SIZE = 10000
+
+SEND_SENT = "sent"
+SEND_FAILED = "failed"
+SEND_BLOCKED = "blocked"
+
+
+class MessageSender:
+    """
+    Отправка сообщений в пределах лимитов Telegram: общего лимита бота
+    (token bucket) и интервала между сообщениями в один чат.
+
+    При RetryAfter отправка приостанавливается для всех сообщений на время,
+    указанное Telegram, и затем повторяется. Отправитель общий для рассылок
+    и служебных уведомлений, чтобы они делили один лимит бота.
+
+    Args:
+        bot: Экземпляр бота
+        rate: Сообщений в секунду для всего бота
+        chat_interval: Минимальный интервал между сообщениями в один чат
+    """
+
+    def __init__(self, bot: Bot, rate: float = BROADCAST_GLOBAL_RATE, chat_interval: float = BROADCAST_CHAT_INTERVAL):
+        self.bot = bot
+        self.limiter = TokenBucket(rate)
+        self.chat_interval = chat_interval
+        self._chat_next_at: "OrderedDict[int, float]" = OrderedDict()
+        self._paused_until = 0.0
+        self._stats = {SEND_SENT: 0, SEND_FAILED: 0, SEND_BLOCKED: 0, "retry_after": 0, "retries": 0}
+
+    async def _wait_chat(self, chat_id: int) -> None:
+        """Резервирует для чата ближайший свободный слот и ждет его"""
+        now = time.monotonic()
+        next_at = max(now, self._chat_next_at.pop(chat_id, 0.0))
+        self._chat_next_at[chat_id] = next_at + self.chat_interval
+        while len(self._chat_next_at) > CHAT_INTERVAL_CACHE_SIZE:
+            self._chat_next_at.popitem(last=False)
+        if next_at > now:
+            await asyncio.sleep(next_at - now)
+
+    async def send(self, chat_id: int, text: str, **kwargs: Any) -> str:
+        """
+        Отправляет сообщение с учетом лимитов и повторами
+
+        Args:
+            chat_id: ID чата
+            text: Текст сообщения
+            **kwargs: Дополнительные параметры send_message (parse_mode, reply_markup, ...)
+
+        Returns:
+            Результат: sent, blocked (бот заблокирован пользователем) или failed
+        """
+        for attempt in range(BROADCAST_MAX_RETRIES + 1):
+            await self._wait_chat(chat_id)
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            await self.limiter.acquire()
+            try:
+                await self.bot.send_message(chat_id, text, **kwargs)
+                result = SEND_SENT
+            except TelegramRetryAfter as e:
+                # Лимит превышен для всего бота: приостанавливаем все отправки
+                self._stats["retry_after"] += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+                logger.warning(f"Telegram просит подождать {e.retry_after} с перед отправкой сообщений")
+                continue
+            except TelegramForbiddenError:
+                result = SEND_BLOCKED
+            except TelegramBadRequest as e:
+                logger.warning(f"Не удалось отправить сообщение в чат {chat_id}: {e}")
+                result = SEND_FAILED
+            except (TelegramNetworkError, TelegramServerError) as e:
+                self._stats["retries"] += 1
+                logger.warning(f"Ошибка сети при отправке сообщения в чат {chat_id}: {e}")
+                await asyncio.sleep(2 ** attempt)
+                continue
+            self._stats[result] += 1
+            return result
+
+        self._stats[SEND_FAILED] += 1
+        return SEND_FAILED
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики отправки
+
+        Returns:
+            Счетчики результатов отправки и время ожидания лимита
+        """
+        return {**self._stats, "limiter_waited_seconds": round(self.limiter.waited, 1)}
+
+
+class Broadcaster:
+    """
+    Рассылка сообщений всем пользователям.
+
+    Получатели читаются серверным курсором в порядке user_id и отправляются
+    параллельно (не больше concurrency сообщений одновременно) через общий
+    MessageSender. Прогресс периодически сохраняется в таблицу Broadcast:
+    last_user_id - позиция, до которой все сообщения уже отправлены, поэтому
+    после перезапуска рассылка продолжается с нее. Сообщения, отправленные
+    после этой позиции до сбоя, будут отправлены повторно (не больше concurrency штук).
+
+    Args:
+        sender: Отправитель сообщений
+        repository: Репозиторий рассылок
+        concurrency: Сколько сообщений отправлять одновременно
+    """
+
+    def __init__(self, sender: MessageSender, repository: Optional[AsyncBroadcastRepository] = None,
+                 concurrency: int = BROADCAST_CONCURRENCY):
+        self.sender = sender
+        self.repository = repository or AsyncBroadcastRepository()
+        self.concurrency = concurrency
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._progress: Dict[int, Dict[str, Any]] = {}
+
+    async def create(self, admin_id: int, text: str, parse_mode: Optional[str] = "HTML") -> Optional[Dict]:
+        """
+        Создает и запускает рассылку
+
+        Args:
+            admin_id: ID администратора
+            text: Текст сообщения
+            parse_mode: Режим разметки
+
+        Returns:
+            Созданная рассылка
+        """
+        broadcast = await self.repository.create({"created_by": admin_id, "text": text, "parse_mode": parse_mode})
+        if broadcast:
+            self.start(broadcast)
+        return broadcast
+
+    def start(self, broadcast: Dict) -> None:
+        """
+        Запускает выполнение рассылки в фоне
+
+        Args:
+            broadcast: Данные рассылки
+        """
+        broadcast_id = broadcast["broadcast_id"]
+        if broadcast_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(broadcast))
+        self._tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast_id, None))
+
+    async def resume_unfinished(self) -> None:
+        """Продолжает рассылки, прерванные остановкой бота"""
+        for broadcast in await self.repository.get_running():
+            logger.info(f"Продолжение рассылки {broadcast['broadcast_id']} с пользователя {broadcast['last_user_id']}")
+            self.start(broadcast)
+
+    async def resume(self, broadcast_id: int) -> Optional[Dict]:
+        """
+        Возобновляет приостановленную рассылку
+
+        Args:
+            broadcast_id: ID рассылки
+
+        Returns:
+            Рассылка или None, если ее нельзя возобновить
+        """
+        broadcast = await self.repository.set_status(broadcast_id, "running")
+        if broadcast:
+            self.start(broadcast)
+        return broadcast
+
+    async def pause(self, broadcast_id: int) -> Optional[Dict]:
+        """
+        Приостанавливает рассылку (на любой реплике: она заметит смену статуса при сохранении прогресса)
+
+        Args:
+            broadcast_id: ID рассылки
+
+        Returns:
+            Рассылка или None, если она уже завершена
+        """
+        broadcast = await self.repository.set_status(broadcast_id, "paused")
+        if broadcast and broadcast_id in self._progress:
+            self._progress[broadcast_id]["status"] = "paused"
+        return broadcast
+
+    async def cancel(self, broadcast_id: int) -> Optional[Dict]:
+        """
+        Отменяет рассылку
+
+        Args:
+            broadcast_id: ID рассылки
+
+        Returns:
+            Рассылка или None, если она уже завершена
+        """
+        broadcast = await self.repository.set_status(broadcast_id, "canceled")
+        if broadcast and broadcast_id in self._progress:
+            self._progress[broadcast_id]["status"] = "canceled"
+        return broadcast
+
+    async def _run(self, broadcast: Dict) -> None:
+        broadcast_id = broadcast["broadcast_id"]
+        after_user_id = broadcast["last_user_id"]
+        send_kwargs = {"parse_mode": broadcast["parse_mode"]} if broadcast.get("parse_mode") else {}
+        progress = {
+            "status": "running",
+            SEND_SENT: broadcast["sent"],
+            SEND_FAILED: broadcast["failed"],
+            SEND_BLOCKED: broadcast["blocked"],
+            "last_user_id": after_user_id,
+            "processed_now": 0,
+            "started_at": time.monotonic(),
+        }
+
+        async with self.repository.stream_recipients(broadcast_id, after_user_id) as recipients:
+            if recipients is None:
+                logger.info(f"Рассылку {broadcast_id} уже выполняет другая реплика бота")
+                return
+
+            done = broadcast["sent"] + broadcast["failed"] + broadcast["blocked"]
+            progress["total"] = done + await self.repository.count_recipients(after_user_id)
+            self._progress[broadcast_id] = progress
+            # Получатели в порядке отправки и признак завершения: позиция рассылки
+            # сдвигается только через непрерывный префикс завершенных отправок
+            pending: "OrderedDict[int, bool]" = OrderedDict()
+            in_flight = set()
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def deliver(user_id: int) -> None:
+                try:
+                    result = await self.sender.send(user_id, broadcast["text"], **send_kwargs)
+                except Exception as e:
+                    logger.error(f"Ошибка при отправке рассылки {broadcast_id} пользователю {user_id}: {e}")
+                    result = SEND_FAILED
+                try:
+                    progress[result] += 1
+                    progress["processed_now"] += 1
+                finally:
+                    pending[user_id] = True
+                    semaphore.release()
+
+            async def save() -> None:
+                while pending and next(iter(pending.values())):
+                    progress["last_user_id"], _ = pending.popitem(last=False)
+                status = await self.repository.save_progress(
+                    broadcast_id, progress["last_user_id"], progress[SEND_SENT],
+                    progress[SEND_FAILED], progress[SEND_BLOCKED], progress["total"]
+                )
+                if status and progress["status"] == "running":
+                    progress["status"] = status
+
+            saved_at = time.monotonic()
+            try:
+                async for user_id in recipients:
+                    await semaphore.acquire()
+                    if progress["status"] != "running":
+                        semaphore.release()
+                        break
+                    pending[user_id] = False
+                    task = asyncio.create_task(deliver(user_id))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                    if time.monotonic() - saved_at >= BROADCAST_PROGRESS_INTERVAL:
+                        await save()
+                        saved_at = time.monotonic()
+
+                if in_flight:
+                    await asyncio.gather(*in_flight)
+                await save()
+                if progress["status"] == "running" and await self.repository.set_status(broadcast_id, "completed"):
+                    progress["status"] = "completed"
+                    await self._report(broadcast, progress)
+                logger.info(f"Рассылка {broadcast_id} остановлена со статусом {progress['status']}")
+            except asyncio.CancelledError:
+                # Бот останавливается: статус остается running, рассылка продолжится после запуска
+                for task in in_flight:
+                    task.cancel()
+                await asyncio.gather(*in_flight, return_exceptions=True)
+                await asyncio.shield(save())
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка при выполнении рассылки {broadcast_id}: {e}")
+                await save()
+            finally:
+                self._progress.pop(broadcast_id, None)
+
+    async def _report(self, broadcast: Dict, progress: Dict[str, Any]) -> None:
+        elapsed = time.monotonic() - progress["started_at"]
+        text = (
+            f"📣 Рассылка #{broadcast['broadcast_id']} завершена за {elapsed / 60:.1f} мин\n"
+            f"Отправлено: {progress[SEND_SENT]}\n"
+            f"Заблокировали бота: {progress[SEND_BLOCKED]}\n"
+            f"Ошибок: {progress[SEND_FAILED]}"
+        )
+        await self.sender.send(broadcast["created_by"], text)
+
+    def progress(self, broadcast_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Прогресс рассылки, выполняемой этим процессом
+
+        Args:
+            broadcast_id: ID рассылки
+
+        Returns:
+            Счетчики, скорость (сообщений в секунду) и оценка оставшегося времени или None
+        """
+        progress = self._progress.get(broadcast_id)
+        if progress is None:
+            return None
+        elapsed = max(time.monotonic() - progress["started_at"], 1e-6)
+        rate = progress["processed_now"] / elapsed
+        processed = progress[SEND_SENT] + progress[SEND_FAILED] + progress[SEND_BLOCKED]
+        remaining = max(progress["total"] - processed, 0)
+        return {
+            "broadcast_id": broadcast_id,
+            "status": progress["status"],
+            "total": progress["total"],
+            "processed": processed,
+            SEND_SENT: progress[SEND_SENT],
+            SEND_FAILED: progress[SEND_FAILED],
+            SEND_BLOCKED: progress[SEND_BLOCKED],
+            "last_user_id": progress["last_user_id"],
+            "rate_per_second": round(rate, 1),
+            "eta_seconds": round(remaining / rate) if rate > 0 else None,
+        }
+
+    async def stop(self) -> None:
+        """Останавливает рассылки этого процесса, сохранив их прогресс"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики рассылок
+
+        Returns:
+            Прогресс выполняемых рассылок и счетчики отправителя
+        """
+        return {
+            "running": [self.progress(broadcast_id) for broadcast_id in list(self._progress)],
+            "sender": self.sender.stats(),
+        }
+
+
+# Общие экземпляры
+_message_sender: Optional[MessageSender] = None
+_broadcaster: Optional[Broadcaster] = None
+
+
+def get_message_sender(bot: Bot) -> MessageSender:
+    """
+    Возвращает общий отправитель сообщений
+
+    Args:
+        bot: Экземпляр бота
+
+    Returns:
+        MessageSender: Отправитель сообщений
+    """
+    global _message_sender
+    if _message_sender is None:
+        _message_sender = MessageSender(bot)
+    return _message_sender
+
+
+def get_broadcaster(bot: Bot) -> Broadcaster:
+    """
+    Возвращает общий экземпляр рассылки
+
+    Args:
+        bot: Экземпляр бота
+
+    Returns:
+        Broadcaster: Рассылка
+    """
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = Broadcaster(get_message_sender(bot))
+    return _broadcaster
@@ -0,0 +1,321 @@
+import os
+import json
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional, Type, Union
+
+import asyncpg
+from pydantic import BaseModel, ValidationError
+
+from repository.async_event_outbox_repository import AsyncEventOutboxRepository, EVENT_BUS_CHANNEL
+from repository.engine import connect_dedicated
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+# Сколько событий дочитывать из журнала за один запрос
+EVENT_REPLAY_BATCH_SIZE = int(os.getenv("EVENT_REPLAY_BATCH_SIZE", "500"))
+# За сколько секунд перечитывать журнал до курсора: событие с меньшим ID может зафиксироваться позже
+EVENT_REPLAY_LOOKBACK_SECONDS = float(os.getenv("EVENT_REPLAY_LOOKBACK_SECONDS", "300"))
+# Сколько ID обработанных событий помнить для отсева повторов (журнал + уведомление)
+EVENT_DEDUP_SIZE = 10000
+# Пауза перед повторным подключением, растет до максимальной
+EVENT_RECONNECT_MIN_DELAY = 1.0
+EVENT_RECONNECT_MAX_DELAY = 30.0
+
+
+class ModelReadyEvent(BaseModel):
+    """Обучение модели завершено (status: ready или failed)"""
+    event_type: Literal["model_ready"] = "model_ready"
+    model_id: int
+    user_id: int
+    training_id: Optional[str] = None
+    name: Optional[str] = None
+    trigger_word: Optional[str] = None
+    status: str
+    model_url: Optional[str] = None
+
+
+class GenerationDoneEvent(BaseModel):
+    """Генерация изображения завершена (status: completed, failed или canceled)"""
+    event_type: Literal["generation_done"] = "generation_done"
+    generation_id: int
+    user_id: int
+    status: str
+    image_url: Optional[str] = None
+
+
+class PaymentCompletedEvent(BaseModel):
+    """Платеж успешно завершен"""
+    event_type: Literal["payment_completed"] = "payment_completed"
+    payment_id: int
+    user_id: int
+    amount: Optional[float] = None
+    tokens: Optional[int] = None
+
+
+Event = Union[ModelReadyEvent, GenerationDoneEvent, PaymentCompletedEvent]
+
+# Типы событий по имени
+EVENT_TYPES: Dict[str, Type[BaseModel]] = {
+    "model_ready": ModelReadyEvent,
+    "generation_done": GenerationDoneEvent,
+    "payment_completed": PaymentCompletedEvent,
+}
+
+EventHandler = Callable[[Any], Awaitable[None]]
+
+
+class EventBus:
+    """
+    Шина событий поверх PostgreSQL LISTEN/NOTIFY, общая для бота и API.
+
+    Публикация записывает событие в журнал EventOutbox и отправляет NOTIFY
+    одним запросом. Подписчик слушает канал на выделенном соединении, а после
+    запуска или обрыва соединения дочитывает из журнала события, пропущенные
+    с момента последнего сохраненного курсора (таблица EventConsumer), захватывая
+    окно EVENT_REPLAY_LOOKBACK_SECONDS до курсора: событие с меньшим ID, чья транзакция
+    зафиксировалась позже, не теряется, а уже обработанные отсеиваются по event_id.
+    Доставка "хотя бы один раз": обработчики должны быть идемпотентными.
+
+    Args:
+        consumer_name: Имя подписчика, под которым сохраняется курсор
+        replay: Дочитывать ли пропущенные события из журнала. Если False,
+            подписчик получает только события, опубликованные при активном соединении
+    """
+
+    def __init__(self, consumer_name: str, replay: bool = True,
+                 repository: Optional[AsyncEventOutboxRepository] = None):
+        self.consumer_name = consumer_name
+        self.replay = replay
+        self.repository = repository or AsyncEventOutboxRepository()
+        self._handlers: Dict[str, List[EventHandler]] = {}
+        self._incoming: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        self._processed: "OrderedDict[int, None]" = OrderedDict()
+        self._cursor = 0
+        self._conn: Optional[asyncpg.Connection] = None
+        self._connection_lost = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._stats = {"published": 0, "received": 0, "replayed": 0, "handled": 0, "errors": 0, "reconnects": 0}
+
+    def subscribe(self, event_type: str, handler: Optional[EventHandler] = None):
+        """
+        Регистрирует обработчик события. Можно использовать как декоратор.
+
+        Args:
+            event_type: Тип события (model_ready, generation_done, payment_completed)
+            handler: Асинхронная функция, принимающая событие
+        """
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Неизвестный тип события: {event_type}")
+
+        def register(func: EventHandler) -> EventHandler:
+            self._handlers.setdefault(event_type, []).append(func)
+            return func
+
+        return register(handler) if handler is not None else register
+
+    async def publish(self, event: Event) -> Optional[int]:
+        """
+        Публикует событие
+
+        Args:
+            event: Событие
+
+        Returns:
+            ID события в журнале
+        """
+        payload = event.model_dump(exclude={"event_type"})
+        record = await self.repository.publish(event.event_type, payload)
+        self._stats["published"] += 1
+        return record["event_id"] if record else None
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        try:
+            self._incoming.put_nowait(json.loads(payload))
+            self._stats["received"] += 1
+        except ValueError:
+            logger.warning(f"Некорректное уведомление в канале {channel}: {payload}")
+
+    def _on_termination(self, connection) -> None:
+        self._connection_lost.set()
+
+    async def _dispatch(self, record: Dict[str, Any]) -> None:
+        """Передает событие обработчикам и сдвигает курсор"""
+        event_id = int(record["event_id"])
+        if event_id in self._processed:
+            return
+        self._processed[event_id] = None
+        while len(self._processed) > EVENT_DEDUP_SIZE:
+            self._processed.popitem(last=False)
+
+        event_type = record["event_type"]
+        handlers = self._handlers.get(event_type)
+        if handlers:
+            try:
+                event = EVENT_TYPES[event_type].model_validate(record["payload"])
+            except (KeyError, ValidationError) as e:
+                self._stats["errors"] += 1
+                logger.error(f"Не удалось разобрать событие {event_id} ({event_type}): {e}")
+                handlers = []
+
+            for handler in handlers:
+                try:
+                    await handler(event)
+                    self._stats["handled"] += 1
+                except Exception as e:
+                    self._stats["errors"] += 1
+                    logger.error(f"Ошибка обработчика события {event_id} ({event_type}): {e}")
+
+        if event_id > self._cursor:
+            self._cursor = event_id
+            if self.replay:
+                await self.repository.save_cursor(self.consumer_name, event_id)
+
+    async def _replay(self) -> None:
+        """Дочитывает из журнала события, опубликованные после курсора или незадолго до него"""
+        after = await self.repository.get_replay_start(self._cursor, EVENT_REPLAY_LOOKBACK_SECONDS)
+        while True:
+            records = await self.repository.get_after(after, EVENT_REPLAY_BATCH_SIZE)
+            for record in records:
+                if int(record["event_id"]) not in self._processed:
+                    self._stats["replayed"] += 1
+                await self._dispatch(record)
+            if len(records) < EVENT_REPLAY_BATCH_SIZE:
+                return
+            after = int(records[-1]["event_id"])
+
+    async def _connect(self) -> None:
+        self._conn = await connect_dedicated()
+        self._conn.add_termination_listener(self._on_termination)
+        await self._conn.add_listener(EVENT_BUS_CHANNEL, self._on_notification)
+        self._connection_lost.clear()
+
+    async def _close_connection(self) -> None:
+        if self._conn is not None and not self._conn.is_closed():
+            try:
+                await self._conn.close(timeout=5)
+            except Exception:
+                self._conn.terminate()
+        self._conn = None
+
+    async def _listen(self) -> None:
+        delay = EVENT_RECONNECT_MIN_DELAY
+        first = True
+        while True:
+            try:
+                # Сначала подписываемся, затем дочитываем журнал: событие, опубликованное
+                # между этими шагами, придет и уведомлением, и из журнала, но будет обработано один раз
+                await self._connect()
+                if not first:
+                    self._stats["reconnects"] += 1
+                if self.replay:
+                    await self._replay()
+                first = False
+                delay = EVENT_RECONNECT_MIN_DELAY
+                logger.info(f"Подписчик {self.consumer_name} слушает канал {EVENT_BUS_CHANNEL} с события {self._cursor}")
+                await self._connection_lost.wait()
+                logger.warning(f"Соединение подписчика {self.consumer_name} с шиной событий потеряно")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка подписчика {self.consumer_name} шины событий: {e}")
+            finally:
+                await self._close_connection()
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, EVENT_RECONNECT_MAX_DELAY)
+
+    async def _consume(self) -> None:
+        while True:
+            record = await self._incoming.get()
+            try:
+                await self._dispatch(record)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.error(f"Ошибка при обработке события {record.get('event_id')}: {e}")
+
+    async def start(self) -> None:
+        """
+        Запускает подписку. Курсор нового подписчика ставится на конец журнала,
+        чтобы он не обрабатывал всю историю событий.
+        """
+        if self._tasks:
+            return
+        if self.replay:
+            cursor = await self.repository.get_cursor(self.consumer_name)
+            if cursor is None:
+                cursor = await self.repository.get_last_event_id()
+                await self.repository.save_cursor(self.consumer_name, cursor)
+            self._cursor = cursor
+        else:
+            self._cursor = await self.repository.get_last_event_id()
+        self._tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._consume())]
+
+    async def stop(self) -> None:
+        """Останавливает подписку"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self._tasks:
+            logger.info(f"Подписчик {self.consumer_name} шины событий остановлен")
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики шины
+
+        Returns:
+            Счетчики событий, курсор и состояние соединения
+        """
+        return {
+            "consumer": self.consumer_name,
+            "connected": self._conn is not None and not self._conn.is_closed(),
+            "cursor": self._cursor,
+            "backlog": self._incoming.qsize(),
+            **self._stats,
+        }
+
+
+# Общие экземпляры по имени подписчика
+_event_buses: Dict[str, EventBus] = {}
+
+
+def get_event_bus(consumer_name: str = "publisher", replay: bool = True) -> EventBus:
+    """
+    Возвращает общий экземпляр шины событий для подписчика
+
+    Args:
+        consumer_name: Имя подписчика (для процессов, которые только публикуют, - любое)
+        replay: Дочитывать ли пропущенные события из журнала
+
+    Returns:
+        EventBus: Шина событий
+    """
+    if consumer_name not in _event_buses:
+        _event_buses[consumer_name] = EventBus(consumer_name, replay=replay)
+    return _event_buses[consumer_name]
+
+
+async def publish_event(event: Event) -> Optional[int]:
+    """
+    Публикует событие, не прерывая вызывающий код при ошибке шины
+
+    Args:
+        event: Событие
+
+    Returns:
+        ID события в журнале или None при ошибке
+    """
+    try:
+        return await get_event_bus().publish(event)
+    except Exception as e:
+        logger.error(f"Не удалось опубликовать событие {event.event_type}: {e}")
+        return None
@@ -0,0 +1,238 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+# Типы задач и их параметры по умолчанию: (режим, число воркеров, длина очереди, Retry-After в секундах)
+# Каждый параметр можно переопределить переменными окружения вида
+# EXECUTOR_IMAGE_MODE, EXECUTOR_IMAGE_WORKERS, EXECUTOR_IMAGE_QUEUE, EXECUTOR_IMAGE_RETRY_AFTER
+DEFAULT_EXECUTOR_LIMITS = {
+    "image": ("thread", 4, 16, 5),        # Конвертация изображений через PIL
+    "archive": ("thread", 2, 8, 10),      # Создание ZIP-архивов
+    "io": ("thread", 8, 64, 2),           # Копирование и удаление файлов
+    "replicate": ("thread", 4, 32, 5),    # Загрузка архивов в облачное хранилище
+}
+
+
+class ExecutorSaturatedError(Exception):
+    """
+    Исключение, возникающее при переполнении очереди исполнителя.
+    Обработчики API превращают его в ответ 503 с заголовком Retry-After.
+    """
+
+    def __init__(self, task_type: str, retry_after: int):
+        self.task_type = task_type
+        self.retry_after = retry_after
+        super().__init__(f"Исполнитель '{task_type}' перегружен, повторите запрос через {retry_after} сек.")
+
+
+class BoundedExecutor:
+    """
+    Пул потоков или процессов с ограничением на количество ожидающих задач.
+
+    Одновременно выполняется не более max_workers задач, еще не более max_queue
+    задач ожидают в очереди. Если очередь заполнена, новая задача отклоняется
+    с ExecutorSaturatedError вместо того, чтобы бесконечно копиться в памяти.
+    """
+
+    def __init__(self, task_type: str, mode: str = "thread", max_workers: int = 4,
+                 max_queue: int = 16, retry_after: int = 5):
+        self.task_type = task_type
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+
+        if mode == "process":
+            self._executor: Executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                                thread_name_prefix=f"executor-{task_type}")
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._max_queue_depth = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_run_time = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Количество задач, ожидающих свободного воркера"""
+        return max(0, self._in_flight - self.max_workers)
+
+    def _reserve_slot(self) -> None:
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise ExecutorSaturatedError(self.task_type, self.retry_after)
+            self._in_flight += 1
+            self._submitted += 1
+            self._max_queue_depth = max(self._max_queue_depth, self.queue_depth)
+
+    def _release_slot(self, succeeded: bool, run_time: float) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._total_run_time += run_time
+            if succeeded:
+                self._completed += 1
+            else:
+                self._failed += 1
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Выполняет блокирующую функцию в пуле, не блокируя event loop.
+
+        Args:
+            func: Блокирующая функция
+            *args: Позиционные аргументы функции
+            **kwargs: Именованные аргументы функции
+
+        Returns:
+            Результат выполнения функции
+
+        Raises:
+            ExecutorSaturatedError: Если все воркеры заняты и очередь заполнена
+        """
+        self._reserve_slot()
+
+        started_at = time.monotonic()
+        try:
+            future = self._executor.submit(partial(func, *args, **kwargs))
+        except BaseException:
+            self._release_slot(False, 0.0)
+            raise
+
+        # Слот освобождается только когда воркер действительно завершил задачу:
+        # отмена ожидающей корутины не останавливает уже запущенный поток,
+        # поэтому освобождать слот в finally нельзя — иначе лимит будет превышен.
+        def _on_done(done_future) -> None:
+            succeeded = not done_future.cancelled() and done_future.exception() is None
+            self._release_slot(succeeded, time.monotonic() - started_at)
+
+        future.add_done_callback(_on_done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики исполнителя
+
+        Returns:
+            Dict[str, Any]: Текущая загрузка, глубина очереди и счетчики задач
+        """
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "mode": self.mode,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "active": min(self._in_flight, self.max_workers),
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self._max_queue_depth,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_time_ms": round(self._total_run_time / finished * 1000, 2) if finished else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Останавливает пул"""
+        self._executor.shutdown(wait=wait)
+
+
+# Реестр исполнителей по типам задач
+_executors: Dict[str, BoundedExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _load_limits(task_type: str) -> Dict[str, Any]:
+    """
+    Считывает параметры исполнителя из переменных окружения
+
+    Args:
+        task_type (str): Тип задачи
+
+    Returns:
+        Dict[str, Any]: Параметры для BoundedExecutor
+    """
+    mode, workers, queue, retry_after = DEFAULT_EXECUTOR_LIMITS.get(task_type, ("thread", 4, 16, 5))
+    prefix = f"EXECUTOR_{task_type.upper()}"
+    return {
+        "mode": os.getenv(f"{prefix}_MODE", mode),
+        "max_workers": int(os.getenv(f"{prefix}_WORKERS", str(workers))),
+        "max_queue": int(os.getenv(f"{prefix}_QUEUE", str(queue))),
+        "retry_after": int(os.getenv(f"{prefix}_RETRY_AFTER", str(retry_after))),
+    }
+
+
+def get_executor(task_type: str) -> BoundedExecutor:
+    """
+    Возвращает общий исполнитель для указанного типа задач, создавая его при первом обращении.
+
+    Args:
+        task_type (str): Тип задачи (image, archive, io, replicate, ...)
+
+    Returns:
+        BoundedExecutor: Исполнитель для этого типа задач
+    """
+    executor = _executors.get(task_type)
+    if executor is not None:
+        return executor
+
+    with _executors_lock:
+        if task_type not in _executors:
+            limits = _load_limits(task_type)
+            _executors[task_type] = BoundedExecutor(task_type, **limits)
+            logger.info(f"Создан исполнитель '{task_type}': {limits}")
+        return _executors[task_type]
+
+
+async def run_blocking(task_type: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Выполняет блокирующую функцию в исполнителе указанного типа.
+
+    Args:
+        task_type (str): Тип задачи
+        func: Блокирующая функция
+        *args: Позиционные аргументы функции
+        **kwargs: Именованные аргументы функции
+
+    Returns:
+        Результат выполнения функции
+
+    Raises:
+        ExecutorSaturatedError: Если исполнитель перегружен
+    """
+    return await get_executor(task_type).run(func, *args, **kwargs)
+
+
+def get_executors_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Возвращает метрики всех созданных исполнителей
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Метрики по типам задач
+    """
+    return {task_type: executor.stats() for task_type, executor in list(_executors.items())}
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    """
+    Останавливает все исполнители (вызывается при остановке приложения)
+    """
+    with _executors_lock:
+        for task_type, executor in _executors.items():
+            executor.shutdown(wait=wait)
+            logger.info(f"Исполнитель '{task_type}' остановлен")
+        _executors.clear()
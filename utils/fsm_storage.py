@@ -0,0 +1,151 @@
+import os
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import DisabledEventIsolation, MemoryStorage
+from dotenv import load_dotenv
+
+try:
+    from aiogram.fsm.storage.redis import DefaultKeyBuilder, RedisStorage
+    from redis.asyncio import Redis
+    from redis.exceptions import WatchError
+except ImportError:  # Пакет redis нужен только для FSM_STORAGE=redis
+    RedisStorage = None
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+# Хранилище состояний FSM: memory (по умолчанию, теряется при перезапуске) или redis
+FSM_STORAGE = os.getenv("FSM_STORAGE", "memory").lower()
+# Время жизни состояния и данных FSM в секундах; продлевается при каждой записи
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", str(7 * 24 * 60 * 60)))
+FSM_DATA_TTL = int(os.getenv("FSM_DATA_TTL", str(7 * 24 * 60 * 60)))
+# Префикс ключей FSM в Redis
+FSM_REDIS_PREFIX = os.getenv("FSM_REDIS_PREFIX", "fsm")
+
+
+if RedisStorage is not None:
+    class PipelinedRedisStorage(RedisStorage):
+        """
+        Хранилище FSM в Redis, в котором каждая операция выполняется за один запрос к Redis.
+
+        Запись состояния и запись данных продлевают время жизни обоих ключей одним
+        конвейером (MULTI/EXEC), поэтому состояние и данные активного диалога
+        истекают вместе. update_data выполняется как оптимистичная транзакция
+        (WATCH), чтобы одновременные обновления с разных реплик бота не терялись.
+        """
+
+        async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+            state_key = self.key_builder.build(key, "state")
+            async with self.redis.pipeline(transaction=True) as pipe:
+                if state is None:
+                    pipe.delete(state_key)
+                else:
+                    pipe.set(state_key, state.state if isinstance(state, State) else state, ex=self.state_ttl)
+                if self.data_ttl:
+                    pipe.expire(self.key_builder.build(key, "data"), self.data_ttl)
+                await pipe.execute()
+
+        async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                self._queue_set_data(pipe, key, data)
+                await pipe.execute()
+
+        def _queue_set_data(self, pipe, key: StorageKey, data: Dict[str, Any]) -> None:
+            data_key = self.key_builder.build(key, "data")
+            if data:
+                pipe.set(data_key, self.json_dumps(data), ex=self.data_ttl)
+            else:
+                pipe.delete(data_key)
+            if self.state_ttl:
+                pipe.expire(self.key_builder.build(key, "state"), self.state_ttl)
+
+        def _decode_data(self, value: Optional[bytes]) -> Dict[str, Any]:
+            if value is None:
+                return {}
+            if isinstance(value, bytes):
+                value = value.decode("utf-8")
+            return self.json_loads(value)
+
+        async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+            data_key = self.key_builder.build(key, "data")
+            async with self.redis.pipeline(transaction=True) as pipe:
+                while True:
+                    try:
+                        await pipe.watch(data_key)
+                        current = self._decode_data(await pipe.get(data_key))
+                        current.update(data)
+                        pipe.multi()
+                        self._queue_set_data(pipe, key, current)
+                        await pipe.execute()
+                        return current.copy()
+                    except WatchError:
+                        # Данные изменила другая реплика между чтением и записью, повторяем
+                        continue
+
+        async def get_state_and_data(self, key: StorageKey) -> Tuple[Optional[str], Dict[str, Any]]:
+            """
+            Читает состояние и данные FSM одним запросом (MGET)
+
+            Args:
+                key: Ключ FSM
+
+            Returns:
+                Кортеж (состояние, данные)
+            """
+            state, data = await self.redis.mget(
+                self.key_builder.build(key, "state"), self.key_builder.build(key, "data")
+            )
+            if isinstance(state, bytes):
+                state = state.decode("utf-8")
+            return state, self._decode_data(data)
+
+
+def create_redis_client() -> "Redis":
+    """
+    Создает асинхронный клиент Redis по настройкам REDIS_* из окружения
+
+    Returns:
+        Redis: Клиент Redis
+    """
+    return Redis(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", "6379")),
+        password=os.getenv("REDIS_PASSWORD") or None,
+        db=int(os.getenv("REDIS_DB", "0")),
+    )
+
+
+def create_fsm_storage() -> Tuple[BaseStorage, BaseEventIsolation]:
+    """
+    Создает хранилище состояний FSM по настройке FSM_STORAGE.
+
+    С хранилищем Redis состояние переживает перезапуск бота и доступно всем
+    репликам за балансировщиком вебхуков; изоляция событий через блокировки
+    в Redis не дает двум репликам одновременно обрабатывать апдейты одного пользователя.
+
+    Returns:
+        Кортеж (хранилище, изоляция событий)
+    """
+    if FSM_STORAGE == "redis":
+        if RedisStorage is None:
+            raise RuntimeError("FSM_STORAGE=redis требует установленного пакета redis")
+        storage = PipelinedRedisStorage(
+            create_redis_client(),
+            key_builder=DefaultKeyBuilder(prefix=FSM_REDIS_PREFIX, with_bot_id=True),
+            state_ttl=FSM_STATE_TTL or None,
+            data_ttl=FSM_DATA_TTL or None,
+            json_dumps=lambda data: json.dumps(data, ensure_ascii=False),
+        )
+        logger.info("Состояния FSM хранятся в Redis")
+        return storage, storage.create_isolation()
+
+    if FSM_STORAGE != "memory":
+        logger.warning(f"Неизвестное хранилище FSM: {FSM_STORAGE}, используется memory")
+    return MemoryStorage(), DisabledEventIsolation()
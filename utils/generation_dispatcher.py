@@ -0,0 +1,362 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from utils.replicate_client import get_replicate_client
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+# Версия модели Replicate для генерации изображений
+GENERATION_MODEL_VERSION = os.getenv("GENERATION_MODEL_VERSION")
+REPLICATE_WEBHOOK_URL = os.getenv("REPLICATE_WEBHOOK_URL")
+
+# Сколько генераций одновременно может выполняться у провайдера (на один процесс API)
+GENERATION_MAX_CONCURRENCY = int(os.getenv("GENERATION_MAX_CONCURRENCY", "8"))
+# Веса полос приоритета: при конкуренции пользователь получает долю слотов пропорционально весу
+GENERATION_WEIGHT_ADMIN = float(os.getenv("GENERATION_WEIGHT_ADMIN", "8"))
+GENERATION_WEIGHT_PAID = float(os.getenv("GENERATION_WEIGHT_PAID", "3"))
+GENERATION_WEIGHT_FREE = float(os.getenv("GENERATION_WEIGHT_FREE", "1"))
+# Как часто забирать новые генерации из базы данных и сколько за раз
+GENERATION_FETCH_INTERVAL = float(os.getenv("GENERATION_FETCH_INTERVAL", "1"))
+GENERATION_FETCH_LIMIT = int(os.getenv("GENERATION_FETCH_LIMIT", "200"))
+# Через сколько секунд считать слот освободившимся, если о завершении генерации не сообщили
+GENERATION_INFLIGHT_TIMEOUT = float(os.getenv("GENERATION_INFLIGHT_TIMEOUT", "600"))
+
+# Полосы приоритета в порядке убывания
+LANES = ("admin", "paid", "free")
+LANE_WEIGHTS = {"admin": GENERATION_WEIGHT_ADMIN, "paid": GENERATION_WEIGHT_PAID, "free": GENERATION_WEIGHT_FREE}
+
+# Окно, за которое считается частота отправки генераций
+RATE_WINDOW = 60.0
+# Сколько последних времен ожидания хранить для перцентилей
+WAIT_SAMPLES = 1000
+
+
+def get_lane(generation: Dict[str, Any]) -> str:
+    """
+    Определяет полосу приоритета генерации по пользователю
+
+    Args:
+        generation: Генерация с полями is_admin и is_paying
+
+    Returns:
+        Название полосы: admin, paid или free
+    """
+    if generation.get("is_admin"):
+        return "admin"
+    if generation.get("is_paying"):
+        return "paid"
+    return "free"
+
+
+async def submit_generation(generation: Dict[str, Any]) -> str:
+    """
+    Отправляет генерацию в Replicate. О результате сообщит вебхук.
+
+    Args:
+        generation: Генерация из очереди (с полями модели model_url и trigger_word)
+
+    Returns:
+        ID предсказания в Replicate
+    """
+    if not GENERATION_MODEL_VERSION:
+        raise RuntimeError("GENERATION_MODEL_VERSION не задан")
+
+    input_data = {
+        "prompt": generation.get("prompt_text") or generation.get("prompt"),
+        "num_outputs": generation.get("content_amount") or 1,
+    }
+    if generation.get("model_url"):
+        input_data["lora_weights"] = generation["model_url"]
+    if generation.get("lora_scale") is not None:
+        input_data["lora_scale"] = float(generation["lora_scale"])
+    if generation.get("guidance_scale") is not None:
+        input_data["guidance_scale"] = float(generation["guidance_scale"])
+    if generation.get("steps"):
+        input_data["num_inference_steps"] = generation["steps"]
+
+    prediction = await get_replicate_client().create_prediction(
+        GENERATION_MODEL_VERSION.split(":", 1)[-1],
+        input_data,
+        webhook=REPLICATE_WEBHOOK_URL,
+        webhook_events_filter=["completed"]
+    )
+    return prediction["id"]
+
+
+class FairQueue:
+    """
+    Очередь со взвешенным справедливым обслуживанием пользователей (self-clocked WFQ).
+
+    Каждой заявке назначается виртуальное время завершения
+    max(V, последнее время завершения пользователя) + 1 / вес, обслуживается
+    заявка с наименьшим временем. Пользователь, поставивший 50 генераций,
+    получает их через одну с остальными, а не заставляет всех ждать;
+    пользователь с весом 3 получает втрое больше слотов, чем с весом 1.
+    """
+
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = weights
+        self._heap: List[Tuple[float, int, int, Dict[str, Any]]] = []
+        self._virtual_time = 0.0
+        self._last_finish: Dict[int, float] = {}
+        self._user_queued: Dict[int, int] = {}
+        self._lane_queued: Dict[str, int] = {lane: 0 for lane in weights}
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, item: Dict[str, Any], user_id: int, lane: str) -> None:
+        """
+        Добавляет заявку в очередь
+
+        Args:
+            item: Заявка
+            user_id: ID пользователя
+            lane: Полоса приоритета
+        """
+        start = max(self._virtual_time, self._last_finish.get(user_id, 0.0))
+        finish = start + 1.0 / self.weights[lane]
+        self._last_finish[user_id] = finish
+        self._user_queued[user_id] = self._user_queued.get(user_id, 0) + 1
+        self._lane_queued[lane] += 1
+        # При равном времени завершения первой идет более приоритетная полоса
+        heapq.heappush(self._heap, (finish, LANES.index(lane), next(self._seq), item))
+
+    def pop(self) -> Optional[Dict[str, Any]]:
+        """
+        Извлекает заявку с наименьшим виртуальным временем завершения
+
+        Returns:
+            Заявка или None, если очередь пуста
+        """
+        if not self._heap:
+            return None
+        finish, lane_index, _, item = heapq.heappop(self._heap)
+        self._virtual_time = finish
+
+        user_id = item["user_id"]
+        self._lane_queued[LANES[lane_index]] -= 1
+        self._user_queued[user_id] -= 1
+        if self._user_queued[user_id] == 0:
+            del self._user_queued[user_id]
+            # Пользователь без заявок не копит "кредит" на будущее
+            if self._last_finish.get(user_id, 0.0) <= self._virtual_time:
+                self._last_finish.pop(user_id, None)
+        return item
+
+    def depth(self) -> Dict[str, Any]:
+        """Глубина очереди: всего, по полосам и число пользователей в очереди"""
+        return {"total": len(self._heap), "users": len(self._user_queued), "lanes": dict(self._lane_queued)}
+
+
+class GenerationDispatcher:
+    """
+    Диспетчер генераций изображений.
+
+    Забирает из базы данных генерации в статусе pending, распределяет их между
+    пользователями очередью со взвешенным справедливым обслуживанием (полосы
+    admin, paid, free) и отправляет провайдеру, не превышая общего ограничения
+    на количество одновременно выполняемых генераций. Слот освобождается, когда
+    вебхук сообщает о завершении генерации, поэтому без REPLICATE_WEBHOOK_URL
+    диспетчер с отправкой в Replicate не запускается.
+    """
+
+    def __init__(self, generation_repository,
+                 submit: Callable[[Dict[str, Any]], Awaitable[str]] = submit_generation,
+                 max_concurrency: int = GENERATION_MAX_CONCURRENCY):
+        self.generation_repository = generation_repository
+        self.submit = submit
+        self.max_concurrency = max_concurrency
+        self._queue = FairQueue(LANE_WEIGHTS)
+        self._queued_ids: Set[int] = set()
+        # Выполняющиеся генерации: generation_id -> время отправки
+        self._in_flight: Dict[int, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._dispatch_tasks: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._last_fetch = 0.0
+        self._dispatch_times: Deque[float] = deque()
+        self._wait_times: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+        self._stats = {"dispatched": 0, "submit_errors": 0, "lost_claims": 0, "expired": 0}
+
+    def wake(self) -> None:
+        """Сообщает о новых генерациях, чтобы не ждать очередного опроса базы данных"""
+        self._last_fetch = 0.0
+        self._wakeup.set()
+
+    def release(self, generation_id: int) -> None:
+        """
+        Освобождает слот завершившейся генерации
+
+        Args:
+            generation_id: ID генерации
+        """
+        if self._in_flight.pop(generation_id, None) is not None:
+            self._wakeup.set()
+
+    async def _fetch(self) -> None:
+        """Добавляет в очередь новые генерации из базы данных"""
+        self._last_fetch = time.monotonic()
+        rows = await self.generation_repository.get_pending_generations(
+            GENERATION_FETCH_LIMIT, exclude_ids=list(self._queued_ids)
+        )
+        for generation in rows:
+            generation_id = generation["generation_id"]
+            if generation_id in self._queued_ids or generation_id in self._in_flight:
+                continue
+            self._queued_ids.add(generation_id)
+            generation["_enqueued_at"] = time.monotonic()
+            self._queue.push(generation, generation["user_id"], get_lane(generation))
+
+    def _expire_in_flight(self) -> None:
+        """Освобождает слоты генераций, о завершении которых так и не сообщили"""
+        deadline = time.monotonic() - GENERATION_INFLIGHT_TIMEOUT
+        for generation_id, sent_at in list(self._in_flight.items()):
+            if sent_at < deadline:
+                self._in_flight.pop(generation_id, None)
+                self._stats["expired"] += 1
+                logger.warning(f"Генерация {generation_id} не завершилась за {GENERATION_INFLIGHT_TIMEOUT:.0f} сек., слот освобожден")
+
+    async def _dispatch(self, generation: Dict[str, Any]) -> None:
+        generation_id = generation["generation_id"]
+
+        # Генерацию мог забрать другой процесс или отменить пользователь
+        claimed = await self.generation_repository.claim_pending(generation_id)
+        if claimed is None:
+            self._stats["lost_claims"] += 1
+            self.release(generation_id)
+            return
+
+        self._wait_times.append(time.monotonic() - generation["_enqueued_at"])
+        self._dispatch_times.append(time.monotonic())
+
+        try:
+            external_id = await self.submit(generation)
+            await self.generation_repository.update(generation_id, {"external_id": external_id})
+            self._stats["dispatched"] += 1
+        except Exception as e:
+            self._stats["submit_errors"] += 1
+            self.release(generation_id)
+            logger.error(f"Не удалось отправить генерацию {generation_id}: {e}")
+            # Генерация не состоялась - статус failed и возврат токенов одной транзакцией
+            await self.generation_repository.fail_and_refund(generation_id)
+
+    def _start_dispatch(self, generation: Dict[str, Any]) -> None:
+        """Занимает слот и отправляет генерацию в фоне, не задерживая очередь"""
+        generation_id = generation["generation_id"]
+        self._queued_ids.discard(generation_id)
+        self._in_flight[generation_id] = time.monotonic()
+
+        task = asyncio.create_task(self._dispatch(generation))
+        self._dispatch_tasks.add(task)
+
+        def done(t: asyncio.Task) -> None:
+            self._dispatch_tasks.discard(t)
+            if not t.cancelled() and t.exception() is not None:
+                self.release(generation_id)
+                logger.error(f"Ошибка при отправке генерации {generation_id}: {t.exception()}")
+
+        task.add_done_callback(done)
+
+    async def _run(self) -> None:
+        logger.info(f"Диспетчер генераций запущен (одновременно генераций: {self.max_concurrency})")
+        while True:
+            try:
+                self._expire_in_flight()
+                if time.monotonic() - self._last_fetch >= GENERATION_FETCH_INTERVAL:
+                    await self._fetch()
+
+                while len(self._in_flight) < self.max_concurrency and len(self._queue):
+                    self._start_dispatch(self._queue.pop())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка в цикле диспетчера генераций: {e}")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=GENERATION_FETCH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    @property
+    def running(self) -> bool:
+        """Запущен ли диспетчер"""
+        return self._task is not None
+
+    async def start(self) -> None:
+        """
+        Запускает диспетчер. Для отправки в Replicate нужны GENERATION_MODEL_VERSION и
+        REPLICATE_WEBHOOK_URL: без вебхука о завершении генерации никто не сообщит и слоты
+        останутся занятыми до GENERATION_INFLIGHT_TIMEOUT, поэтому диспетчер не запускается.
+        """
+        if self._task is not None:
+            return
+        if self.submit is submit_generation and not (GENERATION_MODEL_VERSION and REPLICATE_WEBHOOK_URL):
+            missing = [name for name, value in (("GENERATION_MODEL_VERSION", GENERATION_MODEL_VERSION),
+                                                ("REPLICATE_WEBHOOK_URL", REPLICATE_WEBHOOK_URL)) if not value]
+            logger.error(f"Диспетчер генераций не запущен: не задан {', '.join(missing)}")
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает диспетчер. Генерации, не отправленные провайдеру, остаются в статусе pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            if self._dispatch_tasks:
+                await asyncio.gather(*self._dispatch_tasks, return_exceptions=True)
+            logger.info("Диспетчер генераций остановлен")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики диспетчера
+
+        Returns:
+            Глубина очереди, занятые слоты, время ожидания и частота отправки
+        """
+        now = time.monotonic()
+        while self._dispatch_times and self._dispatch_times[0] < now - RATE_WINDOW:
+            self._dispatch_times.popleft()
+
+        waits = sorted(self._wait_times)
+        return {
+            "running": self.running,
+            "queue": self._queue.depth(),
+            "in_flight": len(self._in_flight),
+            "max_concurrency": self.max_concurrency,
+            "wait_avg_s": round(sum(waits) / len(waits), 3) if waits else None,
+            "wait_p95_s": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else None,
+            "dispatch_rate_per_min": len(self._dispatch_times) * 60.0 / RATE_WINDOW,
+            **self._stats,
+        }
+
+
+# Общий экземпляр, создается при первом обращении
+_generation_dispatcher: Optional[GenerationDispatcher] = None
+
+
+def get_generation_dispatcher() -> GenerationDispatcher:
+    """
+    Возвращает общий экземпляр диспетчера генераций
+
+    Returns:
+        GenerationDispatcher: Диспетчер
+    """
+    global _generation_dispatcher
+    if _generation_dispatcher is None:
+        from repository.async_generation_repository import AsyncGenerationRepository
+        _generation_dispatcher = GenerationDispatcher(AsyncGenerationRepository())
+    return _generation_dispatcher
@@ -0,0 +1,194 @@
+import os
+import json
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Set
+
+import asyncpg
+
+from repository.status_events import STATUS_CHANNEL
+from repository.engine import connect_dedicated
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+# Сколько событий может ждать отправки одному подписчику; при переполнении старые события отбрасываются
+STATUS_SUBSCRIBER_QUEUE_SIZE = int(os.getenv("STATUS_SUBSCRIBER_QUEUE_SIZE", "100"))
+# Пауза перед повторным подключением к базе данных, растет до максимальной
+LISTENER_RECONNECT_MIN_DELAY = 1.0
+LISTENER_RECONNECT_MAX_DELAY = 30.0
+
+
+class StatusSubscription:
+    """
+    Подписка на события одного пользователя. События читаются через get().
+    """
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=STATUS_SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    def put(self, event: Dict[str, Any]) -> None:
+        if self.queue.full():
+            # Медленный клиент не должен задерживать остальных: отбрасываем самое старое событие
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self) -> Dict[str, Any]:
+        return await self.queue.get()
+
+
+class StatusListener:
+    """
+    Слушает канал PostgreSQL LISTEN/NOTIFY с изменениями статусов моделей
+    и генераций и раздает события подписчикам по user_id.
+
+    Использует одно выделенное соединение на процесс. При обрыве соединения
+    переподключается и отправляет подписчикам событие resync: уведомления,
+    пришедшие во время обрыва, потеряны, и клиенту нужно перечитать состояние.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[StatusSubscription]] = {}
+        self._conn: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._connection_lost = asyncio.Event()
+        self._stats = {"events": 0, "delivered": 0, "reconnects": 0, "invalid": 0}
+
+    def subscribe(self, user_id: int) -> StatusSubscription:
+        """
+        Подписывает на события пользователя
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            StatusSubscription: Подписка
+        """
+        subscription = StatusSubscription(user_id)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: StatusSubscription) -> None:
+        """
+        Отменяет подписку
+
+        Args:
+            subscription: Подписка
+        """
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        self._stats["events"] += 1
+        try:
+            event = json.loads(payload)
+            user_id = int(event["user_id"])
+        except (ValueError, KeyError, TypeError):
+            self._stats["invalid"] += 1
+            logger.warning(f"Некорректное уведомление в канале {channel}: {payload}")
+            return
+
+        for subscription in self._subscribers.get(user_id, ()):
+            subscription.put(event)
+            self._stats["delivered"] += 1
+
+    def _on_termination(self, connection) -> None:
+        self._connection_lost.set()
+
+    async def _connect(self) -> None:
+        self._conn = await connect_dedicated()
+        self._conn.add_termination_listener(self._on_termination)
+        await self._conn.add_listener(STATUS_CHANNEL, self._on_notification)
+        self._connection_lost.clear()
+
+    async def _close_connection(self) -> None:
+        if self._conn is not None and not self._conn.is_closed():
+            try:
+                await self._conn.close(timeout=5)
+            except Exception:
+                self._conn.terminate()
+        self._conn = None
+
+    def _broadcast_resync(self) -> None:
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                subscription.put({"kind": "resync"})
+
+    async def _run(self) -> None:
+        delay = LISTENER_RECONNECT_MIN_DELAY
+        first = True
+        while True:
+            try:
+                await self._connect()
+                logger.info(f"Подписка на канал {STATUS_CHANNEL} установлена")
+                if not first:
+                    self._stats["reconnects"] += 1
+                    self._broadcast_resync()
+                first = False
+                delay = LISTENER_RECONNECT_MIN_DELAY
+                await self._connection_lost.wait()
+                logger.warning(f"Соединение подписки на канал {STATUS_CHANNEL} потеряно")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка подписки на канал {STATUS_CHANNEL}: {e}")
+            finally:
+                await self._close_connection()
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, LISTENER_RECONNECT_MAX_DELAY)
+
+    async def start(self) -> None:
+        """Запускает прослушивание канала"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает прослушивание канала"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info(f"Подписка на канал {STATUS_CHANNEL} остановлена")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики подписки
+
+        Returns:
+            Количество подписчиков, событий и переподключений
+        """
+        subscriptions = [s for subscribers in self._subscribers.values() for s in subscribers]
+        return {
+            "connected": self._conn is not None and not self._conn.is_closed(),
+            "users": len(self._subscribers),
+            "subscriptions": len(subscriptions),
+            "dropped": sum(s.dropped for s in subscriptions),
+            **self._stats,
+        }
+
+
+# Общий экземпляр, создается при первом обращении
+_status_listener: Optional[StatusListener] = None
+
+
+def get_status_listener() -> StatusListener:
+    """
+    Возвращает общий экземпляр подписки на изменения статусов
+
+    Returns:
+        StatusListener: Подписка
+    """
+    global _status_listener
+    if _status_listener is None:
+        _status_listener = StatusListener()
+    return _status_listener
@@ -0,0 +1,350 @@
+import os
+import shutil
+import hashlib
+import logging
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from PIL import Image
+
+from utils.training_utils import (
+    BASE_UPLOAD_DIR,
+    IMAGE_PREPROCESS_MODE,
+    TRAINING_MAX_EDGE,
+    TRAINING_JPEG_QUALITY,
+    convert_images_parallel,
+)
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+# Директория кэша конвертированных фотографий (ключ - хэш исходных байтов)
+PHOTO_CACHE_DIR = os.getenv("PHOTO_CACHE_DIR", os.path.join(BASE_UPLOAD_DIR, ".cache"))
+
+# Максимальный размер кэша в байтах, при превышении удаляются давно не использованные файлы
+PHOTO_CACHE_MAX_BYTES = int(os.getenv("PHOTO_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+# Максимальное расстояние Хэмминга между перцептивными хэшами, при котором фотографии считаются почти одинаковыми
+PHOTO_DUPLICATE_DISTANCE = int(os.getenv("PHOTO_DUPLICATE_DISTANCE", "6"))
+
+# Как часто (в секундах) пересчитывать размер кэша обходом директории, даже если оценка не превышает лимит:
+# оценка учитывает только файлы, сохраненные этим процессом
+PHOTO_CACHE_RESCAN_INTERVAL = int(os.getenv("PHOTO_CACHE_RESCAN_INTERVAL", "600"))
+
+# Счетчики попаданий в кэш
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evicted": 0}
+
+# Оценка размера кэша в байтах (None - еще не подсчитан) и время последнего обхода директории
+_size_lock = threading.Lock()
+_estimated_size: Optional[int] = None
+_last_scan_at = 0.0
+
+
+def _variant() -> str:
+    """
+    Возвращает суффикс ключа кэша, зависящий от параметров предобработки:
+    при их изменении старые результаты не используются
+    """
+    if IMAGE_PREPROCESS_MODE == "training":
+        return f"training{TRAINING_MAX_EDGE}q{TRAINING_JPEG_QUALITY}"
+    return IMAGE_PREPROCESS_MODE
+
+
+def get_cache_key(content: bytes) -> str:
+    """
+    Вычисляет ключ кэша для содержимого загруженной фотографии.
+
+    Args:
+        content (bytes): Исходные байты фотографии
+
+    Returns:
+        str: Ключ кэша
+    """
+    return f"{hashlib.sha256(content).hexdigest()}_{_variant()}"
+
+
+def _cache_path(key: str) -> str:
+    """Путь к файлу кэша; файлы раскладываются по подкаталогам по первым символам хэша"""
+    return os.path.join(PHOTO_CACHE_DIR, key[:2], f"{key}.jpg")
+
+
+def _link_or_copy(source: str, destination: str) -> None:
+    """
+    Создает жесткую ссылку на файл, а если файловая система этого не позволяет - копирует его.
+
+    Args:
+        source (str): Исходный файл
+        destination (str): Путь назначения (существующий файл заменяется)
+    """
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+def lookup(key: str) -> Optional[str]:
+    """
+    Ищет конвертированную фотографию в кэше и отмечает ее как недавно использованную.
+
+    Args:
+        key (str): Ключ кэша
+
+    Returns:
+        Optional[str]: Путь к файлу в кэше или None, если его нет
+    """
+    path = _cache_path(key)
+    try:
+        # Время изменения файла используется как время последнего обращения для вытеснения
+        os.utime(path)
+        return path
+    except OSError:
+        return None
+
+
+def store(key: str, converted_path: str) -> None:
+    """
+    Сохраняет конвертированную фотографию в кэш.
+
+    Args:
+        key (str): Ключ кэша
+        converted_path (str): Путь к конвертированной фотографии
+    """
+    path = _cache_path(key)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _link_or_copy(converted_path, tmp_path)
+        added = os.path.getsize(tmp_path)
+        replaced = os.path.getsize(path) if os.path.exists(path) else 0
+        # Атомарная замена: параллельные загрузки одного и того же файла не видят недописанный результат
+        os.replace(tmp_path, path)
+        _add_to_size(added - replaced)
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить фотографию в кэш {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _add_to_size(delta: int) -> None:
+    """Учитывает изменение размера кэша, если он уже подсчитан"""
+    global _estimated_size
+    with _size_lock:
+        if _estimated_size is not None:
+            _estimated_size += delta
+
+
+def evict(max_bytes: int = PHOTO_CACHE_MAX_BYTES) -> int:
+    """
+    Удаляет давно не использованные фотографии, пока размер кэша превышает max_bytes.
+
+    Директория обходится только при первом вызове, когда оценка размера превышает
+    max_bytes, или раз в PHOTO_CACHE_RESCAN_INTERVAL секунд; в остальных случаях
+    вызов почти ничего не стоит. Недописанные временные файлы не учитываются и не удаляются.
+
+    Args:
+        max_bytes (int): Допустимый размер кэша в байтах
+
+    Returns:
+        int: Количество удаленных файлов
+    """
+    global _estimated_size, _last_scan_at
+    with _size_lock:
+        rescan_due = time.monotonic() - _last_scan_at >= PHOTO_CACHE_RESCAN_INTERVAL
+        if _estimated_size is not None and _estimated_size <= max_bytes and not rescan_due:
+            return 0
+
+    entries = []
+    total_size = 0
+    for root, _, files in os.walk(PHOTO_CACHE_DIR):
+        for filename in files:
+            # Временные файлы принадлежат сохранениям, которые еще выполняются
+            if filename.endswith(".tmp"):
+                continue
+            path = os.path.join(root, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+    removed = 0
+    if total_size > max_bytes:
+        for _, size, path in sorted(entries):
+            if total_size <= max_bytes:
+                break
+            try:
+                # Пользовательские копии - жесткие ссылки, поэтому удаление из кэша их не затрагивает
+                os.remove(path)
+                total_size -= size
+                removed += 1
+            except OSError as e:
+                logger.warning(f"Не удалось удалить файл кэша {path}: {e}")
+
+    with _size_lock:
+        _estimated_size = total_size
+        _last_scan_at = time.monotonic()
+
+    if removed:
+        with _stats_lock:
+            _stats["evicted"] += removed
+        logger.info(f"Из кэша фотографий удалено {removed} файлов, размер кэша: {total_size} байт")
+    return removed
+
+
+def compute_dhash(image_path: str, hash_size: int = 8) -> int:
+    """
+    Вычисляет разностный перцептивный хэш (dHash) изображения.
+    Похожие изображения (пересжатые, слегка обрезанные, с другой яркостью) дают близкие хэши.
+
+    Args:
+        image_path (str): Путь к изображению
+        hash_size (int): Размер хэша по стороне (8 - 64-битный хэш)
+
+    Returns:
+        int: Перцептивный хэш
+    """
+    with Image.open(image_path) as img:
+        img.draft("L", (hash_size * 8, hash_size * 8))
+        pixels = list(img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS).getdata())
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def find_near_duplicates(image_paths: List[str], max_distance: int = PHOTO_DUPLICATE_DISTANCE) -> List[Dict[str, Any]]:
+    """
+    Находит почти одинаковые фотографии в наборе.
+
+    Args:
+        image_paths (List[str]): Пути к конвертированным фотографиям
+        max_distance (int): Максимальное расстояние Хэмминга между хэшами дубликатов
+
+    Returns:
+        List[Dict[str, Any]]: Список вида {"index", "duplicate_of", "distance"}, где индексы - позиции в image_paths
+    """
+    hashes: List[Tuple[int, int]] = []
+    duplicates = []
+    for index, path in enumerate(image_paths):
+        try:
+            value = compute_dhash(path)
+        except Exception as e:
+            logger.warning(f"Не удалось вычислить перцептивный хэш {path}: {e}")
+            continue
+
+        # Сравниваем с уже просмотренными фотографиями: наборы небольшие, полный перебор дешевле индекса
+        for other_index, other_value in hashes:
+            distance = bin(value ^ other_value).count("1")
+            if distance <= max_distance:
+                duplicates.append({"index": index, "duplicate_of": other_index, "distance": distance})
+                break
+        hashes.append((index, value))
+    return duplicates
+
+
+def convert_images_cached(uploads: List[bytes], output_dir: str) -> Dict[str, Any]:
+    """
+    Конвертирует загруженные фотографии, используя кэш конвертированных результатов.
+    Фотографии, уже обработанные ранее (или повторяющиеся в этом наборе), не конвертируются
+    заново, а связываются с готовым файлом жесткой ссылкой.
+
+    Args:
+        uploads (List[bytes]): Содержимое загруженных фотографий
+        output_dir (str): Директория для сохранения конвертированных фотографий
+
+    Returns:
+        Dict[str, Any]: Отчет о конвертации:
+            converted - пути к конвертированным фотографиям в исходном порядке
+            failed - список ошибок вида {"index", "source", "error"} (индексы с 1, как в convert_images_parallel)
+            cache_hits - количество фотографий, взятых из кэша
+            near_duplicates - список почти одинаковых фотографий {"index", "duplicate_of", "distance"} (индексы с 1)
+    """
+    keys = [get_cache_key(content) for content in uploads]
+    outputs = {index: os.path.join(output_dir, f"image_{index}.jpg") for index in range(1, len(uploads) + 1)}
+
+    ready: Dict[int, str] = {}
+    first_by_key: Dict[str, int] = {}
+    miss_indices = []
+    for index, key in enumerate(keys, start=1):
+        cached_path = lookup(key)
+        if cached_path is not None:
+            try:
+                _link_or_copy(cached_path, outputs[index])
+                ready[index] = outputs[index]
+                continue
+            except OSError as e:
+                logger.warning(f"Не удалось взять фотографию №{index} из кэша: {e}")
+        if key not in first_by_key:
+            first_by_key[key] = index
+            miss_indices.append(index)
+
+    cache_hits = len(ready)
+
+    # Конвертируем только то, чего нет в кэше, по одному разу на уникальное содержимое
+    conversion = {"converted": [], "failed": []}
+    if miss_indices:
+        conversion = convert_images_parallel(
+            [uploads[index - 1] for index in miss_indices], output_dir, indices=miss_indices
+        )
+    failed_by_index = {failed["index"]: failed for failed in conversion["failed"]}
+
+    for index in miss_indices:
+        if index not in failed_by_index:
+            ready[index] = outputs[index]
+            store(keys[index - 1], outputs[index])
+
+    # Повторы внутри набора получают результат первого вхождения
+    failed = list(conversion["failed"])
+    for index, key in enumerate(keys, start=1):
+        if index in ready or index in failed_by_index:
+            continue
+        first_index = first_by_key[key]
+        if first_index in ready:
+            _link_or_copy(ready[first_index], outputs[index])
+            ready[index] = outputs[index]
+        else:
+            failed.append({**failed_by_index[first_index], "index": index})
+
+    with _stats_lock:
+        _stats["hits"] += cache_hits
+        _stats["misses"] += len(miss_indices)
+
+    ordered_indices = sorted(ready)
+    converted = [ready[index] for index in ordered_indices]
+    near_duplicates = [
+        {
+            "index": ordered_indices[duplicate["index"]],
+            "duplicate_of": ordered_indices[duplicate["duplicate_of"]],
+            "distance": duplicate["distance"],
+        }
+        for duplicate in find_near_duplicates(converted)
+    ]
+    if near_duplicates:
+        logger.info(f"Найдено почти одинаковых фотографий: {len(near_duplicates)}")
+
+    logger.info(f"Конвертация с кэшем: {len(converted)} из {len(uploads)} фотографий, из кэша: {cache_hits}")
+    return {
+        "converted": converted,
+        "failed": sorted(failed, key=lambda item: item["index"]),
+        "cache_hits": cache_hits,
+        "near_duplicates": near_duplicates,
+    }
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """
+    Возвращает счетчики кэша фотографий
+
+    Returns:
+        Dict[str, int]: Количество попаданий, промахов и вытесненных файлов
+    """
+    with _stats_lock:
+        return dict(_stats)
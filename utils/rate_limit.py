@@ -0,0 +1,49 @@
+import time
+import asyncio
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Асинхронный ограничитель частоты запросов по алгоритму token bucket.
+
+    Корзина вмещает capacity токенов и пополняется со скоростью rate токенов в секунду.
+    Каждый запрос забирает токен; если корзина пуста, запрос ждет пополнения.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Забирает токены из корзины, дожидаясь их пополнения при необходимости
+
+        Args:
+            tokens: Количество токенов
+        """
+        # Блокировка сохраняет порядок ожидающих: токены получает тот, кто пришел раньше
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                delay = (tokens - self._tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+    @property
+    def available(self) -> float:
+        """Количество токенов, доступных прямо сейчас"""
+        self._refill()
+        return self._tokens
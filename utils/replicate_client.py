@@ -0,0 +1,324 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+from utils.rate_limit import TokenBucket
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+# Адрес API Replicate (для тестов указывается адрес utils/replicate_fake_server.py)
+REPLICATE_API_BASE_URL = os.getenv("REPLICATE_API_BASE_URL", "https://api.replicate.com/v1")
+REPLICATE_API_TOKEN = os.getenv("REPLICATE_API_TOKEN")
+
+# Ограничения Replicate: 600 запросов в минуту на создание предсказаний, 3000 в минуту на остальные запросы
+REPLICATE_CREATE_RATE = float(os.getenv("REPLICATE_CREATE_RATE", "10"))
+REPLICATE_REQUEST_RATE = float(os.getenv("REPLICATE_REQUEST_RATE", "50"))
+
+# Параметры соединений и повторов
+REPLICATE_MAX_CONNECTIONS = int(os.getenv("REPLICATE_MAX_CONNECTIONS", "20"))
+REPLICATE_TIMEOUT = float(os.getenv("REPLICATE_TIMEOUT", "30"))
+REPLICATE_MAX_RETRIES = int(os.getenv("REPLICATE_MAX_RETRIES", "3"))
+REPLICATE_RETRY_BASE_DELAY = float(os.getenv("REPLICATE_RETRY_BASE_DELAY", "0.5"))
+REPLICATE_RETRY_MAX_DELAY = float(os.getenv("REPLICATE_RETRY_MAX_DELAY", "10"))
+
+# Параметры предохранителя: после N ошибок подряд запросы не отправляются reset_timeout секунд
+REPLICATE_BREAKER_THRESHOLD = int(os.getenv("REPLICATE_BREAKER_THRESHOLD", "5"))
+REPLICATE_BREAKER_RESET_TIMEOUT = float(os.getenv("REPLICATE_BREAKER_RESET_TIMEOUT", "30"))
+
+
+class ReplicateError(Exception):
+    """
+    Исключение, возникающее при ошибке запроса к Replicate
+    """
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        self.status = status
+        super().__init__(message)
+
+
+class CircuitOpenError(ReplicateError):
+    """
+    Исключение, возникающее, когда предохранитель разомкнут и запросы к Replicate временно не отправляются
+    """
+    pass
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для внешнего API.
+
+    closed - запросы проходят; после failure_threshold ошибок подряд переходит в open.
+    open - запросы сразу отклоняются; через reset_timeout переходит в half-open.
+    half-open - пропускается один пробный запрос: успех замыкает предохранитель, ошибка снова размыкает,
+    а прочий исход (429, отмена) только освобождает место для следующего пробного запроса.
+    """
+
+    def __init__(self, failure_threshold: int = REPLICATE_BREAKER_THRESHOLD,
+                 reset_timeout: float = REPLICATE_BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Проверяет, можно ли отправить запрос"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info("Предохранитель Replicate замкнут")
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Освобождает пробный запрос, если он завершился без успеха и без ошибки"""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._probe_in_flight or self._failures >= self.failure_threshold:
+            if self._opened_at is None or self._probe_in_flight:
+                logger.warning(f"Предохранитель Replicate разомкнут после {self._failures} ошибок подряд")
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+class AsyncReplicateClient:
+    """
+    Асинхронный клиент HTTP API Replicate.
+
+    Использует одну сессию aiohttp с пулом keep-alive соединений, ограничивает
+    частоту запросов в соответствии с лимитами Replicate, повторяет запросы
+    при сетевых ошибках, 429 и 5xx с экспоненциальной задержкой и случайным
+    разбросом (создание предсказаний - только при 429 и ошибках соединения),
+    а при устойчивых сбоях размыкает предохранитель.
+    """
+
+    def __init__(self, api_token: Optional[str] = REPLICATE_API_TOKEN, base_url: str = REPLICATE_API_BASE_URL,
+                 max_connections: int = REPLICATE_MAX_CONNECTIONS, timeout: float = REPLICATE_TIMEOUT,
+                 max_retries: int = REPLICATE_MAX_RETRIES):
+        self.api_token = api_token
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        self.create_limiter = TokenBucket(REPLICATE_CREATE_RATE)
+        self.request_limiter = TokenBucket(REPLICATE_REQUEST_RATE)
+        self.breaker = CircuitBreaker()
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._stats = {"requests": 0, "retries": 0, "errors": 0, "rejected_by_breaker": 0}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Сессия создается в работающем event loop при первом запросе
+        if self._session is None or self._session.closed:
+            headers = {"Content-Type": "application/json"}
+            if self.api_token:
+                headers["Authorization"] = f"Bearer {self.api_token}"
+            self._session = aiohttp.ClientSession(
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60),
+            )
+        return self._session
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Экспоненциальная задержка с полным случайным разбросом, чтобы повторы клиентов не совпадали
+        return random.uniform(0, min(REPLICATE_RETRY_MAX_DELAY, REPLICATE_RETRY_BASE_DELAY * 2 ** attempt))
+
+    async def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None,
+                       limiter: Optional[TokenBucket] = None, idempotent: bool = True) -> Dict[str, Any]:
+        """
+        Выполняет запрос к API Replicate
+
+        Args:
+            method: HTTP-метод
+            path: Путь относительно базового адреса API
+            payload: Тело запроса
+            limiter: Ограничитель частоты для этого типа запросов
+            idempotent: Можно ли повторять запрос, который мог дойти до Replicate. Неидемпотентные
+                запросы повторяются только после 429 и ошибок установки соединения
+
+        Returns:
+            Ответ API в виде словаря
+
+        Raises:
+            CircuitOpenError: Если предохранитель разомкнут
+            ReplicateError: Если запрос не удался
+        """
+        url = f"{self.base_url}{path}"
+        last_error: Optional[ReplicateError] = None
+
+        for attempt in range(self.max_retries + 1):
+            is_probe = self.breaker.state == "half-open"
+            if not self.breaker.allow():
+                self._stats["rejected_by_breaker"] += 1
+                raise CircuitOpenError("Replicate временно недоступен, запросы приостановлены")
+
+            retry_after = None
+            try:
+                await (limiter or self.request_limiter).acquire()
+                self._stats["requests"] += 1
+                async with self._get_session().request(method, url, json=payload) as response:
+                    body = await response.json(content_type=None)
+                    if response.status < 400:
+                        self.breaker.record_success()
+                        return body or {}
+
+                    detail = body.get("detail") if isinstance(body, dict) else body
+                    last_error = ReplicateError(f"{method} {path}: HTTP {response.status}: {detail}", response.status)
+                    if response.status == 429:
+                        # Превышение лимита - не сбой Replicate, предохранитель не трогаем
+                        retry_after = response.headers.get("Retry-After")
+                    elif response.status >= 500:
+                        self.breaker.record_failure()
+                        if not idempotent:
+                            # Запрос мог быть выполнен до сбоя - повтор создаст дубликат
+                            raise last_error
+                    else:
+                        # Ошибки клиента (4xx) повторять бессмысленно
+                        self.breaker.record_success()
+                        raise last_error
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                self.breaker.record_failure()
+                last_error = ReplicateError(f"{method} {path}: {type(e).__name__}: {e}")
+                # Повторять неидемпотентный запрос безопасно, только если соединение не было установлено
+                if not idempotent and not isinstance(e, aiohttp.ClientConnectorError):
+                    raise last_error from e
+            finally:
+                # Пробный запрос, завершившийся 429 или отменой, не должен навсегда блокировать предохранитель
+                if is_probe:
+                    self.breaker.release_probe()
+
+            if attempt < self.max_retries:
+                self._stats["retries"] += 1
+                delay = self._retry_delay(attempt, retry_after)
+                logger.warning(f"{last_error}; повтор через {delay:.2f} сек. (попытка {attempt + 1})")
+                await asyncio.sleep(delay)
+
+        self._stats["errors"] += 1
+        raise last_error
+
+    async def create_prediction(self, version: str, input_data: Dict[str, Any], webhook: Optional[str] = None,
+                                webhook_events_filter: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Создает предсказание (запуск модели или обучения)
+
+        Args:
+            version: ID версии модели
+            input_data: Входные параметры модели
+            webhook: URL для вебхуков о ходе выполнения
+            webhook_events_filter: События, о которых отправлять вебхуки
+
+        Returns:
+            Данные созданного предсказания
+        """
+        payload: Dict[str, Any] = {"version": version, "input": input_data}
+        if webhook:
+            payload["webhook"] = webhook
+            if webhook_events_filter:
+                payload["webhook_events_filter"] = webhook_events_filter
+        # Replicate не поддерживает ключи идемпотентности, поэтому после таймаута или 5xx запрос не повторяется
+        return await self._request("POST", "/predictions", payload, limiter=self.create_limiter, idempotent=False)
+
+    async def get_prediction(self, prediction_id: str) -> Dict[str, Any]:
+        """
+        Получает состояние предсказания
+
+        Args:
+            prediction_id: ID предсказания
+
+        Returns:
+            Данные предсказания (status, output, error, metrics, ...)
+        """
+        return await self._request("GET", f"/predictions/{prediction_id}")
+
+    async def cancel_prediction(self, prediction_id: str) -> Dict[str, Any]:
+        """
+        Отменяет предсказание
+
+        Args:
+            prediction_id: ID предсказания
+
+        Returns:
+            Данные предсказания
+        """
+        return await self._request("POST", f"/predictions/{prediction_id}/cancel")
+
+    async def close(self) -> None:
+        """Закрывает HTTP-сессию"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики клиента
+
+        Returns:
+            Счетчики запросов, состояние предохранителя и время ожидания лимитов
+        """
+        return {
+            **self._stats,
+            "breaker": self.breaker.state,
+            "rate_limit_wait_s": round(self.create_limiter.waited + self.request_limiter.waited, 3),
+        }
+
+
+# Общий экземпляр клиента
+_replicate_client: Optional[AsyncReplicateClient] = None
+
+
+def get_replicate_client() -> AsyncReplicateClient:
+    """
+    Возвращает общий клиент Replicate
+
+    Returns:
+        AsyncReplicateClient: Клиент
+    """
+    global _replicate_client
+    if _replicate_client is None:
+        _replicate_client = AsyncReplicateClient()
+    return _replicate_client
+
+
+async def close_replicate_client() -> None:
+    """
+    Закрывает общий клиент Replicate (вызывается при остановке приложения)
+    """
+    global _replicate_client
+    if _replicate_client is not None:
+        await _replicate_client.close()
+        _replicate_client = None
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+"""
+Локальный фейковый сервер API Replicate для тестов и разработки.
+
+Поддерживает создание, получение и отмену предсказаний. Предсказание проходит
+статусы starting -> processing -> succeeded за заданное время, по завершении
+отправляется подписанный вебхук. Можно включить случайные ошибки 5xx и 429,
+чтобы проверить повторы, лимиты и предохранитель клиента.
+
+Пример запуска:
+    python -m utils.replicate_fake_server --port 8089 --duration 5
+    REPLICATE_API_BASE_URL=http://127.0.0.1:8089/v1 python api.py
+"""
+import time
+import uuid
+import base64
+import hashlib
+import hmac
+import json
+import random
+import asyncio
+import logging
+import argparse
+from typing import Any, Dict, Optional
+
+from aiohttp import ClientSession, web
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+
+class FakeReplicateServer:
+    """
+    Состояние фейкового сервера Replicate
+
+    Args:
+        duration: Время выполнения предсказания в секундах
+        error_rate: Доля запросов, на которые отвечаем 500
+        rate_limit_rate: Доля запросов, на которые отвечаем 429
+        fail_predictions: Доля предсказаний, завершающихся со статусом failed
+        webhook_secret: Секрет подписи вебхуков (whsec_...)
+    """
+
+    def __init__(self, duration: float = 5.0, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 fail_predictions: float = 0.0, webhook_secret: Optional[str] = None):
+        self.duration = duration
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.fail_predictions = fail_predictions
+        self.webhook_secret = webhook_secret
+        self.predictions: Dict[str, Dict[str, Any]] = {}
+        self.request_count = 0
+        self._tasks = set()
+
+    def _prediction_view(self, prediction: Dict[str, Any]) -> Dict[str, Any]:
+        """Вычисляет текущий статус предсказания по прошедшему времени"""
+        if prediction["status"] in ("starting", "processing"):
+            elapsed = time.time() - prediction["created"]
+            if elapsed >= self.duration:
+                self._finish(prediction)
+            elif elapsed >= self.duration / 5:
+                prediction["status"] = "processing"
+        return {key: value for key, value in prediction.items() if not key.startswith("_") and key != "created"}
+
+    def _finish(self, prediction: Dict[str, Any]) -> None:
+        if prediction["_fail"]:
+            prediction["status"] = "failed"
+            prediction["error"] = "Fake prediction failure"
+        else:
+            prediction["status"] = "succeeded"
+            prediction["output"] = {
+                "model_url": f"https://replicate.example.com/models/{prediction['id']}",
+                "url": f"https://replicate.example.com/outputs/{prediction['id']}.png",
+            }
+        prediction["completed_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        prediction["metrics"] = {"predict_time": round(self.duration, 3)}
+
+    @web.middleware
+    async def faults_middleware(self, request: web.Request, handler):
+        """Имитирует сбои и превышение лимитов"""
+        self.request_count += 1
+        if request.headers.get("Authorization", "").split(" ")[0] != "Bearer":
+            return web.json_response({"detail": "Unauthenticated"}, status=401)
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            return web.json_response({"detail": "Request was throttled"}, status=429, headers={"Retry-After": "1"})
+        if roll < self.rate_limit_rate + self.error_rate:
+            return web.json_response({"detail": "Internal server error"}, status=500)
+        return await handler(request)
+
+    async def create_prediction(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        if "version" not in payload or "input" not in payload:
+            return web.json_response({"detail": "version and input are required"}, status=422)
+
+        prediction_id = uuid.uuid4().hex[:26]
+        prediction = {
+            "id": prediction_id,
+            "version": payload["version"],
+            "input": payload["input"],
+            "status": "starting",
+            "output": None,
+            "error": None,
+            "metrics": {},
+            "created": time.time(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "urls": {
+                "get": f"{request.url.origin()}/v1/predictions/{prediction_id}",
+                "cancel": f"{request.url.origin()}/v1/predictions/{prediction_id}/cancel",
+            },
+            "_fail": random.random() < self.fail_predictions,
+        }
+        self.predictions[prediction_id] = prediction
+
+        if payload.get("webhook"):
+            task = asyncio.create_task(self._send_webhook_later(prediction, payload["webhook"]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        return web.json_response(self._prediction_view(prediction), status=201)
+
+    async def get_prediction(self, request: web.Request) -> web.Response:
+        prediction = self.predictions.get(request.match_info["prediction_id"])
+        if prediction is None:
+            return web.json_response({"detail": "Not found"}, status=404)
+        return web.json_response(self._prediction_view(prediction))
+
+    async def cancel_prediction(self, request: web.Request) -> web.Response:
+        prediction = self.predictions.get(request.match_info["prediction_id"])
+        if prediction is None:
+            return web.json_response({"detail": "Not found"}, status=404)
+        if prediction["status"] in ("starting", "processing"):
+            prediction["status"] = "canceled"
+        return web.json_response(self._prediction_view(prediction))
+
+    def _sign(self, webhook_id: str, timestamp: str, body: bytes) -> str:
+        secret = self.webhook_secret.split("_", 1)[1] if self.webhook_secret.startswith("whsec_") else self.webhook_secret
+        signed_content = f"{webhook_id}.{timestamp}.".encode() + body
+        digest = hmac.new(base64.b64decode(secret), signed_content, hashlib.sha256).digest()
+        return f"v1,{base64.b64encode(digest).decode()}"
+
+    async def _send_webhook_later(self, prediction: Dict[str, Any], webhook_url: str) -> None:
+        await asyncio.sleep(self.duration)
+        view = self._prediction_view(prediction)
+        if view["status"] not in ("succeeded", "failed", "canceled"):
+            return
+
+        body = json.dumps(view).encode()
+        webhook_id = f"msg_{uuid.uuid4().hex}"
+        timestamp = str(int(time.time()))
+        headers = {"Content-Type": "application/json", "webhook-id": webhook_id, "webhook-timestamp": timestamp}
+        if self.webhook_secret:
+            headers["webhook-signature"] = self._sign(webhook_id, timestamp, body)
+
+        try:
+            async with ClientSession() as session:
+                async with session.post(webhook_url, data=body, headers=headers) as response:
+                    logger.info(f"Вебхук {prediction['id']} отправлен на {webhook_url}: HTTP {response.status}")
+        except Exception as e:
+            logger.error(f"Не удалось отправить вебхук {prediction['id']}: {e}")
+
+    def create_app(self) -> web.Application:
+        """
+        Создает приложение aiohttp с маршрутами API Replicate
+
+        Returns:
+            web.Application: Приложение
+        """
+        app = web.Application(middlewares=[self.faults_middleware])
+        app.router.add_post("/v1/predictions", self.create_prediction)
+        app.router.add_get("/v1/predictions/{prediction_id}", self.get_prediction)
+        app.router.add_post("/v1/predictions/{prediction_id}/cancel", self.cancel_prediction)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Фейковый сервер API Replicate")
+    parser.add_argument("--host", default="127.0.0.1", help="Адрес сервера")
+    parser.add_argument("--port", type=int, default=8089, help="Порт сервера")
+    parser.add_argument("--duration", type=float, default=5.0, help="Время выполнения предсказания, сек.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Доля ответов 429")
+    parser.add_argument("--fail-predictions", type=float, default=0.0, help="Доля неудачных предсказаний")
+    parser.add_argument("--webhook-secret", default=None, help="Секрет подписи вебхуков (whsec_...)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = FakeReplicateServer(
+        duration=args.duration,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        fail_predictions=args.fail_predictions,
+        webhook_secret=args.webhook_secret,
+    )
+    web.run_app(server.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
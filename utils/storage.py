@@ -0,0 +1,613 @@
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import logging
+import tempfile
+import threading
+import xml.etree.ElementTree as ET
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+# Тип хранилища: "local" - локальная директория (для разработки и тестов), "s3" - S3-совместимое хранилище
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+
+# Настройки локального хранилища
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "storage")
+LOCAL_STORAGE_BASE_URL = os.getenv("LOCAL_STORAGE_BASE_URL", os.getenv("CLOUD_STORAGE_URL"))
+
+# Настройки S3-совместимого хранилища (AWS S3, MinIO, Yandex Object Storage и т.п.)
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "https://s3.amazonaws.com")
+S3_BUCKET = os.getenv("S3_BUCKET")
+S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID")
+S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY")
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+# Публичный адрес бакета; если не задан, возвращаются подписанные ссылки со сроком действия S3_URL_EXPIRES
+S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL")
+S3_URL_EXPIRES = int(os.getenv("S3_URL_EXPIRES", str(24 * 60 * 60)))
+
+# Параметры многочастной загрузки: размер части (не меньше 5 МБ по требованию S3) и число параллельных частей
+S3_PART_SIZE = max(int(os.getenv("S3_PART_SIZE", str(8 * 1024 * 1024))), 5 * 1024 * 1024)
+S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "4"))
+S3_MAX_RETRIES = int(os.getenv("S3_MAX_RETRIES", "5"))
+S3_TIMEOUT = float(os.getenv("S3_TIMEOUT", "60"))
+# Сверять ETag с MD5 (отключается для бакетов с шифрованием SSE-KMS/SSE-C, где ETag не равен MD5)
+S3_VERIFY_ETAG = os.getenv("S3_VERIFY_ETAG", "true").lower() == "true"
+
+# Суффикс файла состояния многочастной загрузки, по которому прерванная загрузка продолжается
+UPLOAD_STATE_SUFFIX = ".upload.json"
+
+
+class StorageError(Exception):
+    """
+    Исключение, возникающее при ошибке загрузки в хранилище
+    """
+    pass
+
+
+def _md5_base64(data: bytes) -> Tuple[str, str]:
+    """
+    Вычисляет MD5 данных
+
+    Returns:
+        Tuple[str, str]: (hex, base64) - hex сравнивается с ETag, base64 передается в Content-MD5
+    """
+    digest = hashlib.md5(data).digest()
+    return digest.hex(), base64.b64encode(digest).decode()
+
+
+class StorageBackend(ABC):
+    """Абстрактное хранилище файлов"""
+
+    @abstractmethod
+    def upload_file(self, path: str, key: str) -> str:
+        """
+        Загружает файл в хранилище
+
+        Args:
+            path: Путь к локальному файлу
+            key: Ключ объекта в хранилище
+
+        Returns:
+            URL загруженного объекта
+        """
+        pass
+
+    @abstractmethod
+    def upload_stream(self, stream: Iterable[bytes], key: str) -> str:
+        """
+        Загружает в хранилище поток байтов, размер которого заранее неизвестен
+
+        Args:
+            stream: Поток фрагментов данных
+            key: Ключ объекта в хранилище
+
+        Returns:
+            URL загруженного объекта
+        """
+        pass
+
+    @abstractmethod
+    def get_url(self, key: str) -> str:
+        """
+        Возвращает URL объекта, по которому его может скачать внешний сервис
+
+        Args:
+            key: Ключ объекта в хранилище
+
+        Returns:
+            URL объекта
+        """
+        pass
+
+    def close(self) -> None:
+        """Освобождает ресурсы хранилища"""
+        pass
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Хранилище в локальной директории. Используется при разработке и в тестах вместо S3.
+    """
+
+    def __init__(self, root_dir: str = LOCAL_STORAGE_DIR, base_url: Optional[str] = LOCAL_STORAGE_BASE_URL):
+        self.root_dir = root_dir
+        self.base_url = base_url
+
+    def _object_path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root_dir, key))
+        if not path.startswith(os.path.abspath(self.root_dir) + os.sep):
+            raise StorageError(f"Недопустимый ключ объекта: {key}")
+        return path
+
+    def _write(self, chunks: Iterable[bytes], key: str, expected_md5: Optional[str] = None) -> str:
+        path = self._object_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        md5 = hashlib.md5()
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as target:
+                for chunk in chunks:
+                    md5.update(chunk)
+                    target.write(chunk)
+            if expected_md5 and md5.hexdigest() != expected_md5:
+                raise StorageError(f"Контрольная сумма объекта {key} не совпадает с исходной")
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        logger.info(f"Объект {key} сохранен в локальное хранилище: {path}")
+        return self.get_url(key)
+
+    def upload_file(self, path: str, key: str) -> str:
+        md5 = hashlib.md5()
+        with open(path, "rb") as source:
+            for chunk in iter(lambda: source.read(S3_PART_SIZE), b""):
+                md5.update(chunk)
+
+        def read_chunks():
+            with open(path, "rb") as source:
+                yield from iter(lambda: source.read(S3_PART_SIZE), b"")
+
+        return self._write(read_chunks(), key, md5.hexdigest())
+
+    def upload_stream(self, stream: Iterable[bytes], key: str) -> str:
+        return self._write(stream, key)
+
+    def get_url(self, key: str) -> str:
+        if self.base_url:
+            return f"{self.base_url.rstrip('/')}/{quote(key)}"
+        return Path(self._object_path(key)).as_uri()
+
+
+class S3StorageBackend(StorageBackend):
+    """
+    S3-совместимое хранилище с многочастной загрузкой.
+
+    Запросы подписываются AWS Signature V4 и отправляются через общую сессию
+    с пулом соединений. Части большого файла загружаются параллельно,
+    целостность каждой части проверяется через Content-MD5 и ETag, а состояние
+    загрузки файла сохраняется рядом с ним, чтобы после сбоя догрузить только
+    недостающие части.
+    """
+
+    def __init__(self, endpoint_url: str, bucket: str, access_key: str, secret_key: str,
+                 region: str = "us-east-1", public_url: Optional[str] = None,
+                 part_size: int = S3_PART_SIZE, concurrency: int = S3_UPLOAD_CONCURRENCY,
+                 max_retries: int = S3_MAX_RETRIES, timeout: float = S3_TIMEOUT):
+        if not bucket or not access_key or not secret_key:
+            raise StorageError("Не заданы S3_BUCKET, S3_ACCESS_KEY_ID или S3_SECRET_ACCESS_KEY")
+
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.host = urlsplit(self.endpoint_url).netloc
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.public_url = public_url
+        self.part_size = part_size
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        # Одна сессия на все загрузки: соединения переиспользуются, пул рассчитан на параллельные части
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency * 2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    # Подпись запросов (AWS Signature V4)
+
+    def _canonical_uri(self, key: str) -> str:
+        # Адресация в стиле path (endpoint/bucket/key) поддерживается и AWS, и MinIO
+        return quote(f"/{self.bucket}/{key}", safe="/~")
+
+    @staticmethod
+    def _canonical_query(params: Dict[str, str]) -> str:
+        return "&".join(
+            f"{quote(str(name), safe='~')}={quote(str(value), safe='~')}"
+            for name, value in sorted(params.items())
+        )
+
+    def _signature(self, method: str, canonical_uri: str, canonical_query: str,
+                   headers: Dict[str, str], payload_hash: str, amz_date: str) -> Tuple[str, str, str]:
+        """
+        Вычисляет подпись запроса
+
+        Returns:
+            Tuple[str, str, str]: (область подписи, подписанные заголовки, подпись)
+        """
+        date = amz_date[:8]
+        scope = f"{date}/{self.region}/s3/aws4_request"
+        signed_headers = ";".join(sorted(headers))
+        canonical_headers = "".join(f"{name}:{headers[name].strip()}\n" for name in sorted(headers))
+        canonical_request = "\n".join([
+            method, canonical_uri, canonical_query, canonical_headers, signed_headers, payload_hash
+        ])
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()
+        ])
+
+        signing_key = f"AWS4{self.secret_key}".encode()
+        for part in (date, self.region, "s3", "aws4_request"):
+            signing_key = hmac.new(signing_key, part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(signing_key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+        return scope, signed_headers, signature
+
+    def _request(self, method: str, key: str, params: Optional[Dict[str, str]] = None,
+                 data: bytes = b"", headers: Optional[Dict[str, str]] = None,
+                 unsigned_payload: bool = False) -> requests.Response:
+        """
+        Выполняет подписанный запрос к хранилищу с повторами при сетевых ошибках и ответах 5xx
+
+        Args:
+            method: HTTP-метод
+            key: Ключ объекта
+            params: Параметры строки запроса
+            data: Тело запроса
+            headers: Дополнительные заголовки
+            unsigned_payload: Не хэшировать тело (для частей, целостность которых проверяется через Content-MD5)
+
+        Returns:
+            Ответ хранилища
+
+        Raises:
+            StorageError: Если запрос не удался после всех попыток
+        """
+        canonical_uri = self._canonical_uri(key)
+        canonical_query = self._canonical_query(params or {})
+        url = f"{self.endpoint_url}{canonical_uri}"
+        if canonical_query:
+            url = f"{url}?{canonical_query}"
+        payload_hash = "UNSIGNED-PAYLOAD" if unsigned_payload else hashlib.sha256(data).hexdigest()
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                # Экспоненциальная задержка между попытками
+                time.sleep(min(2 ** (attempt - 1) * 0.5, 10))
+
+            amz_date = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+            signed = {
+                "host": self.host,
+                "x-amz-content-sha256": payload_hash,
+                "x-amz-date": amz_date,
+            }
+            for name, value in (headers or {}).items():
+                signed[name.lower()] = value
+            scope, signed_headers, signature = self._signature(
+                method, canonical_uri, canonical_query, signed, payload_hash, amz_date
+            )
+            request_headers = {name: value for name, value in signed.items() if name != "host"}
+            request_headers["Authorization"] = (
+                f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+                f"SignedHeaders={signed_headers}, Signature={signature}"
+            )
+
+            try:
+                response = self.session.request(method, url, data=data, headers=request_headers,
+                                                timeout=self.timeout)
+            except requests.RequestException as e:
+                last_error = f"{type(e).__name__}: {e}"
+                logger.warning(f"Ошибка сети при запросе {method} {key} (попытка {attempt + 1}): {e}")
+                continue
+
+            if response.status_code >= 500 or response.status_code == 429:
+                last_error = f"HTTP {response.status_code}: {response.text[:200]}"
+                logger.warning(f"Хранилище ответило {response.status_code} на {method} {key} (попытка {attempt + 1})")
+                continue
+            if response.status_code >= 400:
+                raise StorageError(f"{method} {key}: HTTP {response.status_code}: {response.text[:500]}")
+            return response
+
+        raise StorageError(f"{method} {key}: запрос не удался после {self.max_retries + 1} попыток: {last_error}")
+
+    @staticmethod
+    def _xml_text(body: bytes, tag: str) -> Optional[str]:
+        """Возвращает текст первого элемента с указанным именем, без учета пространства имен"""
+        root = ET.fromstring(body)
+        for element in root.iter():
+            if element.tag == tag or element.tag.endswith("}" + tag):
+                return element.text
+        return None
+
+    # Загрузка
+
+    def _put_object(self, key: str, data: bytes) -> None:
+        md5_hex, md5_b64 = _md5_base64(data)
+        response = self._request("PUT", key, data=data, headers={"Content-MD5": md5_b64},
+                                 unsigned_payload=True)
+        self._check_etag(response, md5_hex, key)
+
+    @staticmethod
+    def _check_etag(response: requests.Response, md5_hex: str, what: str) -> str:
+        etag = response.headers.get("ETag", "").strip('"')
+        # Содержимое проверяется хранилищем по Content-MD5, сверка ETag дополнительно
+        # подтверждает, что сохранены именно отправленные данные
+        if S3_VERIFY_ETAG and len(etag) == 32 and etag != md5_hex:
+            raise StorageError(f"ETag {what} ({etag}) не совпадает с MD5 отправленных данных ({md5_hex})")
+        return etag
+
+    def _create_multipart_upload(self, key: str) -> str:
+        response = self._request("POST", key, params={"uploads": ""})
+        upload_id = self._xml_text(response.content, "UploadId")
+        if not upload_id:
+            raise StorageError(f"Хранилище не вернуло UploadId для {key}")
+        return upload_id
+
+    def _upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        md5_hex, md5_b64 = _md5_base64(data)
+        response = self._request(
+            "PUT", key, params={"partNumber": str(part_number), "uploadId": upload_id},
+            data=data, headers={"Content-MD5": md5_b64}, unsigned_payload=True
+        )
+        return self._check_etag(response, md5_hex, f"части {part_number} объекта {key}") or md5_hex
+
+    def _list_parts(self, key: str, upload_id: str) -> Dict[int, str]:
+        """Возвращает уже загруженные части незавершенной загрузки: {номер: ETag}"""
+        parts: Dict[int, str] = {}
+        marker = "0"
+        while True:
+            response = self._request("GET", key, params={"uploadId": upload_id, "part-number-marker": marker})
+            root = ET.fromstring(response.content)
+            for element in root.iter():
+                if element.tag.endswith("Part"):
+                    number = etag = None
+                    for child in element:
+                        if child.tag.endswith("PartNumber"):
+                            number = int(child.text)
+                        elif child.tag.endswith("ETag"):
+                            etag = (child.text or "").strip('"')
+                    if number is not None:
+                        parts[number] = etag
+            if (self._xml_text(response.content, "IsTruncated") or "").lower() != "true":
+                return parts
+            next_marker = self._xml_text(response.content, "NextPartNumberMarker") or (str(max(parts)) if parts else None)
+            if not next_marker or next_marker == marker:
+                # Без продвижения маркера дальше читать нечего; не найденные части будут загружены заново
+                return parts
+            marker = next_marker
+
+    def _complete_multipart_upload(self, key: str, upload_id: str, etags: Dict[int, str]) -> None:
+        parts_xml = "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>\"{etags[number]}\"</ETag></Part>"
+            for number in sorted(etags)
+        )
+        body = f"<CompleteMultipartUpload>{parts_xml}</CompleteMultipartUpload>".encode()
+        response = self._request("POST", key, params={"uploadId": upload_id}, data=body,
+                                 headers={"Content-Type": "application/xml"})
+        # S3 может вернуть 200 с ошибкой в теле ответа
+        if self._xml_text(response.content, "Code"):
+            raise StorageError(f"Не удалось завершить загрузку {key}: {response.text[:500]}")
+
+    def _abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        try:
+            self._request("DELETE", key, params={"uploadId": upload_id})
+        except StorageError as e:
+            logger.warning(f"Не удалось отменить загрузку {key}: {e}")
+
+    @staticmethod
+    def _read_part(path: str, offset: int, size: int) -> bytes:
+        with open(path, "rb") as source:
+            source.seek(offset)
+            return source.read(size)
+
+    def _load_state(self, state_path: str, key: str, stat: os.stat_result) -> Optional[Dict[str, Any]]:
+        try:
+            with open(state_path) as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError):
+            return None
+        # Состояние действительно только для того же файла, объекта и размера части
+        if (state.get("bucket"), state.get("key"), state.get("size"), state.get("mtime_ns"), state.get("part_size")) != \
+                (self.bucket, key, stat.st_size, stat.st_mtime_ns, self.part_size):
+            return None
+        return state
+
+    def upload_file(self, path: str, key: str) -> str:
+        stat = os.stat(path)
+        if stat.st_size <= self.part_size:
+            self._put_object(key, self._read_part(path, 0, stat.st_size))
+            logger.info(f"Файл {path} загружен в S3 как {key} ({stat.st_size} байт)")
+            return self.get_url(key)
+
+        part_count = (stat.st_size + self.part_size - 1) // self.part_size
+        state_path = f"{path}{UPLOAD_STATE_SUFFIX}"
+        state = self._load_state(state_path, key, stat)
+
+        done: Dict[int, str] = {}
+        if state:
+            upload_id = state["upload_id"]
+            try:
+                uploaded = self._list_parts(key, upload_id)
+            except StorageError as e:
+                logger.warning(f"Не удалось продолжить загрузку {key}, начинаем заново: {e}")
+                state = None
+            else:
+                # Часть считается загруженной, только если ее ETag совпадает с MD5 локальных данных
+                for number, etag in uploaded.items():
+                    if 1 <= number <= part_count:
+                        data = self._read_part(path, (number - 1) * self.part_size, self.part_size)
+                        if _md5_base64(data)[0] == etag:
+                            done[number] = etag
+                logger.info(f"Продолжение загрузки {key}: готово {len(done)} из {part_count} частей")
+
+        if not state:
+            upload_id = self._create_multipart_upload(key)
+            state = {
+                "bucket": self.bucket,
+                "key": key,
+                "upload_id": upload_id,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "part_size": self.part_size,
+            }
+            with open(state_path, "w") as state_file:
+                json.dump(state, state_file)
+
+        def upload(number: int) -> Tuple[int, str]:
+            data = self._read_part(path, (number - 1) * self.part_size, self.part_size)
+            return number, self._upload_part(key, upload_id, number, data)
+
+        pending = [number for number in range(1, part_count + 1) if number not in done]
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="s3-upload") as pool:
+            futures = [pool.submit(upload, number) for number in pending]
+            for future in as_completed(futures):
+                # При ошибке состояние остается на диске, и следующий вызов догрузит недостающие части
+                number, etag = future.result()
+                done[number] = etag
+
+        self._complete_multipart_upload(key, upload_id, done)
+        os.remove(state_path)
+        logger.info(f"Файл {path} загружен в S3 как {key}: {part_count} частей, {stat.st_size} байт")
+        return self.get_url(key)
+
+    def upload_stream(self, stream: Iterable[bytes], key: str) -> str:
+        buffer = bytearray()
+        chunks = iter(stream)
+
+        # Небольшой поток загружаем одним запросом
+        for chunk in chunks:
+            buffer.extend(chunk)
+            if len(buffer) > self.part_size:
+                break
+        else:
+            self._put_object(key, bytes(buffer))
+            logger.info(f"Поток загружен в S3 как {key} ({len(buffer)} байт)")
+            return self.get_url(key)
+
+        upload_id = self._create_multipart_upload(key)
+        etags: Dict[int, str] = {}
+        total_size = 0
+        # Ограничиваем число частей в памяти: пока все воркеры заняты, чтение потока ждет
+        slots = threading.BoundedSemaphore(self.concurrency)
+
+        def upload(number: int, data: bytes) -> Tuple[int, str]:
+            try:
+                return number, self._upload_part(key, upload_id, number, data)
+            finally:
+                slots.release()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="s3-upload") as pool:
+                futures = []
+                part_number = 0
+
+                def submit(data: bytes) -> None:
+                    nonlocal part_number, total_size
+                    slots.acquire()
+                    try:
+                        futures.append(pool.submit(upload, part_number + 1, data))
+                    except BaseException:
+                        # Часть не попала в пул - upload не вызовется и слот не освободит
+                        slots.release()
+                        raise
+                    part_number += 1
+                    total_size += len(data)
+
+                for chunk in chunks:
+                    while len(buffer) >= self.part_size:
+                        submit(bytes(buffer[:self.part_size]))
+                        del buffer[:self.part_size]
+                    buffer.extend(chunk)
+                while len(buffer) >= self.part_size:
+                    submit(bytes(buffer[:self.part_size]))
+                    del buffer[:self.part_size]
+                if buffer:
+                    submit(bytes(buffer))
+
+                for future in as_completed(futures):
+                    number, etag = future.result()
+                    etags[number] = etag
+
+            self._complete_multipart_upload(key, upload_id, etags)
+        except BaseException:
+            # Поток нельзя прочитать повторно, поэтому незавершенную загрузку отменяем
+            self._abort_multipart_upload(key, upload_id)
+            raise
+
+        logger.info(f"Поток загружен в S3 как {key}: {len(etags)} частей, {total_size} байт")
+        return self.get_url(key)
+
+    def get_url(self, key: str) -> str:
+        if self.public_url:
+            return f"{self.public_url.rstrip('/')}/{quote(key)}"
+
+        # Подписанная ссылка на скачивание (query-параметры Signature V4)
+        amz_date = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        scope = f"{amz_date[:8]}/{self.region}/s3/aws4_request"
+        params = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{scope}",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(S3_URL_EXPIRES),
+            "X-Amz-SignedHeaders": "host",
+        }
+        canonical_uri = self._canonical_uri(key)
+        canonical_query = self._canonical_query(params)
+        _, _, signature = self._signature("GET", canonical_uri, canonical_query, {"host": self.host},
+                                          "UNSIGNED-PAYLOAD", amz_date)
+        return f"{self.endpoint_url}{canonical_uri}?{canonical_query}&X-Amz-Signature={signature}"
+
+    def close(self) -> None:
+        self.session.close()
+
+
+# Общий экземпляр хранилища, создается при первом использовании
+_storage_backend: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage_backend() -> StorageBackend:
+    """
+    Возвращает хранилище, выбранное переменной окружения STORAGE_BACKEND
+
+    Returns:
+        StorageBackend: Хранилище
+    """
+    global _storage_backend
+    with _storage_lock:
+        if _storage_backend is None:
+            if STORAGE_BACKEND == "s3":
+                _storage_backend = S3StorageBackend(
+                    endpoint_url=S3_ENDPOINT_URL,
+                    bucket=S3_BUCKET,
+                    access_key=S3_ACCESS_KEY_ID,
+                    secret_key=S3_SECRET_ACCESS_KEY,
+                    region=S3_REGION,
+                    public_url=S3_PUBLIC_URL,
+                )
+            else:
+                _storage_backend = LocalStorageBackend()
+            logger.info(f"Используется хранилище: {type(_storage_backend).__name__}")
+        return _storage_backend
+
+
+def close_storage_backend() -> None:
+    """
+    Закрывает соединения хранилища (вызывается при остановке приложения)
+    """
+    global _storage_backend
+    with _storage_lock:
+        if _storage_backend is not None:
+            _storage_backend.close()
+            _storage_backend = None
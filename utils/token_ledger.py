@@ -0,0 +1,47 @@
+import os
+import asyncio
+import logging
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from repository.async_token_ledger_repository import AsyncTokenLedgerRepository
+
+# Загружаем переменные окружения
+load_dotenv()
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+# Как часто сохранять снимки балансов в секундах
+TOKEN_LEDGER_SNAPSHOT_INTERVAL = float(os.getenv("TOKEN_LEDGER_SNAPSHOT_INTERVAL", "300"))
+# Сколько записей журнала после последнего снимка пользователя нужно для нового снимка
+TOKEN_LEDGER_SNAPSHOT_MIN_ENTRIES = int(os.getenv("TOKEN_LEDGER_SNAPSHOT_MIN_ENTRIES", "100"))
+
+
+async def run_snapshot_loop(stop: asyncio.Event, repository: Optional[AsyncTokenLedgerRepository] = None) -> None:
+    """
+    Периодически сохраняет снимки балансов, чтобы подсчет баланса и сверка по журналу
+    просматривали только записи после последнего снимка. Можно запускать в нескольких
+    процессах: снимки за один проход сохраняет только один из них.
+
+    Args:
+        stop: Событие остановки
+        repository: Репозиторий журнала токенов
+    """
+    repository = repository or AsyncTokenLedgerRepository()
+    since_entry_id = 0
+    while not stop.is_set():
+        try:
+            last_entry_id = await repository.get_last_entry_id()
+            saved = await repository.snapshot_balances(since_entry_id, TOKEN_LEDGER_SNAPSHOT_MIN_ENTRIES)
+            since_entry_id = last_entry_id
+            if saved:
+                logger.info(f"Сохранено снимков балансов: {saved}")
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении снимков балансов: {e}")
+
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=TOKEN_LEDGER_SNAPSHOT_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,371 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from utils.training_utils import (
+    get_user_upload_path,
+    get_zip_filename,
+    iter_zip_stream,
+    upload_zip_to_cloud,
+    start_replicate_training,
+)
+from utils.executors import run_blocking
+from repository.async_token_ledger_repository import AsyncTokenLedgerRepository
+from repository.unit_of_work import run_in_async_transaction
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+# Стоимость обучения модели в токенах
+TRAINING_COST = 300
+
+# Количество попыток выполнения задачи, после которых она переходит в dead
+TRAINING_JOB_MAX_ATTEMPTS = int(os.getenv("TRAINING_JOB_MAX_ATTEMPTS", "5"))
+# Задержка перед повтором: base * 2^(попытка-1) со случайным разбросом, не больше max
+TRAINING_JOB_RETRY_BASE_DELAY = float(os.getenv("TRAINING_JOB_RETRY_BASE_DELAY", "30"))
+TRAINING_JOB_RETRY_MAX_DELAY = float(os.getenv("TRAINING_JOB_RETRY_MAX_DELAY", "900"))
+# Аренда задачи: если обработчик не продлил ее за это время, задача возвращается в очередь
+TRAINING_JOB_LEASE_SECONDS = float(os.getenv("TRAINING_JOB_LEASE_SECONDS", "120"))
+# Пауза между проверками пустой очереди
+TRAINING_JOB_POLL_INTERVAL = float(os.getenv("TRAINING_JOB_POLL_INTERVAL", "1"))
+
+
+class PermanentJobError(Exception):
+    """
+    Ошибка, при которой повторять задачу бессмысленно (например, нет загруженных фотографий).
+    Задача сразу переходит в статус dead.
+    """
+    pass
+
+
+class LeaseLostError(Exception):
+    """
+    Аренда задачи истекла и задачу забрал другой обработчик
+    """
+    pass
+
+
+def training_job_reference(job_id: int) -> str:
+    """
+    Ключ операций журнала токенов для задачи обучения: резерва (reason="training")
+    и его возврата (reason="training_refund")
+
+    Args:
+        job_id: ID задачи
+
+    Returns:
+        Ключ операции
+    """
+    return f"training_job:{job_id}"
+
+
+async def reserve_training_tokens(user_id: int, job_id: int, user_repository) -> bool:
+    """
+    Резервирует токены за обучение условным списанием по журналу токенов.
+    Если резерв для задачи уже есть в журнале, повторного списания нет: условный
+    UPDATE при остатке меньше стоимости не дошел бы до уникального индекса и
+    вернул бы «недостаточно токенов» для уже оплаченной задачи.
+
+    Args:
+        user_id: ID пользователя
+        job_id: ID задачи
+        user_repository: Асинхронный репозиторий пользователей
+
+    Returns:
+        True, если токены зарезервированы, False, если их не хватает
+    """
+    reference = training_job_reference(job_id)
+    if await AsyncTokenLedgerRepository().get_by_reference("training", reference) is not None:
+        return True
+    reserved = await user_repository.update_tokens(
+        user_id, -TRAINING_COST, reason="training", reference=reference
+    )
+    return reserved is not None
+
+
+async def refund_training_tokens(user_id: int, job_id: int, user_repository) -> bool:
+    """
+    Возвращает зарезервированные за задачу токены компенсирующим начислением.
+    Если резерва не было (например, задача не прошла резервирование), ничего не делает;
+    повторный вызов второй раз токены не начислит.
+
+    Args:
+        user_id: ID пользователя
+        job_id: ID задачи
+        user_repository: Асинхронный репозиторий пользователей
+
+    Returns:
+        True, если токены возвращены
+    """
+    reference = training_job_reference(job_id)
+    if await AsyncTokenLedgerRepository().get_by_reference("training", reference) is None:
+        return False
+    refunded = await user_repository.update_tokens(
+        user_id, TRAINING_COST, reason="training_refund", reference=reference
+    )
+    return refunded is not None
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Задержка перед следующей попыткой задачи
+
+    Args:
+        attempts: Количество уже выполненных попыток
+
+    Returns:
+        Задержка в секундах
+    """
+    delay = min(TRAINING_JOB_RETRY_MAX_DELAY, TRAINING_JOB_RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def run_training_job(job: Dict[str, Any], save_progress: Callable[[Dict[str, Any]], Awaitable[None]],
+                           model_repository, user_repository) -> Dict[str, Any]:
+    """
+    Выполняет задачу обучения: резерв токенов -> архив -> облачное хранилище -> Replicate -> модель в БД.
+
+    Токены резервируются при постановке задачи в очередь; здесь резерв только
+    подтверждается (задачи, поставленные без резерва, резервируют его сейчас),
+    поэтому платное обучение на Replicate не запускается без оплаты.
+    Результат каждого шага сохраняется в progress задачи до перехода к следующему,
+    поэтому повторная попытка после сбоя продолжает с невыполненного шага и не
+    запускает второе обучение для уже созданной тренировки.
+
+    Args:
+        job: Задача из очереди
+        save_progress: Функция сохранения выполненных шагов
+        model_repository: Асинхронный репозиторий моделей
+        user_repository: Асинхронный репозиторий пользователей
+
+    Returns:
+        Результат задачи (model_id, training_id, ...)
+
+    Raises:
+        PermanentJobError: Если задачу невозможно выполнить
+    """
+    payload = job["payload"]
+    progress = dict(job.get("progress") or {})
+    user_id = job["user_id"]
+    username = payload["username"]
+    model_name = payload["model_name"]
+    trigger_word = payload["trigger_word"]
+
+    if not progress.get("tokens_reserved"):
+        if not await reserve_training_tokens(user_id, job["job_id"], user_repository):
+            raise PermanentJobError("Недостаточно токенов для обучения модели")
+        progress["tokens_reserved"] = True
+        await save_progress({"tokens_reserved": True})
+
+    if "zip_url" not in progress:
+        user_path = get_user_upload_path(username, user_id)
+        image_files = sorted(f for f in os.listdir(user_path) if f.endswith('.jpg'))
+        if not image_files:
+            raise PermanentJobError("Не найдено загруженных изображений")
+
+        image_paths = [os.path.join(user_path, f) for f in image_files]
+        zip_url = await run_blocking(
+            "replicate", upload_zip_to_cloud, iter_zip_stream(image_paths), get_zip_filename(username, user_id)
+        )
+        if not zip_url:
+            raise RuntimeError("Не удалось загрузить ZIP-архив в облачное хранилище")
+        progress["zip_url"] = zip_url
+        await save_progress({"zip_url": zip_url})
+
+    if "training_id" not in progress:
+        training_info = await start_replicate_training(
+            username, user_id, progress["zip_url"], model_name, trigger_word
+        )
+        if not training_info or training_info.get("status") == "failed":
+            error_msg = training_info.get("error", "Неизвестная ошибка") if training_info else "Неизвестная ошибка"
+            raise RuntimeError(f"Не удалось запустить обучение модели: {error_msg}")
+        progress["training_id"] = training_info["training_id"]
+        await save_progress({"training_id": progress["training_id"]})
+
+    if "model_id" not in progress:
+        async def save_model() -> Dict[str, Any]:
+            # Модель могла быть создана попыткой, упавшей до сохранения шага
+            model = await model_repository.get_by_training_id(progress["training_id"])
+            if not model:
+                model = await model_repository.create({
+                    "user_id": user_id,
+                    "name": model_name,
+                    "trigger_word": trigger_word,
+                    "training_id": progress["training_id"],
+                    "status": "training",
+                    "is_public": False,
+                    "model_type": "user"
+                })
+            if not model:
+                raise RuntimeError("Не удалось сохранить модель в базе данных")
+            await save_progress({"model_id": model["model_id"]})
+            return model
+
+        # Модель и отметка о выполненном шаге фиксируются одной транзакцией:
+        # при потере аренды задачи (LeaseLostError) модель не сохраняется
+        model = await run_in_async_transaction(save_model)
+        progress["model_id"] = model["model_id"]
+
+    return {
+        "model_id": progress["model_id"],
+        "training_id": progress["training_id"],
+        "model_name": model_name,
+        "trigger_word": trigger_word,
+        "tokens_spent": TRAINING_COST
+    }
+
+
+class TrainingJobWorker:
+    """
+    Обработчик очереди задач обучения.
+
+    Забирает задачи из таблицы TrainingJob, выполняет до concurrency задач
+    одновременно и продлевает их аренду, пока они выполняются. Задачи, чья
+    аренда истекла (упавший процесс), возвращаются в очередь.
+    """
+
+    def __init__(self, worker_id: str, job_repository, model_repository, user_repository,
+                 concurrency: int = 1, notify: Optional[Callable[[int, str], Awaitable[None]]] = None):
+        self.worker_id = worker_id
+        self.job_repository = job_repository
+        self.model_repository = model_repository
+        self.user_repository = user_repository
+        self.concurrency = concurrency
+        self.notify = notify
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self._last_reap = 0.0
+        self._stats = {"claimed": 0, "succeeded": 0, "retried": 0, "dead": 0, "lost": 0}
+
+    async def _heartbeat(self, job_id: int, lost: asyncio.Event) -> None:
+        """Продлевает аренду задачи, пока она выполняется"""
+        while True:
+            await asyncio.sleep(TRAINING_JOB_LEASE_SECONDS / 3)
+            try:
+                if not await self.job_repository.extend_lease(job_id, self.worker_id):
+                    lost.set()
+                    return
+            except Exception as e:
+                logger.warning(f"Не удалось продлить аренду задачи {job_id}: {e}")
+
+    async def _process(self, job: Dict[str, Any]) -> None:
+        job_id = job["job_id"]
+        lost = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, lost))
+
+        async def save_progress(step: Dict[str, Any]) -> None:
+            if not await self.job_repository.save_progress(job_id, self.worker_id, step):
+                lost.set()
+            if lost.is_set():
+                # Задачу забрал другой обработчик - продолжать нельзя, иначе шаги выполнятся дважды
+                raise LeaseLostError(f"Аренда задачи {job_id} потеряна")
+
+        started = time.monotonic()
+        try:
+            result = await run_training_job(job, save_progress, self.model_repository, self.user_repository)
+            await self.job_repository.mark_succeeded(job_id, self.worker_id, result)
+            self._stats["succeeded"] += 1
+            logger.info(f"Задача обучения {job_id} выполнена за {time.monotonic() - started:.1f} сек.: "
+                        f"модель {result['model_id']}, тренировка {result['training_id']}")
+        except LeaseLostError:
+            self._stats["lost"] += 1
+            logger.warning(f"Обработчик {self.worker_id} потерял аренду задачи {job_id}")
+        except Exception as e:
+            permanent = isinstance(e, PermanentJobError)
+            updated = await self.job_repository.mark_failed(
+                job_id, self.worker_id, str(e), retry_delay(job["attempts"]), permanent=permanent
+            )
+            if updated and updated["status"] == "dead":
+                self._stats["dead"] += 1
+                logger.error(f"Задача обучения {job_id} переведена в dead после {job['attempts']} попыток: {e}")
+                refunded = await self._refund(job["user_id"], job_id)
+                if self.notify:
+                    refund_note = " Токены возвращены на баланс." if refunded else ""
+                    await self.notify(job["user_id"], f"❌ Не удалось запустить обучение модели "
+                                                      f"<b>{job['payload'].get('model_name')}</b>.{refund_note} "
+                                                      f"Попробуйте еще раз.")
+            else:
+                self._stats["retried"] += 1
+                logger.warning(f"Задача обучения {job_id}, попытка {job['attempts']} не удалась: {e}")
+        finally:
+            heartbeat.cancel()
+
+    async def _refund(self, user_id: int, job_id: int) -> bool:
+        """Возвращает токены, зарезервированные за задачу, перешедшую в dead"""
+        try:
+            refunded = await refund_training_tokens(user_id, job_id, self.user_repository)
+            if refunded:
+                logger.info(f"Токены за задачу обучения {job_id} возвращены пользователю {user_id}")
+            return refunded
+        except Exception as e:
+            # Возврат идемпотентен (ключ задачи в журнале), его можно безопасно повторить
+            logger.error(f"Не удалось вернуть токены за задачу обучения {job_id}: {e}")
+            return False
+
+    def _run_job(self, job: Dict[str, Any]) -> None:
+        task = asyncio.create_task(self._process(job))
+        self._tasks.add(task)
+
+        def done(t: asyncio.Task) -> None:
+            self._tasks.discard(t)
+            self._slots.release()
+            if not t.cancelled() and t.exception() is not None:
+                logger.error(f"Ошибка при обработке задачи обучения {job['job_id']}: {t.exception()}")
+
+        task.add_done_callback(done)
+
+    async def _reap_stale(self) -> None:
+        if time.monotonic() - self._last_reap < TRAINING_JOB_LEASE_SECONDS / 2:
+            return
+        self._last_reap = time.monotonic()
+        for job in await self.job_repository.requeue_stale(TRAINING_JOB_LEASE_SECONDS):
+            logger.warning(f"Задача обучения {job['job_id']} с истекшей арендой переведена в {job['status']}")
+            if job["status"] == "dead":
+                await self._refund(job["user_id"], job["job_id"])
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """
+        Обрабатывает очередь до установки события stop, затем дожидается начатых задач
+
+        Args:
+            stop: Событие остановки
+        """
+        logger.info(f"Обработчик задач обучения {self.worker_id} запущен (одновременно задач: {self.concurrency})")
+        while not stop.is_set():
+            await self._slots.acquire()
+            claimed = False
+            try:
+                await self._reap_stale()
+                job = await self.job_repository.claim_next(self.worker_id)
+                if job is not None:
+                    self._stats["claimed"] += 1
+                    self._run_job(job)
+                    claimed = True
+                    continue
+            except Exception as e:
+                logger.error(f"Ошибка при выборке задачи обучения: {e}")
+            finally:
+                if not claimed:
+                    self._slots.release()
+
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=TRAINING_JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+        if self._tasks:
+            logger.info(f"Обработчик {self.worker_id} ожидает завершения {len(self._tasks)} задач")
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        logger.info(f"Обработчик задач обучения {self.worker_id} остановлен")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики обработчика
+
+        Returns:
+            Счетчики задач и количество выполняющихся задач
+        """
+        return {"worker_id": self.worker_id, "in_flight": len(self._tasks), **self._stats}
@@ -0,0 +1,278 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from utils.training_utils import check_training_status
+from utils.event_bus import ModelReadyEvent, publish_event
+
+# Настраиваем логгер
+logger = logging.getLogger(__name__)
+
+# Интервал опроса одной тренировки: начинается с минимального и растет, пока статус не меняется.
+# Если Replicate присылает вебхуки о завершении, опрос нужен только как страховка и выполняется редко
+TRAINING_POLL_MIN_INTERVAL = float(os.getenv(
+    "TRAINING_POLL_MIN_INTERVAL", "300" if os.getenv("REPLICATE_WEBHOOK_URL") else "10"
+))
+TRAINING_POLL_MAX_INTERVAL = float(os.getenv("TRAINING_POLL_MAX_INTERVAL", str(max(120.0, TRAINING_POLL_MIN_INTERVAL))))
+TRAINING_POLL_BACKOFF = float(os.getenv("TRAINING_POLL_BACKOFF", "1.5"))
+# Максимальное количество запросов к Replicate за один проход
+TRAINING_POLL_BATCH_SIZE = int(os.getenv("TRAINING_POLL_BATCH_SIZE", "10"))
+# Как часто сверять список отслеживаемых тренировок с базой данных
+TRAINING_POLL_REFRESH_INTERVAL = float(os.getenv("TRAINING_POLL_REFRESH_INTERVAL", "60"))
+# Сколько снимков завершенных тренировок хранить в памяти
+TRAINING_SNAPSHOT_LIMIT = int(os.getenv("TRAINING_SNAPSHOT_LIMIT", "10000"))
+
+# Статусы Replicate, после которых тренировка больше не меняется
+TERMINAL_STATUSES = {"succeeded", "failed", "canceled"}
+
+
+class TrainingStatusPoller:
+    """
+    Фоновый опрос статусов обучения моделей на Replicate.
+
+    Отслеживает все модели в статусе training, опрашивает Replicate пачками
+    с адаптивным интервалом и один раз записывает переход в итоговый статус
+    в базу данных. Обработчики API читают статус из локального снимка,
+    не обращаясь к Replicate.
+    """
+
+    def __init__(self, model_repository):
+        self.model_repository = model_repository
+        # Отслеживаемые тренировки: training_id -> состояние опроса
+        self._tracked: Dict[str, Dict[str, Any]] = {}
+        # Последние известные статусы, включая завершенные тренировки
+        self._snapshots: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._last_refresh = 0.0
+        self._stats = {"polls": 0, "errors": 0, "transitions": 0}
+
+    def track(self, model: Dict[str, Any]) -> None:
+        """
+        Добавляет модель в список отслеживаемых
+
+        Args:
+            model: Запись модели (model_id, user_id, training_id, name, trigger_word)
+        """
+        training_id = model.get("training_id")
+        if not training_id or training_id in self._tracked:
+            return
+
+        self._tracked[training_id] = {
+            "model_id": model.get("model_id"),
+            "user_id": model.get("user_id"),
+            "interval": TRAINING_POLL_MIN_INTERVAL,
+            "next_poll_at": time.monotonic(),
+        }
+        self._save_snapshot(training_id, {
+            "model_id": model.get("model_id"),
+            "user_id": model.get("user_id"),
+            "model_name": model.get("name"),
+            "trigger_word": model.get("trigger_word"),
+            "model_status": model.get("status", "training"),
+            "training_status": "starting",
+            "model_url": model.get("model_url"),
+        })
+        self._wakeup.set()
+
+    def get_snapshot(self, training_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Возвращает последний известный статус тренировки
+
+        Args:
+            training_id: ID тренировки
+
+        Returns:
+            Снимок статуса или None, если тренировка неизвестна
+        """
+        snapshot = self._snapshots.get(training_id)
+        return dict(snapshot) if snapshot is not None else None
+
+    def _save_snapshot(self, training_id: str, data: Dict[str, Any]) -> None:
+        snapshot = self._snapshots.pop(training_id, {})
+        snapshot.update(data)
+        snapshot["training_id"] = training_id
+        snapshot["checked_at"] = time.time()
+        self._snapshots[training_id] = snapshot
+        while len(self._snapshots) > TRAINING_SNAPSHOT_LIMIT:
+            self._snapshots.popitem(last=False)
+
+    async def _refresh_tracked(self) -> None:
+        """Подхватывает тренировки, запущенные другими процессами, и забывает завершенные"""
+        models = await self.model_repository.get_models_in_training()
+        active = set()
+        for model in models:
+            active.add(model["training_id"])
+            self.track(model)
+        for training_id in list(self._tracked):
+            if training_id not in active:
+                # Тренировку завершил другой процесс: снимок устарел, статус будет прочитан из базы
+                self._tracked.pop(training_id, None)
+                self._snapshots.pop(training_id, None)
+        self._last_refresh = time.monotonic()
+
+    async def _poll_one(self, training_id: str, state: Dict[str, Any]) -> None:
+        result = await check_training_status(training_id)
+        self._stats["polls"] += 1
+        status = result.get("status")
+        previous = self._snapshots.get(training_id, {}).get("training_status")
+
+        if status == "error":
+            # Ошибка сети или API (в том числе разомкнутый предохранитель): увеличиваем интервал, статус в базе не трогаем
+            self._stats["errors"] += 1
+            state["interval"] = min(state["interval"] * 2, TRAINING_POLL_MAX_INTERVAL)
+            state["next_poll_at"] = time.monotonic() + state["interval"]
+            return
+
+        if status in TERMINAL_STATUSES:
+            await self._complete(training_id, state, status, result.get("output"))
+            return
+
+        if status != previous:
+            state["interval"] = TRAINING_POLL_MIN_INTERVAL
+        else:
+            state["interval"] = min(state["interval"] * TRAINING_POLL_BACKOFF, TRAINING_POLL_MAX_INTERVAL)
+        state["next_poll_at"] = time.monotonic() + state["interval"]
+        self._save_snapshot(training_id, {"training_status": status})
+
+    async def _complete(self, training_id: str, state: Dict[str, Any], status: str, output: Any) -> None:
+        """Записывает итоговый статус тренировки в базу данных"""
+        model_status = "ready" if status == "succeeded" else "failed"
+        model_url = output.get("model_url") if isinstance(output, dict) else None
+
+        model = await self.model_repository.complete_training(state["model_id"], model_status, model_url)
+        if model is not None:
+            self._stats["transitions"] += 1
+            logger.info(f"Обучение {training_id} завершено со статусом {status}, модель {state['model_id']}: {model_status}")
+            await publish_event(ModelReadyEvent(
+                model_id=model["model_id"],
+                user_id=model["user_id"],
+                training_id=training_id,
+                name=model.get("name"),
+                trigger_word=model.get("trigger_word"),
+                status=model["status"],
+                model_url=model.get("model_url")
+            ))
+        else:
+            # Переход уже записан другим процессом или обработчиком
+            model = await self.model_repository.get_by_training_id(training_id)
+
+        self.record_completion(training_id, status, model or {"status": model_status, "model_url": model_url})
+
+    def record_completion(self, training_id: str, training_status: str, model: Dict[str, Any]) -> None:
+        """
+        Фиксирует завершение тренировки, о котором стало известно из опроса или вебхука
+
+        Args:
+            training_id: ID тренировки
+            training_status: Статус Replicate (succeeded, failed, canceled)
+            model: Запись модели после обновления
+        """
+        self._tracked.pop(training_id, None)
+
+        data = {
+            "training_status": training_status,
+            "model_status": model.get("status"),
+            "model_url": model.get("model_url"),
+        }
+        if "user_id" in model:
+            data.update({
+                "model_id": model.get("model_id"),
+                "user_id": model["user_id"],
+                "model_name": model.get("name"),
+                "trigger_word": model.get("trigger_word"),
+            })
+        elif training_id not in self._snapshots:
+            # Без данных о владельце снимок не построить - статус будет прочитан из базы
+            return
+        self._save_snapshot(training_id, data)
+
+    def _due(self) -> List[str]:
+        now = time.monotonic()
+        due = sorted(
+            (state["next_poll_at"], training_id)
+            for training_id, state in self._tracked.items()
+            if state["next_poll_at"] <= now
+        )
+        return [training_id for _, training_id in due[:TRAINING_POLL_BATCH_SIZE]]
+
+    async def _run(self) -> None:
+        logger.info("Фоновый опрос статусов обучения запущен")
+        while True:
+            try:
+                if time.monotonic() - self._last_refresh >= TRAINING_POLL_REFRESH_INTERVAL:
+                    await self._refresh_tracked()
+
+                batch = self._due()
+                if batch:
+                    results = await asyncio.gather(
+                        *(self._poll_one(training_id, self._tracked[training_id]) for training_id in batch),
+                        return_exceptions=True
+                    )
+                    for training_id, result in zip(batch, results):
+                        if isinstance(result, Exception):
+                            logger.error(f"Ошибка при опросе статуса обучения {training_id}: {result}")
+                            state = self._tracked.get(training_id)
+                            if state:
+                                state["next_poll_at"] = time.monotonic() + state["interval"]
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка в цикле опроса статусов обучения: {e}")
+
+            # Спим до ближайшего опроса или до добавления новой тренировки
+            next_poll = min((state["next_poll_at"] for state in self._tracked.values()), default=None)
+            timeout = TRAINING_POLL_REFRESH_INTERVAL if next_poll is None else max(next_poll - time.monotonic(), 0.1)
+            timeout = min(timeout, max(self._last_refresh + TRAINING_POLL_REFRESH_INTERVAL - time.monotonic(), 0.1))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        """Запускает фоновый опрос"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает фоновый опрос"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Фоновый опрос статусов обучения остановлен")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает метрики опроса
+
+        Returns:
+            Количество отслеживаемых тренировок и счетчики запросов
+        """
+        return {"tracked": len(self._tracked), "snapshots": len(self._snapshots), **self._stats}
+
+
+# Общий экземпляр, создается при первом обращении
+_training_poller: Optional[TrainingStatusPoller] = None
+
+
+def get_training_poller() -> TrainingStatusPoller:
+    """
+    Возвращает общий экземпляр фонового опроса статусов обучения
+
+    Returns:
+        TrainingStatusPoller: Экземпляр опроса
+    """
+    global _training_poller
+    if _training_poller is None:
+        from repository.async_model_repository import AsyncModelRepository
+        _training_poller = TrainingStatusPoller(AsyncModelRepository())
+    return _training_poller
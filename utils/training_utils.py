@@ -5,12 +5,32 @@ import zipfile
 import tempfile
 import requests
 import time
-from typing import List, Dict, Any, Optional
-from PIL import Image
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
+from PIL import Image, ImageOps
 from io import BytesIO
-import replicate
 from dotenv import load_dotenv
 
+from config import config
+from utils.replicate_client import get_replicate_client
+
+# OpenCV (opencv-python-headless 4.x из requirements.txt) нужен для поиска лица при кадрировании.
+# Если пакет не установлен или в нем нет каскадов Хаара (в OpenCV 5 их убрали),
+# кадрирование переходит на эвристику со смещением к верхней части кадра.
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = None
+    np = None
+    logging.warning("OpenCV не установлен: кадрирование фотографий для обучения будет выполняться без поиска лица")
+else:
+    if not hasattr(cv2, "CascadeClassifier") or not hasattr(cv2, "data"):
+        logging.warning(f"OpenCV {cv2.__version__} не поддерживает CascadeClassifier: кадрирование "
+                        f"фотографий для обучения будет выполняться без поиска лица (нужен opencv-python-headless<5)")
+        cv2 = None
+        np = None
+
 # Загружаем переменные окружения
 load_dotenv()
 
@@ -22,6 +42,9 @@ REPLICATE_API_KEY = os.getenv("REPLICATE_API_TOKEN")
 if not REPLICATE_API_KEY and not DISABLE_DB_CHECK:
     logging.error("REPLICATE_API_TOKEN не найден в переменных окружения")
 
+# Адрес, на который Replicate отправляет вебхуки о завершении обучения и генераций (см. handlers/users/replicate_webhook.py)
+REPLICATE_WEBHOOK_URL = os.getenv("REPLICATE_WEBHOOK_URL")
+
 # Получаем API-ключ для облачного хранилища (например, Cloudinary или аналог)
 CLOUD_STORAGE_API_KEY = os.getenv("CLOUD_STORAGE_API_KEY")
 CLOUD_STORAGE_URL = os.getenv("CLOUD_STORAGE_URL")
@@ -29,6 +52,46 @@ CLOUD_STORAGE_URL = os.getenv("CLOUD_STORAGE_URL")
 # Устанавливаем базовые пути для загрузки фотографий
 BASE_UPLOAD_DIR = os.getenv("BASE_UPLOAD_DIR", "user_training_photos")
 
+# Ограничения на загружаемые фотографии берем из общей конфигурации
+MAX_IMAGE_SIZE = config.MAX_IMAGE_SIZE
+ALLOWED_IMAGE_TYPES = config.ALLOWED_IMAGE_TYPES
+
+# Сигнатуры форматов изображений: по первым байтам определяем реальный тип файла,
+# не доверяя Content-Type от клиента
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+# Количество процессов для параллельной конвертации изображений
+IMAGE_CONVERSION_WORKERS = int(os.getenv("IMAGE_CONVERSION_WORKERS", str(os.cpu_count() or 1)))
+
+# Разрешение, на котором Replicate обучает модель
+TRAINING_RESOLUTION = int(os.getenv("TRAINING_RESOLUTION", "512"))
+
+# Режим предобработки фотографий для обучения:
+# "training" - уменьшение при декодировании до TRAINING_MAX_EDGE, поворот по EXIF и квадратное кадрирование по лицу
+# "full" - конвертация в исходном разрешении
+IMAGE_PREPROCESS_MODE = os.getenv("IMAGE_PREPROCESS_MODE", "training").lower()
+
+# Максимальная сторона изображения после предобработки (по умолчанию с запасом в 2 раза от разрешения обучения)
+TRAINING_MAX_EDGE = int(os.getenv("TRAINING_MAX_EDGE", str(TRAINING_RESOLUTION * 2)))
+
+# Качество JPEG: для уменьшенных снимков достаточно 90, исходное разрешение сохраняем с 95
+TRAINING_JPEG_QUALITY = int(os.getenv("TRAINING_JPEG_QUALITY", "90"))
+FULL_JPEG_QUALITY = 95
+
+# Размер блока при потоковой сборке ZIP-архива
+ZIP_STREAM_CHUNK_SIZE = int(os.getenv("ZIP_STREAM_CHUNK_SIZE", str(1024 * 1024)))
+
+# Каскад Хаара для поиска лиц, загружается в каждом процессе при первом использовании
+_face_cascade = None
+
+# Общий пул процессов для конвертации, создается при первом использовании
+_conversion_pool: Optional[ProcessPoolExecutor] = None
+
 # Настраиваем логгер
 logger = logging.getLogger(__name__)
 
@@ -101,6 +164,153 @@ def clear_user_upload_dir(username: str, user_id: int) -> bool:
         return False
 
 
+def detect_image_type(header: bytes) -> Optional[str]:
+    """
+    Определяет тип изображения по сигнатуре в начале файла.
+    
+    Args:
+        header (bytes): Первые байты файла
+    
+    Returns:
+        Optional[str]: MIME-тип изображения или None, если формат не распознан
+    """
+    for signature, image_type in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return image_type
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def _detect_face_center(img: Image.Image) -> Optional[Tuple[float, float]]:
+    """
+    Ищет самое крупное лицо на изображении с помощью OpenCV.
+    
+    Args:
+        img (Image.Image): Изображение
+    
+    Returns:
+        Optional[Tuple[float, float]]: Координаты центра лица или None, если лицо не найдено или OpenCV не установлен
+    """
+    global _face_cascade
+    if cv2 is None:
+        return None
+
+    try:
+        if _face_cascade is None:
+            _face_cascade = cv2.CascadeClassifier(
+                os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+            )
+
+        # Детектор работает на маленькой серой копии - этого достаточно для поиска лица
+        preview = img.convert("L")
+        preview.thumbnail((400, 400))
+        faces = _face_cascade.detectMultiScale(np.asarray(preview), scaleFactor=1.1, minNeighbors=5)
+        if len(faces) == 0:
+            return None
+
+        x, y, w, h = max(faces, key=lambda face: face[2] * face[3])
+        return (x + w / 2) * img.width / preview.width, (y + h / 2) * img.height / preview.height
+    except Exception as e:
+        logger.warning(f"Не удалось выполнить поиск лица: {e}")
+        return None
+
+
+def _crop_square(img: Image.Image) -> Image.Image:
+    """
+    Вырезает из изображения квадрат по короткой стороне, центрируя его на лице.
+    Если лицо не найдено, на вертикальных снимках квадрат смещается вверх,
+    где на портретах обычно находится голова.
+    
+    Args:
+        img (Image.Image): Изображение
+    
+    Returns:
+        Image.Image: Квадратное изображение
+    """
+    width, height = img.size
+    side = min(width, height)
+    if width == height:
+        return img
+
+    center = _detect_face_center(img)
+    if center is None:
+        center = (width / 2, height * 0.4 if height > width else height / 2)
+
+    left = int(min(max(center[0] - side / 2, 0), width - side))
+    top = int(min(max(center[1] - side / 2, 0), height - side))
+    return img.crop((left, top, left + side, top + side))
+
+
+def _prepare_training_image(img: Image.Image, max_edge: int) -> Image.Image:
+    """
+    Готовит изображение для обучения: уменьшает при декодировании, поворачивает по EXIF
+    и кадрирует в квадрат со стороной не больше max_edge.
+    
+    Args:
+        img (Image.Image): Открытое, но еще не декодированное изображение
+        max_edge (int): Максимальная сторона результата
+    
+    Returns:
+        Image.Image: Подготовленное изображение
+    """
+    # JPEG декодируется сразу в уменьшенном масштабе (1/2, 1/4, 1/8), но не меньше max_edge по каждой стороне
+    if img.format == "JPEG":
+        img.draft("RGB", (max_edge, max_edge))
+
+    img = ImageOps.exif_transpose(img)
+    img = _crop_square(img)
+
+    if img.width > max_edge:
+        # reducing_gap сначала быстро уменьшает изображение в целое число раз, затем доводит LANCZOS
+        img = img.resize((max_edge, max_edge), Image.LANCZOS, reducing_gap=3.0)
+    return img
+
+
+def _save_as_jpeg(img: Image.Image, output_path: str, quality: int) -> None:
+    """
+    Сохраняет изображение в JPG, заменяя прозрачность белым фоном.
+    
+    Args:
+        img (Image.Image): Изображение
+        output_path (str): Путь для сохранения
+        quality (int): Качество JPEG
+    """
+    # Конвертация изображения в RGB, если оно в другом режиме
+    if img.mode in ('RGBA', 'LA', 'P'):
+        # Создаем новое изображение с белым фоном
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'RGBA':
+            background.paste(img, mask=img.split()[3])  # 3 is the alpha channel
+        else:
+            background.paste(img)
+        background.save(output_path, 'JPEG', quality=quality)
+    else:
+        # Для RGB изображений просто конвертируем в JPG
+        img.convert('RGB').save(output_path, 'JPEG', quality=quality)
+
+
+def _convert_image(source: Union[str, bytes], output_path: str, mode: Optional[str] = None) -> None:
+    """
+    Конвертирует изображение в формат JPG, пробрасывая исключения.
+    
+    Args:
+        source (Union[str, bytes]): Путь к исходному изображению или его содержимое
+        output_path (str): Путь для сохранения конвертированного изображения
+        mode (Optional[str]): Режим предобработки ("training" или "full"), по умолчанию IMAGE_PREPROCESS_MODE
+    """
+    mode = mode or IMAGE_PREPROCESS_MODE
+
+    # Содержимое загрузки декодируем прямо из памяти, без промежуточного файла на диске
+    input_file = BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    with Image.open(input_file) as img:
+        if mode == "training":
+            _save_as_jpeg(_prepare_training_image(img, TRAINING_MAX_EDGE), output_path, TRAINING_JPEG_QUALITY)
+        else:
+            # Поворот по EXIF применяем и здесь: при сохранении в JPG метаданные ориентации теряются
+            _save_as_jpeg(ImageOps.exif_transpose(img), output_path, FULL_JPEG_QUALITY)
+
+
 def convert_image_to_jpg(input_path: str, output_path: str) -> bool:
     """
     Конвертирует изображение в формат JPG.
@@ -113,20 +323,7 @@ def convert_image_to_jpg(input_path: str, output_path: str) -> bool:
         bool: True, если конвертация успешна, иначе False
     """
     try:
-        with Image.open(input_path) as img:
-            # Конвертация изображения в RGB, если оно в другом режиме
-            if img.mode in ('RGBA', 'LA', 'P'):
-                # Создаем новое изображение с белым фоном
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'RGBA':
-                    background.paste(img, mask=img.split()[3])  # 3 is the alpha channel
-                else:
-                    background.paste(img)
-                background.save(output_path, 'JPEG', quality=95)
-            else:
-                # Для RGB изображений просто конвертируем в JPG
-                img.convert('RGB').save(output_path, 'JPEG', quality=95)
-
+        _convert_image(input_path, output_path)
         logger.info(f"Изображение успешно конвертировано: {input_path} -> {output_path}")
         return True
     except Exception as e:
@@ -134,6 +331,99 @@ def convert_image_to_jpg(input_path: str, output_path: str) -> bool:
         return False
 
 
+def _convert_image_task(index: int, source: Union[str, bytes], output_path: str,
+                        mode: Optional[str] = None) -> Tuple[int, str, Optional[str]]:
+    """
+    Задача конвертации одного изображения для пула процессов.
+    
+    Args:
+        index (int): Порядковый номер изображения
+        source (Union[str, bytes]): Путь к исходному изображению или его содержимое
+        output_path (str): Путь для сохранения конвертированного изображения
+        mode (Optional[str]): Режим предобработки
+    
+    Returns:
+        Tuple[int, str, Optional[str]]: (номер, путь к результату, текст ошибки или None)
+    """
+    try:
+        _convert_image(source, output_path, mode)
+        return index, output_path, None
+    except Exception as e:
+        return index, output_path, f"{type(e).__name__}: {e}"
+
+
+def get_conversion_pool() -> ProcessPoolExecutor:
+    """
+    Возвращает общий пул процессов для конвертации изображений.
+    
+    Returns:
+        ProcessPoolExecutor: Пул процессов
+    """
+    global _conversion_pool
+    if _conversion_pool is None:
+        _conversion_pool = ProcessPoolExecutor(max_workers=IMAGE_CONVERSION_WORKERS)
+        logger.info(f"Создан пул процессов для конвертации изображений: {IMAGE_CONVERSION_WORKERS} воркеров")
+    return _conversion_pool
+
+
+def shutdown_conversion_pool() -> None:
+    """
+    Останавливает пул процессов конвертации (вызывается при остановке приложения).
+    """
+    global _conversion_pool
+    if _conversion_pool is not None:
+        _conversion_pool.shutdown(wait=False, cancel_futures=True)
+        _conversion_pool = None
+
+
+def convert_images_parallel(image_paths: List[Union[str, bytes]], output_dir: str, parallel: bool = True,
+                            mode: Optional[str] = None, indices: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    Конвертирует изображения в JPG, распределяя работу по ядрам процессора.
+    Имена результатов соответствуют порядку входных файлов: image_1.jpg, image_2.jpg, ...
+    
+    Args:
+        image_paths (List[Union[str, bytes]]): Пути к исходным изображениям или их содержимое
+        output_dir (str): Директория для сохранения конвертированных изображений
+        parallel (bool): Использовать пул процессов (False - последовательная конвертация)
+        mode (Optional[str]): Режим предобработки ("training" или "full"), по умолчанию IMAGE_PREPROCESS_MODE
+        indices (Optional[List[int]]): Номера изображений для имен результатов (по умолчанию 1, 2, 3, ...)
+    
+    Returns:
+        Dict[str, Any]: Отчет о конвертации:
+            converted - пути к конвертированным изображениям в исходном порядке
+            failed - список ошибок вида {"index", "source", "error"} (source - путь или None для содержимого)
+    """
+    if indices is None:
+        indices = list(range(1, len(image_paths) + 1))
+
+    tasks = [
+        (index, img_path, os.path.join(output_dir, f"image_{index}.jpg"), mode)
+        for index, img_path in zip(indices, image_paths)
+    ]
+
+    # Для одного изображения или одного воркера пул процессов только добавляет накладные расходы
+    if parallel and len(tasks) > 1 and IMAGE_CONVERSION_WORKERS > 1:
+        pool = get_conversion_pool()
+        futures = [pool.submit(_convert_image_task, *task) for task in tasks]
+        results = [future.result() for future in futures]
+    else:
+        results = [_convert_image_task(*task) for task in tasks]
+
+    converted = []
+    failed = []
+    for (index, output_path, error), (_, img_path, _, _) in zip(results, tasks):
+        if error is None:
+            converted.append(output_path)
+        else:
+            source = img_path if isinstance(img_path, str) else None
+            logger.error(f"Ошибка при конвертации изображения №{index} ({source or 'из памяти'}): {error}")
+            failed.append({"index": index, "source": source, "error": error})
+
+    logger.info(f"Конвертировано {len(converted)} из {len(tasks)} изображений, ошибок: {len(failed)}")
+    return {"converted": converted, "failed": failed}
+
+
 def process_and_convert_images(username: str, user_id: int, image_paths: List[str]) -> List[str]:
     """
     Обрабатывает и конвертирует несколько изображений в формат JPG.
@@ -147,89 +437,129 @@ def process_and_convert_images(username: str, user_id: int, image_paths: List[st
         List[str]: Список путей к конвертированным изображениям
     """
     user_path = get_user_upload_path(username, user_id)
-    converted_paths = []
+    return convert_images_parallel(image_paths, user_path)["converted"]
 
-    for i, img_path in enumerate(image_paths):
-        # Формируем путь для сохранения конвертированного изображения
-        jpg_filename = f"image_{i + 1}.jpg"
-        jpg_path = os.path.join(user_path, jpg_filename)
 
-        # Конвертируем изображение
-        if convert_image_to_jpg(img_path, jpg_path):
-            converted_paths.append(jpg_path)
-
-    logger.info(f"Обработано и конвертировано {len(converted_paths)} из {len(image_paths)} изображений")
-    return converted_paths
-
-
-def create_zip_archive(username: str, user_id: int, image_paths: List[str]) -> str:
+def get_zip_filename(username: str, user_id: int) -> str:
     """
-    Создает ZIP-архив из конвертированных изображений.
+    Формирует имя ZIP-архива с фотографиями пользователя.
     
     Args:
         username (str): Имя пользователя
         user_id (int): ID пользователя
-        image_paths (List[str]): Список путей к конвертированным изображениям
     
     Returns:
-        str: Путь к созданному ZIP-архиву
+        str: Имя архива
     """
-    # Формируем путь к ZIP-архиву
     clean_username = "".join(c for c in username if c.isalnum() or c in "_-")
-    zip_filename = f"{clean_username}_{user_id}.zip"
-    user_path = get_user_upload_path(username, user_id)
-    zip_path = os.path.join(user_path, zip_filename)
+    return f"{clean_username}_{user_id}.zip"
 
-    try:
-        # Создаем ZIP-архив
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
-            for img_path in image_paths:
-                # Добавляем в архив только имя файла, без полного пути
-                zipf.write(img_path, os.path.basename(img_path))
-
-        logger.info(f"Создан ZIP-архив: {zip_path} с {len(image_paths)} изображениями")
-        return zip_path
-    except Exception as e:
-        logger.error(f"Ошибка при создании ZIP-архива для пользователя {username}: {e}")
-        return ""
 
+class _ZipStreamSink:
+    """
+    Приемник данных для zipfile, накапливающий записанные байты до следующей выдачи.
+    Не поддерживает tell/seek, поэтому zipfile пишет архив последовательно,
+    с дескрипторами данных после каждого файла.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
 
-def upload_zip_to_cloud(zip_path: str) -> str:
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        """Возвращает накопленные байты и очищает буфер"""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip_stream(image_paths: List[str], chunk_size: int = ZIP_STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Собирает ZIP-архив из изображений на лету и отдает его блоками.
+    Файлы добавляются без сжатия (ZIP_STORED): JPEG уже сжат, и deflate
+    только тратит процессор. В памяти держится не больше одного блока.
+    
+    Args:
+        image_paths (List[str]): Список путей к конвертированным изображениям
+        chunk_size (int): Размер блока чтения изображений
+    
+    Yields:
+        bytes: Очередной фрагмент архива
+    """
+    sink = _ZipStreamSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as zipf:
+        for img_path in image_paths:
+            # Добавляем в архив только имя файла, без полного пути
+            zinfo = zipfile.ZipInfo.from_file(img_path, os.path.basename(img_path))
+            zinfo.compress_type = zipfile.ZIP_STORED
+            with open(img_path, "rb") as src, zipf.open(zinfo, "w") as dst:
+                while True:
+                    block = src.read(chunk_size)
+                    if not block:
+                        break
+                    dst.write(block)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+
+    # Центральный каталог записывается при закрытии архива
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def upload_zip_to_cloud(source: Union[str, Iterable[bytes]], filename: Optional[str] = None) -> str:
     """
     Загружает ZIP-архив в облачное хранилище и возвращает URL.
     
     Args:
-        zip_path (str): Путь к ZIP-архиву
+        source (Union[str, Iterable[bytes]]): Путь к ZIP-архиву или поток его байтов (см. iter_zip_stream)
+        filename (Optional[str]): Имя архива в хранилище (по умолчанию имя файла архива)
     
     Returns:
         str: URL загруженного архива
     """
+    from utils.storage import get_storage_backend
+
+    is_path = isinstance(source, str)
+    filename = filename or (os.path.basename(source) if is_path else "archive.zip")
+
     # В тестовом режиме возвращаем фиктивный URL
     if DISABLE_DB_CHECK:
-        logger.info(f"[ТЕСТОВЫЙ РЕЖИМ] Эмуляция загрузки ZIP-архива: {zip_path}")
-        return f"https://cloud-storage.example.com/{os.path.basename(zip_path)}"
+        logger.info(f"[ТЕСТОВЫЙ РЕЖИМ] Эмуляция загрузки ZIP-архива: {filename}")
+        return f"https://cloud-storage.example.com/{filename}"
 
     try:
-        if not os.path.exists(zip_path):
-            logger.error(f"ZIP-архив не найден: {zip_path}")
+        if is_path and not os.path.exists(source):
+            logger.error(f"ZIP-архив не найден: {source}")
             return ""
 
-        # Для демонстрации возвращаем локальный путь
-        # В реальном проекте здесь должен быть код для загрузки
-        # и получения URL из облачного хранилища
-
-        # Эмуляция загрузки в облако
-        logger.info(f"ZIP-архив успешно загружен в облачное хранилище: {zip_path}")
-        dummy_url = f"https://cloud-storage.example.com/{os.path.basename(zip_path)}"
+        # Хранилище выбирается переменной STORAGE_BACKEND (local или s3)
+        storage = get_storage_backend()
+        key = f"training/{filename}"
+        if is_path:
+            url = storage.upload_file(source, key)
+        else:
+            url = storage.upload_stream(source, key)
 
-        return dummy_url
+        logger.info(f"ZIP-архив успешно загружен в облачное хранилище: {key}")
+        return url
     except Exception as e:
         logger.error(f"Ошибка при загрузке ZIP-архива в облачное хранилище: {e}")
         return ""
 
 
-def start_replicate_training(username: str, user_id: int, zip_url: str, model_name: str, trigger_word: str) -> Dict[
-    str, Any]:
+async def start_replicate_training(username: str, user_id: int, zip_url: str, model_name: str,
+                                   trigger_word: str) -> Dict[str, Any]:
     """
     Запускает обучение модели на Replicate с заданными параметрами.
     
@@ -258,11 +588,6 @@ def start_replicate_training(username: str, user_id: int, zip_url: str, model_na
         }
 
     try:
-        # Настраиваем клиент Replicate с помощью API-ключа
-        if REPLICATE_API_KEY:
-            # Установка API-ключа для Replicate
-            os.environ["REPLICATE_API_TOKEN"] = REPLICATE_API_KEY
-
         # Формируем запрос для API Replicate
         # Важно: параметры должны соответствовать API Replicate
         input_data = {
@@ -271,7 +596,7 @@ def start_replicate_training(username: str, user_id: int, zip_url: str, model_na
             "model_name": model_name,
             "trigger_word": trigger_word,
             "train_batch_size": 1,
-            "resolution": 512,
+            "resolution": TRAINING_RESOLUTION,
             "num_training_steps": 3000,
             "learning_rate": 1e-6,
             "enable_LoRA": True,
@@ -280,9 +605,15 @@ def start_replicate_training(username: str, user_id: int, zip_url: str, model_na
             "lora_dropout": 0.1,
         }
 
-        # Запускаем обучение с помощью Replicate API
+        # Запускаем обучение с помощью Replicate API, не дожидаясь его завершения:
+        # о результате сообщит вебхук или фоновый опрос статусов
         version = "lucataco/lora-training:54bdee3a48fafb1e65dacf9151138ae290b35328ff5fbfd6cc4a8fcfa2dbe3c3"
-        training = replicate.run(version, input=input_data)
+        training = await get_replicate_client().create_prediction(
+            version.split(":", 1)[1],
+            input_data,
+            webhook=REPLICATE_WEBHOOK_URL,
+            webhook_events_filter=["completed"]
+        )
 
         # Получаем ID обучения и другую информацию из ответа API
         training_id = training["id"]
@@ -306,7 +637,7 @@ def start_replicate_training(username: str, user_id: int, zip_url: str, model_na
         }
 
 
-def check_training_status(training_id: str) -> Dict[str, Any]:
+async def check_training_status(training_id: str) -> Dict[str, Any]:
     """
     Проверяет статус обучения модели на Replicate.
     
@@ -328,15 +659,11 @@ def check_training_status(training_id: str) -> Dict[str, Any]:
         }
 
     try:
-        if REPLICATE_API_KEY:
-            # Установка API-ключа для Replicate
-            os.environ["REPLICATE_API_TOKEN"] = REPLICATE_API_KEY
-
         # Получаем информацию о прогрессе обучения
-        prediction = replicate.predictions.get(training_id)
+        prediction = await get_replicate_client().get_prediction(training_id)
 
-        status = prediction.status
-        output = prediction.output if prediction.status == "succeeded" else None
+        status = prediction.get("status")
+        output = prediction.get("output") if status == "succeeded" else None
 
         logger.info(f"Статус обучения модели {training_id}: {status}")
 
@@ -354,8 +681,8 @@ def check_training_status(training_id: str) -> Dict[str, Any]:
         }
 
 
-def process_training_completion(training_id: str, user_id: int, username: str, model_name: str, trigger_word: str) -> \
-Dict[str, Any]:
+async def process_training_completion(training_id: str, user_id: int, username: str, model_name: str,
+                                      trigger_word: str) -> Dict[str, Any]:
     """
     Обрабатывает завершение обучения модели и сохраняет результаты.
     
@@ -385,7 +712,7 @@ Dict[str, Any]:
 
     try:
         # Получаем статус обучения
-        training_status = check_training_status(training_id)
+        training_status = await check_training_status(training_id)
 
         if training_status["status"] == "succeeded":
             # Обучение успешно завершено, получаем информацию о модели
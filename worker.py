@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+import signal
+import socket
+import asyncio
+import logging
+import argparse
+import multiprocessing
+from dotenv import load_dotenv
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Загружаем переменные окружения
+load_dotenv(override=True)
+
+# Количество процессов-обработчиков и задач, выполняемых одним процессом одновременно
+TRAINING_WORKER_PROCESSES = int(os.getenv("TRAINING_WORKER_PROCESSES", "2"))
+TRAINING_WORKER_CONCURRENCY = int(os.getenv("TRAINING_WORKER_CONCURRENCY", "2"))
+# Минимальная пауза перед перезапуском упавшего процесса
+WORKER_RESTART_DELAY = 5
+
+# Получаем логгер для этого модуля
+logger = logging.getLogger(__name__)
+
+
+def setup_logging() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.FileHandler("worker.log"),
+            logging.StreamHandler()
+        ]
+    )
+
+
+async def notify_user(user_id: int, text: str) -> None:
+    """
+    Отправляет пользователю сообщение через бота
+
+    Args:
+        user_id: ID пользователя в Telegram
+        text: Текст сообщения
+    """
+    try:
+        from loader import bot
+        await bot.send_message(user_id, text)
+    except Exception as e:
+        logger.error(f"Не удалось отправить уведомление пользователю {user_id}: {e}")
+
+
+async def run_worker(worker_id: str, concurrency: int) -> None:
+    """
+    Запускает обработчик очереди задач обучения в текущем процессе
+
+    Args:
+        worker_id: Идентификатор обработчика
+        concurrency: Количество задач, выполняемых одновременно
+    """
+    from repository import init_async_db, close_async_db, AsyncJobRepository, AsyncModelRepository, AsyncUserRepository
+    from utils.training_jobs import TrainingJobWorker
+    from utils.token_ledger import run_snapshot_loop
+    from utils.executors import shutdown_executors
+    from utils.storage import close_storage_backend
+    from utils.replicate_client import close_replicate_client
+
+    if not await init_async_db():
+        raise RuntimeError("Не удалось подключиться к базе данных")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    worker = TrainingJobWorker(
+        worker_id,
+        AsyncJobRepository(),
+        AsyncModelRepository(),
+        AsyncUserRepository(),
+        concurrency=concurrency,
+        notify=notify_user
+    )
+    # Снимки балансов журнала токенов (при нескольких процессах сохраняет один из них)
+    snapshots = asyncio.create_task(run_snapshot_loop(stop))
+    try:
+        await worker.run(stop)
+    finally:
+        stop.set()
+        await snapshots
+        logger.info(f"Итоги обработчика: {worker.stats()}")
+        shutdown_executors(wait=True)
+        close_storage_backend()
+        await close_replicate_client()
+        if "loader" in sys.modules:
+            from loader import bot
+            await bot.session.close()
+        await close_async_db()
+
+
+def worker_process(index: int, concurrency: int) -> None:
+    """Точка входа процесса-обработчика"""
+    setup_logging()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    asyncio.run(run_worker(worker_id, concurrency))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обработчики очереди задач обучения моделей")
+    parser.add_argument("--processes", type=int, default=TRAINING_WORKER_PROCESSES, help="Количество процессов")
+    parser.add_argument("--concurrency", type=int, default=TRAINING_WORKER_CONCURRENCY,
+                        help="Количество задач, выполняемых одним процессом одновременно")
+    args = parser.parse_args()
+
+    setup_logging()
+
+    if args.processes <= 1:
+        worker_process(0, args.concurrency)
+        return
+
+    stopping = False
+
+    def handle_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    def spawn(index: int) -> multiprocessing.Process:
+        process = multiprocessing.Process(
+            target=worker_process, args=(index, args.concurrency), name=f"training-worker-{index}"
+        )
+        process.start()
+        logger.info(f"Запущен процесс-обработчик {index} (PID: {process.pid})")
+        return process
+
+    processes = {index: spawn(index) for index in range(args.processes)}
+
+    # Перезапускаем упавшие процессы; их задачи вернутся в очередь по истечении аренды
+    while not stopping:
+        time.sleep(1)
+        for index, process in list(processes.items()):
+            if not process.is_alive() and not stopping:
+                logger.error(f"Процесс-обработчик {index} завершился с кодом {process.exitcode}, перезапуск")
+                time.sleep(WORKER_RESTART_DELAY)
+                processes[index] = spawn(index)
+
+    for process in processes.values():
+        process.join()
+    logger.info("Обработчики задач обучения остановлены")
+
+
+if __name__ == "__main__":
+    main()